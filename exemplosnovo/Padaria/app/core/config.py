@@ -9,6 +9,17 @@ class Settings(BaseSettings):
     database_url: str = "sqlite:///./padaria.db"
     default_page_size: int = 20
     max_page_size: int = 100
+    agendador_ativo: bool = True
+    agendador_intervalo_segundos: float = 60.0
+    retencao_snapshots_cozinha_dias: int = 30
+    escritor_dedicado: bool = False
+    escritor_lote_maximo: int = 64
+    escritor_espera_ms: float = 2.0
+    metricas_ativas: bool = True
+    # Limite em ms para o registro de consultas lentas; None desliga.
+    consultas_lentas_ms: float | None = None
+    consultas_lentas_arquivo: str = "consultas_lentas.log"
+    consultas_lentas_max: int = 200
 
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -0,0 +1,45 @@
+from typing import Any
+
+from fastapi import HTTPException, Request, Response, status
+
+
+def responder_versionado(request: Request, response: Response, versao: int) -> Response | None:
+    # ETag fraco com a versao dos dados; o navegador revalida a cada polling
+    # e recebe 304 sem que o servico toque no banco.
+    etag = f'W/"v{versao}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "X-Data-Version": str(versao)}
+    enviados = {
+        valor.strip().removeprefix("W/")
+        for valor in request.headers.get("if-none-match", "").split(",")
+    }
+    if "*" in enviados or etag.removeprefix("W/") in enviados:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return None
+
+
+def anunciar_cursor(response: Response, cursor: str | None) -> None:
+    # Listas continuam sendo arrays JSON; a proxima pagina (keyset) vai no header.
+    if cursor:
+        response.headers["X-Next-Cursor"] = cursor
+
+
+class ConflitoVersao(HTTPException):
+    # 409 com o estado atual do recurso: o cliente reaplica a alteracao sobre ele.
+    def __init__(self, detail: str, atual: dict[str, Any]) -> None:
+        super().__init__(status_code=status.HTTP_409_CONFLICT, detail=detail)
+        self.atual = atual
+
+
+async def versao_if_match(request: Request) -> int | None:
+    # If-Match: "7" (ou W/"7"); ausente ou "*" dispensa a conferencia.
+    # Async para nao ocupar thread do pool nas rotas async.
+    valor = request.headers.get("if-match", "").strip().removeprefix("W/").strip('"')
+    if not valor or valor == "*":
+        return None
+    if not valor.isdigit():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="If-Match deve conter a versao numerica da comanda.",
+        )
+    return int(valor)
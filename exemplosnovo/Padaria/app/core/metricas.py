@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+from bisect import bisect_left
+from collections.abc import Iterable
+from contextvars import ContextVar
+from dataclasses import dataclass
+from threading import Lock
+from time import perf_counter
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+PREFIXO = "padaria"
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_CONSULTAS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+ROTA_DESCONHECIDA = "sem_rota"
+
+
+@dataclass(slots=True)
+class Medicao:
+    # Consultas SQL da requisicao corrente (inclusive as que rodam no threadpool,
+    # que herda o contexto, e no escritor dedicado).
+    consultas: int = 0
+    segundos_sql: float = 0.0
+
+
+class Histograma:
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.contagens = [0] * (len(buckets) + 1)
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor: float) -> None:
+        self.contagens[bisect_left(self.buckets, valor)] += 1
+        self.soma += valor
+        self.total += 1
+
+
+_medicao_atual: ContextVar[Medicao | None] = ContextVar("medicao_sql", default=None)
+_lock = Lock()
+_requisicoes: dict[tuple[str, str, str], int] = {}
+_duracao: dict[tuple[str, str], Histograma] = {}
+_consultas_por_requisicao: dict[tuple[str, str], Histograma] = {}
+_segundos_sql: dict[tuple[str, str], float] = {}
+_em_andamento = 0
+_consultas_total = 0
+_segundos_sql_total = 0.0
+
+
+def registrar_consulta(segundos: float) -> None:
+    global _consultas_total, _segundos_sql_total
+    medicao = _medicao_atual.get()
+    if medicao is not None:
+        medicao.consultas += 1
+        medicao.segundos_sql += segundos
+    with _lock:
+        _consultas_total += 1
+        _segundos_sql_total += segundos
+
+
+def registrar_requisicao(metodo: str, rota: str, status: int, segundos: float, medicao: Medicao) -> None:
+    chave = (metodo, rota)
+    with _lock:
+        _requisicoes[(metodo, rota, str(status))] = _requisicoes.get((metodo, rota, str(status)), 0) + 1
+        _duracao.setdefault(chave, Histograma(BUCKETS_SEGUNDOS)).observar(segundos)
+        _consultas_por_requisicao.setdefault(chave, Histograma(BUCKETS_CONSULTAS)).observar(medicao.consultas)
+        _segundos_sql[chave] = _segundos_sql.get(chave, 0.0) + medicao.segundos_sql
+
+
+def server_timing(medicao: Medicao, segundos: float) -> str:
+    return (
+        f'db;dur={medicao.segundos_sql * 1000:.2f};desc="{medicao.consultas} consultas", '
+        f"app;dur={segundos * 1000:.2f}"
+    )
+
+
+def limpar() -> None:
+    global _consultas_total, _segundos_sql_total
+    with _lock:
+        _requisicoes.clear()
+        _duracao.clear()
+        _consultas_por_requisicao.clear()
+        _segundos_sql.clear()
+        _consultas_total = 0
+        _segundos_sql_total = 0.0
+
+
+def exportar(medidas: Iterable[tuple[str, str, str, float]] = ()) -> str:
+    # Formato texto do Prometheus; `medidas` sao gauges/contadores lidos na hora
+    # (cache, threadpool, escritor) como (nome, tipo, ajuda, valor).
+    linhas: list[str] = []
+    with _lock:
+        _cabecalho(linhas, "http_requisicoes_total", "counter", "Requisicoes HTTP atendidas.")
+        for (metodo, rota, status), total in sorted(_requisicoes.items()):
+            linhas.append(f"{PREFIXO}_http_requisicoes_total{_rotulos(metodo, rota, status=status)} {total}")
+        _cabecalho(linhas, "http_requisicoes_em_andamento", "gauge", "Requisicoes HTTP em andamento.")
+        linhas.append(f"{PREFIXO}_http_requisicoes_em_andamento {_em_andamento}")
+        _histogramas(linhas, "http_duracao_segundos", "Latencia por rota.", _duracao)
+        _histogramas(
+            linhas,
+            "sql_consultas_por_requisicao",
+            "Comandos SQL por requisicao.",
+            _consultas_por_requisicao,
+        )
+        _cabecalho(linhas, "sql_duracao_segundos_total", "counter", "Tempo em SQL por rota.")
+        for (metodo, rota), segundos in sorted(_segundos_sql.items()):
+            linhas.append(f"{PREFIXO}_sql_duracao_segundos_total{_rotulos(metodo, rota)} {segundos:.6f}")
+        _cabecalho(linhas, "sql_consultas_total", "counter", "Comandos SQL (inclui tarefas de fundo).")
+        linhas.append(f"{PREFIXO}_sql_consultas_total {_consultas_total}")
+        _cabecalho(linhas, "sql_consultas_segundos_total", "counter", "Tempo total em SQL.")
+        linhas.append(f"{PREFIXO}_sql_consultas_segundos_total {_segundos_sql_total:.6f}")
+    for nome, tipo, ajuda, valor in medidas:
+        _cabecalho(linhas, nome, tipo, ajuda)
+        linhas.append(f"{PREFIXO}_{nome} {valor:g}")
+    return "\n".join(linhas) + "\n"
+
+
+def _cabecalho(linhas: list[str], nome: str, tipo: str, ajuda: str) -> None:
+    linhas.append(f"# HELP {PREFIXO}_{nome} {ajuda}")
+    linhas.append(f"# TYPE {PREFIXO}_{nome} {tipo}")
+
+
+def _histogramas(
+    linhas: list[str],
+    nome: str,
+    ajuda: str,
+    series: dict[tuple[str, str], Histograma],
+) -> None:
+    _cabecalho(linhas, nome, "histogram", ajuda)
+    for (metodo, rota), histograma in sorted(series.items()):
+        acumulado = 0
+        for limite, contagem in zip(histograma.buckets, histograma.contagens):
+            acumulado += contagem
+            linhas.append(f"{PREFIXO}_{nome}_bucket{_rotulos(metodo, rota, le=f'{limite:g}')} {acumulado}")
+        linhas.append(f"{PREFIXO}_{nome}_bucket{_rotulos(metodo, rota, le='+Inf')} {histograma.total}")
+        linhas.append(f"{PREFIXO}_{nome}_sum{_rotulos(metodo, rota)} {histograma.soma:.6f}")
+        linhas.append(f"{PREFIXO}_{nome}_count{_rotulos(metodo, rota)} {histograma.total}")
+
+
+def _rotulos(metodo: str, rota: str, **extras: str) -> str:
+    pares = {"metodo": metodo, "rota": rota, **extras}
+    corpo = ",".join(f'{chave}="{_escapar(valor)}"' for chave, valor in pares.items())
+    return "{" + corpo + "}"
+
+
+def _escapar(valor: str) -> str:
+    return valor.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _rota(scope: Scope) -> str:
+    # Template da rota ("/comandas/{pedido_id}/itens"), nunca o path cru: cardinalidade fixa.
+    rota = scope.get("route")
+    return getattr(rota, "path", ROTA_DESCONHECIDA)
+
+
+class MetricasMiddleware:
+    # ASGI puro (sem BaseHTTPMiddleware): nao bufferiza streams e o contexto da
+    # medicao chega as rotas sync pelo threadpool.
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        global _em_andamento
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        inicio = perf_counter()
+        medicao = Medicao()
+        token = _medicao_atual.set(medicao)
+        status = 500
+
+        async def enviar(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                MutableHeaders(scope=message).append(
+                    "Server-Timing", server_timing(medicao, perf_counter() - inicio)
+                )
+            await send(message)
+
+        with _lock:
+            _em_andamento += 1
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            _medicao_atual.reset(token)
+            with _lock:
+                _em_andamento -= 1
+            registrar_requisicao(scope["method"], _rota(scope), status, perf_counter() - inicio, medicao)
@@ -1,4 +1,12 @@
 from app.db.base import Base
-from app.db.session import SessionLocal, engine, get_db
+from app.db.session import AsyncSessionLocal, SessionLocal, async_engine, engine, get_async_db, get_db
 
-__all__ = ["Base", "engine", "SessionLocal", "get_db"]
+__all__ = [
+    "Base",
+    "engine",
+    "SessionLocal",
+    "get_db",
+    "async_engine",
+    "AsyncSessionLocal",
+    "get_async_db",
+]
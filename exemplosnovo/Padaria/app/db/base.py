@@ -5,11 +5,14 @@ from app.models.comanda_codigo import ComandaCodigo
 from app.models.erp_config import ERPConfig
 from app.models.item_adicional import ItemPedidoAdicional
 from app.models.item_pedido import ItemPedido
+from app.models.movimento_estoque import MovimentoEstoque
 from app.models.pagamento import Pagamento
 from app.models.pedido import Pedido
 from app.models.pedido_cozinha_snapshot import PedidoCozinhaSnapshot
 from app.models.produto import Produto
 from app.models.produto_adicional import ProdutoAdicional
+from app.models.tarefa_agendada import TarefaAgendada
+from app.models.venda_diaria import VendaDiaria
 
 __all__ = [
     "Base",
@@ -23,5 +26,8 @@ __all__ = [
     "ItemPedido",
     "ItemPedidoAdicional",
     "ProdutoAdicional",
+    "MovimentoEstoque",
     "Pagamento",
+    "TarefaAgendada",
+    "VendaDiaria",
 ]
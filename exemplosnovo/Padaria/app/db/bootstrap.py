@@ -1,4 +1,4 @@
-from sqlalchemy import inspect, text
+from sqlalchemy import Numeric, inspect, text
 from sqlalchemy.engine import Engine
 
 
@@ -14,6 +14,9 @@ def ensure_schema(engine: Engine) -> None:
         if "mesa" not in pedido_columns:
             with engine.begin() as conn:
                 conn.execute(text("ALTER TABLE pedidos ADD COLUMN mesa VARCHAR(30)"))
+        if "versao" not in pedido_columns:
+            with engine.begin() as conn:
+                conn.execute(text("ALTER TABLE pedidos ADD COLUMN versao INTEGER NOT NULL DEFAULT 1"))
 
     if "itens_pedido" in tables:
         item_columns = {column["name"] for column in inspector.get_columns("itens_pedido")}
@@ -23,7 +26,7 @@ def ensure_schema(engine: Engine) -> None:
         if "desconto" not in item_columns:
             with engine.begin() as conn:
                 conn.execute(
-                    text("ALTER TABLE itens_pedido ADD COLUMN desconto NUMERIC(10,2) NOT NULL DEFAULT 0")
+                    text("ALTER TABLE itens_pedido ADD COLUMN desconto BIGINT NOT NULL DEFAULT 0")
                 )
 
     if "produtos" in tables:
@@ -56,6 +59,17 @@ def ensure_schema(engine: Engine) -> None:
                         "ADD COLUMN status_visual VARCHAR(20) NOT NULL DEFAULT 'LIBERADO'"
                     )
                 )
+        if "pedido_atual_id" not in codigo_columns:
+            from app.services.manutencao_service import reconstruir_ponteiros_comanda
+
+            with engine.begin() as conn:
+                conn.execute(
+                    text(
+                        "ALTER TABLE comanda_codigos "
+                        "ADD COLUMN pedido_atual_id INTEGER REFERENCES pedidos(id) ON DELETE SET NULL"
+                    )
+                )
+                reconstruir_ponteiros_comanda(conn)
         with engine.begin() as conn:
             conn.execute(
                 text(
@@ -65,8 +79,70 @@ def ensure_schema(engine: Engine) -> None:
                 )
             )
 
+    _migrar_dinheiro_para_centavos(engine, tables)
     _ensure_indexes(engine, tables)
 
+    from app.services.busca_service import instalar_busca
+    from app.services.estoque_service import inicializar_movimentos
+    from app.services.vendas_diarias_service import inicializar_vendas_diarias
+
+    with engine.begin() as conn:
+        inicializar_vendas_diarias(conn)
+        inicializar_movimentos(conn)
+        instalar_busca(conn)
+
+
+COLUNAS_DINHEIRO: dict[str, tuple[str, ...]] = {
+    "produtos": ("preco",),
+    "adicionais": ("preco",),
+    "pedidos": ("total",),
+    "itens_pedido": ("preco_unitario", "desconto", "subtotal"),
+    "itens_pedido_adicionais": ("preco_unitario", "subtotal"),
+    "pagamentos": ("valor",),
+    "vendas_diarias": ("valor_pedidos", "valor_recebido"),
+}
+# PRAGMA user_version do SQLite a partir da qual o dinheiro ja esta em centavos.
+VERSAO_CENTAVOS = 1
+
+
+def _migrar_dinheiro_para_centavos(engine: Engine, tables: set[str]) -> None:
+    # Bancos antigos guardam NUMERIC(10,2) em reais; o modelo agora grava inteiros
+    # em centavos. No Postgres o tipo da coluna muda (e serve de marca); no SQLite
+    # o tipo declarado nao muda, entao a marca e o user_version.
+    inspector = inspect(engine)
+    pendentes = {
+        table: [
+            column["name"]
+            for column in inspector.get_columns(table)
+            if column["name"] in colunas and isinstance(column["type"], Numeric)
+        ]
+        for table, colunas in COLUNAS_DINHEIRO.items()
+        if table in tables
+    }
+    pendentes = {table: colunas for table, colunas in pendentes.items() if colunas}
+    if not pendentes:
+        return
+
+    with engine.begin() as conn:
+        if engine.dialect.name == "sqlite":
+            if conn.execute(text("PRAGMA user_version")).scalar_one() >= VERSAO_CENTAVOS:
+                return
+            for table, colunas in pendentes.items():
+                atribuicoes = ", ".join(
+                    f"{coluna} = CAST(ROUND({coluna} * 100) AS INTEGER)" for coluna in colunas
+                )
+                conn.execute(text(f"UPDATE {table} SET {atribuicoes}"))
+            conn.execute(text(f"PRAGMA user_version = {VERSAO_CENTAVOS}"))
+            return
+        for table, colunas in pendentes.items():
+            for coluna in colunas:
+                conn.execute(
+                    text(
+                        f"ALTER TABLE {table} ALTER COLUMN {coluna} TYPE BIGINT "
+                        f"USING ROUND({coluna} * 100)::BIGINT"
+                    )
+                )
+
 
 def _ensure_indexes(engine: Engine, tables: set[str]) -> None:
     inspector = inspect(engine)
@@ -116,6 +192,11 @@ def _ensure_indexes(engine: Engine, tables: set[str]) -> None:
             "ix_comanda_codigos_status_visual",
             "CREATE INDEX IF NOT EXISTS ix_comanda_codigos_status_visual ON comanda_codigos (status_visual)",
         ),
+        (
+            "comanda_codigos",
+            "ix_comanda_codigos_pedido_atual_id",
+            "CREATE INDEX IF NOT EXISTS ix_comanda_codigos_pedido_atual_id ON comanda_codigos (pedido_atual_id)",
+        ),
         (
             "adicionais",
             "ix_adicionais_ativo_id",
@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+import json
+import logging
+import re
+import sys
+import threading
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from typing import Any
+
+from app.core.config import settings
+
+try:
+    import greenlet
+except ImportError:  # pragma: no cover - vem junto com o SQLAlchemy asyncio
+    greenlet = None
+
+logger = logging.getLogger("app.consultas_lentas")
+
+APP_DIR = str(Path(__file__).resolve().parents[1])
+# Frames do proprio app que nao sao "quem chamou" (sessao, listeners, middleware).
+_IGNORAR_ORIGEM = ("app.db.", "app.core.")
+_PLANEJAVEIS = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+_ESPACOS = re.compile(r"\s+")
+_LITERAIS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_LISTAS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+# "SCAN pedidos" (ou "SCAN TABLE pedidos" em SQLite < 3.36) sem indice.
+_SCAN = re.compile(r"^SCAN (?:TABLE )?(?!CONSTANT ROW)(\w+)\b(?! VIRTUAL TABLE| USING)")
+
+
+@dataclass(slots=True)
+class ConsultaLenta:
+    sql: str
+    parametros: str
+    origem: str
+    plano: list[str]
+    alertas: list[str]
+    ocorrencias: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    ultima_ms: float = 0.0
+    ultima_em: datetime = field(default_factory=datetime.now)
+
+    @property
+    def media_ms(self) -> float:
+        return self.total_ms / self.ocorrencias if self.ocorrencias else 0.0
+
+
+def normalizar_sql(sql: str) -> str:
+    # Literais viram "?" e listas de IN colapsam: a mesma consulta com outros
+    # valores agrupa na mesma linha.
+    normalizado = _LITERAIS.sub("?", _ESPACOS.sub(" ", sql).strip())
+    return _LISTAS.sub("(?...)", normalizado)
+
+
+def forma_parametros(parametros: Any, executemany: bool = False) -> str:
+    if executemany and parametros:
+        return f"{_forma(parametros[0])} x{len(parametros)}"
+    return _forma(parametros)
+
+
+def _forma(parametros: Any) -> str:
+    if isinstance(parametros, dict):
+        return "{" + ", ".join(f"{chave}: {type(valor).__name__}" for chave, valor in parametros.items()) + "}"
+    if isinstance(parametros, (list, tuple)):
+        # Sequencias longas (IN com muitos ids) viram "int x50".
+        grupos: list[list[Any]] = []
+        for valor in parametros:
+            tipo = type(valor).__name__
+            if grupos and grupos[-1][0] == tipo:
+                grupos[-1][1] += 1
+            else:
+                grupos.append([tipo, 1])
+        return "(" + ", ".join(tipo if n == 1 else f"{tipo} x{n}" for tipo, n in grupos) + ")"
+    return type(parametros).__name__ if parametros is not None else "()"
+
+
+def origem_chamada() -> str:
+    # Primeiro frame do app fora da camada de banco. Nas sessoes async o SQL roda
+    # num greenlet filho: ao fim da pilha dele, segue pela pilha do greenlet pai.
+    frame = sys._getframe(1)
+    atual = greenlet.getcurrent() if greenlet is not None else None
+    while frame is not None:
+        modulo = frame.f_globals.get("__name__", "")
+        if frame.f_code.co_filename.startswith(APP_DIR) and not modulo.startswith(_IGNORAR_ORIGEM):
+            return f"{modulo}.{frame.f_code.co_name}:{frame.f_lineno}"
+        frame = frame.f_back
+        if frame is None and atual is not None and atual.parent is not None:
+            atual = atual.parent
+            frame = atual.gr_frame
+    return "desconhecida"
+
+
+def tabelas_varridas(plano: list[str]) -> list[str]:
+    # Tabelas lidas por inteiro, sem indice, no plano do SQLite.
+    return [scan.group(1) for linha in plano if (scan := _SCAN.match(linha.strip()))]
+
+
+def alertas_do_plano(sql: str, parametros: Any, plano: list[str]) -> list[str]:
+    alertas = [f"varredura completa de {tabela}" for tabela in tabelas_varridas(plano)]
+    for linha in plano:
+        detalhe = linha.strip()
+        if detalhe.startswith("USE TEMP B-TREE"):
+            alertas.append(f"b-tree temporaria ({detalhe.removeprefix('USE TEMP B-TREE ').lower()})")
+    if " LIKE " in sql.upper() and _tem_curinga_inicial(parametros):
+        alertas.append("LIKE com curinga no inicio nao usa indice")
+    return alertas
+
+
+def _tem_curinga_inicial(parametros: Any) -> bool:
+    if isinstance(parametros, dict):
+        parametros = parametros.values()
+    elif not isinstance(parametros, (list, tuple)):
+        return False
+    return any(isinstance(valor, str) and valor.startswith("%") for valor in parametros)
+
+
+def explicar(conn, statement: str, parametros: Any) -> list[str]:
+    # Roda no cursor DBAPI cru: nao passa pelos listeners nem pelo ORM.
+    dialeto = conn.dialect.name
+    if dialeto not in {"sqlite", "postgresql"}:
+        return []
+    prefixo = "EXPLAIN QUERY PLAN " if dialeto == "sqlite" else "EXPLAIN "
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(prefixo + statement, parametros)
+        linhas = cursor.fetchall()
+    except Exception as exc:
+        return [f"(plano indisponivel: {exc})"]
+    finally:
+        cursor.close()
+    if dialeto != "sqlite":
+        return [linha[0] for linha in linhas]
+    # (id, pai, _, detalhe) -> arvore indentada como a do shell do sqlite.
+    profundidade: dict[int, int] = {0: -1}
+    saida = []
+    for id_no, pai, _nao_usado, detalhe in linhas:
+        profundidade[id_no] = profundidade.get(pai, -1) + 1
+        saida.append("  " * profundidade[id_no] + detalhe)
+    return saida
+
+
+class RegistroConsultasLentas:
+    # Agrupa por SQL normalizado: o plano e capturado so na primeira ocorrencia de
+    # cada consulta; as seguintes so somam tempo (e vao para o arquivo).
+
+    def __init__(self, limite_ms: float | None = None, arquivo: str | None = None, max_itens: int = 200) -> None:
+        self._lock = threading.Lock()
+        self._itens: OrderedDict[str, ConsultaLenta] = OrderedDict()
+        self._handler: logging.Handler | None = None
+        self.limite_s: float | None = None
+        self.max_itens = max_itens
+        self.configurar(limite_ms, arquivo)
+
+    @property
+    def limite_ms(self) -> float | None:
+        return None if self.limite_s is None else self.limite_s * 1000
+
+    def configurar(self, limite_ms: float | None, arquivo: str | None = None) -> None:
+        self.limite_s = None if limite_ms is None else max(0.0, limite_ms) / 1000
+        if self._handler is not None:
+            logger.removeHandler(self._handler)
+            self._handler.close()
+            self._handler = None
+        if self.limite_s is not None and arquivo:
+            self._handler = RotatingFileHandler(arquivo, maxBytes=5 * 1024 * 1024, backupCount=3, encoding="utf-8")
+            self._handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(self._handler)
+            logger.setLevel(logging.INFO)
+
+    def avaliar(self, conn, statement: str, parametros: Any, executemany: bool, segundos: float) -> None:
+        if self.limite_s is None or segundos < self.limite_s:
+            return
+        sql = normalizar_sql(statement)
+        duracao_ms = segundos * 1000
+        with self._lock:
+            consulta = self._itens.get(sql)
+        if consulta is None:
+            primeiros = parametros[0] if executemany and parametros else parametros
+            plano = explicar(conn, statement, primeiros) if sql.upper().startswith(_PLANEJAVEIS) else []
+            consulta = ConsultaLenta(
+                sql=sql,
+                parametros=forma_parametros(parametros, executemany),
+                origem=origem_chamada(),
+                plano=plano,
+                alertas=alertas_do_plano(sql, primeiros, plano),
+            )
+        with self._lock:
+            consulta = self._itens.setdefault(sql, consulta)
+            consulta.ocorrencias += 1
+            consulta.total_ms += duracao_ms
+            consulta.max_ms = max(consulta.max_ms, duracao_ms)
+            consulta.ultima_ms = duracao_ms
+            consulta.ultima_em = datetime.now()
+            self._itens.move_to_end(sql)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+        if self._handler is not None:
+            logger.info(
+                json.dumps(
+                    {
+                        "em": consulta.ultima_em.isoformat(timespec="milliseconds"),
+                        "duracao_ms": round(duracao_ms, 3),
+                        "sql": sql,
+                        "parametros": consulta.parametros,
+                        "origem": consulta.origem,
+                        "plano": consulta.plano,
+                        "alertas": consulta.alertas,
+                    },
+                    ensure_ascii=False,
+                )
+            )
+
+    def listar(self) -> list[dict[str, Any]]:
+        # Piores primeiro: tempo acumulado pesa mais que um pico isolado.
+        with self._lock:
+            itens = [{**asdict(consulta), "media_ms": consulta.media_ms} for consulta in self._itens.values()]
+        return sorted(itens, key=lambda item: item["total_ms"], reverse=True)
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._itens.clear()
+
+
+registro = RegistroConsultasLentas(
+    settings.consultas_lentas_ms,
+    settings.consultas_lentas_arquivo,
+    settings.consultas_lentas_max,
+)
@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import queue
+import threading
+from collections.abc import Callable
+from concurrent.futures import Future
+from contextvars import Context, copy_context
+from dataclasses import dataclass, field
+from time import monotonic
+from typing import Any
+
+from fastapi import Depends
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import (
+    configurar_sqlite,
+    connect_args,
+    database_url,
+    get_db,
+    instrumentar_engine,
+    is_sqlite,
+)
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+def adiar_para_commit(acao: Callable[[], Any], invalidacao: bool = False) -> bool:
+    # Dentro de um lote do escritor o commit do servico e so um RELEASE SAVEPOINT:
+    # eventos e invalidacoes registrados aqui rodam depois do commit real do lote.
+    # Invalidacoes rodam mesmo se o COMMIT falhar (leitura do lote pode ter cacheado
+    # linhas desfeitas); eventos so saem se o lote foi gravado.
+    pendentes = getattr(_local, "pendentes", None)
+    if pendentes is None:
+        return False
+    pendentes.append((acao, invalidacao))
+    return True
+
+
+def criar_engine_escritor(url: str = database_url) -> Engine:
+    engine = create_engine(url, future=True, connect_args=connect_args, pool_size=1)
+    instrumentar_engine(engine)
+    if is_sqlite:
+        event.listen(engine, "connect", configurar_sqlite)
+
+        @event.listens_for(engine, "connect")
+        def _sem_begin_implicito(dbapi_connection, _connection_record) -> None:
+            # O pysqlite abre transacoes por conta propria e quebra SAVEPOINT;
+            # aqui quem abre e o evento "begin", ja reservando o lock de escrita.
+            dbapi_connection.isolation_level = None
+
+        @event.listens_for(engine, "begin")
+        def _begin_immediate(conn) -> None:
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+    return engine
+
+
+@dataclass(slots=True)
+class _Tarefa:
+    funcao: Callable[..., Any]
+    args: tuple
+    kwargs: dict
+    futuro: Future = field(default_factory=Future)
+    # Contexto de quem enviou: o SQL da escrita conta na medicao da requisicao de origem.
+    contexto: Context = field(default_factory=copy_context)
+
+
+class EscritorUnico:
+    # Uma thread, uma conexao: as escritas pendentes entram num mesmo BEGIN IMMEDIATE
+    # (cada uma em seu SAVEPOINT) e pagam um unico COMMIT/fsync por lote.
+
+    def __init__(self, engine: Engine, lote_maximo: int = 64, espera_ms: float = 2.0) -> None:
+        self.engine = engine
+        self.lote_maximo = max(1, lote_maximo)
+        self.espera_s = max(0.0, espera_ms) / 1000
+        self.lotes = 0
+        self.tarefas = 0
+        self._fila: queue.SimpleQueue[_Tarefa | None] = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._laco, name="escritor-sqlite", daemon=True)
+
+    def iniciar(self) -> None:
+        self._thread.start()
+
+    def parar(self, timeout: float = 10.0) -> None:
+        if self._thread.is_alive():
+            self._fila.put(None)
+            self._thread.join(timeout)
+
+    def enviar(self, funcao: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("Escrita aninhada dentro do escritor: chame o servico direto.")
+        tarefa = _Tarefa(funcao, args, kwargs)
+        self._fila.put(tarefa)
+        return tarefa.futuro
+
+    def executar(self, funcao: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        return self.enviar(funcao, *args, **kwargs).result()
+
+    def _laco(self) -> None:
+        parar = False
+        while not parar:
+            primeira = self._fila.get()
+            if primeira is None:
+                return
+            lote = [primeira]
+            parar = self._coletar(lote)
+            self._processar(lote)
+
+    def _coletar(self, lote: list[_Tarefa]) -> bool:
+        prazo = monotonic() + self.espera_s
+        while len(lote) < self.lote_maximo:
+            restante = prazo - monotonic()
+            try:
+                tarefa = self._fila.get(timeout=restante) if restante > 0 else self._fila.get_nowait()
+            except queue.Empty:
+                return False
+            if tarefa is None:
+                return True
+            lote.append(tarefa)
+        return False
+
+    def _processar(self, lote: list[_Tarefa]) -> None:
+        resultados: list[tuple[_Tarefa, Any, BaseException | None]] = []
+        pendentes: list[tuple[Callable[[], Any], bool]] = []
+        falha: Exception | None = None
+        _local.pendentes = pendentes
+        try:
+            with self.engine.connect() as conn:
+                with conn.begin():
+                    for tarefa in lote:
+                        resultados.append(self._rodar(conn, tarefa))
+        except Exception as exc:
+            falha = exc
+        finally:
+            _local.pendentes = None
+        if falha is not None:
+            # Commit do lote falhou: nada do lote foi gravado, todos recebem o erro.
+            logger.error("Falha ao gravar lote de %s escritas", len(lote), exc_info=falha)
+            self._rodar_pendentes(pendentes, so_invalidacoes=True)
+            for tarefa in lote:
+                tarefa.futuro.set_exception(falha)
+            return
+        self.lotes += 1
+        self.tarefas += len(lote)
+        self._rodar_pendentes(pendentes, so_invalidacoes=False)
+        for tarefa, resultado, erro in resultados:
+            if erro is None:
+                tarefa.futuro.set_result(resultado)
+            else:
+                tarefa.futuro.set_exception(erro)
+
+    @staticmethod
+    def _rodar_pendentes(pendentes: list[tuple[Callable[[], Any], bool]], so_invalidacoes: bool) -> None:
+        for acao, invalidacao in pendentes:
+            if so_invalidacoes and not invalidacao:
+                continue
+            try:
+                acao()
+            except Exception:
+                logger.exception("Falha em acao pos-commit do escritor")
+
+    @staticmethod
+    def _rodar(conn, tarefa: _Tarefa) -> tuple[_Tarefa, Any, BaseException | None]:
+        # Cada escrita no seu SAVEPOINT: db.commit() do servico libera o savepoint,
+        # db.rollback()/excecao desfaz so ela, sem derrubar as vizinhas do lote.
+        with Session(
+            bind=conn,
+            join_transaction_mode="create_savepoint",
+            autoflush=False,
+            expire_on_commit=False,
+        ) as db:
+            try:
+                resultado = tarefa.contexto.run(tarefa.funcao, db, *tarefa.args, **tarefa.kwargs)
+                return tarefa, resultado, None
+            except Exception as exc:
+                db.rollback()
+                return tarefa, None, exc
+
+
+_escritor: EscritorUnico | None = None
+
+
+def iniciar_escritor() -> EscritorUnico:
+    global _escritor
+    if _escritor is None:
+        _escritor = EscritorUnico(
+            criar_engine_escritor(),
+            lote_maximo=settings.escritor_lote_maximo,
+            espera_ms=settings.escritor_espera_ms,
+        )
+        _escritor.iniciar()
+    return _escritor
+
+
+def parar_escritor() -> None:
+    global _escritor
+    escritor, _escritor = _escritor, None
+    if escritor is not None:
+        escritor.parar()
+        escritor.engine.dispose()
+
+
+def escritor_ativo() -> EscritorUnico | None:
+    return _escritor
+
+
+class Escrita:
+    # Dependencia das rotas de escrita: com o escritor ligado a chamada vai para a fila,
+    # senao roda na sessao da propria requisicao (comportamento de sempre).
+
+    def __init__(self, db: Session) -> None:
+        self.db = db
+
+    def __call__(self, funcao: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        escritor = _escritor
+        if escritor is None:
+            return funcao(self.db, *args, **kwargs)
+        return escritor.executar(funcao, *args, **kwargs)
+
+
+def get_escrita(db: Session = Depends(get_db)) -> Escrita:
+    return Escrita(db)
+
+
+async def escrever_async(db: AsyncSession, funcao: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    # Versao das rotas async: espera o lote sem bloquear o event loop; sem escritor,
+    # o servico sync roda na sessao async via greenlet (run_sync).
+    escritor = _escritor
+    if escritor is None:
+        return await db.run_sync(funcao, *args, **kwargs)
+    return await asyncio.wrap_future(escritor.enviar(funcao, *args, **kwargs))
@@ -1,10 +1,15 @@
-from collections.abc import Generator
+from collections.abc import AsyncGenerator, Generator
+from time import perf_counter
 
 from sqlalchemy import create_engine, event
-from sqlalchemy.engine import make_url
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import URL, Connection, Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import Session, sessionmaker
 
+from app.core import metricas
 from app.core.config import settings
+from app.db import consultas_lentas
 
 database_url = settings.database_url
 url = make_url(database_url)
@@ -20,27 +25,84 @@ engine = create_engine(
     pool_pre_ping=True,
 )
 
+
+def configurar_sqlite(dbapi_connection, _connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    pragmas = [
+        "PRAGMA foreign_keys=ON",
+        # Pragmas para melhorar concorrencia e throughput em SQLite sob carga diaria.
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        "PRAGMA temp_store=MEMORY",
+        "PRAGMA busy_timeout=5000",
+        "PRAGMA cache_size=-64000",
+    ]
+    for pragma in pragmas:
+        try:
+            cursor.execute(pragma)
+        except Exception:
+            # Em alguns ambientes/arquivos, nem todos os PRAGMAs sao aceitos.
+            continue
+    cursor.close()
+
+
 if is_sqlite:
+    event.listen(engine, "connect", configurar_sqlite)
+
+
+def _antes_da_consulta(_conn, _cursor, _statement, _parameters, context, _executemany) -> None:
+    context._metricas_inicio = perf_counter()
+
+
+def _depois_da_consulta(conn, _cursor, statement, parameters, context, executemany) -> None:
+    inicio = getattr(context, "_metricas_inicio", None)
+    if inicio is None:
+        return
+    segundos = perf_counter() - inicio
+    metricas.registrar_consulta(segundos)
+    consultas_lentas.registro.avaliar(conn, statement, parameters, executemany, segundos)
+
 
-    @event.listens_for(engine, "connect")
-    def _enable_foreign_keys(dbapi_connection, _connection_record) -> None:
-        cursor = dbapi_connection.cursor()
-        pragmas = [
-            "PRAGMA foreign_keys=ON",
-            # Pragmas para melhorar concorrencia e throughput em SQLite sob carga diaria.
-            "PRAGMA journal_mode=WAL",
-            "PRAGMA synchronous=NORMAL",
-            "PRAGMA temp_store=MEMORY",
-            "PRAGMA busy_timeout=5000",
-            "PRAGMA cache_size=-64000",
-        ]
-        for pragma in pragmas:
-            try:
-                cursor.execute(pragma)
-            except Exception:
-                # Em alguns ambientes/arquivos, nem todos os PRAGMAs sao aceitos.
-                continue
-        cursor.close()
+def instrumentar_engine(alvo: Engine) -> None:
+    # Conta comandos e tempo de SQL na medicao da requisicao corrente (Server-Timing,
+    # /metrics) e alimenta o registro de consultas lentas.
+    ligado = settings.metricas_ativas or settings.consultas_lentas_ms is not None
+    if not ligado or event.contains(alvo, "before_cursor_execute", _antes_da_consulta):
+        return
+    event.listen(alvo, "before_cursor_execute", _antes_da_consulta)
+    event.listen(alvo, "after_cursor_execute", _depois_da_consulta)
+
+
+instrumentar_engine(engine)
+
+
+def insert_com_conflito(bind: Connection | Engine, tabela):
+    # INSERT ... ON CONFLICT do dialeto em uso (SQLite e Postgres tem a mesma API);
+    # o insert do SQLite renderizado no Postgres quebraria o upsert.
+    if bind.dialect.name == "postgresql":
+        return postgresql.insert(tabela)
+    return sqlite.insert(tabela)
+
+
+def url_async(sync_url: URL) -> URL:
+    # Mesmo banco pelo driver asyncio: aiosqlite para SQLite, asyncpg para Postgres.
+    drivers = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+    backend = sync_url.get_backend_name()
+    if backend not in drivers or sync_url.get_driver_name() in {"aiosqlite", "asyncpg"}:
+        return sync_url
+    return sync_url.set(drivername=drivers[backend])
+
+
+async_engine = create_async_engine(
+    url_async(url),
+    echo=False,
+    connect_args=connect_args,
+    pool_pre_ping=True,
+)
+
+if is_sqlite:
+    event.listen(async_engine.sync_engine, "connect", configurar_sqlite)
+instrumentar_engine(async_engine.sync_engine)
 
 
 SessionLocal = sessionmaker(
@@ -51,6 +113,12 @@ SessionLocal = sessionmaker(
     future=True,
 )
 
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
 
 def get_db() -> Generator[Session, None, None]:
     db = SessionLocal()
@@ -58,3 +126,9 @@ def get_db() -> Generator[Session, None, None]:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    # Rotas async (painel, listagens, detalhe, lancamento de item): sem thread do pool.
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,23 +1,33 @@
-from contextlib import asynccontextmanager
+import asyncio
+from contextlib import asynccontextmanager, suppress
 from pathlib import Path
 
-from fastapi import FastAPI, Response
+import anyio.to_thread
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from sqlalchemy import text
 
+from app.core import metricas
 from app.core.config import settings
+from app.core.http_cache import ConflitoVersao
 from app.db.base import Base
 from app.db.bootstrap import ensure_schema
-from app.db.session import engine
+from app.db.escritor import escritor_ativo, iniciar_escritor, parar_escritor
+from app.db.session import SessionLocal, async_engine, engine
 from app.routes import (
     adicionais_router,
+    catalogo_router,
     comandas_router,
     config_router,
+    diagnostico_router,
+    manutencao_router,
     pagamentos_router,
     produtos_router,
     relatorios_router,
     web_router,
 )
+from app.services import agendador_service, comanda_service
 
 APP_DIR = Path(__file__).resolve().parent
 STATIC_DIR = APP_DIR / "static"
@@ -27,7 +37,18 @@ STATIC_DIR = APP_DIR / "static"
 async def lifespan(_app: FastAPI):
     Base.metadata.create_all(bind=engine)
     ensure_schema(engine)
+    if settings.escritor_dedicado:
+        iniciar_escritor()
+    agendador = None
+    if settings.agendador_ativo:
+        agendador = asyncio.create_task(agendador_service.executar_agendador(SessionLocal))
     yield
+    if agendador is not None:
+        agendador.cancel()
+        with suppress(asyncio.CancelledError):
+            await agendador
+    parar_escritor()
+    await async_engine.dispose()
 
 
 app = FastAPI(
@@ -43,10 +64,20 @@ app.include_router(comandas_router)
 app.include_router(config_router)
 app.include_router(produtos_router)
 app.include_router(adicionais_router)
+app.include_router(catalogo_router)
 app.include_router(pagamentos_router)
 app.include_router(relatorios_router)
+app.include_router(manutencao_router)
+app.include_router(diagnostico_router)
 app.include_router(web_router)
 app.mount("/static", StaticFiles(directory=str(STATIC_DIR)), name="static")
+if settings.metricas_ativas:
+    app.add_middleware(metricas.MetricasMiddleware)
+
+
+@app.exception_handler(ConflitoVersao)
+async def conflito_versao_handler(_request: Request, exc: ConflitoVersao) -> JSONResponse:
+    return JSONResponse(status_code=exc.status_code, content={"detail": exc.detail, "atual": exc.atual})
 
 
 @app.get("/health", tags=["Sistema"])
@@ -63,3 +94,29 @@ def health_db(response: Response) -> dict[str, str]:
     except Exception:
         response.status_code = 503
         return {"status": "error", "database": "disconnected"}
+
+
+@app.get("/metrics", tags=["Sistema"], response_class=PlainTextResponse)
+async def metrics() -> PlainTextResponse:
+    cache = comanda_service.read_cache_stats()
+    limitador = anyio.to_thread.current_default_thread_limiter()
+    medidas = [
+        ("comandas_cache_hits_total", "counter", "Leituras de comanda servidas do cache.", cache["hits"]),
+        ("comandas_cache_misses_total", "counter", "Leituras de comanda que foram ao banco.", cache["misses"]),
+        ("comandas_cache_hit_ratio", "gauge", "Fracao de leituras de comanda servidas do cache.", cache["hit_ratio"]),
+        ("comandas_cache_itens", "gauge", "Entradas no cache de comandas.", cache["itens"]),
+        ("comandas_cache_evictions_total", "counter", "Entradas descartadas por limite.", cache["evictions"]),
+        ("threadpool_em_uso", "gauge", "Threads do pool ocupadas por rotas sync.", limitador.borrowed_tokens),
+        ("threadpool_limite", "gauge", "Tamanho do pool de threads.", limitador.total_tokens),
+        (
+            "threadpool_saturacao",
+            "gauge",
+            "Fracao do pool de threads em uso.",
+            limitador.borrowed_tokens / limitador.total_tokens if limitador.total_tokens else 0.0,
+        ),
+    ]
+    escritor = escritor_ativo()
+    if escritor is not None:
+        medidas.append(("escritor_lotes_total", "counter", "Lotes gravados pelo escritor.", escritor.lotes))
+        medidas.append(("escritor_tarefas_total", "counter", "Escritas gravadas pelo escritor.", escritor.tarefas))
+    return PlainTextResponse(metricas.exportar(medidas), media_type="text/plain; version=0.0.4")
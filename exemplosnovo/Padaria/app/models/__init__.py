@@ -6,11 +6,14 @@ from app.models.enums import StatusPedido, TipoEntrega
 from app.models.enums import MetodoPagamento, StatusPagamento
 from app.models.item_adicional import ItemPedidoAdicional
 from app.models.item_pedido import ItemPedido
+from app.models.movimento_estoque import MovimentoEstoque
 from app.models.pagamento import Pagamento
 from app.models.pedido import Pedido
 from app.models.pedido_cozinha_snapshot import PedidoCozinhaSnapshot
 from app.models.produto import Produto
 from app.models.produto_adicional import ProdutoAdicional
+from app.models.tarefa_agendada import TarefaAgendada
+from app.models.venda_diaria import VendaDiaria
 
 __all__ = [
     "Adicional",
@@ -23,9 +26,12 @@ __all__ = [
     "PedidoCozinhaSnapshot",
     "ItemPedido",
     "ItemPedidoAdicional",
+    "MovimentoEstoque",
     "Pagamento",
     "MetodoPagamento",
     "StatusPagamento",
     "StatusPedido",
+    "TarefaAgendada",
     "TipoEntrega",
+    "VendaDiaria",
 ]
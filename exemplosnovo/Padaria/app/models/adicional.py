@@ -5,10 +5,11 @@ from decimal import Decimal
 from typing import TYPE_CHECKING
 
 import sqlalchemy as sa
-from sqlalchemy import Boolean, DateTime, Numeric, String, func
+from sqlalchemy import Boolean, DateTime, String, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.models.base import Base
+from app.models.tipos import Centavos
 
 if TYPE_CHECKING:
     from app.models.item_adicional import ItemPedidoAdicional
@@ -23,7 +24,7 @@ class Adicional(Base):
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     nome: Mapped[str] = mapped_column(String(120), nullable=False, unique=True, index=True)
-    preco: Mapped[Decimal] = mapped_column(Numeric(10, 2), nullable=False)
+    preco: Mapped[Decimal] = mapped_column(Centavos(), nullable=False)
     ativo: Mapped[bool] = mapped_column(
         Boolean,
         nullable=False,
@@ -1,13 +1,17 @@
 from __future__ import annotations
 
 from datetime import datetime
+from typing import TYPE_CHECKING
 
 import sqlalchemy as sa
-from sqlalchemy import Boolean, DateTime, String, func
-from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import Boolean, DateTime, ForeignKey, String, func
+from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.models.base import Base
 
+if TYPE_CHECKING:
+    from app.models.pedido import Pedido
+
 
 class ComandaCodigo(Base):
     __tablename__ = "comanda_codigos"
@@ -36,8 +40,17 @@ class ComandaCodigo(Base):
         server_default="LIBERADO",
         index=True,
     )
+    # Pedido exibido no painel para o codigo; mantido pelas escritas de comanda
+    # e reconstruido por `manutencao.py repair_ponteiros_comanda`.
+    pedido_atual_id: Mapped[int | None] = mapped_column(
+        ForeignKey("pedidos.id", ondelete="SET NULL"),
+        nullable=True,
+        index=True,
+    )
     criado_em: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
         server_default=func.now(),
         nullable=False,
     )
+
+    pedido_atual: Mapped["Pedido | None"] = relationship(foreign_keys=[pedido_atual_id])
@@ -3,10 +3,11 @@ from __future__ import annotations
 from decimal import Decimal
 from typing import TYPE_CHECKING
 
-from sqlalchemy import ForeignKey, Index, Numeric
+from sqlalchemy import ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.models.base import Base
+from app.models.tipos import Centavos
 
 if TYPE_CHECKING:
     from app.models.adicional import Adicional
@@ -35,8 +36,8 @@ class ItemPedidoAdicional(Base):
         index=True,
     )
     quantidade: Mapped[int] = mapped_column(nullable=False, default=1)
-    preco_unitario: Mapped[Decimal] = mapped_column(Numeric(10, 2), nullable=False)
-    subtotal: Mapped[Decimal] = mapped_column(Numeric(10, 2), nullable=False)
+    preco_unitario: Mapped[Decimal] = mapped_column(Centavos(), nullable=False)
+    subtotal: Mapped[Decimal] = mapped_column(Centavos(), nullable=False)
 
     item_pedido: Mapped["ItemPedido"] = relationship(back_populates="adicionais")
     adicional: Mapped["Adicional"] = relationship(back_populates="itens")
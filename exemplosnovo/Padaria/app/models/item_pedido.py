@@ -3,10 +3,11 @@ from __future__ import annotations
 from decimal import Decimal
 from typing import TYPE_CHECKING
 
-from sqlalchemy import ForeignKey, Index, Numeric, Text
+from sqlalchemy import ForeignKey, Index, Text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.models.base import Base
+from app.models.tipos import Centavos
 
 if TYPE_CHECKING:
     from app.models.item_adicional import ItemPedidoAdicional
@@ -32,14 +33,14 @@ class ItemPedido(Base):
         index=True,
     )
     quantidade: Mapped[int] = mapped_column(nullable=False)
-    preco_unitario: Mapped[Decimal] = mapped_column(Numeric(10, 2), nullable=False)
+    preco_unitario: Mapped[Decimal] = mapped_column(Centavos(), nullable=False)
     desconto: Mapped[Decimal] = mapped_column(
-        Numeric(10, 2),
+        Centavos(),
         nullable=False,
         default=0,
         server_default="0",
     )
-    subtotal: Mapped[Decimal] = mapped_column(Numeric(10, 2), nullable=False)
+    subtotal: Mapped[Decimal] = mapped_column(Centavos(), nullable=False)
     observacoes: Mapped[str | None] = mapped_column(Text, nullable=True)
 
     pedido: Mapped["Pedido"] = relationship(back_populates="itens")
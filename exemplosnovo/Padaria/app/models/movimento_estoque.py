@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+import sqlalchemy as sa
+from sqlalchemy import DateTime, ForeignKey, Integer, String, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.base import Base
+
+
+class MovimentoEstoque(Base):
+    # Livro-razao append-only: estoque_atual de cada produto e a soma dos seus deltas.
+    __tablename__ = "movimentos_estoque"
+    __table_args__ = (
+        sa.Index("ix_movimentos_estoque_produto_id_id", "produto_id", "id"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    produto_id: Mapped[int] = mapped_column(
+        ForeignKey("produtos.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    pedido_id: Mapped[int | None] = mapped_column(
+        ForeignKey("pedidos.id", ondelete="SET NULL"),
+        nullable=True,
+        index=True,
+    )
+    delta: Mapped[int] = mapped_column(Integer, nullable=False)
+    motivo: Mapped[str] = mapped_column(String(30), nullable=False)
+    criado_em: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        nullable=False,
+    )
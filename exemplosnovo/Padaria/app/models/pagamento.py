@@ -4,11 +4,12 @@ from datetime import datetime
 from decimal import Decimal
 from typing import TYPE_CHECKING
 
-from sqlalchemy import DateTime, Enum as SQLEnum, ForeignKey, Index, Numeric, String, func
+from sqlalchemy import DateTime, Enum as SQLEnum, ForeignKey, Index, String, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.models.base import Base
 from app.models.enums import MetodoPagamento, StatusPagamento
+from app.models.tipos import Centavos
 
 if TYPE_CHECKING:
     from app.models.pedido import Pedido
@@ -40,7 +41,7 @@ class Pagamento(Base):
         server_default=StatusPagamento.APROVADO.value,
         index=True,
     )
-    valor: Mapped[Decimal] = mapped_column(Numeric(10, 2), nullable=False)
+    valor: Mapped[Decimal] = mapped_column(Centavos(), nullable=False)
     referencia_externa: Mapped[str | None] = mapped_column(String(80), nullable=True, index=True)
     maquininha_id: Mapped[str | None] = mapped_column(String(80), nullable=True)
     criado_em: Mapped[datetime] = mapped_column(
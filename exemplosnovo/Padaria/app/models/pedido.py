@@ -5,11 +5,12 @@ from decimal import Decimal
 from typing import TYPE_CHECKING
 
 import sqlalchemy as sa
-from sqlalchemy import DateTime, Enum as SQLEnum, ForeignKey, Numeric, String, Text, func
+from sqlalchemy import DateTime, Enum as SQLEnum, ForeignKey, Integer, String, Text, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.models.base import Base
 from app.models.enums import StatusPedido, TipoEntrega
+from app.models.tipos import Centavos
 
 if TYPE_CHECKING:
     from app.models.cliente import Cliente
@@ -54,7 +55,7 @@ class Pedido(Base):
     )
     observacoes: Mapped[str | None] = mapped_column(Text, nullable=True)
     total: Mapped[Decimal] = mapped_column(
-        Numeric(10, 2),
+        Centavos(),
         nullable=False,
         default=Decimal("0.00"),
         server_default=sa.text("0"),
@@ -66,6 +67,13 @@ class Pedido(Base):
         nullable=False,
         index=True,
     )
+    # Controle otimista: toda escrita de comanda avanca a versao com UPDATE ... WHERE versao = :lida.
+    versao: Mapped[int] = mapped_column(
+        Integer,
+        nullable=False,
+        default=1,
+        server_default=sa.text("1"),
+    )
 
     cliente: Mapped["Cliente"] = relationship(back_populates="pedidos")
     itens: Mapped[list["ItemPedido"]] = relationship(
@@ -5,10 +5,11 @@ from decimal import Decimal
 from typing import TYPE_CHECKING
 
 import sqlalchemy as sa
-from sqlalchemy import Boolean, DateTime, Numeric, String, Text, func
+from sqlalchemy import Boolean, DateTime, String, Text, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.models.base import Base
+from app.models.tipos import Centavos
 
 if TYPE_CHECKING:
     from app.models.item_pedido import ItemPedido
@@ -26,7 +27,7 @@ class Produto(Base):
     categoria: Mapped[str | None] = mapped_column(String(80), nullable=True, index=True)
     descricao: Mapped[str | None] = mapped_column(Text, nullable=True)
     imagem_url: Mapped[str | None] = mapped_column(String(255), nullable=True)
-    preco: Mapped[Decimal] = mapped_column(Numeric(10, 2), nullable=False)
+    preco: Mapped[Decimal] = mapped_column(Centavos(), nullable=False)
     ativo: Mapped[bool] = mapped_column(
         Boolean,
         nullable=False,
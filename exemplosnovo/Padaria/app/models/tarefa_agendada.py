@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any
+
+import sqlalchemy as sa
+from sqlalchemy import JSON, DateTime, Float, Integer, String, Text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.base import Base
+
+
+class TarefaAgendada(Base):
+    # Uma linha por tarefa do agendador; `janela` e a ultima janela reivindicada.
+    __tablename__ = "tarefas_agendadas"
+
+    nome: Mapped[str] = mapped_column(String(60), primary_key=True)
+    janela: Mapped[str | None] = mapped_column(String(40), nullable=True)
+    status: Mapped[str] = mapped_column(
+        String(20),
+        nullable=False,
+        default="PENDENTE",
+        server_default="PENDENTE",
+    )
+    iniciada_em: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    concluida_em: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    duracao_ms: Mapped[float | None] = mapped_column(Float, nullable=True)
+    execucoes: Mapped[int] = mapped_column(
+        Integer,
+        nullable=False,
+        default=0,
+        server_default=sa.text("0"),
+    )
+    resultado: Mapped[dict[str, Any] | None] = mapped_column(JSON, nullable=True)
+    erro: Mapped[str | None] = mapped_column(Text, nullable=True)
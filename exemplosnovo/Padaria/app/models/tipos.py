@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Any
+
+from sqlalchemy import BigInteger, type_coerce
+from sqlalchemy.sql.elements import ColumnElement
+from sqlalchemy.types import TypeDecorator
+
+_CENTAVO = Decimal(1)
+ZERO = Decimal("0.00")
+
+
+def para_centavos(valor: Decimal | int | float | str) -> int:
+    # Reais -> centavos inteiros, arredondando meio centavo para cima (como as_money).
+    if type(valor) is int:
+        return valor * 100
+    centavos = Decimal(valor).scaleb(2)
+    inteiro = int(centavos)
+    if inteiro == centavos:
+        return inteiro
+    return int(centavos.quantize(_CENTAVO, rounding=ROUND_HALF_UP))
+
+
+def de_centavos(centavos: int) -> Decimal:
+    # Exato e ja com 2 casas: dispensa quantize.
+    return Decimal(centavos).scaleb(-2)
+
+
+def dividir_centavos(centavos: int, divisor: int) -> int:
+    # Divisao inteira com arredondamento meio-para-cima (ticket medio etc.).
+    if divisor <= 0:
+        return 0
+    quociente, resto = divmod(centavos, divisor)
+    return quociente + (1 if resto * 2 >= divisor else 0)
+
+
+class Centavos(TypeDecorator):
+    # Dinheiro gravado como inteiro de centavos: somas no banco sao exatas e o valor
+    # chega ao Python como Decimal de 2 casas, montado sem quantize.
+    impl = BigInteger
+    cache_ok = True
+
+    @property
+    def python_type(self) -> type:
+        return Decimal
+
+    def process_bind_param(self, value: Any, dialect) -> int | None:
+        if value is None:
+            return None
+        return para_centavos(value)
+
+    def process_result_value(self, value: Any, dialect) -> Decimal | None:
+        if value is None:
+            return None
+        return de_centavos(value)
+
+
+def em_centavos(expressao: ColumnElement) -> ColumnElement[int]:
+    # Le a coluna (ou SUM dela) como inteiro cru, para somas em lote no Python.
+    return type_coerce(expressao, BigInteger)
@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+from datetime import date
+from decimal import Decimal
+
+import sqlalchemy as sa
+from sqlalchemy import Date, Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.base import Base
+from app.models.tipos import Centavos
+
+
+class VendaDiaria(Base):
+    # Rollup de pedidos e pagamentos por dia. Linhas de pedido usam metodo="";
+    # linhas de pagamento aprovado usam status="" e tipo_entrega="".
+    __tablename__ = "vendas_diarias"
+
+    dia: Mapped[date] = mapped_column(Date, primary_key=True)
+    status: Mapped[str] = mapped_column(String(20), primary_key=True, default="")
+    tipo_entrega: Mapped[str] = mapped_column(String(20), primary_key=True, default="")
+    metodo: Mapped[str] = mapped_column(String(20), primary_key=True, default="")
+    pedidos: Mapped[int] = mapped_column(
+        Integer,
+        nullable=False,
+        default=0,
+        server_default=sa.text("0"),
+    )
+    valor_pedidos: Mapped[Decimal] = mapped_column(
+        Centavos(),
+        nullable=False,
+        default=Decimal("0.00"),
+        server_default=sa.text("0"),
+    )
+    valor_recebido: Mapped[Decimal] = mapped_column(
+        Centavos(),
+        nullable=False,
+        default=Decimal("0.00"),
+        server_default=sa.text("0"),
+    )
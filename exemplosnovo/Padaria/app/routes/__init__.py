@@ -1,6 +1,9 @@
 from app.routes.adicionais import router as adicionais_router
+from app.routes.catalogo import router as catalogo_router
 from app.routes.comandas import router as comandas_router
 from app.routes.config import router as config_router
+from app.routes.diagnostico import router as diagnostico_router
+from app.routes.manutencao import router as manutencao_router
 from app.routes.pagamentos import router as pagamentos_router
 from app.routes.produtos import router as produtos_router
 from app.routes.relatorios import router as relatorios_router
@@ -8,8 +11,11 @@ from app.routes.web import router as web_router
 
 __all__ = [
     "adicionais_router",
+    "catalogo_router",
     "comandas_router",
     "config_router",
+    "diagnostico_router",
+    "manutencao_router",
     "pagamentos_router",
     "produtos_router",
     "relatorios_router",
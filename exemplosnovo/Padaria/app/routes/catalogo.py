@@ -0,0 +1,22 @@
+from fastapi import APIRouter, Depends, Request, Response
+from sqlalchemy.orm import Session
+
+from app.core.http_cache import responder_versionado
+from app.db.session import get_db
+from app.schemas.catalogo import CatalogoOut
+from app.services import catalogo_service
+
+router = APIRouter(prefix="/catalogo", tags=["Catalogo"])
+
+
+@router.get("", response_model=CatalogoOut)
+def get_catalogo(
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db),
+) -> CatalogoOut:
+    nao_modificado = responder_versionado(request, response, catalogo_service.versao_catalogo())
+    if nao_modificado is not None:
+        return nao_modificado
+    snapshot = catalogo_service.obter_catalogo(db)
+    return catalogo_service.serializar_catalogo(snapshot)
@@ -1,12 +1,15 @@
 from datetime import date
 from decimal import Decimal
 
-from fastapi import APIRouter, Depends, Query, Request, status
-from fastapi.responses import HTMLResponse
+from fastapi import APIRouter, Depends, Header, Query, Request, Response, status
+from fastapi.responses import HTMLResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.db.session import get_db
+from app.core.http_cache import anunciar_cursor, responder_versionado, versao_if_match
+from app.db.escritor import Escrita, get_escrita
+from app.db.session import get_async_db, get_db
 from app.models.enums import StatusPedido, TipoEntrega
 from app.schemas.comanda import (
     ComandaAbrirIn,
@@ -14,12 +17,14 @@ from app.schemas.comanda import (
     ComandaCodigoDeleteOut,
     ComandaCodigoLiberarIn,
     ComandaCodigoOut,
+    ComandaPainelDeltaOut,
     ComandaPainelOut,
     ComandaCodigoPatch,
     ComandaDeleteOut,
     ComandaItemCreate,
     ComandaItemMoveIn,
     ComandaItemUpdate,
+    ComandaItensBatchIn,
     ComandaListOut,
     ComandaOut,
     ComandaResetItemOut,
@@ -27,7 +32,7 @@ from app.schemas.comanda import (
     ComandaStatusPatchIn,
     SugestaoProdutoOut,
 )
-from app.services import comanda_service
+from app.services import comanda_service, eventos_service
 
 router = APIRouter(prefix="/comandas", tags=["Comandas"])
 templates = Jinja2Templates(directory="app/templates")
@@ -36,9 +41,9 @@ templates = Jinja2Templates(directory="app/templates")
 @router.post("/codigos", response_model=ComandaCodigoOut, status_code=status.HTTP_201_CREATED)
 def create_codigo(
     payload: ComandaCodigoCreate,
-    db: Session = Depends(get_db),
+    escrever: Escrita = Depends(get_escrita),
 ) -> ComandaCodigoOut:
-    return comanda_service.create_codigo(db, payload.codigo)
+    return escrever(comanda_service.create_codigo, payload.codigo)
 
 
 @router.get("/codigos", response_model=list[ComandaCodigoOut])
@@ -50,44 +55,54 @@ def list_codigos(
     return comanda_service.list_codigos(db, ativo, em_uso)
 
 
-@router.get("/painel", response_model=list[ComandaPainelOut])
-def list_painel_comandas(
+@router.get("/painel", response_model=list[ComandaPainelOut] | ComandaPainelDeltaOut)
+async def list_painel_comandas(
+    request: Request,
+    response: Response,
     ativo: bool = Query(default=True),
-    db: Session = Depends(get_db),
-) -> list[ComandaPainelOut]:
-    return comanda_service.list_painel_comandas(db, ativo=ativo)
+    since: int | None = Query(default=None, ge=0),
+    db: AsyncSession = Depends(get_async_db),
+) -> list[ComandaPainelOut] | ComandaPainelDeltaOut:
+    nao_modificado = responder_versionado(request, response, comanda_service.versao_dados())
+    if nao_modificado is not None:
+        return nao_modificado
+    if since is not None:
+        return await comanda_service.list_painel_delta_async(db, since=since, ativo=ativo)
+    return await comanda_service.list_painel_comandas_async(db, ativo=ativo)
 
 
 @router.patch("/codigos/{codigo_id}", response_model=ComandaCodigoOut)
 def patch_codigo(
     codigo_id: int,
     payload: ComandaCodigoPatch,
-    db: Session = Depends(get_db),
+    escrever: Escrita = Depends(get_escrita),
 ) -> ComandaCodigoOut:
-    return comanda_service.patch_codigo_ativo(db, codigo_id, payload.ativo)
+    return escrever(comanda_service.patch_codigo_ativo, codigo_id, payload.ativo)
 
 
 @router.post("/codigos/{codigo_id}/liberar", response_model=ComandaCodigoOut)
 def liberar_codigo(
     codigo_id: int,
     payload: ComandaCodigoLiberarIn,
-    db: Session = Depends(get_db),
+    escrever: Escrita = Depends(get_escrita),
 ) -> ComandaCodigoOut:
-    return comanda_service.liberar_codigo(db, codigo_id, confirmar=payload.confirmar)
+    return escrever(comanda_service.liberar_codigo, codigo_id, confirmar=payload.confirmar)
 
 
 @router.delete("/codigos/{codigo_id}", response_model=ComandaCodigoDeleteOut)
-def delete_codigo(codigo_id: int, db: Session = Depends(get_db)) -> ComandaCodigoDeleteOut:
-    return comanda_service.delete_codigo(db, codigo_id)
+def delete_codigo(codigo_id: int, escrever: Escrita = Depends(get_escrita)) -> ComandaCodigoDeleteOut:
+    return escrever(comanda_service.delete_codigo, codigo_id)
 
 
 @router.post("/abrir", response_model=ComandaOut, status_code=status.HTTP_201_CREATED)
-def abrir_comanda(payload: ComandaAbrirIn, db: Session = Depends(get_db)) -> ComandaOut:
-    return comanda_service.abrir_comanda(db, payload)
+def abrir_comanda(payload: ComandaAbrirIn, escrever: Escrita = Depends(get_escrita)) -> ComandaOut:
+    return escrever(comanda_service.abrir_comanda, payload)
 
 
 @router.get("", response_model=list[ComandaListOut])
-def list_comandas(
+async def list_comandas(
+    request: Request,
+    response: Response,
     status: StatusPedido | None = Query(default=None),
     tipo_entrega: TipoEntrega | None = Query(default=None),
     codigo: str | None = Query(default=None),
@@ -100,9 +115,13 @@ def list_comandas(
     order_dir: str = Query(default="desc"),
     offset: int = Query(default=0, ge=0),
     limit: int = Query(default=500, ge=1, le=5000),
-    db: Session = Depends(get_db),
+    cursor: str | None = Query(default=None, description="X-Next-Cursor da pagina anterior"),
+    db: AsyncSession = Depends(get_async_db),
 ) -> list[ComandaListOut]:
-    return comanda_service.list_comandas(
+    nao_modificado = responder_versionado(request, response, comanda_service.versao_dados())
+    if nao_modificado is not None:
+        return nao_modificado
+    itens = await comanda_service.list_comandas_async(
         db,
         status_filter=status,
         tipo_entrega=tipo_entrega,
@@ -116,26 +135,34 @@ def list_comandas(
         order_dir=order_dir,
         offset=offset,
         limit=limit,
+        cursor=cursor,
     )
+    anunciar_cursor(response, comanda_service.cursor_comandas(itens, limit, order_by))
+    return itens
 
 
 @router.get("/historico/cupons")
 def list_historico_cupons(
+    response: Response,
     data_inicial: date | None = Query(default=None),
     data_final: date | None = Query(default=None),
     status: StatusPedido | None = Query(default=None),
     somente_finalizadas: bool = Query(default=True),
     limit: int = Query(default=200, ge=1, le=1000),
+    cursor: str | None = Query(default=None, description="X-Next-Cursor da pagina anterior"),
     db: Session = Depends(get_db),
 ) -> list[dict]:
-    return comanda_service.list_historico(
+    itens = comanda_service.list_historico(
         db,
         data_inicial=data_inicial,
         data_final=data_final,
         status_filter=status,
         somente_finalizadas=somente_finalizadas,
         limit=limit,
+        cursor=cursor,
     )
+    anunciar_cursor(response, comanda_service.cursor_historico(itens, limit))
+    return itens
 
 
 @router.get("/sugestoes/mais-pedidos", response_model=list[SugestaoProdutoOut])
@@ -147,26 +174,51 @@ def list_sugestoes_mais_pedidos(
 
 
 @router.post("/resetar-ativas", response_model=ComandaResetOut)
-def resetar_comandas_ativas(db: Session = Depends(get_db)) -> ComandaResetOut:
-    return comanda_service.resetar_comandas_ativas(db)
+def resetar_comandas_ativas(escrever: Escrita = Depends(get_escrita)) -> ComandaResetOut:
+    return escrever(comanda_service.resetar_comandas_ativas)
+
+
+@router.get("/stream")
+async def stream_comandas(
+    request: Request,
+    last_event_id: int | None = Header(default=None, alias="Last-Event-ID"),
+) -> StreamingResponse:
+    return StreamingResponse(
+        eventos_service.stream_sse(request.is_disconnected, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.get("/{pedido_id}", response_model=ComandaOut)
-def get_comanda(pedido_id: int, db: Session = Depends(get_db)) -> ComandaOut:
-    return comanda_service.get_comanda(db, pedido_id)
+async def get_comanda(
+    pedido_id: int,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+) -> ComandaOut:
+    nao_modificado = responder_versionado(request, response, comanda_service.versao_dados(pedido_id))
+    if nao_modificado is not None:
+        return nao_modificado
+    return await comanda_service.get_comanda_async(db, pedido_id)
 
 
 @router.delete("/{pedido_id}", response_model=ComandaDeleteOut)
-def delete_comanda(pedido_id: int, db: Session = Depends(get_db)) -> ComandaDeleteOut:
-    return comanda_service.delete_comanda(db, pedido_id)
+def delete_comanda(
+    pedido_id: int,
+    versao: int | None = Depends(versao_if_match),
+    escrever: Escrita = Depends(get_escrita),
+) -> ComandaDeleteOut:
+    return escrever(comanda_service.delete_comanda, pedido_id, versao_esperada=versao)
 
 
 @router.post("/{pedido_id}/reset", response_model=ComandaResetItemOut)
 def reset_comanda_individual(
     pedido_id: int,
-    db: Session = Depends(get_db),
+    versao: int | None = Depends(versao_if_match),
+    escrever: Escrita = Depends(get_escrita),
 ) -> ComandaResetItemOut:
-    return comanda_service.reset_comanda_individual(db, pedido_id)
+    return escrever(comanda_service.reset_comanda_individual, pedido_id, versao_esperada=versao)
 
 
 @router.get("/{pedido_id}/cupom", response_class=HTMLResponse)
@@ -187,12 +239,23 @@ def get_cupom_comanda(
 
 
 @router.post("/{pedido_id}/itens", response_model=ComandaOut)
-def add_item(
+async def add_item(
     pedido_id: int,
     payload: ComandaItemCreate,
-    db: Session = Depends(get_db),
+    versao: int | None = Depends(versao_if_match),
+    db: AsyncSession = Depends(get_async_db),
+) -> ComandaOut:
+    return await comanda_service.add_item_async(db, pedido_id, payload, versao_esperada=versao)
+
+
+@router.post("/{pedido_id}/itens:batch", response_model=ComandaOut)
+def aplicar_itens_batch(
+    pedido_id: int,
+    payload: ComandaItensBatchIn,
+    versao: int | None = Depends(versao_if_match),
+    escrever: Escrita = Depends(get_escrita),
 ) -> ComandaOut:
-    return comanda_service.add_item(db, pedido_id, payload)
+    return escrever(comanda_service.aplicar_itens_batch, pedido_id, payload, versao_esperada=versao)
 
 
 @router.put("/{pedido_id}/itens/{item_id}", response_model=ComandaOut)
@@ -200,14 +263,20 @@ def update_item(
     pedido_id: int,
     item_id: int,
     payload: ComandaItemUpdate,
-    db: Session = Depends(get_db),
+    versao: int | None = Depends(versao_if_match),
+    escrever: Escrita = Depends(get_escrita),
 ) -> ComandaOut:
-    return comanda_service.update_item(db, pedido_id, item_id, payload)
+    return escrever(comanda_service.update_item, pedido_id, item_id, payload, versao_esperada=versao)
 
 
 @router.delete("/{pedido_id}/itens/{item_id}", response_model=ComandaOut)
-def delete_item(pedido_id: int, item_id: int, db: Session = Depends(get_db)) -> ComandaOut:
-    return comanda_service.delete_item(db, pedido_id, item_id)
+def delete_item(
+    pedido_id: int,
+    item_id: int,
+    versao: int | None = Depends(versao_if_match),
+    escrever: Escrita = Depends(get_escrita),
+) -> ComandaOut:
+    return escrever(comanda_service.delete_item, pedido_id, item_id, versao_esperada=versao)
 
 
 @router.delete("/{pedido_id}/itens/{item_id}/forcar", response_model=ComandaOut)
@@ -215,14 +284,16 @@ def force_delete_item(
     pedido_id: int,
     item_id: int,
     repor_estoque: bool = Query(default=True),
-    db: Session = Depends(get_db),
+    versao: int | None = Depends(versao_if_match),
+    escrever: Escrita = Depends(get_escrita),
 ) -> ComandaOut:
-    return comanda_service.delete_item(
-        db,
+    return escrever(
+        comanda_service.delete_item,
         pedido_id,
         item_id,
         forcar=True,
         repor_estoque=repor_estoque,
+        versao_esperada=versao,
     )
 
 
@@ -231,13 +302,15 @@ def move_item(
     pedido_id: int,
     item_id: int,
     payload: ComandaItemMoveIn,
-    db: Session = Depends(get_db),
+    versao: int | None = Depends(versao_if_match),
+    escrever: Escrita = Depends(get_escrita),
 ) -> ComandaOut:
-    return comanda_service.move_item(
-        db,
+    return escrever(
+        comanda_service.move_item,
         pedido_id,
         item_id,
         payload.destino_pedido_id,
+        versao_esperada=versao,
     )
 
 
@@ -245,13 +318,15 @@ def move_item(
 def patch_status(
     pedido_id: int,
     payload: ComandaStatusPatchIn,
-    db: Session = Depends(get_db),
+    versao: int | None = Depends(versao_if_match),
+    escrever: Escrita = Depends(get_escrita),
 ) -> ComandaOut:
-    return comanda_service.change_status(
-        db,
+    return escrever(
+        comanda_service.change_status,
         pedido_id,
         payload.status,
         repor_estoque=payload.repor_estoque,
         confirmar_reabertura=payload.confirmar_reabertura,
         motivo_status=payload.motivo_status,
+        versao_esperada=versao,
     )
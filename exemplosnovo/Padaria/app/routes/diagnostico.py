@@ -0,0 +1,29 @@
+from fastapi import APIRouter, Request, Response, status
+from fastapi.responses import HTMLResponse
+from fastapi.templating import Jinja2Templates
+
+from app.db.consultas_lentas import registro
+from app.schemas.manutencao import ConsultaLentaOut
+
+router = APIRouter(prefix="/diagnostico", tags=["Diagnostico"])
+templates = Jinja2Templates(directory="app/templates")
+
+
+@router.get("/slow-queries", response_class=HTMLResponse)
+def get_slow_queries_page(request: Request) -> HTMLResponse:
+    context = {
+        "consultas": registro.listar(),
+        "limite_ms": registro.limite_ms,
+    }
+    return templates.TemplateResponse(request, "diagnostico_consultas.html", context)
+
+
+@router.get("/slow-queries.json", response_model=list[ConsultaLentaOut])
+def get_slow_queries() -> list[dict]:
+    return registro.listar()
+
+
+@router.delete("/slow-queries", status_code=status.HTTP_204_NO_CONTENT)
+def delete_slow_queries() -> Response:
+    registro.limpar()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,13 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+
+from app.db.session import get_db
+from app.schemas.manutencao import TarefaAgendadaOut
+from app.services import agendador_service
+
+router = APIRouter(prefix="/manutencao", tags=["Manutencao"])
+
+
+@router.get("/tarefas", response_model=list[TarefaAgendadaOut])
+def get_tarefas(db: Session = Depends(get_db)) -> list[TarefaAgendadaOut]:
+    return agendador_service.status_tarefas(db)
@@ -1,6 +1,8 @@
-from fastapi import APIRouter, Depends, Query, status
+from fastapi import APIRouter, Depends, Query, Response, status
 from sqlalchemy.orm import Session
 
+from app.core.http_cache import anunciar_cursor
+from app.db.escritor import Escrita, get_escrita
 from app.db.session import get_db
 from app.schemas.pagamento import (
     PagamentoCreate,
@@ -8,52 +10,57 @@ from app.schemas.pagamento import (
     PagamentoMaquininhaIniciar,
     PagamentoOut,
 )
-from app.services import pagamento_service
+from app.services import pagamento_service, paginacao
 
 router = APIRouter(prefix="/pagamentos", tags=["Pagamentos"])
 
 
 @router.get("", response_model=list[PagamentoOut])
 def list_pagamentos(
+    response: Response,
     pedido_id: int | None = Query(default=None, ge=1),
     offset: int = Query(default=0, ge=0),
     limit: int = Query(default=500, ge=1, le=5000),
+    cursor: str | None = Query(default=None, description="X-Next-Cursor da pagina anterior"),
     db: Session = Depends(get_db),
 ) -> list[PagamentoOut]:
-    return pagamento_service.list_pagamentos(
+    pagamentos = pagamento_service.list_pagamentos(
         db,
         pedido_id,
         offset=offset,
         limit=limit,
+        cursor=cursor,
     )
+    anunciar_cursor(response, paginacao.proximo_cursor(pagamentos, limit, "id"))
+    return pagamentos
 
 
 @router.post("", response_model=PagamentoOut, status_code=status.HTTP_201_CREATED)
-def create_pagamento(payload: PagamentoCreate, db: Session = Depends(get_db)) -> PagamentoOut:
-    return pagamento_service.create_pagamento_manual(db, payload)
+def create_pagamento(payload: PagamentoCreate, escrever: Escrita = Depends(get_escrita)) -> PagamentoOut:
+    return escrever(pagamento_service.create_pagamento_manual, payload)
 
 
 @router.post("/maquininha/iniciar", response_model=PagamentoOut, status_code=status.HTTP_201_CREATED)
 def iniciar_pagamento_maquininha(
     payload: PagamentoMaquininhaIniciar,
-    db: Session = Depends(get_db),
+    escrever: Escrita = Depends(get_escrita),
 ) -> PagamentoOut:
-    return pagamento_service.iniciar_pagamento_maquininha(db, payload)
+    return escrever(pagamento_service.iniciar_pagamento_maquininha, payload)
 
 
 @router.patch("/maquininha/{pagamento_id}/confirmar", response_model=PagamentoOut)
 def confirmar_pagamento_maquininha(
     pagamento_id: int,
     payload: PagamentoMaquininhaConfirmar,
-    db: Session = Depends(get_db),
+    escrever: Escrita = Depends(get_escrita),
 ) -> PagamentoOut:
-    return pagamento_service.confirmar_pagamento_maquininha(db, pagamento_id, payload)
+    return escrever(pagamento_service.confirmar_pagamento_maquininha, pagamento_id, payload)
 
 
 @router.post("/maquininha/callback/{referencia}", response_model=PagamentoOut)
 def callback_maquininha(
     referencia: str,
     payload: PagamentoMaquininhaConfirmar,
-    db: Session = Depends(get_db),
+    escrever: Escrita = Depends(get_escrita),
 ) -> PagamentoOut:
-    return pagamento_service.callback_maquininha_por_referencia(db, referencia, payload)
+    return escrever(pagamento_service.callback_maquininha_por_referencia, referencia, payload)
@@ -7,8 +7,14 @@ from sqlalchemy.orm import Session
 
 from app.db.session import get_db
 from app.schemas.common import PaginatedResponse
-from app.schemas.produto import EstoquePatchIn, ProdutoCreate, ProdutoOut, ProdutoUpdate
-from app.services import produto_service
+from app.schemas.produto import (
+    EstoquePatchIn,
+    MovimentoEstoqueOut,
+    ProdutoCreate,
+    ProdutoOut,
+    ProdutoUpdate,
+)
+from app.services import estoque_service, paginacao, produto_service
 
 router = APIRouter(prefix="/produtos", tags=["Produtos"])
 UPLOAD_DIR = Path("app/static/uploads/produtos")
@@ -79,6 +85,8 @@ def list_produtos(
     page_size: int = Query(default=20, ge=1, le=500),
     ativo: bool | None = Query(default=None),
     q: str | None = Query(default=None, description="Busca por nome do produto"),
+    cursor: str | None = Query(default=None, description="next_cursor da pagina anterior (ignora page)"),
+    incluir_total: bool = Query(default=True),
     db: Session = Depends(get_db),
 ) -> PaginatedResponse[ProdutoOut]:
     items, total = produto_service.list_produtos(
@@ -87,15 +95,28 @@ def list_produtos(
         page_size=page_size,
         ativo=ativo,
         q=q,
+        cursor=cursor,
+        incluir_total=incluir_total,
     )
     return PaginatedResponse[ProdutoOut](
         page=page,
         page_size=page_size,
         total=total,
         items=items,
+        next_cursor=paginacao.proximo_cursor(items, page_size, "id"),
     )
 
 
+@router.get("/busca", response_model=list[ProdutoOut])
+def buscar_produtos(
+    q: str = Query(min_length=1, description="Termo de busca (sem acento, por prefixo)"),
+    ativo: bool | None = Query(default=None),
+    limit: int = Query(default=20, ge=1, le=100),
+    db: Session = Depends(get_db),
+) -> list[ProdutoOut]:
+    return produto_service.buscar_produtos(db, q, ativo, limit)
+
+
 @router.get("/{produto_id}", response_model=ProdutoOut)
 def get_produto(produto_id: int, db: Session = Depends(get_db)) -> ProdutoOut:
     return produto_service.get_produto_or_404(db, produto_id)
@@ -119,6 +140,16 @@ def patch_estoque(
     return produto_service.patch_estoque(db, produto_id, payload.delta)
 
 
+@router.get("/{produto_id}/movimentos", response_model=list[MovimentoEstoqueOut])
+def list_movimentos_estoque(
+    produto_id: int,
+    limite: int = Query(default=100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+) -> list[MovimentoEstoqueOut]:
+    produto_service.get_produto_or_404(db, produto_id)
+    return estoque_service.listar_movimentos(db, produto_id, limite)
+
+
 @router.delete("/{produto_id}", response_model=ProdutoOut)
 def delete_produto(
     produto_id: int,
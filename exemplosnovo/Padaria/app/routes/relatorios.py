@@ -1,7 +1,8 @@
+from collections.abc import Iterator
 from datetime import date, datetime
 
 from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
-from fastapi.responses import HTMLResponse, Response
+from fastapi.responses import HTMLResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
 
@@ -13,6 +14,18 @@ router = APIRouter(prefix="/relatorios", tags=["Relatórios"])
 templates = Jinja2Templates(directory="app/templates")
 
 
+def _csv_response(linhas: Iterator[str], filename: str) -> StreamingResponse:
+    def _com_bom() -> Iterator[str]:
+        yield "\ufeff"
+        yield from linhas
+
+    return StreamingResponse(
+        _com_bom(),
+        media_type="text/csv; charset=utf-8",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
 @router.get("/resumo-dia", response_model=ResumoDiaOut)
 def get_resumo_dia(
     data: date = Query(description="Data no formato YYYY-MM-DD"),
@@ -33,15 +46,10 @@ def get_fechamento_caixa(
 def get_fechamento_caixa_csv(
     data: date = Query(description="Data no formato YYYY-MM-DD"),
     db: Session = Depends(get_db),
-) -> Response:
+) -> StreamingResponse:
     fechamento = relatorio_service.fechamento_caixa(db, data)
-    csv_content = "\ufeff" + relatorio_service.fechamento_caixa_csv(fechamento)
     filename = f"fechamento-caixa-{data.isoformat()}.csv"
-    return Response(
-        content=csv_content,
-        media_type="text/csv; charset=utf-8",
-        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
-    )
+    return _csv_response(relatorio_service.fechamento_caixa_csv(fechamento), filename)
 
 
 @router.get("/faturamento-periodo", response_model=FaturamentoPeriodoOut)
@@ -64,7 +72,7 @@ def get_faturamento_periodo_csv(
     data_inicial: date = Query(description="Data inicial no formato YYYY-MM-DD"),
     data_final: date = Query(description="Data final no formato YYYY-MM-DD"),
     db: Session = Depends(get_db),
-) -> Response:
+) -> StreamingResponse:
     try:
         payload = relatorio_service.faturamento_periodo(db, data_inicial, data_final)
     except ValueError as error:
@@ -73,13 +81,26 @@ def get_faturamento_periodo_csv(
             detail=str(error),
         ) from error
 
-    csv_content = "\ufeff" + relatorio_service.faturamento_periodo_csv(payload)
     filename = f"faturamento-periodo-{data_inicial.isoformat()}-a-{data_final.isoformat()}.csv"
-    return Response(
-        content=csv_content,
-        media_type="text/csv; charset=utf-8",
-        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
-    )
+    return _csv_response(relatorio_service.faturamento_periodo_csv(payload), filename)
+
+
+@router.get("/lancamentos.csv")
+def get_lancamentos_csv(
+    data_inicial: date = Query(description="Data inicial no formato YYYY-MM-DD"),
+    data_final: date = Query(description="Data final no formato YYYY-MM-DD"),
+    db: Session = Depends(get_db),
+) -> StreamingResponse:
+    try:
+        linhas = relatorio_service.lancamentos_csv(db, data_inicial, data_final)
+    except ValueError as error:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(error),
+        ) from error
+
+    filename = f"lancamentos-{data_inicial.isoformat()}-a-{data_final.isoformat()}.csv"
+    return _csv_response(linhas, filename)
 
 
 @router.get("/faturamento-periodo/relatorio", response_class=HTMLResponse)
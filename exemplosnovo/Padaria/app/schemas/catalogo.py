@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+from decimal import Decimal
+
+from app.schemas.common import ORMBaseModel
+
+
+class ProdutoCatalogoOut(ORMBaseModel):
+    id: int
+    nome: str
+    categoria: str | None = None
+    descricao: str | None = None
+    imagem_url: str | None = None
+    preco: Decimal
+    controla_estoque: bool
+    adicional_ids: list[int]
+
+
+class AdicionalCatalogoOut(ORMBaseModel):
+    id: int
+    nome: str
+    preco: Decimal
+
+
+class CatalogoOut(ORMBaseModel):
+    versao: int
+    produtos: list[ProdutoCatalogoOut]
+    adicionais: list[AdicionalCatalogoOut]
@@ -50,6 +50,13 @@ class ComandaPainelOut(ORMBaseModel):
     criado_em: datetime | None = None
 
 
+class ComandaPainelDeltaOut(ORMBaseModel):
+    versao: int
+    completo: bool
+    itens: list[ComandaPainelOut]
+    removidos: list[str] = Field(default_factory=list)
+
+
 class ComandaAbrirIn(ORMBaseModel):
     codigo: str = Field(min_length=1, max_length=50)
     tipo_entrega: TipoEntrega = TipoEntrega.RETIRADA
@@ -87,6 +94,16 @@ class ComandaItemUpdate(ORMBaseModel):
     adicionais: list[ItemAdicionalIn] = Field(default_factory=list)
 
 
+class ComandaItemBatchUpdate(ComandaItemUpdate):
+    item_id: int = Field(gt=0)
+
+
+class ComandaItensBatchIn(ORMBaseModel):
+    adicionar: list[ComandaItemCreate] = Field(default_factory=list, max_length=200)
+    alterar: list[ComandaItemBatchUpdate] = Field(default_factory=list, max_length=200)
+    remover: list[int] = Field(default_factory=list, max_length=200)
+
+
 class ComandaItemMoveIn(ORMBaseModel):
     destino_pedido_id: int = Field(gt=0)
 
@@ -134,6 +151,7 @@ class ComandaOut(ORMBaseModel):
     total_itens: int = 0
     complexidade: str = "Sem itens"
     criado_em: datetime
+    versao: int = 1
     itens: list[ComandaItemOut] = Field(default_factory=list)
     pagamento: ResumoPagamentoOut
 
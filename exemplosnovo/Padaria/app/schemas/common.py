@@ -17,5 +17,7 @@ class ORMBaseModel(BaseModel):
 class PaginatedResponse(BaseModel, Generic[T]):
     page: int = Field(ge=1)
     page_size: int = Field(ge=1)
-    total: int = Field(ge=0)
+    # None quando o cliente dispensa a contagem (incluir_total=false).
+    total: int | None = Field(default=None, ge=0)
     items: list[T]
+    next_cursor: str | None = None
@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any
+
+from app.schemas.common import ORMBaseModel
+
+
+class TarefaAgendadaOut(ORMBaseModel):
+    nome: str
+    descricao: str
+    janela_atual: str | None = None
+    ultima_janela: str | None = None
+    pendente: bool
+    status: str | None = None
+    iniciada_em: datetime | None = None
+    concluida_em: datetime | None = None
+    duracao_ms: float | None = None
+    execucoes: int
+    resultado: dict[str, Any] | None = None
+    erro: str | None = None
+
+
+class ConsultaLentaOut(ORMBaseModel):
+    sql: str
+    parametros: str
+    origem: str
+    plano: list[str]
+    alertas: list[str]
+    ocorrencias: int
+    total_ms: float
+    media_ms: float
+    max_ms: float
+    ultima_ms: float
+    ultima_em: datetime
@@ -35,3 +35,12 @@ class ProdutoOut(ProdutoBase):
 
 class EstoquePatchIn(ORMBaseModel):
     delta: int = Field(description="Valor para somar (positivo) ou subtrair (negativo).")
+
+
+class MovimentoEstoqueOut(ORMBaseModel):
+    id: int
+    produto_id: int
+    pedido_id: int | None
+    delta: int
+    motivo: str
+    criado_em: datetime
@@ -1,21 +1,35 @@
 from . import (
     adicional_service,
+    agendador_service,
+    busca_service,
+    catalogo_service,
     cliente_service,
     comanda_service,
     config_service,
+    estoque_service,
+    eventos_service,
+    manutencao_service,
     pagamento_service,
     pedido_service,
     produto_service,
     relatorio_service,
+    vendas_diarias_service,
 )
 
 __all__ = [
     "adicional_service",
+    "agendador_service",
+    "busca_service",
+    "catalogo_service",
     "cliente_service",
     "comanda_service",
     "config_service",
+    "estoque_service",
+    "eventos_service",
+    "manutencao_service",
     "pagamento_service",
     "produto_service",
     "pedido_service",
     "relatorio_service",
+    "vendas_diarias_service",
 ]
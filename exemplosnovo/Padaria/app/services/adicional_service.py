@@ -12,6 +12,7 @@ from app.models.item_pedido import ItemPedido
 from app.models.pedido import Pedido
 from app.models.produto_adicional import ProdutoAdicional
 from app.schemas.adicional import AdicionalCreate, AdicionalUpdate
+from app.services import catalogo_service, eventos_service
 from app.services.utils import as_money
 
 
@@ -31,6 +32,7 @@ def create_adicional(db: Session, payload: AdicionalCreate) -> Adicional:
     db.add(adicional)
     db.commit()
     db.refresh(adicional)
+    catalogo_service.invalidar_catalogo()
     return adicional
 
 
@@ -79,6 +81,12 @@ def update_adicional(db: Session, adicional_id: int, payload: AdicionalUpdate) -
     adicional.ativo = payload.ativo
     db.commit()
     db.refresh(adicional)
+    catalogo_service.invalidar_catalogo()
+    # Nome do adicional aparece no detalhe das comandas ja cacheadas.
+    from app.services.comanda_service import invalidate_read_caches
+
+    invalidate_read_caches()
+    eventos_service.publicar("resync", motivo="catalogo")
     return adicional
 
 
@@ -87,6 +95,7 @@ def deactivate_adicional(db: Session, adicional_id: int) -> Adicional:
     adicional.ativo = False
     db.commit()
     db.refresh(adicional)
+    catalogo_service.invalidar_catalogo()
     return adicional
 
 
@@ -131,10 +140,12 @@ def hard_delete_adicional(db: Session, adicional_id: int) -> Adicional:
 
     db.delete(adicional)
     db.commit()
+    catalogo_service.invalidar_catalogo()
     # Atualiza cache de leitura das comandas apos exclusao em cascata.
     from app.services.comanda_service import invalidate_read_caches
 
     invalidate_read_caches()
+    eventos_service.publicar("resync", motivo="catalogo")
     return adicional
 
 
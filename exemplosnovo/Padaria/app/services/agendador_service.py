@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from time import perf_counter
+from typing import Any
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import insert_com_conflito
+from app.models.tarefa_agendada import TarefaAgendada
+from app.services import comanda_service, manutencao_service
+
+logger = logging.getLogger(__name__)
+
+STATUS_EXECUTANDO = "EXECUTANDO"
+STATUS_OK = "OK"
+STATUS_ERRO = "ERRO"
+
+
+@dataclass(frozen=True, slots=True)
+class Tarefa:
+    nome: str
+    descricao: str
+    # Chave da janela vigente em `agora` (None: fora de janela); roda uma vez por chave.
+    janela: Callable[[datetime], str | None]
+    executar: Callable[[Session], dict[str, Any] | None]
+
+
+_tarefas: dict[str, Tarefa] = {}
+
+
+def registrar(tarefa: Tarefa) -> Tarefa:
+    _tarefas[tarefa.nome] = tarefa
+    return tarefa
+
+
+def tarefas_registradas() -> list[Tarefa]:
+    return list(_tarefas.values())
+
+
+def janela_horaria(agora: datetime) -> str:
+    return agora.strftime("%Y-%m-%dT%H")
+
+
+def janela_diaria(hora: int) -> Callable[[datetime], str]:
+    def _janela(agora: datetime) -> str:
+        marco = agora.replace(hour=hora, minute=0, second=0, microsecond=0)
+        if agora < marco:
+            marco -= timedelta(days=1)
+        return marco.date().isoformat()
+
+    return _janela
+
+
+def janela_semanal(dia_semana: int, hora: int) -> Callable[[datetime], str | None]:
+    # So dentro da hora marcada (mesma regra do expurgo original): fora dela nao ha
+    # janela aberta, entao o servidor desligado no horario nao expurga no meio da semana.
+    def _janela(agora: datetime) -> str | None:
+        if agora.weekday() != dia_semana or agora.hour != hora:
+            return None
+        return agora.date().isoformat()
+
+    return _janela
+
+
+def executar_pendentes(
+    session_factory: Callable[[], Session],
+    agora: datetime | None = None,
+) -> list[dict[str, Any]]:
+    agora = agora or datetime.now()
+    executadas = []
+    for tarefa in tarefas_registradas():
+        janela = tarefa.janela(agora)
+        if janela is None:
+            continue
+        with session_factory() as db:
+            if not _reivindicar(db, tarefa.nome, janela):
+                continue
+            executadas.append(_executar(db, tarefa, janela))
+    return executadas
+
+
+def _reivindicar(db: Session, nome: str, janela: str) -> bool:
+    # UPDATE condicional: entre processos/reinicios so um consegue marcar a janela.
+    db.execute(insert_com_conflito(db.get_bind(), TarefaAgendada).values(nome=nome).on_conflict_do_nothing())
+    reivindicada = db.execute(
+        update(TarefaAgendada)
+        .where(
+            TarefaAgendada.nome == nome,
+            or_(TarefaAgendada.janela.is_(None), TarefaAgendada.janela != janela),
+        )
+        .values(janela=janela, status=STATUS_EXECUTANDO, iniciada_em=datetime.now(), erro=None)
+    ).rowcount
+    db.commit()
+    return reivindicada == 1
+
+
+def _executar(db: Session, tarefa: Tarefa, janela: str) -> dict[str, Any]:
+    inicio = perf_counter()
+    resultado: dict[str, Any] | None = None
+    erro: str | None = None
+    try:
+        resultado = tarefa.executar(db)
+    except Exception as exc:
+        db.rollback()
+        erro = f"{type(exc).__name__}: {exc}"
+        logger.exception("Tarefa agendada %s falhou na janela %s", tarefa.nome, janela)
+    duracao_ms = (perf_counter() - inicio) * 1000
+    db.execute(
+        update(TarefaAgendada)
+        .where(TarefaAgendada.nome == tarefa.nome)
+        .values(
+            status=STATUS_ERRO if erro else STATUS_OK,
+            concluida_em=datetime.now(),
+            duracao_ms=duracao_ms,
+            execucoes=TarefaAgendada.execucoes + 1,
+            resultado=_serializavel(resultado),
+            erro=erro,
+        )
+    )
+    db.commit()
+    return {"nome": tarefa.nome, "janela": janela, "duracao_ms": duracao_ms, "erro": erro}
+
+
+def _serializavel(resultado: dict[str, Any] | None) -> dict[str, Any] | None:
+    if resultado is None:
+        return None
+    return {
+        chave: valor if isinstance(valor, (int, float, str, bool)) or valor is None else str(valor)
+        for chave, valor in resultado.items()
+    }
+
+
+def status_tarefas(db: Session, agora: datetime | None = None) -> list[dict[str, Any]]:
+    agora = agora or datetime.now()
+    registros = {row.nome: row for row in db.scalars(select(TarefaAgendada))}
+    payload = []
+    for tarefa in tarefas_registradas():
+        row = registros.get(tarefa.nome)
+        janela_atual = tarefa.janela(agora)
+        payload.append(
+            {
+                "nome": tarefa.nome,
+                "descricao": tarefa.descricao,
+                "janela_atual": janela_atual,
+                "ultima_janela": row.janela if row else None,
+                "pendente": janela_atual is not None and (not row or row.janela != janela_atual),
+                "status": row.status if row else None,
+                "iniciada_em": row.iniciada_em if row else None,
+                "concluida_em": row.concluida_em if row else None,
+                "duracao_ms": row.duracao_ms if row else None,
+                "execucoes": row.execucoes if row else 0,
+                "resultado": row.resultado if row else None,
+                "erro": row.erro if row else None,
+            }
+        )
+    return payload
+
+
+async def executar_agendador(
+    session_factory: Callable[[], Session],
+    intervalo: float | None = None,
+) -> None:
+    # Laco do lifespan: tarefas rodam no threadpool para nao travar o event loop.
+    intervalo = intervalo or settings.agendador_intervalo_segundos
+    while True:
+        try:
+            await asyncio.to_thread(executar_pendentes, session_factory)
+        except Exception:
+            logger.exception("Falha ao verificar tarefas agendadas")
+        await asyncio.sleep(intervalo)
+
+
+def _retencao_snapshots(db: Session) -> dict[str, Any]:
+    return manutencao_service.expurgar_snapshots_cozinha(
+        db, dias=settings.retencao_snapshots_cozinha_dias
+    )
+
+
+registrar(
+    Tarefa(
+        nome="expurgo_historico",
+        descricao="Desvincula dos codigos as comandas entregues/canceladas (domingo 23h).",
+        janela=janela_semanal(dia_semana=6, hora=23),
+        executar=comanda_service.expurgar_historico,
+    )
+)
+registrar(
+    Tarefa(
+        nome="retencao_snapshots_cozinha",
+        descricao="Remove snapshots de cozinha antigos, mantendo o ultimo de cada pedido.",
+        janela=janela_diaria(hora=3),
+        executar=_retencao_snapshots,
+    )
+)
+registrar(
+    Tarefa(
+        nome="checkpoint_wal",
+        descricao="PRAGMA wal_checkpoint(TRUNCATE) para conter o crescimento do -wal.",
+        janela=janela_horaria,
+        executar=manutencao_service.checkpoint_wal,
+    )
+)
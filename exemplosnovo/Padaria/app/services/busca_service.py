@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import logging
+import re
+
+from sqlalchemy import ColumnElement, Subquery, column, literal_column, select, table, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from app.models.pedido import Pedido
+from app.models.produto import Produto
+
+logger = logging.getLogger(__name__)
+
+TABELA_PRODUTOS = "produtos_fts"
+TABELA_PEDIDOS = "pedidos_busca"
+# Trigram so casa a partir de 3 caracteres; abaixo disso vale o ilike.
+TRIGRAM_MINIMO = 3
+
+_produtos_fts = table(TABELA_PRODUTOS, column("rowid"))
+_pedidos_busca = table(TABELA_PEDIDOS, column("rowid"))
+
+# Indices externos (content=): o texto fica so na tabela original e os triggers
+# mantem o indice em dia, inclusive para escritas fora do ORM (seed, manutencao).
+_DDL = {
+    TABELA_PRODUTOS: [
+        f"""CREATE VIRTUAL TABLE IF NOT EXISTS {TABELA_PRODUTOS} USING fts5(
+            nome, categoria, content='produtos', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )""",
+        f"""CREATE TRIGGER IF NOT EXISTS produtos_fts_ai AFTER INSERT ON produtos BEGIN
+            INSERT INTO {TABELA_PRODUTOS}(rowid, nome, categoria) VALUES (new.id, new.nome, new.categoria);
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS produtos_fts_ad AFTER DELETE ON produtos BEGIN
+            INSERT INTO {TABELA_PRODUTOS}({TABELA_PRODUTOS}, rowid, nome, categoria)
+            VALUES ('delete', old.id, old.nome, old.categoria);
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS produtos_fts_au AFTER UPDATE OF nome, categoria ON produtos BEGIN
+            INSERT INTO {TABELA_PRODUTOS}({TABELA_PRODUTOS}, rowid, nome, categoria)
+            VALUES ('delete', old.id, old.nome, old.categoria);
+            INSERT INTO {TABELA_PRODUTOS}(rowid, nome, categoria) VALUES (new.id, new.nome, new.categoria);
+        END""",
+    ],
+    TABELA_PEDIDOS: [
+        f"""CREATE VIRTUAL TABLE IF NOT EXISTS {TABELA_PEDIDOS} USING fts5(
+            comanda_codigo, mesa, content='pedidos', content_rowid='id', tokenize='trigram'
+        )""",
+        f"""CREATE TRIGGER IF NOT EXISTS pedidos_busca_ai AFTER INSERT ON pedidos BEGIN
+            INSERT INTO {TABELA_PEDIDOS}(rowid, comanda_codigo, mesa)
+            VALUES (new.id, new.comanda_codigo, new.mesa);
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS pedidos_busca_ad AFTER DELETE ON pedidos BEGIN
+            INSERT INTO {TABELA_PEDIDOS}({TABELA_PEDIDOS}, rowid, comanda_codigo, mesa)
+            VALUES ('delete', old.id, old.comanda_codigo, old.mesa);
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS pedidos_busca_au AFTER UPDATE OF comanda_codigo, mesa ON pedidos BEGIN
+            INSERT INTO {TABELA_PEDIDOS}({TABELA_PEDIDOS}, rowid, comanda_codigo, mesa)
+            VALUES ('delete', old.id, old.comanda_codigo, old.mesa);
+            INSERT INTO {TABELA_PEDIDOS}(rowid, comanda_codigo, mesa)
+            VALUES (new.id, new.comanda_codigo, new.mesa);
+        END""",
+    ],
+}
+
+
+def instalar_busca(conn: Connection) -> dict[str, bool]:
+    # Cria os indices FTS5 que faltam e popula a partir das tabelas. SQLite sem
+    # FTS5 (ou outro banco) segue sem indice: as buscas caem no ilike.
+    if conn.dialect.name != "sqlite":
+        return {}
+    instaladas: dict[str, bool] = {}
+    for tabela, comandos in _DDL.items():
+        nova = not _existe(conn, tabela)
+        try:
+            with conn.begin_nested():
+                for comando in comandos:
+                    conn.exec_driver_sql(comando)
+                if nova:
+                    conn.exec_driver_sql(f"INSERT INTO {tabela}({tabela}) VALUES ('rebuild')")
+        except OperationalError:
+            logger.warning("FTS5 indisponivel: busca em %s usa ilike", tabela)
+            instaladas[tabela] = False
+            continue
+        instaladas[tabela] = True
+    return instaladas
+
+
+def reconstruir_busca(conn: Connection) -> None:
+    for tabela in _DDL:
+        if _existe(conn, tabela):
+            conn.exec_driver_sql(f"INSERT INTO {tabela}({tabela}) VALUES ('rebuild')")
+
+
+def remover_gatilhos(conn: Connection, tabela: str) -> bool:
+    # Para cargas em lote: sem os triggers cada INSERT nao atualiza o indice. Depois
+    # rode instalar_busca (recria os triggers) e reconstruir_busca.
+    if conn.dialect.name != "sqlite" or not _existe(conn, tabela):
+        return False
+    gatilhos = conn.scalars(text("SELECT name FROM sqlite_master WHERE type = 'trigger'")).all()
+    for gatilho in gatilhos:
+        if gatilho.startswith(f"{tabela}_"):
+            conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {gatilho}")
+    return True
+
+
+def filtro_produtos(db: Session, q: str) -> ColumnElement[bool]:
+    # Sem acento/caixa e por prefixo: "pao fra" acha "Pão Francês".
+    consulta = _consulta_prefixo(q)
+    if consulta and _disponivel(db, TABELA_PRODUTOS):
+        return Produto.id.in_(select(_produtos_fts.c.rowid).where(_match(TABELA_PRODUTOS, consulta)))
+    return Produto.nome.ilike(f"%{q.strip()}%")
+
+
+def relevancia_produtos(db: Session, q: str) -> Subquery | None:
+    # (rowid, relevancia) dos produtos que casam; bm25 com nome pesando mais que
+    # categoria (menor = melhor). None quando nao ha indice.
+    consulta = _consulta_prefixo(q)
+    if not consulta or not _disponivel(db, TABELA_PRODUTOS):
+        return None
+    return (
+        select(
+            _produtos_fts.c.rowid.label("produto_id"),
+            literal_column(f"bm25({TABELA_PRODUTOS}, 10.0, 1.0)").label("relevancia"),
+        )
+        .where(_match(TABELA_PRODUTOS, consulta))
+        .subquery()
+    )
+
+
+def filtro_pedidos(db: Session, campo: str, termo: str) -> ColumnElement[bool]:
+    # Substring (como o ilike '%x%') via trigram; termos curtos ficam no ilike.
+    coluna = {"comanda_codigo": Pedido.comanda_codigo, "mesa": Pedido.mesa}[campo]
+    termo = termo.strip()
+    if len(termo) >= TRIGRAM_MINIMO and _disponivel(db, TABELA_PEDIDOS):
+        consulta = f"{campo} : {_aspas(termo)}"
+        return Pedido.id.in_(select(_pedidos_busca.c.rowid).where(_match(TABELA_PEDIDOS, consulta)))
+    return coluna.ilike(f"%{termo}%")
+
+
+def _consulta_prefixo(q: str) -> str:
+    termos = re.findall(r"\w+", q or "")
+    return " ".join(f"{_aspas(termo)}*" for termo in termos)
+
+
+def _aspas(termo: str) -> str:
+    return '"' + termo.replace('"', '""') + '"'
+
+
+def _match(tabela: str, consulta: str) -> ColumnElement[bool]:
+    return text(f"{tabela} MATCH :consulta").bindparams(consulta=consulta)
+
+
+def _disponivel(db: Session, tabela: str) -> bool:
+    bind = db.get_bind()
+    if bind.dialect.name != "sqlite":
+        return False
+    return _existe(db.connection(), tabela)
+
+
+def _existe(conn: Connection, tabela: str) -> bool:
+    return (
+        conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :nome"),
+            {"nome": tabela},
+        ).first()
+        is not None
+    )
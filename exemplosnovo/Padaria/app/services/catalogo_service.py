@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass
+from decimal import Decimal
+from threading import Lock
+from time import time_ns
+from types import MappingProxyType
+from typing import Any
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.db.escritor import adiar_para_commit
+from app.models.adicional import Adicional
+from app.models.produto import Produto
+from app.models.produto_adicional import ProdutoAdicional
+from app.services.utils import as_money
+
+
+@dataclass(frozen=True, slots=True)
+class ProdutoCatalogo:
+    id: int
+    nome: str
+    categoria: str | None
+    descricao: str | None
+    imagem_url: str | None
+    preco: Decimal
+    ativo: bool
+    controla_estoque: bool
+    adicional_ids: frozenset[int]
+
+
+@dataclass(frozen=True, slots=True)
+class AdicionalCatalogo:
+    id: int
+    nome: str
+    preco: Decimal
+    ativo: bool
+
+
+@dataclass(frozen=True, slots=True)
+class CatalogoSnapshot:
+    versao: int
+    # Produtos em id desc e adicionais por nome, na mesma ordem das listagens.
+    produtos: Mapping[int, ProdutoCatalogo]
+    adicionais: Mapping[int, AdicionalCatalogo]
+
+
+_lock = Lock()
+# Versao inicial em microssegundos: ETag do /catalogo continua crescente entre reinicios.
+_versao = time_ns() // 1000
+_snapshot: CatalogoSnapshot | None = None
+
+
+def invalidar_catalogo() -> None:
+    # Chamado pelas escritas de produto/adicional; o proximo leitor reconstroi.
+    global _versao, _snapshot
+    with _lock:
+        _versao += 1
+        _snapshot = None
+    # Leitor que reconstruiu antes do commit do lote do escritor veria dado velho.
+    adiar_para_commit(invalidar_catalogo, invalidacao=True)
+
+
+def versao_catalogo() -> int:
+    with _lock:
+        return _versao
+
+
+def obter_catalogo(db: Session, recarregar: bool = False) -> CatalogoSnapshot:
+    global _snapshot
+    with _lock:
+        if recarregar:
+            _snapshot = None
+        if _snapshot is not None:
+            return _snapshot
+        versao = _versao
+    snapshot = _montar_snapshot(db, versao)
+    with _lock:
+        # Escrita concorrente durante a montagem: devolve, mas nao publica dado velho.
+        if versao == _versao:
+            _snapshot = snapshot
+    return snapshot
+
+
+def obter_catalogo_com(
+    db: Session,
+    produto_ids: Iterable[int] = (),
+    adicional_ids: Iterable[int] = (),
+) -> CatalogoSnapshot:
+    # Id fora do snapshot so recarrega se o snapshot ficou para tras ou se o id
+    # existe no banco (escrita de outro processo); id invalido vira 404 sem rebuild.
+    catalogo = obter_catalogo(db)
+    faltam_produtos = set(produto_ids) - catalogo.produtos.keys()
+    faltam_adicionais = set(adicional_ids) - catalogo.adicionais.keys()
+    if not faltam_produtos and not faltam_adicionais:
+        return catalogo
+    if catalogo.versao < versao_catalogo() or _algum_existe(db, faltam_produtos, faltam_adicionais):
+        return obter_catalogo(db, recarregar=True)
+    return catalogo
+
+
+def _algum_existe(db: Session, produto_ids: set[int], adicional_ids: set[int]) -> bool:
+    if produto_ids and db.scalar(select(Produto.id).where(Produto.id.in_(produto_ids)).limit(1)):
+        return True
+    if adicional_ids and db.scalar(select(Adicional.id).where(Adicional.id.in_(adicional_ids)).limit(1)):
+        return True
+    return False
+
+
+def serializar_catalogo(snapshot: CatalogoSnapshot) -> dict[str, Any]:
+    return {
+        "versao": snapshot.versao,
+        "produtos": [
+            {
+                "id": produto.id,
+                "nome": produto.nome,
+                "categoria": produto.categoria,
+                "descricao": produto.descricao,
+                "imagem_url": produto.imagem_url,
+                "preco": produto.preco,
+                "controla_estoque": produto.controla_estoque,
+                "adicional_ids": sorted(produto.adicional_ids),
+            }
+            for produto in snapshot.produtos.values()
+            if produto.ativo
+        ],
+        "adicionais": [
+            {"id": adicional.id, "nome": adicional.nome, "preco": adicional.preco}
+            for adicional in snapshot.adicionais.values()
+            if adicional.ativo
+        ],
+    }
+
+
+def _montar_snapshot(db: Session, versao: int) -> CatalogoSnapshot:
+    links: dict[int, set[int]] = {}
+    for produto_id, adicional_id in db.execute(
+        select(ProdutoAdicional.produto_id, ProdutoAdicional.adicional_id)
+    ):
+        links.setdefault(int(produto_id), set()).add(int(adicional_id))
+
+    produtos = {
+        row.id: ProdutoCatalogo(
+            id=row.id,
+            nome=row.nome,
+            categoria=row.categoria,
+            descricao=row.descricao,
+            imagem_url=row.imagem_url,
+            preco=as_money(row.preco),
+            ativo=bool(row.ativo),
+            controla_estoque=bool(row.controla_estoque),
+            adicional_ids=frozenset(links.get(row.id, ())),
+        )
+        for row in db.execute(
+            select(
+                Produto.id,
+                Produto.nome,
+                Produto.categoria,
+                Produto.descricao,
+                Produto.imagem_url,
+                Produto.preco,
+                Produto.ativo,
+                Produto.controla_estoque,
+            ).order_by(Produto.id.desc())
+        )
+    }
+    adicionais = {
+        row.id: AdicionalCatalogo(
+            id=row.id,
+            nome=row.nome,
+            preco=as_money(row.preco),
+            ativo=bool(row.ativo),
+        )
+        for row in db.execute(
+            select(Adicional.id, Adicional.nome, Adicional.preco, Adicional.ativo).order_by(
+                Adicional.nome.asc(), Adicional.id.asc()
+            )
+        )
+    }
+    return CatalogoSnapshot(
+        versao=versao,
+        produtos=MappingProxyType(produtos),
+        adicionais=MappingProxyType(adicionais),
+    )
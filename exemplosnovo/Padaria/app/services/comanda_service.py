@@ -1,16 +1,19 @@
 ﻿from __future__ import annotations
 
-from copy import deepcopy
+from collections.abc import Iterable, Mapping
 from datetime import date, datetime, time
 from decimal import Decimal
-from threading import Lock
-from time import monotonic
+from time import time_ns
+from typing import Any
 
 from fastapi import HTTPException, status
-from sqlalchemy import asc, desc, func, select
+from sqlalchemy import asc, desc, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm.attributes import set_committed_value
 
-from app.models.adicional import Adicional
+from app.core.http_cache import ConflitoVersao
+from app.db.escritor import adiar_para_commit, escrever_async
 from app.models.cliente import Cliente
 from app.models.comanda_codigo import ComandaCodigo
 from app.models.enums import StatusPedido, TipoEntrega
@@ -19,10 +22,24 @@ from app.models.item_pedido import ItemPedido
 from app.models.pedido import Pedido
 from app.models.pedido_cozinha_snapshot import PedidoCozinhaSnapshot
 from app.models.produto import Produto
-from app.models.produto_adicional import ProdutoAdicional
-from app.schemas.comanda import ComandaAbrirIn, ComandaItemCreate, ComandaItemUpdate
-from app.services import pagamento_service
-from app.services.utils import as_money
+from app.schemas.comanda import (
+    ComandaAbrirIn,
+    ComandaItemCreate,
+    ComandaItensBatchIn,
+    ComandaItemUpdate,
+    ComandaOut,
+)
+from app.services import (
+    busca_service,
+    catalogo_service,
+    estoque_service,
+    eventos_service,
+    pagamento_service,
+    paginacao,
+)
+from app.services.catalogo_service import ProdutoCatalogo
+from app.services.read_model import ReadModelCache, freeze
+from app.services.utils import ZERO, as_money
 
 STATUS_TRANSITIONS: dict[StatusPedido, set[StatusPedido]] = {
     StatusPedido.ABERTO: {StatusPedido.EM_PREPARO, StatusPedido.CANCELADO},
@@ -54,58 +71,87 @@ STATUS_VISUALS_VALIDOS = {
     StatusPedido.CANCELADO.value,
 }
 
-READ_CACHE_TTL_SECONDS = 1.0
-READ_CACHE_MAX_ITEMS = 512
-_cache_lock = Lock()
-_cache_generation = 0
-_cache_list_comandas: dict[tuple, tuple[float, list[dict]]] = {}
-_cache_list_painel: dict[tuple, tuple[float, list[dict]]] = {}
-_cache_list_historico: dict[tuple, tuple[float, list[dict]]] = {}
-_cache_sugestoes: dict[tuple, tuple[float, list[dict]]] = {}
-_cache_comanda: dict[tuple, tuple[float, dict]] = {}
+READ_CACHE_MAX_ITEMS = 2048
+TAG_LISTAS = ("listas",)
+TAG_CODIGOS = ("codigos",)
+TAG_SUGESTOES = ("sugestoes",)
+# A geracao inicial em microssegundos mantem a versao crescente entre reinicios,
+# entao um `since`/ETag de outro processo nunca casa com dados novos.
+_read_model = ReadModelCache(max_items=READ_CACHE_MAX_ITEMS, initial_generation=time_ns() // 1000)
 
 
 def invalidate_read_caches() -> None:
-    global _cache_generation
-    with _cache_lock:
-        _cache_generation += 1
-        _cache_list_comandas.clear()
-        _cache_list_painel.clear()
-        _cache_list_historico.clear()
-        _cache_sugestoes.clear()
-        _cache_comanda.clear()
-
-
-def _next_cache_key(*parts) -> tuple:
-    with _cache_lock:
-        generation = _cache_generation
-    return (generation, *parts)
-
-
-def _cache_read(cache: dict, key: tuple):
-    now = monotonic()
-    with _cache_lock:
-        item = cache.get(key)
-        if not item:
-            return None
-        expires_at, payload = item
-        if expires_at < now:
-            cache.pop(key, None)
-            return None
-        return deepcopy(payload)
-
-
-def _cache_write(cache: dict, key: tuple, payload) -> None:
-    now = monotonic()
-    with _cache_lock:
-        if len(cache) >= READ_CACHE_MAX_ITEMS:
-            expired = [k for k, (expires, _value) in cache.items() if expires < now]
-            for expired_key in expired:
-                cache.pop(expired_key, None)
-            if len(cache) >= READ_CACHE_MAX_ITEMS:
-                first_key = next(iter(cache))
-                cache.pop(first_key, None)
-        cache[key] = (now + READ_CACHE_TTL_SECONDS, deepcopy(payload))
+    _read_model.clear()
+    adiar_para_commit(_read_model.clear, invalidacao=True)
+
+
+def invalidate_comanda_cache(
+    pedido_ids: Iterable[int] = (),
+    codigos: Iterable[str | None] = (),
+    listas: bool = True,
+    sugestoes: bool = False,
+    codigos_cadastro: bool = False,
+) -> None:
+    # Invalida somente as entradas afetadas pela escrita: detalhe por pedido,
+    # linha do painel por codigo e, quando pedido, as listagens agregadas.
+    tags: list[tuple] = [("pedido", int(pedido_id)) for pedido_id in pedido_ids]
+    tags.extend(("codigo", codigo) for codigo in codigos if codigo)
+    if listas:
+        tags.append(TAG_LISTAS)
+    if sugestoes:
+        tags.append(TAG_SUGESTOES)
+    if codigos_cadastro:
+        tags.append(TAG_CODIGOS)
+    _read_model.invalidate(tags)
+    # No escritor dedicado invalida de novo apos o commit do lote: leitura feita
+    # entre a escrita e o commit nao fica no cache.
+    adiar_para_commit(lambda: _read_model.invalidate(tags), invalidacao=True)
+
+
+def read_cache_stats() -> dict:
+    return _read_model.stats()
+
+
+def versao_dados(pedido_id: int | None = None) -> int:
+    # Nao consulta o banco: serve para responder 304 antes de qualquer trabalho.
+    if pedido_id is None:
+        return _read_model.generation
+    return _read_model.version_of([("pedido", int(pedido_id))])
+
+
+def _publicar_comanda(acao: str, pedido: Pedido, codigo: str | None = None) -> None:
+    eventos_service.publicar(
+        "comanda",
+        acao=acao,
+        pedido_id=pedido.id,
+        codigo=codigo or pedido.comanda_codigo,
+        status=pedido.status.value,
+        total=pedido.total,
+    )
+
+
+def _publicar_codigo(acao: str, code: ComandaCodigo) -> None:
+    eventos_service.publicar(
+        "codigo",
+        acao=acao,
+        codigo_id=code.id,
+        codigo=code.codigo,
+        status=code.status_visual,
+        em_uso=code.em_uso,
+        ativo=code.ativo,
+    )
+
+
+def _cache_read(key: tuple):
+    return _read_model.get(key)
+
+
+def _cache_write(key: tuple, payload, tags: Iterable[tuple], generation: int):
+    # Payloads ficam congelados (mappingproxy/tuple) e sao devolvidos sem copia:
+    # quem precisar alterar deve montar um dict proprio.
+    frozen = freeze(payload)
+    _read_model.put(key, frozen, tags, generation)
+    return frozen
 
 
 def create_codigo(db: Session, codigo_raw: str) -> ComandaCodigo:
@@ -125,98 +171,149 @@ def create_codigo(db: Session, codigo_raw: str) -> ComandaCodigo:
     db.add(code)
     db.commit()
     db.refresh(code)
-    invalidate_read_caches()
+    invalidate_comanda_cache(codigos=[code.codigo], listas=False, codigos_cadastro=True)
+    _publicar_codigo("cadastro", code)
     return code
 
 
-def list_codigos(db: Session, ativo: bool | None, em_uso: bool | None) -> list[ComandaCodigo]:
-    _purge_historico_if_due(db)
-    stmt = select(ComandaCodigo)
+def list_codigos(db: Session, ativo: bool | None, em_uso: bool | None) -> list[Mapping[str, Any]]:
+    stmt = select(
+        ComandaCodigo.id,
+        ComandaCodigo.codigo,
+        ComandaCodigo.ativo,
+        ComandaCodigo.em_uso,
+        ComandaCodigo.status_visual,
+        ComandaCodigo.criado_em,
+    )
     if ativo is not None:
         stmt = stmt.where(ComandaCodigo.ativo.is_(ativo))
     if em_uso is not None:
         stmt = stmt.where(ComandaCodigo.em_uso.is_(em_uso))
-    rows = list(db.scalars(stmt.order_by(ComandaCodigo.codigo.asc())).all())
-    for code in rows:
-        if code.status_visual not in STATUS_VISUALS_VALIDOS:
-            code.status_visual = STATUS_VISUAL_LIBERADO
-    return rows
+    return [_serialize_codigo(row) for row in db.execute(stmt.order_by(ComandaCodigo.codigo.asc()))]
 
 
-def list_painel_comandas(db: Session, ativo: bool = True) -> list[dict]:
-    _purge_historico_if_due(db)
-    cache_key = _next_cache_key("list_painel_comandas", bool(ativo))
-    cached = _cache_read(_cache_list_painel, cache_key)
-    if cached is not None:
-        return cached
+def _serialize_codigo(row: Any) -> dict:
+    # Aceita linha (Row) ou entidade: so le atributos.
+    return {
+        "id": row.id,
+        "codigo": row.codigo,
+        "ativo": row.ativo,
+        "em_uso": row.em_uso,
+        "status_visual": _status_visual_valido(row.status_visual),
+        "criado_em": row.criado_em,
+    }
+
+
+def _status_visual_valido(status_visual: str | None) -> str:
+    if status_visual not in STATUS_VISUALS_VALIDOS:
+        return STATUS_VISUAL_LIBERADO
+    return status_visual
+
 
-    stmt = select(ComandaCodigo)
-    if ativo:
-        stmt = stmt.where(ComandaCodigo.ativo.is_(True))
-    codigos = list(db.scalars(stmt.order_by(ComandaCodigo.codigo.asc())).all())
+def list_painel_comandas(db: Session, ativo: bool = True) -> list[Mapping[str, Any]]:
+    generation = _read_model.generation
+    index_key = ("painel_codigos", bool(ativo))
+    codigos = _read_model.get(index_key)
+    if codigos is None:
+        stmt = select(ComandaCodigo.codigo)
+        if ativo:
+            stmt = stmt.where(ComandaCodigo.ativo.is_(True))
+        codigos = tuple(db.scalars(stmt.order_by(ComandaCodigo.codigo.asc())).all())
+        _read_model.put(index_key, codigos, [TAG_CODIGOS], generation)
     if not codigos:
         return []
 
-    codigos_map = {row.codigo: row for row in codigos}
-    pedidos = list(
-        db.scalars(
-            select(Pedido)
-            .where(Pedido.comanda_codigo.in_(codigos_map.keys()))
-            .order_by(Pedido.id.desc())
-        ).all()
-    )
-    ultimo_pedido_por_codigo: dict[str, Pedido] = {}
-    for pedido in pedidos:
-        codigo = pedido.comanda_codigo
-        if not codigo:
-            continue
-        if codigo not in ultimo_pedido_por_codigo:
-            ultimo_pedido_por_codigo[codigo] = pedido
+    # Cada linha do painel e cacheada por codigo: uma escrita so invalida a linha
+    # do codigo afetado e apenas as linhas faltantes voltam ao banco.
+    linhas: dict[str, dict] = {}
+    faltantes: list[str] = []
+    for codigo in codigos:
+        linha = _read_model.get(("painel_linha", codigo))
+        if linha is None:
+            faltantes.append(codigo)
+        else:
+            linhas[codigo] = linha
+    if faltantes:
+        for codigo, linha in _build_painel_linhas(db, faltantes).items():
+            linhas[codigo] = _cache_write(("painel_linha", codigo), linha, [("codigo", codigo)], generation)
+    return [linhas[codigo] for codigo in codigos if codigo in linhas]
+
+
+async def list_painel_comandas_async(db: AsyncSession, ativo: bool = True) -> list[Mapping[str, Any]]:
+    # Mesma logica do painel sync, rodando no event loop (greenlet) em vez do threadpool.
+    return await db.run_sync(list_painel_comandas, ativo=ativo)
+
+
+def list_painel_delta(db: Session, since: int, ativo: bool = True) -> dict[str, Any]:
+    versao = _read_model.generation
+    alteradas = _read_model.tags_changed_since(since)
+    painel = list_painel_comandas(db, ativo=ativo)
+    if alteradas is None:
+        return {"versao": versao, "completo": True, "itens": painel, "removidos": []}
+    codigos_alterados = {
+        tag[1] for tag in alteradas if isinstance(tag, tuple) and len(tag) == 2 and tag[0] == "codigo"
+    }
+    itens = [linha for linha in painel if linha["codigo"] in codigos_alterados]
+    presentes = {linha["codigo"] for linha in painel}
+    return {
+        "versao": versao,
+        "completo": False,
+        "itens": itens,
+        "removidos": sorted(codigos_alterados - presentes),
+    }
+
+
+async def list_painel_delta_async(db: AsyncSession, since: int, ativo: bool = True) -> dict[str, Any]:
+    return await db.run_sync(list_painel_delta, since=since, ativo=ativo)
+
+
+def _build_painel_linhas(db: Session, codigos_filtro: list[str]) -> dict[str, dict]:
+    # Um join pelo ponteiro pedido_atual_id: custo independe do historico do codigo.
+    # So as colunas da linha do painel, sem entidades no identity map.
+    rows = db.execute(
+        select(
+            ComandaCodigo.id,
+            ComandaCodigo.codigo,
+            ComandaCodigo.ativo,
+            ComandaCodigo.em_uso,
+            ComandaCodigo.status_visual,
+            Pedido.id.label("pedido_id"),
+            Pedido.status.label("pedido_status"),
+            Pedido.mesa,
+            Pedido.tipo_entrega,
+            Pedido.total,
+            Pedido.criado_em,
+        )
+        .outerjoin(Pedido, Pedido.id == ComandaCodigo.pedido_atual_id)
+        .where(ComandaCodigo.codigo.in_(codigos_filtro))
+    ).all()
+    if not rows:
+        return {}
 
-    # Precalcula o último pedido "ativo" por código para evitar N+1 queries
-    # durante a montagem do painel quando status_visual está em aberto/preparo/pronto.
     status_ativos = {
         StatusPedido.ABERTO.value,
         StatusPedido.EM_PREPARO.value,
         StatusPedido.PRONTO.value,
     }
-    ultimo_pedido_ativo_por_codigo: dict[str, Pedido] = {}
-    for pedido in pedidos:
-        codigo = pedido.comanda_codigo
-        if not codigo or codigo in ultimo_pedido_ativo_por_codigo:
-            continue
-        if pedido.status.value in status_ativos:
-            ultimo_pedido_ativo_por_codigo[codigo] = pedido
-
-    payload: list[dict] = []
-    for code in codigos:
-        status_visual = code.status_visual or STATUS_VISUAL_LIBERADO
-        if status_visual not in STATUS_VISUALS_VALIDOS:
-            status_visual = STATUS_VISUAL_LIBERADO
-            code.status_visual = status_visual
-        pedido = ultimo_pedido_por_codigo.get(code.codigo)
-        if status_visual in status_ativos and (not pedido or pedido.status.value != status_visual):
-            pedido_ativo = ultimo_pedido_ativo_por_codigo.get(code.codigo)
-            if pedido_ativo and pedido_ativo.status.value == status_visual:
-                pedido = pedido_ativo
-            else:
-                pedido = None
-        payload.append(
-            {
-                "codigo_id": code.id,
-                "codigo": code.codigo,
-                "ativo": code.ativo,
-                "em_uso": code.em_uso,
-                "status": status_visual,
-                "pedido_id": pedido.id if pedido else None,
-                "mesa": pedido.mesa if pedido else None,
-                "tipo_entrega": pedido.tipo_entrega if pedido else None,
-                "total": as_money(pedido.total) if pedido else as_money(0),
-                "criado_em": pedido.criado_em if pedido else None,
-            }
-        )
-    _cache_write(_cache_list_painel, cache_key, payload)
-    return payload
+    linhas: dict[str, dict] = {}
+    for row in rows:
+        status_visual = _status_visual_valido(row.status_visual or STATUS_VISUAL_LIBERADO)
+        tem_pedido = row.pedido_id is not None
+        if status_visual in status_ativos and tem_pedido and row.pedido_status.value != status_visual:
+            tem_pedido = False
+        linhas[row.codigo] = {
+            "codigo_id": row.id,
+            "codigo": row.codigo,
+            "ativo": row.ativo,
+            "em_uso": row.em_uso,
+            "status": status_visual,
+            "pedido_id": row.pedido_id if tem_pedido else None,
+            "mesa": row.mesa if tem_pedido else None,
+            "tipo_entrega": row.tipo_entrega if tem_pedido else None,
+            "total": row.total if tem_pedido else ZERO,
+            "criado_em": row.criado_em if tem_pedido else None,
+        }
+    return linhas
 
 
 def liberar_codigo(db: Session, codigo_id: int, confirmar: bool = False) -> ComandaCodigo:
@@ -239,7 +336,8 @@ def liberar_codigo(db: Session, codigo_id: int, confirmar: bool = False) -> Coma
     code.status_visual = STATUS_VISUAL_LIBERADO
     db.commit()
     db.refresh(code)
-    invalidate_read_caches()
+    invalidate_comanda_cache(codigos=[code.codigo], listas=False)
+    _publicar_codigo("liberado", code)
     return code
 
 
@@ -258,7 +356,8 @@ def patch_codigo_ativo(db: Session, codigo_id: int, ativo: bool) -> ComandaCodig
     code.ativo = ativo
     db.commit()
     db.refresh(code)
-    invalidate_read_caches()
+    invalidate_comanda_cache(codigos=[code.codigo], listas=False, codigos_cadastro=True)
+    _publicar_codigo("cadastro", code)
     return code
 
 
@@ -281,11 +380,12 @@ def delete_codigo(db: Session, codigo_id: int) -> dict:
     }
     db.delete(code)
     db.commit()
-    invalidate_read_caches()
+    invalidate_comanda_cache(codigos=[payload["codigo"]], listas=False, codigos_cadastro=True)
+    eventos_service.publicar("codigo", acao="removido", codigo_id=payload["id"], codigo=payload["codigo"])
     return payload
 
 
-def abrir_comanda(db: Session, payload: ComandaAbrirIn) -> dict:
+def abrir_comanda(db: Session, payload: ComandaAbrirIn) -> Mapping[str, Any]:
     codigo = _normalize_codigo(payload.codigo)
     mesa_normalizada = _normalize_optional_text(payload.mesa)
     if payload.tipo_entrega == TipoEntrega.ENTREGA and not mesa_normalizada:
@@ -304,11 +404,7 @@ def abrir_comanda(db: Session, payload: ComandaAbrirIn) -> dict:
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Código de comanda '{codigo}' está desativado.",
         )
-    if code.em_uso:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Código de comanda '{codigo}' já está em uso.",
-        )
+    _reivindicar_codigo(db, code, StatusPedido.ABERTO.value)
 
     cliente_bal = _get_or_create_cliente_balcao(db)
     pedido = Pedido(
@@ -318,13 +414,13 @@ def abrir_comanda(db: Session, payload: ComandaAbrirIn) -> dict:
         mesa=mesa_normalizada,
         observacoes=_normalize_optional_text(payload.observacoes),
         status=StatusPedido.ABERTO,
-        total=as_money(0),
+        total=ZERO,
     )
-    code.em_uso = True
-    code.status_visual = StatusPedido.ABERTO.value
+    code.pedido_atual = pedido
     db.add(pedido)
     db.commit()
-    invalidate_read_caches()
+    invalidate_comanda_cache(pedido_ids=[pedido.id], codigos=[codigo])
+    _publicar_comanda("aberta", pedido)
     return get_comanda(db, pedido.id)
 
 
@@ -342,17 +438,25 @@ def list_comandas(
     order_dir: str,
     offset: int = 0,
     limit: int = 500,
-) -> list[dict]:
-    _purge_historico_if_due(db)
-    stmt = select(Pedido).where(Pedido.comanda_codigo.is_not(None))
+    cursor: str | None = None,
+) -> list[Mapping[str, Any]]:
+    stmt = select(
+        Pedido.id,
+        Pedido.comanda_codigo,
+        Pedido.mesa,
+        Pedido.status,
+        Pedido.tipo_entrega,
+        Pedido.total,
+        Pedido.criado_em,
+    ).where(Pedido.comanda_codigo.is_not(None))
     if status_filter is not None:
         stmt = stmt.where(Pedido.status == status_filter)
     if tipo_entrega is not None:
         stmt = stmt.where(Pedido.tipo_entrega == tipo_entrega)
     if codigo:
-        stmt = stmt.where(Pedido.comanda_codigo.ilike(f"%{codigo.strip()}%"))
+        stmt = stmt.where(busca_service.filtro_pedidos(db, "comanda_codigo", codigo))
     if mesa:
-        stmt = stmt.where(Pedido.mesa.ilike(f"%{mesa.strip()}%"))
+        stmt = stmt.where(busca_service.filtro_pedidos(db, "mesa", mesa))
     if data_inicial is not None:
         stmt = stmt.where(Pedido.criado_em >= datetime.combine(data_inicial, time.min))
     if data_final is not None:
@@ -368,7 +472,7 @@ def list_comandas(
             detail="Filtro inválido: total_min não pode ser maior que total_max.",
         )
 
-    order_columns = {
+    order_columns: dict[str, Any] = {
         "id": Pedido.id,
         "criado_em": Pedido.criado_em,
         "codigo": Pedido.comanda_codigo,
@@ -388,7 +492,7 @@ def list_comandas(
             detail=f"order_dir inválido: {order_dir}.",
         )
 
-    cache_key = _next_cache_key(
+    cache_key = (
         "list_comandas",
         status_filter.value if status_filter else None,
         tipo_entrega.value if tipo_entrega else None,
@@ -400,20 +504,30 @@ def list_comandas(
         str(total_max) if total_max is not None else None,
         order_by,
         order_dir,
-        offset,
+        None if cursor else offset,
         limit,
+        cursor,
     )
-    cached = _cache_read(_cache_list_comandas, cache_key)
+    cached = _cache_read(cache_key)
     if cached is not None:
-        return cached
+        return list(cached)
+
+    generation = _read_model.generation
 
     order_column = order_columns[order_by]
     order_expr = asc(order_column) if order_dir == "asc" else desc(order_column)
-    stmt = stmt.order_by(order_expr, desc(Pedido.id)).offset(offset).limit(limit)
-    comandas = list(db.scalars(stmt).all())
+    if cursor:
+        # Keyset em (coluna de ordenacao, id): custo igual em qualquer profundidade.
+        valor, ultimo_id = paginacao.decodificar_cursor(cursor, [order_column, Pedido.id])
+        stmt = stmt.where(
+            paginacao.filtro_apos(order_column, order_dir == "desc", valor, Pedido.id, ultimo_id)
+        )
+    else:
+        stmt = stmt.offset(offset)
+    stmt = stmt.order_by(order_expr, desc(Pedido.id)).limit(limit)
+    comandas = db.execute(stmt).all()
     if not comandas:
-        _cache_write(_cache_list_comandas, cache_key, [])
-        return []
+        return list(_cache_write(cache_key, [], [TAG_LISTAS], generation))
 
     comanda_ids = [c.id for c in comandas]
     totais_itens_rows = db.execute(
@@ -433,21 +547,42 @@ def list_comandas(
             "mesa": c.mesa,
             "status": c.status,
             "tipo_entrega": c.tipo_entrega,
-            "total": as_money(c.total),
+            "total": c.total,
             "total_itens": total_itens_por_comanda.get(c.id, 0),
             "complexidade": _classificar_complexidade(total_itens_por_comanda.get(c.id, 0)),
             "criado_em": c.criado_em,
         }
         for c in comandas
     ]
-    _cache_write(_cache_list_comandas, cache_key, payload)
-    return payload
+    return list(_cache_write(cache_key, payload, [TAG_LISTAS], generation))
 
 
-def _purge_historico_if_due(db: Session) -> None:
-    now = datetime.now()
-    if now.weekday() != 6 or now.hour < 23:
-        return
+async def list_comandas_async(db: AsyncSession, **filtros: Any) -> list[Mapping[str, Any]]:
+    return await db.run_sync(list_comandas, **filtros)
+
+
+CAMPOS_CURSOR_COMANDAS = {
+    "id": "id",
+    "criado_em": "criado_em",
+    "codigo": "comanda_codigo",
+    "mesa": "mesa",
+    "status": "status",
+    "tipo_entrega": "tipo_entrega",
+    "total": "total",
+}
+
+
+def cursor_comandas(itens: list[Mapping[str, Any]], limit: int, order_by: str) -> str | None:
+    return paginacao.proximo_cursor(itens, limit, CAMPOS_CURSOR_COMANDAS[order_by], "id")
+
+
+def cursor_historico(itens: list[Mapping[str, Any]], limit: int) -> str | None:
+    return paginacao.proximo_cursor(itens, limit, "criado_em", "pedido_id")
+
+
+def expurgar_historico(db: Session) -> dict:
+    # Tarefa semanal do agendador (agendador_service): desvincula dos codigos os
+    # pedidos finalizados, mantendo o historico financeiro.
     pedidos = list(
         db.scalars(
             select(Pedido).where(
@@ -457,16 +592,20 @@ def _purge_historico_if_due(db: Session) -> None:
         ).all()
     )
     if not pedidos:
-        return
-    codigos_liberados: set[str] = set()
+        return {"pedidos_desvinculados": 0, "codigos_liberados": 0}
+    pedidos_por_codigo: dict[str, list[int]] = {}
     for pedido in pedidos:
         if pedido.comanda_codigo:
-            codigos_liberados.add(pedido.comanda_codigo)
+            pedidos_por_codigo.setdefault(pedido.comanda_codigo, []).append(pedido.id)
         pedido.comanda_codigo = None
-    for codigo in codigos_liberados:
-        _release_comanda_codigo(db, codigo, status_visual=STATUS_VISUAL_LIBERADO)
+    for codigo, pedido_ids in pedidos_por_codigo.items():
+        _release_comanda_codigo(
+            db, codigo, status_visual=STATUS_VISUAL_LIBERADO, pedidos_desvinculados=pedido_ids
+        )
     db.commit()
     invalidate_read_caches()
+    eventos_service.publicar("resync", motivo="expurgo_historico")
+    return {"pedidos_desvinculados": len(pedidos), "codigos_liberados": len(pedidos_por_codigo)}
 
 
 def list_historico(
@@ -476,21 +615,33 @@ def list_historico(
     status_filter: StatusPedido | None,
     somente_finalizadas: bool,
     limit: int,
-) -> list[dict]:
-    _purge_historico_if_due(db)
-    cache_key = _next_cache_key(
+    cursor: str | None = None,
+) -> list[Mapping[str, Any]]:
+    cache_key = (
         "list_historico",
         data_inicial.isoformat() if data_inicial else None,
         data_final.isoformat() if data_final else None,
         status_filter.value if status_filter else None,
         somente_finalizadas,
         limit,
+        cursor,
     )
-    cached = _cache_read(_cache_list_historico, cache_key)
+    cached = _cache_read(cache_key)
     if cached is not None:
-        return cached
-
-    stmt = select(Pedido).where(Pedido.comanda_codigo.is_not(None))
+        return list(cached)
+
+    generation = _read_model.generation
+
+    stmt = select(
+        Pedido.id,
+        Pedido.cliente_id,
+        Pedido.status,
+        Pedido.tipo_entrega,
+        Pedido.mesa,
+        Pedido.total,
+        Pedido.criado_em,
+        Pedido.comanda_codigo,
+    ).where(Pedido.comanda_codigo.is_not(None))
     if status_filter is not None:
         stmt = stmt.where(Pedido.status == status_filter)
     elif somente_finalizadas:
@@ -501,7 +652,10 @@ def list_historico(
     if data_final is not None:
         stmt = stmt.where(Pedido.criado_em <= datetime.combine(data_final, time.max))
 
-    rows = list(db.scalars(stmt.order_by(desc(Pedido.criado_em)).limit(limit)).all())
+    if cursor:
+        criado_em, ultimo_id = paginacao.decodificar_cursor(cursor, [Pedido.criado_em, Pedido.id])
+        stmt = stmt.where(paginacao.filtro_apos(Pedido.criado_em, True, criado_em, Pedido.id, ultimo_id))
+    rows = db.execute(stmt.order_by(desc(Pedido.criado_em), desc(Pedido.id)).limit(limit)).all()
     payload = [
         {
             "pedido_id": p.id,
@@ -510,21 +664,22 @@ def list_historico(
             "status": p.status,
             "tipo_entrega": p.tipo_entrega,
             "mesa": p.mesa,
-            "total": as_money(p.total),
+            "total": p.total,
             "criado_em": p.criado_em,
             "comanda_codigo": p.comanda_codigo or f"#{p.id}",
         }
         for p in rows
     ]
-    _cache_write(_cache_list_historico, cache_key, payload)
-    return payload
+    return list(_cache_write(cache_key, payload, [TAG_LISTAS], generation))
 
 
-def list_sugestoes_mais_pedidos(db: Session, limit: int = 8) -> list[dict]:
-    cache_key = _next_cache_key("list_sugestoes_mais_pedidos", limit)
-    cached = _cache_read(_cache_sugestoes, cache_key)
+def list_sugestoes_mais_pedidos(db: Session, limit: int = 8) -> list[Mapping[str, Any]]:
+    cache_key = ("list_sugestoes_mais_pedidos", limit)
+    cached = _cache_read(cache_key)
     if cached is not None:
-        return cached
+        return list(cached)
+
+    generation = _read_model.generation
 
     quantidade = func.coalesce(func.sum(ItemPedido.quantidade), 0).label("quantidade_total")
     rows = db.execute(
@@ -550,13 +705,12 @@ def list_sugestoes_mais_pedidos(db: Session, limit: int = 8) -> list[dict]:
             "produto_id": produto_id,
             "nome": nome,
             "imagem_url": imagem_url,
-            "preco": as_money(preco),
+            "preco": preco,
             "quantidade_total": int(qtd),
         }
         for produto_id, nome, imagem_url, preco, qtd in rows
     ]
-    _cache_write(_cache_sugestoes, cache_key, payload)
-    return payload
+    return list(_cache_write(cache_key, payload, [TAG_SUGESTOES], generation))
 
 
 def resetar_comandas_ativas(db: Session) -> dict:
@@ -579,7 +733,6 @@ def resetar_comandas_ativas(db: Session) -> dict:
     itens_afetados = 0
     estoque_reposto_total = 0
     codigos_liberados: set[str] = set()
-    estoque_por_produto: dict[int, int] = {}
 
     for pedido in pedidos:
         if pedido.comanda_codigo:
@@ -587,25 +740,14 @@ def resetar_comandas_ativas(db: Session) -> dict:
         itens_afetados += len(pedido.itens)
 
         if pedido.status in {StatusPedido.EM_PREPARO, StatusPedido.PRONTO}:
-            for item in pedido.itens:
-                estoque_por_produto[item.produto_id] = (
-                    estoque_por_produto.get(item.produto_id, 0) + item.quantidade
-                )
+            repostos = estoque_service.repor(
+                db, _quantidades_do_pedido(pedido), pedido_id=pedido.id
+            )
+            estoque_reposto_total += sum(repostos.values())
 
         pedido.status = StatusPedido.CANCELADO
         pedido.comanda_codigo = None
-
-    produtos = {
-        produto.id: produto
-        for produto in db.scalars(
-            select(Produto).where(Produto.id.in_(estoque_por_produto.keys()))
-        ).all()
-    }
-    for produto_id, quantidade in estoque_por_produto.items():
-        produto = produtos.get(produto_id)
-        if produto and produto.controla_estoque:
-            produto.estoque_atual += quantidade
-            estoque_reposto_total += quantidade
+        pedido.versao += 1
 
     for codigo in codigos_liberados:
         _release_comanda_codigo(db, codigo, status_visual=STATUS_VISUAL_LIBERADO)
@@ -618,6 +760,8 @@ def resetar_comandas_ativas(db: Session) -> dict:
         ).all()
     )
     for code in codigos_cadastrados:
+        # Todo pedido vinculado foi desvinculado acima: nenhum codigo tem pedido atual.
+        code.pedido_atual_id = None
         if code.em_uso or code.status_visual != STATUS_VISUAL_LIBERADO:
             code.em_uso = False
             code.status_visual = STATUS_VISUAL_LIBERADO
@@ -625,6 +769,7 @@ def resetar_comandas_ativas(db: Session) -> dict:
 
     db.commit()
     invalidate_read_caches()
+    eventos_service.publicar("resync", motivo="reset_comandas")
     return {
         "comandas_resetadas": len(pedidos),
         "itens_afetados": itens_afetados,
@@ -633,23 +778,35 @@ def resetar_comandas_ativas(db: Session) -> dict:
     }
 
 
-def reset_comanda_individual(db: Session, pedido_id: int) -> dict:
+def reset_comanda_individual(
+    db: Session,
+    pedido_id: int,
+    versao_esperada: int | None = None,
+) -> dict:
     pedido = _get_comanda_or_404(db, pedido_id)
+    _conferir_versao(db, pedido, versao_esperada)
     status_anterior = pedido.status
     comanda_codigo = pedido.comanda_codigo or f"#{pedido.id}"
     estoque_reposto_total = 0
 
     if pedido.status in {StatusPedido.EM_PREPARO, StatusPedido.PRONTO}:
-        for item in pedido.itens:
-            if _increment_stock_for_product(db, item.produto_id, item.quantidade):
-                estoque_reposto_total += item.quantidade
+        repostos = estoque_service.repor(db, _quantidades_do_pedido(pedido), pedido_id=pedido.id)
+        estoque_reposto_total = sum(repostos.values())
 
+    codigo_liberado = pedido.comanda_codigo
     pedido.status = StatusPedido.CANCELADO
-    _release_comanda_codigo(db, pedido.comanda_codigo, status_visual=STATUS_VISUAL_LIBERADO)
+    _release_comanda_codigo(
+        db,
+        pedido.comanda_codigo,
+        status_visual=STATUS_VISUAL_LIBERADO,
+        pedidos_desvinculados=[pedido.id],
+    )
     pedido.comanda_codigo = None
 
+    _avancar_versao(db, pedido)
     db.commit()
-    invalidate_read_caches()
+    invalidate_comanda_cache(pedido_ids=[pedido_id], codigos=[codigo_liberado], sugestoes=True)
+    _publicar_comanda("resetada", pedido, codigo=codigo_liberado)
     return {
         "pedido_id": pedido_id,
         "comanda_codigo": comanda_codigo,
@@ -659,26 +816,40 @@ def reset_comanda_individual(db: Session, pedido_id: int) -> dict:
     }
 
 
-def get_comanda(db: Session, pedido_id: int) -> dict:
-    cache_key = _next_cache_key("get_comanda", pedido_id)
-    cached = _cache_read(_cache_comanda, cache_key)
+def get_comanda(db: Session, pedido_id: int) -> Mapping[str, Any]:
+    cache_key = ("get_comanda", pedido_id)
+    cached = _cache_read(cache_key)
     if cached is not None:
         return cached
 
+    generation = _read_model.generation
     db.expire_all()
     pedido = _get_comanda_or_404(db, pedido_id)
     payload = _serialize_comanda(db, pedido)
-    _cache_write(_cache_comanda, cache_key, payload)
-    return payload
+    return _cache_write(cache_key, payload, [("pedido", pedido.id)], generation)
+
 
+async def get_comanda_async(db: AsyncSession, pedido_id: int) -> Mapping[str, Any]:
+    # Acerto de cache responde direto no event loop, sem abrir conexao.
+    cached = _cache_read(("get_comanda", pedido_id))
+    if cached is not None:
+        return cached
+    return await db.run_sync(get_comanda, pedido_id)
 
-def add_item(db: Session, pedido_id: int, payload: ComandaItemCreate) -> dict:
+
+def add_item(
+    db: Session,
+    pedido_id: int,
+    payload: ComandaItemCreate,
+    versao_esperada: int | None = None,
+) -> Mapping[str, Any]:
     pedido = _get_comanda_or_404(db, pedido_id)
+    _conferir_versao(db, pedido, versao_esperada)
     _ensure_editable_order(pedido)
     produto = _get_produto_ativo_or_404(db, payload.produto_id)
 
     if _status_controla_estoque(pedido.status):
-        _decrement_stock_for_product(db, produto.id, payload.quantidade)
+        _decrement_stock_for_product(db, produto.id, payload.quantidade, pedido_id=pedido.id)
 
     item = ItemPedido(
         pedido_id=pedido.id,
@@ -686,22 +857,40 @@ def add_item(db: Session, pedido_id: int, payload: ComandaItemCreate) -> dict:
         quantidade=payload.quantidade,
         desconto=as_money(payload.desconto),
         observacoes=_normalize_optional_text(payload.observacoes),
-        preco_unitario=as_money(produto.preco),
-        subtotal=as_money(0),
+        preco_unitario=produto.preco,
+        subtotal=ZERO,
     )
     db.add(item)
     db.flush()
 
     _replace_adicionais(db, item, payload.adicionais, produto.id)
     _recalculate_item_subtotal(item)
-    _recalculate_comanda_total(db, pedido)
+    _apply_total_delta(pedido, item.subtotal)
+    _avancar_versao(db, pedido)
     db.commit()
-    invalidate_read_caches()
+    invalidate_comanda_cache(pedido_ids=[pedido.id], codigos=[pedido.comanda_codigo], sugestoes=True)
+    _publicar_comanda("item_adicionado", pedido)
     return get_comanda(db, pedido.id)
 
 
-def update_item(db: Session, pedido_id: int, item_id: int, payload: ComandaItemUpdate) -> dict:
+async def add_item_async(
+    db: AsyncSession,
+    pedido_id: int,
+    payload: ComandaItemCreate,
+    versao_esperada: int | None = None,
+) -> Mapping[str, Any]:
+    return await escrever_async(db, add_item, pedido_id, payload, versao_esperada=versao_esperada)
+
+
+def update_item(
+    db: Session,
+    pedido_id: int,
+    item_id: int,
+    payload: ComandaItemUpdate,
+    versao_esperada: int | None = None,
+) -> Mapping[str, Any]:
     pedido = _get_comanda_or_404(db, pedido_id)
+    _conferir_versao(db, pedido, versao_esperada)
     _ensure_editable_order(pedido)
 
     item = db.scalar(
@@ -718,6 +907,7 @@ def update_item(db: Session, pedido_id: int, item_id: int, payload: ComandaItemU
 
     old_produto_id = item.produto_id
     old_quantidade = item.quantidade
+    old_subtotal = item.subtotal
     next_produto_id = payload.produto_id or item.produto_id
     produto = _get_produto_ativo_or_404(db, next_produto_id)
 
@@ -728,18 +918,112 @@ def update_item(db: Session, pedido_id: int, item_id: int, payload: ComandaItemU
             old_quantidade=old_quantidade,
             new_produto_id=produto.id,
             new_quantidade=payload.quantidade,
+            pedido_id=pedido.id,
         )
 
     item.produto_id = produto.id
-    item.preco_unitario = as_money(produto.preco)
+    item.preco_unitario = produto.preco
     item.quantidade = payload.quantidade
     item.desconto = as_money(payload.desconto)
     item.observacoes = _normalize_optional_text(payload.observacoes)
     _replace_adicionais(db, item, payload.adicionais, produto.id)
     _recalculate_item_subtotal(item)
-    _recalculate_comanda_total(db, pedido)
+    _apply_total_delta(pedido, item.subtotal - old_subtotal)
+    _avancar_versao(db, pedido)
     db.commit()
-    invalidate_read_caches()
+    invalidate_comanda_cache(pedido_ids=[pedido.id], codigos=[pedido.comanda_codigo], sugestoes=True)
+    _publicar_comanda("item_alterado", pedido)
+    return get_comanda(db, pedido.id)
+
+
+def aplicar_itens_batch(
+    db: Session,
+    pedido_id: int,
+    payload: ComandaItensBatchIn,
+    versao_esperada: int | None = None,
+) -> Mapping[str, Any]:
+    pedido = _get_comanda_or_404(db, pedido_id)
+    _conferir_versao(db, pedido, versao_esperada)
+    _ensure_editable_order(pedido)
+    if not (payload.adicionar or payload.alterar or payload.remover):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Informe ao menos uma operação de item.",
+        )
+
+    item_ids = [op.item_id for op in payload.alterar] + list(payload.remover)
+    if len(set(item_ids)) != len(item_ids):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cada item pode aparecer em apenas uma operação do lote.",
+        )
+    # Os itens ja vieram no joinedload da comanda: nenhuma consulta por item.
+    itens_map = {item.id: item for item in pedido.itens}
+    for item_id in item_ids:
+        if item_id not in itens_map:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Item {item_id} não encontrado na comanda {pedido_id}.",
+            )
+
+    produto_ids = {op.produto_id for op in payload.adicionar}
+    produto_ids.update(op.produto_id or itens_map[op.item_id].produto_id for op in payload.alterar)
+    produtos = _get_produtos_ativos_or_404(db, produto_ids)
+
+    if _status_controla_estoque(pedido.status):
+        saldo: dict[int, int] = {}
+        for op in payload.adicionar:
+            saldo[op.produto_id] = saldo.get(op.produto_id, 0) + op.quantidade
+        for op in payload.alterar:
+            item = itens_map[op.item_id]
+            novo_produto_id = op.produto_id or item.produto_id
+            saldo[item.produto_id] = saldo.get(item.produto_id, 0) - item.quantidade
+            saldo[novo_produto_id] = saldo.get(novo_produto_id, 0) + op.quantidade
+        for item_id in payload.remover:
+            item = itens_map[item_id]
+            saldo[item.produto_id] = saldo.get(item.produto_id, 0) - item.quantidade
+        _apply_stock_balance(db, saldo, pedido_id=pedido.id)
+
+    delta_total = ZERO
+    for item_id in payload.remover:
+        item = itens_map[item_id]
+        delta_total -= item.subtotal
+        db.delete(item)
+
+    for op in payload.alterar:
+        item = itens_map[op.item_id]
+        produto = produtos[op.produto_id or item.produto_id]
+        subtotal_anterior = item.subtotal
+        item.produto_id = produto.id
+        item.preco_unitario = produto.preco
+        item.quantidade = op.quantidade
+        item.desconto = as_money(op.desconto)
+        item.observacoes = _normalize_optional_text(op.observacoes)
+        _replace_adicionais(db, item, op.adicionais, produto.id)
+        _recalculate_item_subtotal(item)
+        delta_total += item.subtotal - subtotal_anterior
+
+    for op in payload.adicionar:
+        produto = produtos[op.produto_id]
+        item = ItemPedido(
+            pedido_id=pedido.id,
+            produto_id=produto.id,
+            quantidade=op.quantidade,
+            desconto=as_money(op.desconto),
+            observacoes=_normalize_optional_text(op.observacoes),
+            preco_unitario=produto.preco,
+            subtotal=ZERO,
+        )
+        db.add(item)
+        _replace_adicionais(db, item, op.adicionais, produto.id)
+        _recalculate_item_subtotal(item)
+        delta_total += item.subtotal
+
+    _apply_total_delta(pedido, delta_total)
+    _avancar_versao(db, pedido)
+    db.commit()
+    invalidate_comanda_cache(pedido_ids=[pedido.id], codigos=[pedido.comanda_codigo], sugestoes=True)
+    _publicar_comanda("itens_lote", pedido)
     return get_comanda(db, pedido.id)
 
 
@@ -749,8 +1033,10 @@ def delete_item(
     item_id: int,
     forcar: bool = False,
     repor_estoque: bool = True,
-) -> dict:
+    versao_esperada: int | None = None,
+) -> Mapping[str, Any]:
     pedido = _get_comanda_or_404(db, pedido_id)
+    _conferir_versao(db, pedido, versao_esperada)
     if not forcar:
         _ensure_editable_order(pedido)
     elif pedido.status == StatusPedido.CANCELADO:
@@ -777,13 +1063,16 @@ def delete_item(
 
     deve_repor = repor_estoque if forcar else True
     if deve_repor and _status_controla_estoque(pedido.status):
-        _increment_stock_for_product(db, item.produto_id, item.quantidade)
+        _increment_stock_for_product(db, item.produto_id, item.quantidade, pedido_id=pedido.id)
 
+    subtotal_removido = item.subtotal
     db.delete(item)
     db.flush()
-    _recalculate_comanda_total(db, pedido)
+    _apply_total_delta(pedido, -subtotal_removido)
+    _avancar_versao(db, pedido)
     db.commit()
-    invalidate_read_caches()
+    invalidate_comanda_cache(pedido_ids=[pedido.id], codigos=[pedido.comanda_codigo], sugestoes=True)
+    _publicar_comanda("item_removido", pedido)
     return get_comanda(db, pedido.id)
 
 
@@ -792,7 +1081,8 @@ def move_item(
     pedido_id: int,
     item_id: int,
     destino_pedido_id: int,
-) -> dict:
+    versao_esperada: int | None = None,
+) -> Mapping[str, Any]:
     if pedido_id == destino_pedido_id:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -801,6 +1091,7 @@ def move_item(
 
     origem = _get_comanda_or_404(db, pedido_id)
     destino = _get_comanda_or_404(db, destino_pedido_id)
+    _conferir_versao(db, origem, versao_esperada)
     _ensure_editable_order(origem)
     _ensure_editable_order(destino)
 
@@ -819,18 +1110,18 @@ def move_item(
     origem_controla = _status_controla_estoque(origem.status)
     destino_controla = _status_controla_estoque(destino.status)
     if origem_controla and not destino_controla:
-        _increment_stock_for_product(db, item.produto_id, item.quantidade)
+        _increment_stock_for_product(db, item.produto_id, item.quantidade, pedido_id=origem.id)
     elif not origem_controla and destino_controla:
-        _decrement_stock_for_product(db, item.produto_id, item.quantidade)
+        _decrement_stock_for_product(db, item.produto_id, item.quantidade, pedido_id=destino.id)
 
     novo_item = ItemPedido(
         pedido_id=destino.id,
         produto_id=item.produto_id,
         quantidade=item.quantidade,
-        desconto=as_money(item.desconto),
+        desconto=item.desconto,
         observacoes=item.observacoes,
-        preco_unitario=as_money(item.preco_unitario),
-        subtotal=as_money(item.subtotal),
+        preco_unitario=item.preco_unitario,
+        subtotal=item.subtotal,
     )
     db.add(novo_item)
     db.flush()
@@ -840,17 +1131,25 @@ def move_item(
             ItemPedidoAdicional(
                 adicional_id=adicional.adicional_id,
                 quantidade=adicional.quantidade,
-                preco_unitario=as_money(adicional.preco_unitario),
-                subtotal=as_money(adicional.subtotal),
+                preco_unitario=adicional.preco_unitario,
+                subtotal=adicional.subtotal,
             )
         )
 
+    subtotal_movido = item.subtotal
     db.delete(item)
     db.flush()
-    _recalculate_comanda_total(db, origem)
-    _recalculate_comanda_total(db, destino)
+    _apply_total_delta(origem, -subtotal_movido)
+    _apply_total_delta(destino, subtotal_movido)
+    _avancar_versao(db, origem, destino)
     db.commit()
-    invalidate_read_caches()
+    invalidate_comanda_cache(
+        pedido_ids=[origem.id, destino.id],
+        codigos=[origem.comanda_codigo, destino.comanda_codigo],
+        sugestoes=True,
+    )
+    _publicar_comanda("item_removido", origem)
+    _publicar_comanda("item_adicionado", destino)
     return get_comanda(db, origem.id)
 
 
@@ -861,8 +1160,10 @@ def change_status(
     repor_estoque: bool = True,
     confirmar_reabertura: bool = False,
     motivo_status: str | None = None,
-) -> dict:
+    versao_esperada: int | None = None,
+) -> Mapping[str, Any]:
     pedido = _get_comanda_or_404(db, pedido_id)
+    _conferir_versao(db, pedido, versao_esperada)
     if pedido.status == new_status:
         return get_comanda(db, pedido.id)
 
@@ -910,45 +1211,46 @@ def change_status(
         codigo_entity = db.scalar(
             select(ComandaCodigo).where(ComandaCodigo.codigo == pedido.comanda_codigo)
         )
-    if codigo_entity:
+    if codigo_entity and new_status in {StatusPedido.ENTREGUE, StatusPedido.CANCELADO}:
         codigo_entity.status_visual = new_status.value
-        codigo_entity.em_uso = new_status not in {StatusPedido.ENTREGUE, StatusPedido.CANCELADO}
+        codigo_entity.em_uso = False
+        codigo_entity.pedido_atual_id = pedido.id
+    elif codigo_entity:
+        # Reabertura de entregue disputa o codigo com uma comanda nova aberta nele.
+        _reivindicar_codigo(db, codigo_entity, new_status.value, pedido_id=pedido.id)
     elif new_status in {StatusPedido.ENTREGUE, StatusPedido.CANCELADO}:
         _release_comanda_codigo(db, pedido.comanda_codigo, status_visual=new_status.value)
+    _avancar_versao(db, pedido)
     db.commit()
-    invalidate_read_caches()
+    invalidate_comanda_cache(pedido_ids=[pedido.id], codigos=[pedido.comanda_codigo], sugestoes=True)
+    _publicar_comanda("status", pedido)
     return get_comanda(db, pedido.id)
 
 
-def delete_comanda(db: Session, pedido_id: int) -> dict:
+def delete_comanda(db: Session, pedido_id: int, versao_esperada: int | None = None) -> dict:
     pedido = _get_comanda_or_404(db, pedido_id)
+    _conferir_versao(db, pedido, versao_esperada)
     comanda_codigo = pedido.comanda_codigo or f"#{pedido.id}"
     itens_removidos = len(pedido.itens)
     pagamentos_removidos = len(pedido.pagamentos)
     estoque_reposto_total = 0
 
     if pedido.status in {StatusPedido.EM_PREPARO, StatusPedido.PRONTO}:
-        reposicao_por_produto: dict[int, int] = {}
-        for item in pedido.itens:
-            reposicao_por_produto[item.produto_id] = (
-                reposicao_por_produto.get(item.produto_id, 0) + item.quantidade
-            )
-        produtos = {
-            produto.id: produto
-            for produto in db.scalars(
-                select(Produto).where(Produto.id.in_(reposicao_por_produto.keys()))
-            ).all()
-        }
-        for produto_id, quantidade in reposicao_por_produto.items():
-            produto = produtos.get(produto_id)
-            if produto and produto.controla_estoque:
-                produto.estoque_atual += quantidade
-                estoque_reposto_total += quantidade
+        # O pedido sera apagado: o movimento fica no razao com pedido_id nulo.
+        repostos = estoque_service.repor(db, _quantidades_do_pedido(pedido), pedido_id=pedido.id)
+        estoque_reposto_total = sum(repostos.values())
 
-    _release_comanda_codigo(db, pedido.comanda_codigo, status_visual=STATUS_VISUAL_LIBERADO)
+    _release_comanda_codigo(
+        db,
+        pedido.comanda_codigo,
+        status_visual=STATUS_VISUAL_LIBERADO,
+        pedidos_desvinculados=[pedido.id],
+    )
+    _avancar_versao(db, pedido)
     db.delete(pedido)
     db.commit()
-    invalidate_read_caches()
+    invalidate_comanda_cache(pedido_ids=[pedido_id], codigos=[pedido.comanda_codigo], sugestoes=True)
+    _publicar_comanda("excluida", pedido)
     return {
         "comanda_id": pedido_id,
         "comanda_codigo": comanda_codigo,
@@ -969,8 +1271,8 @@ def get_cupom_data(db: Session, pedido_id: int, cozinha: bool = False) -> dict:
             {
                 "nome": ad.adicional.nome if ad.adicional else f"Adicional {ad.adicional_id}",
                 "quantidade": ad.quantidade,
-                "preco_unitario": as_money(ad.preco_unitario),
-                "subtotal": as_money(ad.subtotal),
+                "preco_unitario": ad.preco_unitario,
+                "subtotal": ad.subtotal,
             }
             for ad in item.adicionais
         ]
@@ -980,9 +1282,9 @@ def get_cupom_data(db: Session, pedido_id: int, cozinha: bool = False) -> dict:
                 "produto": item.produto.nome if item.produto else f"Produto {item.produto_id}",
                 "quantidade": item.quantidade,
                 "observacoes": item.observacoes,
-                "preco_unitario": as_money(item.preco_unitario),
-                "desconto": as_money(item.desconto),
-                "subtotal": as_money(item.subtotal),
+                "preco_unitario": item.preco_unitario,
+                "desconto": item.desconto,
+                "subtotal": item.subtotal,
                 "adicionais": ad_rows,
             }
         )
@@ -1005,7 +1307,7 @@ def get_cupom_data(db: Session, pedido_id: int, cozinha: bool = False) -> dict:
         "total_itens": total_itens,
         "complexidade": _classificar_complexidade(total_itens),
         "criado_em": pedido.criado_em,
-        "total": as_money(pedido.total),
+        "total": pedido.total,
         "total_pago": pagamento["total_pago"],
         "saldo_pendente": pagamento["saldo_pendente"],
         "itens": itens_data,
@@ -1185,19 +1487,91 @@ def _get_comanda_or_404(db: Session, pedido_id: int) -> Pedido:
     return pedido
 
 
-def _get_produto_ativo_or_404(db: Session, produto_id: int) -> Produto:
-    produto = db.get(Produto, produto_id)
-    if not produto:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Produto {produto_id} não encontrado.",
-        )
-    if not produto.ativo:
+def _reivindicar_codigo(
+    db: Session,
+    code: ComandaCodigo,
+    status_visual: str,
+    pedido_id: int | None = None,
+) -> None:
+    # Posse do codigo decidida por um UPDATE condicional: de dois aparelhos abrindo o
+    # mesmo codigo, so um encontra em_uso = 0; o outro recebe 409 em vez de sobrescrever.
+    livre = ComandaCodigo.em_uso.is_(False)
+    valores: dict[str, Any] = {"em_uso": True, "status_visual": status_visual}
+    if pedido_id is not None:
+        livre = or_(livre, ComandaCodigo.pedido_atual_id == pedido_id)
+        valores["pedido_atual_id"] = pedido_id
+    reivindicado = db.execute(
+        update(ComandaCodigo)
+        .where(ComandaCodigo.id == code.id, livre)
+        .values(**valores)
+        .execution_options(synchronize_session="fetch")
+    ).rowcount
+    if not reivindicado:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Produto inativo não pode ser adicionado.",
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Código de comanda '{code.codigo}' já está em uso.",
         )
-    return produto
+
+
+def _conferir_versao(db: Session, pedido: Pedido, versao_esperada: int | None) -> None:
+    if versao_esperada is not None and versao_esperada != pedido.versao:
+        raise _conflito_versao(db, pedido)
+
+
+def _avancar_versao(db: Session, *pedidos: Pedido) -> None:
+    # Controle otimista: a escrita so vale se a versao lida ainda e a do banco.
+    for pedido in pedidos:
+        versao = pedido.versao
+        avancou = db.execute(
+            update(Pedido)
+            .where(Pedido.id == pedido.id, Pedido.versao == versao)
+            .values(versao=versao + 1)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not avancou:
+            db.rollback()
+            raise _conflito_versao(db, _get_comanda_or_404(db, pedido.id))
+        set_committed_value(pedido, "versao", versao + 1)
+
+
+def _conflito_versao(db: Session, pedido: Pedido) -> ConflitoVersao:
+    atual = ComandaOut.model_validate(_serialize_comanda(db, pedido)).model_dump(mode="json")
+    return ConflitoVersao(
+        detail=(
+            f"Comanda {pedido.id} foi alterada por outro aparelho (versão {pedido.versao}). "
+            "Confira os dados atualizados e tente novamente."
+        ),
+        atual=atual,
+    )
+
+
+def _get_produto_ativo_or_404(db: Session, produto_id: int) -> ProdutoCatalogo:
+    return _get_produtos_ativos_or_404(db, [produto_id])[produto_id]
+
+
+def _get_produtos_ativos_or_404(
+    db: Session,
+    produto_ids: Iterable[int],
+) -> dict[int, ProdutoCatalogo]:
+    # Validacao e preco saem do snapshot do catalogo, sem consulta por item.
+    ids = set(produto_ids)
+    if not ids:
+        return {}
+    catalogo = catalogo_service.obter_catalogo_com(db, produto_ids=ids)
+    produtos = {produto_id: catalogo.produtos.get(produto_id) for produto_id in ids}
+    for produto_id in sorted(ids):
+        produto = produtos.get(produto_id)
+        if not produto:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Produto {produto_id} não encontrado.",
+            )
+        if not produto.ativo:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Produto inativo não pode ser adicionado.",
+            )
+    return produtos
 
 
 def _replace_adicionais(
@@ -1223,12 +1597,10 @@ def _replace_adicionais(
             )
         adicionais_agrupados[adicional_id] = adicionais_agrupados.get(adicional_id, 0) + quantidade
 
-    adicionais_permitidos = _get_adicionais_permitidos_no_produto(db, produto_id)
-    adicional_ids = list(adicionais_agrupados.keys())
-    adicionais_map = {
-        adicional.id: adicional
-        for adicional in db.scalars(select(Adicional).where(Adicional.id.in_(adicional_ids))).all()
-    }
+    catalogo = catalogo_service.obter_catalogo_com(db, adicional_ids=adicionais_agrupados)
+    produto_catalogo = catalogo.produtos.get(produto_id)
+    adicionais_permitidos = produto_catalogo.adicional_ids if produto_catalogo else frozenset()
+    adicionais_map = catalogo.adicionais
 
     for adicional_id, quantidade in adicionais_agrupados.items():
         if adicionais_permitidos and adicional_id not in adicionais_permitidos:
@@ -1249,8 +1621,8 @@ def _replace_adicionais(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Adicional '{adicional.nome}' está inativo.",
             )
-        preco = as_money(adicional.preco)
-        subtotal = as_money(preco * quantidade)
+        preco = adicional.preco
+        subtotal = preco * quantidade
         item.adicionais.append(
             ItemPedidoAdicional(
                 adicional_id=adicional.id,
@@ -1262,12 +1634,12 @@ def _replace_adicionais(
 
 
 def _recalculate_item_subtotal(item: ItemPedido) -> None:
-    base = as_money(item.preco_unitario * item.quantidade)
-    adicionais_total = as_money(
-        sum((as_money(ad.subtotal) for ad in item.adicionais), start=Decimal("0"))
+    # Precos e subtotais vem de colunas em centavos (Decimal de 2 casas exatas): a
+    # conta fecha sem quantize. Converter para int aqui custaria mais que a soma.
+    bruto = item.preco_unitario * item.quantidade + sum(
+        (ad.subtotal for ad in item.adicionais), start=ZERO
     )
-    bruto = as_money(base + adicionais_total)
-    desconto = as_money(item.desconto or Decimal("0"))
+    desconto = item.desconto or ZERO
     if desconto < 0:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -1279,18 +1651,13 @@ def _recalculate_item_subtotal(item: ItemPedido) -> None:
             detail="Desconto do item não pode ser maior que o valor bruto do item.",
         )
     item.desconto = desconto
-    item.subtotal = as_money(bruto - desconto)
+    item.subtotal = bruto - desconto
 
 
-def _recalculate_comanda_total(db: Session, pedido: Pedido) -> None:
-    db.flush()
-    total = db.scalar(
-        select(func.coalesce(func.sum(ItemPedido.subtotal), 0)).where(
-            ItemPedido.pedido_id == pedido.id
-        )
-    )
-    pedido.total = as_money(total or Decimal("0"))
-    db.flush()
+def _apply_total_delta(pedido: Pedido, delta: Decimal) -> None:
+    # O total e mantido por diferenca dentro da mesma transacao da escrita do item,
+    # sem refazer o SUM dos itens; `manutencao_service.verificar_totais` reconcilia.
+    pedido.total = (pedido.total or ZERO) + delta
 
 
 def _ensure_editable_order(pedido: Pedido) -> None:
@@ -1308,35 +1675,22 @@ def _status_controla_estoque(status_pedido: StatusPedido) -> bool:
     return status_pedido in STOCK_CONTROLLED_STATUSES
 
 
-def _decrement_stock_for_product(db: Session, produto_id: int, quantidade: int) -> bool:
-    produto = db.get(Produto, produto_id)
-    if not produto:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Produto {produto_id} nao encontrado.",
-        )
-    if not produto.controla_estoque:
-        return False
-    if produto.estoque_atual < quantidade:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=(
-                f"Estoque insuficiente para '{produto.nome}'. "
-                f"Disponivel: {produto.estoque_atual}, necessario: {quantidade}."
-            ),
-        )
-    produto.estoque_atual -= quantidade
-    return True
+def _decrement_stock_for_product(
+    db: Session,
+    produto_id: int,
+    quantidade: int,
+    pedido_id: int | None = None,
+) -> bool:
+    return bool(estoque_service.baixar(db, {produto_id: quantidade}, pedido_id=pedido_id))
 
 
-def _increment_stock_for_product(db: Session, produto_id: int, quantidade: int) -> bool:
-    produto = db.get(Produto, produto_id)
-    if not produto:
-        return False
-    if not produto.controla_estoque:
-        return False
-    produto.estoque_atual += quantidade
-    return True
+def _increment_stock_for_product(
+    db: Session,
+    produto_id: int,
+    quantidade: int,
+    pedido_id: int | None = None,
+) -> bool:
+    return bool(estoque_service.repor(db, {produto_id: quantidade}, pedido_id=pedido_id))
 
 
 def _adjust_stock_on_item_change(
@@ -1345,17 +1699,18 @@ def _adjust_stock_on_item_change(
     old_quantidade: int,
     new_produto_id: int,
     new_quantidade: int,
+    pedido_id: int | None = None,
 ) -> None:
-    if old_produto_id == new_produto_id:
-        delta = int(new_quantidade) - int(old_quantidade)
-        if delta > 0:
-            _decrement_stock_for_product(db, new_produto_id, delta)
-        elif delta < 0:
-            _increment_stock_for_product(db, new_produto_id, abs(delta))
-        return
+    saldo = {new_produto_id: int(new_quantidade)}
+    saldo[old_produto_id] = saldo.get(old_produto_id, 0) - int(old_quantidade)
+    estoque_service.movimentar(db, saldo, pedido_id=pedido_id)
+
 
-    _increment_stock_for_product(db, old_produto_id, int(old_quantidade))
-    _decrement_stock_for_product(db, new_produto_id, int(new_quantidade))
+def _quantidades_do_pedido(pedido: Pedido) -> dict[int, int]:
+    required: dict[int, int] = {}
+    for item in pedido.itens:
+        required[item.produto_id] = required.get(item.produto_id, 0) + item.quantidade
+    return required
 
 
 def _decrement_stock_for_order(db: Session, pedido: Pedido) -> None:
@@ -1364,67 +1719,23 @@ def _decrement_stock_for_order(db: Session, pedido: Pedido) -> None:
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Comanda sem itens nao pode ir para EM_PREPARO.",
         )
-    required: dict[int, int] = {}
-    for item in pedido.itens:
-        required[item.produto_id] = required.get(item.produto_id, 0) + item.quantidade
-
-    produtos = {
-        produto.id: produto
-        for produto in db.scalars(select(Produto).where(Produto.id.in_(required.keys()))).all()
-    }
-    updates: list[tuple[Produto, int]] = []
-    for produto_id, quantity in required.items():
-        produto = produtos.get(produto_id)
-        if not produto:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Produto {produto_id} nao encontrado.",
-            )
-        if not produto.controla_estoque:
-            continue
-        if produto.estoque_atual < quantity:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=(
-                    f"Estoque insuficiente para '{produto.nome}'. "
-                    f"Disponivel: {produto.estoque_atual}, necessario: {quantity}."
-                ),
-            )
-        updates.append((produto, quantity))
-    for produto, quantity in updates:
-        produto.estoque_atual -= quantity
-
+    estoque_service.baixar(db, _quantidades_do_pedido(pedido), pedido_id=pedido.id)
 
-def _increment_stock_for_order(db: Session, pedido: Pedido) -> None:
-    required: dict[int, int] = {}
-    for item in pedido.itens:
-        required[item.produto_id] = required.get(item.produto_id, 0) + item.quantidade
 
-    produtos = {
-        produto.id: produto
-        for produto in db.scalars(select(Produto).where(Produto.id.in_(required.keys()))).all()
-    }
-    for produto_id, quantity in required.items():
-        produto = produtos.get(produto_id)
-        if not produto:
-            continue
-        if not produto.controla_estoque:
-            continue
-        produto.estoque_atual += quantity
+def _apply_stock_balance(db: Session, saldo: dict[int, int], pedido_id: int | None = None) -> None:
+    # Saldo liquido por produto (positivo = consumo): valida tudo antes de aplicar.
+    estoque_service.movimentar(db, saldo, pedido_id=pedido_id)
 
 
-def _get_adicionais_permitidos_no_produto(db: Session, produto_id: int) -> set[int]:
-    return set(
-        db.scalars(
-            select(ProdutoAdicional.adicional_id).where(ProdutoAdicional.produto_id == produto_id)
-        ).all()
-    )
+def _increment_stock_for_order(db: Session, pedido: Pedido) -> None:
+    estoque_service.repor(db, _quantidades_do_pedido(pedido), pedido_id=pedido.id)
 
 
 def _release_comanda_codigo(
     db: Session,
     code: str | None,
     status_visual: str | None = None,
+    pedidos_desvinculados: Iterable[int] = (),
 ) -> None:
     if not code:
         return
@@ -1433,6 +1744,16 @@ def _release_comanda_codigo(
         comanda_code.em_uso = False
         if status_visual and status_visual in STATUS_VISUALS_VALIDOS:
             comanda_code.status_visual = status_visual
+        desvinculados = set(pedidos_desvinculados)
+        if comanda_code.pedido_atual_id in desvinculados:
+            # Volta para o ultimo pedido que continua vinculado ao codigo (mesma regra
+            # do reparo em manutencao_service.reconstruir_ponteiros_comanda).
+            comanda_code.pedido_atual_id = db.scalar(
+                select(func.max(Pedido.id)).where(
+                    Pedido.comanda_codigo == code,
+                    Pedido.id.not_in(desvinculados),
+                )
+            )
 
 
 def _total_itens_da_comanda(pedido: Pedido) -> int:
@@ -1461,8 +1782,8 @@ def _serialize_comanda(db: Session, pedido: Pedido) -> dict:
                 "adicional_id": ad.adicional_id,
                 "nome": ad.adicional.nome if ad.adicional else f"Adicional {ad.adicional_id}",
                 "quantidade": ad.quantidade,
-                "preco_unitario": as_money(ad.preco_unitario),
-                "subtotal": as_money(ad.subtotal),
+                "preco_unitario": ad.preco_unitario,
+                "subtotal": ad.subtotal,
             }
             for ad in item.adicionais
         ]
@@ -1474,9 +1795,9 @@ def _serialize_comanda(db: Session, pedido: Pedido) -> dict:
                 "produto_nome": item.produto.nome if item.produto else f"Produto {item.produto_id}",
                 "quantidade": item.quantidade,
                 "observacoes": item.observacoes,
-                "preco_unitario": as_money(item.preco_unitario),
-                "desconto": as_money(item.desconto),
-                "subtotal": as_money(item.subtotal),
+                "preco_unitario": item.preco_unitario,
+                "desconto": item.desconto,
+                "subtotal": item.subtotal,
                 "adicionais": adicionais,
             }
         )
@@ -1488,10 +1809,11 @@ def _serialize_comanda(db: Session, pedido: Pedido) -> dict:
         "status": pedido.status,
         "tipo_entrega": pedido.tipo_entrega,
         "observacoes": pedido.observacoes,
-        "total": as_money(pedido.total),
+        "total": pedido.total,
         "total_itens": total_itens,
         "complexidade": _classificar_complexidade(total_itens),
         "criado_em": pedido.criado_em,
+        "versao": pedido.versao,
         "itens": itens,
         "pagamento": pagamento,
     }
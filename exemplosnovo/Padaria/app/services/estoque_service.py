@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+from collections.abc import Mapping
+from typing import Any
+
+from fastapi import HTTPException, status
+from sqlalchemy import case, func, insert, literal, select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.models.movimento_estoque import MovimentoEstoque
+from app.models.produto import Produto
+
+MOTIVO_SALDO_INICIAL = "SALDO_INICIAL"
+MOTIVO_AJUSTE = "AJUSTE"
+MOTIVO_CONSUMO = "CONSUMO"
+MOTIVO_ESTORNO = "ESTORNO"
+
+
+def baixar(
+    db: Session,
+    quantidades: Mapping[int, int],
+    motivo: str = MOTIVO_CONSUMO,
+    pedido_id: int | None = None,
+) -> dict[int, int]:
+    # Um unico UPDATE condicional para o lote inteiro: o saldo e conferido pelo proprio
+    # banco (estoque_atual >= q), sem ler-checar-gravar em Python. Tudo ou nada.
+    pedidas = {int(produto_id): int(qtd) for produto_id, qtd in quantidades.items() if qtd > 0}
+    if not pedidas:
+        return {}
+    quantidade = case(pedidas, value=Produto.id)
+    baixados = set(
+        db.scalars(
+            update(Produto)
+            .where(
+                Produto.id.in_(pedidas.keys()),
+                Produto.controla_estoque.is_(True),
+                Produto.estoque_atual >= quantidade,
+            )
+            .values(estoque_atual=Produto.estoque_atual - quantidade)
+            .returning(Produto.id)
+            .execution_options(synchronize_session="fetch")
+        )
+    )
+    faltantes = [produto_id for produto_id in pedidas if produto_id not in baixados]
+    if faltantes:
+        erro = _erro_baixa(db, faltantes, pedidas)
+        if erro is not None:
+            # Desfaz o que ja baixou nesta chamada antes de recusar o lote.
+            _somar(db, {produto_id: pedidas[produto_id] for produto_id in baixados})
+            raise erro
+    aplicados = {produto_id: pedidas[produto_id] for produto_id in sorted(baixados)}
+    _registrar(db, aplicados, -1, motivo, pedido_id)
+    return aplicados
+
+
+def repor(
+    db: Session,
+    quantidades: Mapping[int, int],
+    motivo: str = MOTIVO_ESTORNO,
+    pedido_id: int | None = None,
+) -> dict[int, int]:
+    # Produto inexistente ou sem controle de estoque e ignorado, como antes.
+    pedidas = {int(produto_id): int(qtd) for produto_id, qtd in quantidades.items() if qtd > 0}
+    repostos = _somar(db, pedidas)
+    aplicados = {produto_id: pedidas[produto_id] for produto_id in sorted(repostos)}
+    _registrar(db, aplicados, 1, motivo, pedido_id)
+    return aplicados
+
+
+def movimentar(
+    db: Session,
+    saldo: Mapping[int, int],
+    motivo_baixa: str = MOTIVO_CONSUMO,
+    motivo_reposicao: str = MOTIVO_ESTORNO,
+    pedido_id: int | None = None,
+) -> None:
+    # Saldo liquido por produto (positivo = consumo): baixa valida o lote antes de repor.
+    baixar(db, {pid: qtd for pid, qtd in saldo.items() if qtd > 0}, motivo_baixa, pedido_id)
+    repor(db, {pid: -qtd for pid, qtd in saldo.items() if qtd < 0}, motivo_reposicao, pedido_id)
+
+
+def ajustar(db: Session, produto_id: int, delta: int, motivo: str = MOTIVO_AJUSTE) -> bool:
+    # Ajuste manual vale mesmo para produto sem controle de estoque; nunca deixa negativo.
+    alterado = db.execute(
+        update(Produto)
+        .where(Produto.id == produto_id, Produto.estoque_atual + delta >= 0)
+        .values(estoque_atual=Produto.estoque_atual + delta)
+        .execution_options(synchronize_session="fetch")
+    ).rowcount
+    if alterado:
+        _registrar(db, {produto_id: delta}, 1, motivo, None)
+    return bool(alterado)
+
+
+def definir(db: Session, produto_id: int, anterior: int, novo: int) -> bool:
+    # Compare-and-set: so grava se ninguem mexeu no estoque desde a leitura de `anterior`.
+    if anterior == novo:
+        return True
+    alterado = db.execute(
+        update(Produto)
+        .where(Produto.id == produto_id, Produto.estoque_atual == anterior)
+        .values(estoque_atual=novo)
+        .execution_options(synchronize_session="fetch")
+    ).rowcount
+    if alterado:
+        _registrar(db, {produto_id: novo - anterior}, 1, MOTIVO_AJUSTE, None)
+    return bool(alterado)
+
+
+def registrar_saldo_inicial(db: Session, produto_id: int, quantidade: int) -> None:
+    if quantidade:
+        _registrar(db, {produto_id: quantidade}, 1, MOTIVO_SALDO_INICIAL, None)
+
+
+def inicializar_movimentos(conn: Connection) -> None:
+    # Bancos anteriores ao livro-razao: abre cada produto com o saldo atual.
+    if conn.scalar(select(MovimentoEstoque.id).limit(1)) is not None:
+        return
+    conn.execute(
+        insert(MovimentoEstoque).from_select(
+            ["produto_id", "delta", "motivo"],
+            select(Produto.id, Produto.estoque_atual, literal(MOTIVO_SALDO_INICIAL)).where(
+                Produto.estoque_atual != 0
+            ),
+        )
+    )
+
+
+def saldos_do_razao(db: Session) -> dict[int, int]:
+    return {
+        int(produto_id): int(total)
+        for produto_id, total in db.execute(
+            select(MovimentoEstoque.produto_id, func.sum(MovimentoEstoque.delta)).group_by(
+                MovimentoEstoque.produto_id
+            )
+        )
+    }
+
+
+def listar_movimentos(db: Session, produto_id: int, limite: int = 100) -> list[MovimentoEstoque]:
+    return list(
+        db.scalars(
+            select(MovimentoEstoque)
+            .where(MovimentoEstoque.produto_id == produto_id)
+            .order_by(MovimentoEstoque.id.desc())
+            .limit(limite)
+        ).all()
+    )
+
+
+def _somar(db: Session, quantidades: Mapping[int, int]) -> set[int]:
+    if not quantidades:
+        return set()
+    quantidade = case(dict(quantidades), value=Produto.id)
+    return set(
+        db.scalars(
+            update(Produto)
+            .where(Produto.id.in_(quantidades.keys()), Produto.controla_estoque.is_(True))
+            .values(estoque_atual=Produto.estoque_atual + quantidade)
+            .returning(Produto.id)
+            .execution_options(synchronize_session="fetch")
+        )
+    )
+
+
+def _erro_baixa(
+    db: Session,
+    faltantes: list[int],
+    pedidas: Mapping[int, int],
+) -> HTTPException | None:
+    linhas = {
+        row.id: row
+        for row in db.execute(
+            select(Produto.id, Produto.nome, Produto.estoque_atual, Produto.controla_estoque).where(
+                Produto.id.in_(faltantes)
+            )
+        )
+    }
+    for produto_id in faltantes:
+        row = linhas.get(produto_id)
+        if row is None:
+            return HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Produto {produto_id} nao encontrado.",
+            )
+        if row.controla_estoque:
+            return HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=(
+                    f"Estoque insuficiente para '{row.nome}'. "
+                    f"Disponivel: {row.estoque_atual}, necessario: {pedidas[produto_id]}."
+                ),
+            )
+    return None
+
+
+def _registrar(
+    db: Session,
+    quantidades: Mapping[int, int],
+    sinal: int,
+    motivo: str,
+    pedido_id: int | None,
+) -> None:
+    linhas: list[dict[str, Any]] = [
+        {"produto_id": produto_id, "pedido_id": pedido_id, "delta": sinal * qtd, "motivo": motivo}
+        for produto_id, qtd in quantidades.items()
+        if qtd
+    ]
+    if linhas:
+        db.execute(insert(MovimentoEstoque), linhas)
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from collections import deque
+from collections.abc import AsyncIterator, Awaitable, Callable
+from threading import Lock
+from typing import Any
+
+from app.db.escritor import adiar_para_commit
+
+EVENTOS_BUFFER_MAX = 500
+EVENTOS_FILA_MAX = 1000
+SSE_HEARTBEAT_SEGUNDOS = 15.0
+SSE_RETRY_MS = 3000
+
+_lock = Lock()
+_ultimo_id = 0
+_buffer: deque[dict[str, Any]] = deque(maxlen=EVENTOS_BUFFER_MAX)
+_assinantes: set[tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = set()
+
+
+def publicar(tipo: str, **dados: Any) -> dict[str, Any] | None:
+    # Chamado pelos serviços (threads do threadpool) logo após o commit.
+    global _ultimo_id
+    if adiar_para_commit(lambda: publicar(tipo, **dados)):
+        # No escritor dedicado o commit real é o do lote; só então o evento sai.
+        return None
+    with _lock:
+        _ultimo_id += 1
+        evento = {"id": _ultimo_id, "tipo": tipo, **dados}
+        _buffer.append(evento)
+        assinantes = list(_assinantes)
+    for loop, fila in assinantes:
+        try:
+            loop.call_soon_threadsafe(_entregar, fila, evento)
+        except RuntimeError:
+            # Loop do assinante já foi encerrado.
+            cancelar((loop, fila))
+    return evento
+
+
+def ultimo_id() -> int:
+    with _lock:
+        return _ultimo_id
+
+
+def assinar() -> tuple[asyncio.AbstractEventLoop, asyncio.Queue]:
+    assinatura = (asyncio.get_running_loop(), asyncio.Queue(maxsize=EVENTOS_FILA_MAX))
+    with _lock:
+        _assinantes.add(assinatura)
+    return assinatura
+
+
+def cancelar(assinatura: tuple[asyncio.AbstractEventLoop, asyncio.Queue]) -> None:
+    with _lock:
+        _assinantes.discard(assinatura)
+
+
+def total_assinantes() -> int:
+    with _lock:
+        return len(_assinantes)
+
+
+def eventos_desde(evento_id: int | None) -> list[dict[str, Any]]:
+    if evento_id is None:
+        return []
+    with _lock:
+        if evento_id >= _ultimo_id:
+            return []
+        primeiro_id = _buffer[0]["id"] if _buffer else _ultimo_id + 1
+        if evento_id < primeiro_id - 1:
+            # Cliente ficou fora por mais eventos do que o buffer guarda.
+            return [{"id": _ultimo_id, "tipo": "resync", "motivo": "buffer"}]
+        return [evento for evento in _buffer if evento["id"] > evento_id]
+
+
+async def proximo(
+    assinatura: tuple[asyncio.AbstractEventLoop, asyncio.Queue],
+    timeout: float,
+) -> dict[str, Any] | None:
+    try:
+        return await asyncio.wait_for(assinatura[1].get(), timeout=timeout)
+    except asyncio.TimeoutError:
+        return None
+
+
+def formatar_sse(evento: dict[str, Any]) -> str:
+    dados = {key: value for key, value in evento.items() if key != "tipo"}
+    payload = json.dumps(dados, default=str, ensure_ascii=False, separators=(",", ":"))
+    return f"id: {evento['id']}\nevent: {evento['tipo']}\ndata: {payload}\n\n"
+
+
+async def stream_sse(
+    desconectado: Callable[[], Awaitable[bool]],
+    last_event_id: int | None = None,
+    heartbeat: float = SSE_HEARTBEAT_SEGUNDOS,
+) -> AsyncIterator[str]:
+    assinatura = assinar()
+    try:
+        enviado = last_event_id or 0
+        yield f"retry: {SSE_RETRY_MS}\n\n"
+        for evento in eventos_desde(last_event_id):
+            enviado = max(enviado, evento["id"])
+            yield formatar_sse(evento)
+        while not await desconectado():
+            evento = await proximo(assinatura, timeout=heartbeat)
+            if evento is None:
+                yield ": ping\n\n"
+                continue
+            if evento["id"] <= enviado and evento["tipo"] != "resync":
+                # Ja entregue pelo replay do Last-Event-ID.
+                continue
+            enviado = max(enviado, evento["id"])
+            yield formatar_sse(evento)
+    finally:
+        cancelar(assinatura)
+
+
+def _entregar(fila: asyncio.Queue, evento: dict[str, Any]) -> None:
+    try:
+        fila.put_nowait(evento)
+    except asyncio.QueueFull:
+        # Cliente lento: descarta o acumulado e pede recarga completa.
+        while not fila.empty():
+            fila.get_nowait()
+        fila.put_nowait({"id": evento["id"], "tipo": "resync", "motivo": "fila"})
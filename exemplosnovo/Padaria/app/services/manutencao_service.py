@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import Any
+
+from sqlalchemy import bindparam, delete, func, select, text, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.models.comanda_codigo import ComandaCodigo
+from app.models.enums import StatusPedido
+from app.models.item_adicional import ItemPedidoAdicional
+from app.models.item_pedido import ItemPedido
+from app.models.pedido import Pedido
+from app.models.pedido_cozinha_snapshot import PedidoCozinhaSnapshot
+from app.models.produto import Produto
+from app.services import estoque_service, vendas_diarias_service
+from app.services.utils import de_centavos, em_centavos
+
+
+def verificar_totais(
+    db: Session,
+    corrigir: bool = False,
+    limite_amostra: int = 20,
+) -> dict[str, Any]:
+    # Recalcula em lote subtotal de itens e total de pedidos e compara com o que
+    # foi mantido incrementalmente pelas escritas de item.
+    # Tudo em centavos inteiros: comparacao exata, sem quantize por linha.
+    adicionais_por_item = {
+        int(item_id): int(total)
+        for item_id, total in db.execute(
+            select(
+                ItemPedidoAdicional.item_pedido_id,
+                em_centavos(func.coalesce(func.sum(ItemPedidoAdicional.subtotal), 0)),
+            ).group_by(ItemPedidoAdicional.item_pedido_id)
+        )
+    }
+
+    itens_divergentes: list[dict[str, Any]] = []
+    total_esperado_por_pedido: dict[int, int] = {}
+    itens_verificados = 0
+    for item_id, pedido_id, quantidade, preco_unitario, desconto, subtotal in db.execute(
+        select(
+            ItemPedido.id,
+            ItemPedido.pedido_id,
+            ItemPedido.quantidade,
+            em_centavos(ItemPedido.preco_unitario),
+            em_centavos(ItemPedido.desconto),
+            em_centavos(ItemPedido.subtotal),
+        )
+    ):
+        itens_verificados += 1
+        esperado = preco_unitario * quantidade + adicionais_por_item.get(item_id, 0) - (desconto or 0)
+        if subtotal != esperado:
+            itens_divergentes.append(
+                {
+                    "id": item_id,
+                    "pedido_id": pedido_id,
+                    "atual": de_centavos(subtotal),
+                    "esperado": de_centavos(esperado),
+                }
+            )
+        total_esperado_por_pedido[pedido_id] = total_esperado_por_pedido.get(pedido_id, 0) + esperado
+
+    pedidos_divergentes: list[dict[str, Any]] = []
+    pedidos_verificados = 0
+    for pedido_id, total in db.execute(select(Pedido.id, em_centavos(Pedido.total))):
+        pedidos_verificados += 1
+        esperado = total_esperado_por_pedido.get(pedido_id, 0)
+        if (total or 0) != esperado:
+            pedidos_divergentes.append(
+                {"id": pedido_id, "atual": de_centavos(total or 0), "esperado": de_centavos(esperado)}
+            )
+
+    if corrigir and (itens_divergentes or pedidos_divergentes):
+        if itens_divergentes:
+            db.execute(
+                update(ItemPedido),
+                [{"id": row["id"], "subtotal": row["esperado"]} for row in itens_divergentes],
+            )
+        if pedidos_divergentes:
+            db.execute(
+                update(Pedido),
+                [{"id": row["id"], "total": row["esperado"]} for row in pedidos_divergentes],
+            )
+            # update() em lote nao passa pelo listener do rollup: reconstroi os dias afetados.
+            inicio, fim = db.execute(
+                select(func.min(Pedido.criado_em), func.max(Pedido.criado_em)).where(
+                    Pedido.id.in_([row["id"] for row in pedidos_divergentes])
+                )
+            ).one()
+            vendas_diarias_service.reconstruir_vendas_diarias(db, inicio.date(), fim.date())
+        db.commit()
+        from app.services import eventos_service
+        from app.services.comanda_service import invalidate_read_caches
+
+        invalidate_read_caches()
+        eventos_service.publicar("resync", motivo="verificar_totais")
+
+    return {
+        "itens_verificados": itens_verificados,
+        "pedidos_verificados": pedidos_verificados,
+        "itens_divergentes": len(itens_divergentes),
+        "pedidos_divergentes": len(pedidos_divergentes),
+        "corrigido": bool(corrigir and (itens_divergentes or pedidos_divergentes)),
+        "amostra_itens": itens_divergentes[:limite_amostra],
+        "amostra_pedidos": pedidos_divergentes[:limite_amostra],
+    }
+
+
+def auditar_estoque(db: Session, corrigir: bool = False) -> dict[str, Any]:
+    # estoque_atual deve ser a soma do livro-razao; com corrigir=True o razao prevalece.
+    saldos = estoque_service.saldos_do_razao(db)
+    divergentes = [
+        {
+            "produto_id": produto_id,
+            "estoque_atual": int(estoque_atual),
+            "saldo_razao": saldos.get(produto_id, 0),
+        }
+        for produto_id, estoque_atual in db.execute(select(Produto.id, Produto.estoque_atual))
+        if int(estoque_atual) != saldos.get(produto_id, 0)
+    ]
+    if corrigir and divergentes:
+        db.connection().execute(
+            update(Produto)
+            .where(Produto.id == bindparam("p_id"))
+            .values(estoque_atual=bindparam("saldo")),
+            [{"p_id": row["produto_id"], "saldo": row["saldo_razao"]} for row in divergentes],
+        )
+        db.commit()
+        from app.services import catalogo_service
+
+        catalogo_service.invalidar_catalogo()
+    return {
+        "produtos_divergentes": len(divergentes),
+        "corrigido": bool(corrigir and divergentes),
+        "divergencias": divergentes,
+    }
+
+
+def reparar_ponteiros_comanda(db: Session) -> dict[str, Any]:
+    corrigidos = reconstruir_ponteiros_comanda(db.connection())
+    db.commit()
+    if corrigidos:
+        from app.services import eventos_service
+        from app.services.comanda_service import invalidate_read_caches
+
+        invalidate_read_caches()
+        eventos_service.publicar("resync", motivo="ponteiros_comanda")
+    return {"ponteiros_corrigidos": corrigidos}
+
+
+def reconstruir_ponteiros_comanda(conn: Connection) -> int:
+    # Refaz pedido_atual_id do zero: ultimo pedido vinculado ao codigo, ou o ultimo
+    # pedido no mesmo status quando o codigo esta em aberto/preparo/pronto.
+    ultimo_por_codigo = {
+        codigo: pedido_id
+        for codigo, pedido_id in conn.execute(
+            select(Pedido.comanda_codigo, func.max(Pedido.id))
+            .where(Pedido.comanda_codigo.is_not(None))
+            .group_by(Pedido.comanda_codigo)
+        )
+    }
+    status_ativos = [StatusPedido.ABERTO, StatusPedido.EM_PREPARO, StatusPedido.PRONTO]
+    ultimo_por_codigo_status = {
+        (codigo, status.value): pedido_id
+        for codigo, status, pedido_id in conn.execute(
+            select(Pedido.comanda_codigo, Pedido.status, func.max(Pedido.id))
+            .where(Pedido.comanda_codigo.is_not(None), Pedido.status.in_(status_ativos))
+            .group_by(Pedido.comanda_codigo, Pedido.status)
+        )
+    }
+    status_por_pedido = {
+        pedido_id: status.value
+        for pedido_id, status in conn.execute(
+            select(Pedido.id, Pedido.status).where(Pedido.id.in_(list(ultimo_por_codigo.values())))
+        )
+    }
+    ativos = {status.value for status in status_ativos}
+
+    alteracoes = []
+    for codigo_id, codigo, status_visual, atual in conn.execute(
+        select(
+            ComandaCodigo.id,
+            ComandaCodigo.codigo,
+            ComandaCodigo.status_visual,
+            ComandaCodigo.pedido_atual_id,
+        )
+    ):
+        esperado = ultimo_por_codigo.get(codigo)
+        if status_visual in ativos and status_por_pedido.get(esperado) != status_visual:
+            esperado = ultimo_por_codigo_status.get((codigo, status_visual))
+        if esperado != atual:
+            alteracoes.append({"codigo_id": codigo_id, "pedido_id": esperado})
+    if alteracoes:
+        conn.execute(
+            update(ComandaCodigo)
+            .where(ComandaCodigo.id == bindparam("codigo_id"))
+            .values(pedido_atual_id=bindparam("pedido_id")),
+            alteracoes,
+        )
+    return len(alteracoes)
+
+
+def expurgar_snapshots_cozinha(db: Session, dias: int) -> dict[str, Any]:
+    # Mantem sempre o ultimo snapshot de cada pedido: e a base do diff na reimpressao.
+    limite = datetime.now() - timedelta(days=dias)
+    ultimos = select(func.max(PedidoCozinhaSnapshot.id)).group_by(PedidoCozinhaSnapshot.pedido_id)
+    removidos = db.execute(
+        delete(PedidoCozinhaSnapshot).where(
+            PedidoCozinhaSnapshot.criado_em < limite,
+            PedidoCozinhaSnapshot.id.not_in(ultimos),
+        )
+    ).rowcount
+    db.commit()
+    return {"snapshots_removidos": int(removidos or 0), "limite": limite}
+
+
+def checkpoint_wal(db: Session) -> dict[str, Any]:
+    if db.get_bind().dialect.name != "sqlite":
+        return {"executado": False}
+    ocupado, paginas_log, paginas_copiadas = db.execute(
+        text("PRAGMA wal_checkpoint(TRUNCATE)")
+    ).one()
+    return {
+        "executado": True,
+        "ocupado": bool(ocupado),
+        "paginas_log": paginas_log,
+        "paginas_copiadas": paginas_copiadas,
+    }
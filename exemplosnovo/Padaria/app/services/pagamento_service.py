@@ -4,7 +4,7 @@ from decimal import Decimal
 from uuid import uuid4
 
 from fastapi import HTTPException, status
-from sqlalchemy import func, select
+from sqlalchemy import Row, func, select
 from sqlalchemy.orm import Session
 
 from app.models.enums import MetodoPagamento, StatusPagamento
@@ -15,7 +15,8 @@ from app.schemas.pagamento import (
     PagamentoMaquininhaConfirmar,
     PagamentoMaquininhaIniciar,
 )
-from app.services.utils import as_money
+from app.services import eventos_service, paginacao
+from app.services.utils import ZERO, as_money, de_centavos, em_centavos, para_centavos
 
 
 def list_pagamentos(
@@ -23,12 +24,28 @@ def list_pagamentos(
     pedido_id: int | None,
     offset: int = 0,
     limit: int = 500,
-) -> list[Pagamento]:
-    stmt = select(Pagamento)
+    cursor: str | None = None,
+) -> list[Row]:
+    # Linhas com as colunas do PagamentoOut (validado por atributo), sem entidades.
+    stmt = select(
+        Pagamento.id,
+        Pagamento.pedido_id,
+        Pagamento.metodo,
+        Pagamento.status,
+        Pagamento.valor,
+        Pagamento.referencia_externa,
+        Pagamento.maquininha_id,
+        Pagamento.criado_em,
+    )
     if pedido_id is not None:
         stmt = stmt.where(Pagamento.pedido_id == pedido_id)
-    stmt = stmt.order_by(Pagamento.id.desc()).offset(offset).limit(limit)
-    return list(db.scalars(stmt).all())
+    if cursor:
+        (ultimo_id,) = paginacao.decodificar_cursor(cursor, [Pagamento.id])
+        stmt = stmt.where(Pagamento.id < ultimo_id)
+    else:
+        stmt = stmt.offset(offset)
+    stmt = stmt.order_by(Pagamento.id.desc()).limit(limit)
+    return list(db.execute(stmt).all())
 
 
 def create_pagamento_manual(db: Session, payload: PagamentoCreate) -> Pagamento:
@@ -45,7 +62,8 @@ def create_pagamento_manual(db: Session, payload: PagamentoCreate) -> Pagamento:
     db.add(pagamento)
     db.commit()
     db.refresh(pagamento)
-    _invalidate_comanda_read_caches()
+    _invalidate_comanda_read_caches(pagamento.pedido_id)
+    _publicar_pagamento(pagamento)
     return pagamento
 
 
@@ -74,7 +92,8 @@ def iniciar_pagamento_maquininha(
     db.add(pagamento)
     db.commit()
     db.refresh(pagamento)
-    _invalidate_comanda_read_caches()
+    _invalidate_comanda_read_caches(pagamento.pedido_id)
+    _publicar_pagamento(pagamento)
     return pagamento
 
 
@@ -92,14 +111,15 @@ def confirmar_pagamento_maquininha(
 
     if payload.aprovado:
         pedido = _get_pedido_or_404(db, pagamento.pedido_id)
-        _validate_valor_exato_no_saldo(db, pedido, as_money(pagamento.valor))
+        _validate_valor_exato_no_saldo(db, pedido, pagamento.valor)
 
     pagamento.status = StatusPagamento.APROVADO if payload.aprovado else StatusPagamento.RECUSADO
     if payload.referencia_externa:
         pagamento.referencia_externa = payload.referencia_externa
     db.commit()
     db.refresh(pagamento)
-    _invalidate_comanda_read_caches()
+    _invalidate_comanda_read_caches(pagamento.pedido_id)
+    _publicar_pagamento(pagamento)
     return pagamento
 
 
@@ -118,34 +138,23 @@ def callback_maquininha_por_referencia(
 
 
 def resumo_pagamentos_pedido(db: Session, pedido_id: int, total_comanda: Decimal) -> dict:
-    total_pago = db.scalar(
-        select(func.coalesce(func.sum(Pagamento.valor), 0)).where(
-            Pagamento.pedido_id == pedido_id,
-            Pagamento.status == StatusPagamento.APROVADO,
-        )
-    )
-    total_pago_money = as_money(total_pago or Decimal("0"))
-    total_comanda_money = as_money(total_comanda)
-    saldo = _non_negative_money(total_comanda_money - total_pago_money)
-    return {
-        "total_comanda": total_comanda_money,
-        "total_pago": total_pago_money,
-        "saldo_pendente": saldo,
-    }
+    return _resumo(total_comanda, de_centavos(_total_pago_centavos(db, pedido_id)))
 
 
 def resumo_pagamentos_lista(pagamentos: list[Pagamento], total_comanda: Decimal) -> dict:
+    # Valores das colunas em centavos ja tem 2 casas exatas: somar dispensa quantize.
     total_pago = sum(
-        (as_money(pagamento.valor) for pagamento in pagamentos if pagamento.status == StatusPagamento.APROVADO),
-        start=Decimal("0"),
+        (pagamento.valor for pagamento in pagamentos if pagamento.status == StatusPagamento.APROVADO),
+        start=ZERO,
     )
-    total_pago_money = as_money(total_pago)
-    total_comanda_money = as_money(total_comanda)
-    saldo = _non_negative_money(total_comanda_money - total_pago_money)
+    return _resumo(total_comanda, total_pago)
+
+
+def _resumo(total_comanda: Decimal, total_pago: Decimal) -> dict:
     return {
-        "total_comanda": total_comanda_money,
-        "total_pago": total_pago_money,
-        "saldo_pendente": saldo,
+        "total_comanda": total_comanda,
+        "total_pago": total_pago,
+        "saldo_pendente": max(total_comanda - total_pago, ZERO),
     }
 
 
@@ -170,42 +179,48 @@ def _get_pedido_or_404(db: Session, pedido_id: int) -> Pedido:
 
 
 def _validate_valor_exato_no_saldo(db: Session, pedido: Pedido, valor_pagamento: Decimal) -> None:
-    saldo_pendente = _saldo_pendente_pedido(db, pedido.id, pedido.total)
-    if saldo_pendente <= Decimal("0"):
+    saldo_pendente = max(para_centavos(pedido.total) - _total_pago_centavos(db, pedido.id), 0)
+    if saldo_pendente <= 0:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Comanda já quitada. Não é permitido registrar novo pagamento.",
         )
 
-    valor_money = as_money(valor_pagamento)
-    if valor_money != saldo_pendente:
+    valor = para_centavos(valor_pagamento)
+    if valor != saldo_pendente:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=(
                 "Pagamento deve ser exatamente igual ao saldo pendente. "
-                f"Saldo: R$ {saldo_pendente:.2f} | informado: R$ {valor_money:.2f}."
+                f"Saldo: R$ {de_centavos(saldo_pendente)} | informado: R$ {de_centavos(valor)}."
             ),
         )
 
 
-def _saldo_pendente_pedido(db: Session, pedido_id: int, total_comanda: Decimal) -> Decimal:
+def _total_pago_centavos(db: Session, pedido_id: int) -> int:
     total_pago = db.scalar(
-        select(func.coalesce(func.sum(Pagamento.valor), 0)).where(
+        select(em_centavos(func.coalesce(func.sum(Pagamento.valor), 0))).where(
             Pagamento.pedido_id == pedido_id,
             Pagamento.status == StatusPagamento.APROVADO,
         )
     )
-    total_pago_money = as_money(total_pago or Decimal("0"))
-    total_comanda_money = as_money(total_comanda)
-    return _non_negative_money(total_comanda_money - total_pago_money)
+    return int(total_pago or 0)
 
 
-def _non_negative_money(value: Decimal) -> Decimal:
-    return as_money(value if value > Decimal("0") else Decimal("0"))
+def _publicar_pagamento(pagamento: Pagamento) -> None:
+    eventos_service.publicar(
+        "pagamento",
+        pedido_id=pagamento.pedido_id,
+        pagamento_id=pagamento.id,
+        metodo=pagamento.metodo.value,
+        status=pagamento.status.value,
+        valor=pagamento.valor,
+    )
 
 
-def _invalidate_comanda_read_caches() -> None:
+def _invalidate_comanda_read_caches(pedido_id: int) -> None:
     # Import local para evitar ciclo de import entre serviços.
-    from app.services.comanda_service import invalidate_read_caches
+    from app.services.comanda_service import invalidate_comanda_cache
 
-    invalidate_read_caches()
+    # Pagamento so altera o resumo financeiro do detalhe da comanda.
+    invalidate_comanda_cache(pedido_ids=[pedido_id], listas=False)
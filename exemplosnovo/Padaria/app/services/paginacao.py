@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+from collections.abc import Mapping, Sequence
+from datetime import datetime
+from decimal import Decimal
+from enum import Enum
+from typing import Any
+
+from fastapi import HTTPException, status
+from sqlalchemy import and_, or_
+from sqlalchemy.sql.elements import ColumnElement
+
+
+def codificar_cursor(*valores: Any) -> str:
+    # Opaco para o cliente: base64url de [valor da ordenacao..., id].
+    bruto = json.dumps([_serializavel(valor) for valor in valores], separators=(",", ":"))
+    return base64.urlsafe_b64encode(bruto.encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor: str, colunas: Sequence[ColumnElement]) -> list[Any]:
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        valores = json.loads(bruto)
+        if not isinstance(valores, list) or len(valores) != len(colunas):
+            raise ValueError(cursor)
+        return [_converter(coluna, valor) for coluna, valor in zip(colunas, valores)]
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError) as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor invalido.",
+        ) from exc
+
+
+def filtro_apos(
+    coluna: ColumnElement,
+    descendente: bool,
+    valor: Any,
+    id_coluna: ColumnElement,
+    ultimo_id: int,
+) -> ColumnElement[bool]:
+    # Linhas depois de (valor, ultimo_id) em ORDER BY coluna [ASC|DESC], id DESC.
+    # SQLite ordena NULL como menor valor: primeiro no ASC, ultimo no DESC.
+    if coluna is id_coluna:
+        return id_coluna > ultimo_id if not descendente else id_coluna < ultimo_id
+    empate = and_(coluna == valor, id_coluna < ultimo_id)
+    if valor is None:
+        empate_nulo = and_(coluna.is_(None), id_coluna < ultimo_id)
+        return empate_nulo if descendente else or_(empate_nulo, coluna.is_not(None))
+    if descendente:
+        return or_(coluna < valor, coluna.is_(None), empate)
+    return or_(coluna > valor, empate)
+
+
+def proximo_cursor(itens: Sequence[Any], limit: int, *campos: str) -> str | None:
+    # Pagina cheia: pode haver mais. A ultima linha vira o ponto de partida.
+    if not itens or len(itens) < limit:
+        return None
+    ultimo = itens[-1]
+    if isinstance(ultimo, Mapping):
+        return codificar_cursor(*(ultimo[campo] for campo in campos))
+    return codificar_cursor(*(getattr(ultimo, campo) for campo in campos))
+
+
+def _serializavel(valor: Any) -> Any:
+    if isinstance(valor, Enum):
+        return valor.value
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return str(valor)
+    return valor
+
+
+def _converter(coluna: ColumnElement, valor: Any) -> Any:
+    if valor is None:
+        return None
+    tipo = coluna.type.python_type
+    if tipo is datetime:
+        return datetime.fromisoformat(valor)
+    return tipo(valor)
@@ -17,6 +17,7 @@ from app.schemas.pedido import (
     ItemPedidoUpdate,
     PedidoCreate,
 )
+from app.services import estoque_service
 from app.services.utils import as_money
 
 STATUS_TRANSITIONS: dict[StatusPedido, set[StatusPedido]] = {
@@ -296,34 +297,5 @@ def _decrement_stock_for_order(db: Session, pedido: Pedido) -> None:
         required_per_product[item.produto_id] = (
             required_per_product.get(item.produto_id, 0) + item.quantidade
         )
-
-    produtos = {
-        produto.id: produto
-        for produto in db.scalars(
-            select(Produto).where(Produto.id.in_(required_per_product.keys()))
-        ).all()
-    }
-    updates: list[tuple[Produto, int]] = []
-    for produto_id, required_qty in required_per_product.items():
-        produto = produtos.get(produto_id)
-        if not produto:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Produto {produto_id} não encontrado.",
-            )
-        if not produto.controla_estoque:
-            continue
-        if produto.estoque_atual < required_qty:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=(
-                    f"Estoque insuficiente para '{produto.nome}'. "
-                    f"Disponível: {produto.estoque_atual}, "
-                    f"necessário: {required_qty}."
-                ),
-            )
-        updates.append((produto, required_qty))
-
-    for produto, required_qty in updates:
-        produto.estoque_atual -= required_qty
+    estoque_service.baixar(db, required_per_product, pedido_id=pedido.id)
 
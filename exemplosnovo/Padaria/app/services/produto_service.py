@@ -1,9 +1,12 @@
 from __future__ import annotations
 
+from collections import OrderedDict
 from decimal import Decimal
+from threading import Lock
+from typing import Any
 
 from fastapi import HTTPException, status
-from sqlalchemy import func, select
+from sqlalchemy import Row, func, select
 from sqlalchemy.orm import Session, selectinload
 
 from app.models.adicional import Adicional
@@ -12,6 +15,7 @@ from app.models.pedido import Pedido
 from app.models.produto import Produto
 from app.models.produto_adicional import ProdutoAdicional
 from app.schemas.produto import ProdutoCreate, ProdutoUpdate
+from app.services import busca_service, catalogo_service, estoque_service, eventos_service, paginacao
 from app.services.utils import as_money
 
 
@@ -22,8 +26,10 @@ def create_produto(db: Session, payload: ProdutoCreate) -> Produto:
     db.add(produto)
     db.flush()
     _set_produto_adicionais(db, produto, adicional_ids)
+    estoque_service.registrar_saldo_inicial(db, produto.id, produto.estoque_atual)
     db.commit()
     db.refresh(produto)
+    catalogo_service.invalidar_catalogo()
     return produto
 
 
@@ -33,23 +39,109 @@ def list_produtos(
     page_size: int,
     ativo: bool | None,
     q: str | None,
-) -> tuple[list[Produto], int]:
-    stmt = select(Produto).options(selectinload(Produto.adicionais_links))
+    cursor: str | None = None,
+    incluir_total: bool = True,
+) -> tuple[list[dict[str, Any]], int | None]:
+    filtros = []
     if ativo is not None:
-        stmt = stmt.where(Produto.ativo.is_(ativo))
+        filtros.append(Produto.ativo.is_(ativo))
     if q:
-        stmt = stmt.where(Produto.nome.ilike(f"%{q.strip()}%"))
-
-    count_stmt = select(func.count()).select_from(stmt.subquery())
-    total = int(db.scalar(count_stmt) or 0)
-
-    items_stmt = (
-        stmt.order_by(Produto.id.desc())
-        .offset((page - 1) * page_size)
-        .limit(page_size)
-    )
-    produtos = list(db.scalars(items_stmt).all())
-    return produtos, total
+        filtros.append(busca_service.filtro_produtos(db, q))
+
+    total = _total_produtos(db, filtros, ativo, q) if incluir_total else None
+
+    # Colunas do ProdutoOut + ids de adicionais numa consulta agrupada, sem
+    # carregar Produto/ProdutoAdicional no identity map.
+    stmt = select(*_COLUNAS_PRODUTO_OUT).where(*filtros).order_by(Produto.id.desc())
+    if cursor:
+        # Keyset: continua depois do ultimo id visto, sem OFFSET.
+        (ultimo_id,) = paginacao.decodificar_cursor(cursor, [Produto.id])
+        stmt = stmt.where(Produto.id < ultimo_id)
+    else:
+        stmt = stmt.offset((page - 1) * page_size)
+    rows = db.execute(stmt.limit(page_size)).all()
+    return _com_adicionais(db, rows), total
+
+
+def buscar_produtos(db: Session, q: str, ativo: bool | None, limite: int) -> list[dict[str, Any]]:
+    # Busca da caixa/autocomplete: mais relevantes primeiro. Sem indice FTS cai
+    # no ilike, com nomes que comecam pelo termo na frente.
+    stmt = select(*_COLUNAS_PRODUTO_OUT)
+    if ativo is not None:
+        stmt = stmt.where(Produto.ativo.is_(ativo))
+    ranking = busca_service.relevancia_produtos(db, q)
+    if ranking is not None:
+        stmt = stmt.join(ranking, ranking.c.produto_id == Produto.id).order_by(
+            ranking.c.relevancia, Produto.id.desc()
+        )
+    else:
+        termo = q.strip()
+        stmt = stmt.where(Produto.nome.ilike(f"%{termo}%")).order_by(
+            Produto.nome.ilike(f"{termo}%").desc(), Produto.nome, Produto.id.desc()
+        )
+    rows = db.execute(stmt.limit(limite)).all()
+    return _com_adicionais(db, rows)
+
+
+_COLUNAS_PRODUTO_OUT = (
+    Produto.id,
+    Produto.nome,
+    Produto.categoria,
+    Produto.descricao,
+    Produto.imagem_url,
+    Produto.preco,
+    Produto.ativo,
+    Produto.estoque_atual,
+    Produto.controla_estoque,
+    Produto.criado_em,
+)
+
+
+def _serialize_produto_row(row: Row, adicional_ids: list[int]) -> dict[str, Any]:
+    return {**row._asdict(), "adicional_ids": sorted(adicional_ids)}
+
+
+def _com_adicionais(db: Session, rows: list[Row]) -> list[dict[str, Any]]:
+    adicionais_por_produto: dict[int, list[int]] = {}
+    if rows:
+        for produto_id, adicional_id in db.execute(
+            select(ProdutoAdicional.produto_id, ProdutoAdicional.adicional_id).where(
+                ProdutoAdicional.produto_id.in_([row.id for row in rows])
+            )
+        ):
+            adicionais_por_produto.setdefault(produto_id, []).append(adicional_id)
+    return [_serialize_produto_row(row, adicionais_por_produto.get(row.id, [])) for row in rows]
+
+
+# Cada termo digitado na busca vira uma chave: LRU limitado para nao crescer ate a
+# proxima escrita no catalogo.
+TOTAIS_MAX_ITEMS = 256
+_totais_lock = Lock()
+_totais: OrderedDict[tuple, int] = OrderedDict()
+_totais_versao: int | None = None
+
+
+def _total_produtos(db: Session, filtros: list, ativo: bool | None, q: str | None) -> int:
+    # O total so muda quando o catalogo muda (criar/editar/excluir produto invalidam a
+    # versao): as paginas seguintes nao repetem o COUNT.
+    global _totais_versao
+    versao = catalogo_service.versao_catalogo()
+    chave = (ativo, (q or "").strip().lower())
+    with _totais_lock:
+        if _totais_versao != versao:
+            _totais.clear()
+            _totais_versao = versao
+        total = _totais.get(chave)
+        if total is not None:
+            _totais.move_to_end(chave)
+    if total is None:
+        total = int(db.scalar(select(func.count(Produto.id)).where(*filtros)) or 0)
+        with _totais_lock:
+            if _totais_versao == versao:
+                _totais[chave] = total
+                while len(_totais) > TOTAIS_MAX_ITEMS:
+                    _totais.popitem(last=False)
+    return total
 
 
 def get_produto_or_404(db: Session, produto_id: int) -> Produto:
@@ -70,18 +162,30 @@ def update_produto(db: Session, produto_id: int, payload: ProdutoUpdate) -> Prod
     produto = get_produto_or_404(db, produto_id)
     data = _normalize_produto_data(payload.model_dump())
     adicional_ids = data.pop("adicional_ids", [])
+    estoque_novo = data.pop("estoque_atual")
+    if not estoque_service.definir(db, produto.id, produto.estoque_atual, estoque_novo):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Estoque alterado por outra operacao. Recarregue o produto e tente de novo.",
+        )
     for key, value in data.items():
         setattr(produto, key, value)
     _set_produto_adicionais(db, produto, adicional_ids)
     db.commit()
     db.refresh(produto)
+    catalogo_service.invalidar_catalogo()
+    # Nome/preco/imagem aparecem nas comandas e sugestoes ja cacheadas.
+    from app.services.comanda_service import invalidate_read_caches
+
+    invalidate_read_caches()
+    eventos_service.publicar("resync", motivo="catalogo")
     return produto
 
 
 def patch_estoque(db: Session, produto_id: int, delta: int) -> Produto:
-    produto = get_produto_or_404(db, produto_id)
-    novo_estoque = produto.estoque_atual + delta
-    if novo_estoque < 0:
+    # Soma atomica no banco: ajustes concorrentes nao se sobrescrevem.
+    if not estoque_service.ajustar(db, produto_id, delta):
+        produto = get_produto_or_404(db, produto_id)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=(
@@ -89,8 +193,8 @@ def patch_estoque(db: Session, produto_id: int, delta: int) -> Produto:
                 f"delta solicitado: {delta}."
             ),
         )
-    produto.estoque_atual = novo_estoque
     db.commit()
+    produto = get_produto_or_404(db, produto_id)
     db.refresh(produto)
     return produto
 
@@ -100,6 +204,7 @@ def deactivate_produto(db: Session, produto_id: int) -> Produto:
     produto.ativo = False
     db.commit()
     db.refresh(produto)
+    catalogo_service.invalidar_catalogo()
     return produto
 
 
@@ -124,10 +229,12 @@ def hard_delete_produto(db: Session, produto_id: int) -> Produto:
 
     db.delete(produto)
     db.commit()
+    catalogo_service.invalidar_catalogo()
     # Atualiza cache de leitura das comandas apos exclusao em cascata.
     from app.services.comanda_service import invalidate_read_caches
 
     invalidate_read_caches()
+    eventos_service.publicar("resync", motivo="catalogo")
     return produto
 
 
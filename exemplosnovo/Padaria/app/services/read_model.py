@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from collections.abc import Hashable, Iterable
+from threading import Lock
+from types import MappingProxyType
+from typing import Any
+
+
+def freeze(value: Any) -> Any:
+    """Converte dict/list em mappingproxy/tuple para compartilhar sem deepcopy."""
+    if isinstance(value, (dict, MappingProxyType)):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+class ReadModelCache:
+    """
+    Cache LRU de leitura invalidado por eventos de escrita (sem TTL).
+
+    Cada entrada recebe tags (ex.: ("pedido", 10), ("codigo", "C-001")); as escritas
+    invalidam apenas as tags afetadas. O `put` recebe a geracao lida antes da consulta
+    ao banco e e descartado se houve invalidacao no meio, evitando gravar dado velho.
+
+    A geracao tambem serve de versao dos dados: cada tag guarda a geracao da ultima
+    invalidacao, o que permite responder "o que mudou desde a versao X".
+    """
+
+    def __init__(self, max_items: int, initial_generation: int = 0) -> None:
+        self.max_items = max(int(max_items), 1)
+        self.max_tag_versions = self.max_items * 4
+        self._lock = Lock()
+        self._entries: OrderedDict[Hashable, tuple[Any, frozenset[Hashable]]] = OrderedDict()
+        self._keys_por_tag: dict[Hashable, set[Hashable]] = {}
+        self._tag_versions: OrderedDict[Hashable, int] = OrderedDict()
+        self._generation = int(initial_generation)
+        # Abaixo deste piso nao ha historico de tags (inicio do processo, clear ou poda).
+        self._version_floor = self._generation
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def generation(self) -> int:
+        with self._lock:
+            return self._generation
+
+    def get(self, key: Hashable) -> Any | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(
+        self,
+        key: Hashable,
+        value: Any,
+        tags: Iterable[Hashable],
+        generation: int,
+    ) -> bool:
+        tag_set = frozenset(tags)
+        with self._lock:
+            if generation != self._generation:
+                return False
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, tag_set)
+            for tag in tag_set:
+                self._keys_por_tag.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_items:
+                oldest_key = next(iter(self._entries))
+                self._drop(oldest_key)
+                self.evictions += 1
+            return True
+
+    def invalidate(self, tags: Iterable[Hashable]) -> int:
+        removed = 0
+        with self._lock:
+            self._generation += 1
+            for tag in set(tags):
+                self._tag_versions[tag] = self._generation
+                self._tag_versions.move_to_end(tag)
+                for key in list(self._keys_por_tag.get(tag, ())):
+                    if key in self._entries:
+                        self._drop(key)
+                        removed += 1
+            self.invalidations += removed
+            while len(self._tag_versions) > self.max_tag_versions:
+                _tag, version = self._tag_versions.popitem(last=False)
+                self._version_floor = max(self._version_floor, version)
+        return removed
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._keys_por_tag.clear()
+            self._tag_versions.clear()
+            self._version_floor = self._generation
+
+    def version_of(self, tags: Iterable[Hashable]) -> int:
+        with self._lock:
+            versions = [self._tag_versions.get(tag, 0) for tag in tags]
+            return max([self._version_floor, *versions])
+
+    def tags_changed_since(self, version: int) -> set[Hashable] | None:
+        """Tags invalidadas depois de `version`; None se nao ha historico suficiente."""
+        with self._lock:
+            if version < self._version_floor or version > self._generation:
+                return None
+            return {tag for tag, tag_version in self._tag_versions.items() if tag_version > version}
+
+    def stats(self) -> dict[str, int | float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "itens": len(self._entries),
+                "max_itens": self.max_items,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "generation": self._generation,
+            }
+
+    def _drop(self, key: Hashable) -> None:
+        _value, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._keys_por_tag.get(tag)
+            if keys is None:
+                continue
+            keys.discard(key)
+            if not keys:
+                self._keys_por_tag.pop(tag, None)
@@ -2,10 +2,11 @@ from __future__ import annotations
 
 import csv
 import io
+from collections.abc import Iterable, Iterator
 from datetime import date, datetime, time, timedelta
 from decimal import Decimal
 
-from sqlalchemy import case, desc, func, select
+from sqlalchemy import case, desc, func, literal, select
 from sqlalchemy.orm import Session
 
 from app.models.enums import MetodoPagamento, StatusPagamento, StatusPedido, TipoEntrega
@@ -13,7 +14,36 @@ from app.models.item_pedido import ItemPedido
 from app.models.pagamento import Pagamento
 from app.models.pedido import Pedido
 from app.models.produto import Produto
-from app.services.utils import as_money
+from app.services import vendas_diarias_service
+from app.services.utils import as_money, de_centavos, dividir_centavos, em_centavos
+
+PERIODO_MAXIMO_DIAS = 366 * 5
+LANCAMENTOS_LOTE = 1000
+LANCAMENTOS_COLUNAS = [
+    "tipo_linha",
+    "pedido_id",
+    "criado_em",
+    "status",
+    "tipo_entrega",
+    "comanda_codigo",
+    "mesa",
+    "produto_id",
+    "produto",
+    "quantidade",
+    "preco_unitario",
+    "desconto",
+    "valor",
+    "metodo",
+]
+
+
+def _validar_periodo(data_inicial: date, data_final: date) -> None:
+    if data_inicial > data_final:
+        raise ValueError("data_inicial não pode ser maior que data_final.")
+
+    total_dias = (data_final - data_inicial).days + 1
+    if total_dias > PERIODO_MAXIMO_DIAS:
+        raise ValueError(f"Período máximo suportado: {PERIODO_MAXIMO_DIAS} dias.")
 
 
 def _fmt_money_csv(value: Decimal | float | int) -> str:
@@ -21,27 +51,65 @@ def _fmt_money_csv(value: Decimal | float | int) -> str:
     return f"{amount:.2f}".replace(".", ",")
 
 
+def _fmt_centavos_csv(centavos: int) -> str:
+    sinal = "-" if centavos < 0 else ""
+    reais, resto = divmod(abs(centavos), 100)
+    return f"{sinal}{reais},{resto:02d}"
+
+
+def _dia_vazio() -> dict:
+    # Valores em centavos enquanto soma; _dia_em_reais converte no fim.
+    return {
+        "total_pedidos": 0,
+        "pedidos_cancelados": 0,
+        "total_vendido": 0,
+        "total_recebido": 0,
+        "total_cancelado": 0,
+        "pedidos_por_status": {status.value: 0 for status in StatusPedido},
+        "pedidos_por_tipo_entrega": {tipo.value: 0 for tipo in TipoEntrega},
+        "faturamento_por_tipo_entrega": {tipo.value: 0 for tipo in TipoEntrega},
+        "pagamentos_por_metodo": {method.value: 0 for method in MetodoPagamento},
+    }
+
+
+def _somar_vendas_diarias(linhas) -> dict[date, dict]:
+    dias: dict[date, dict] = {}
+    for linha in linhas:
+        dia = dias.setdefault(linha.dia, _dia_vazio())
+        if linha.metodo:
+            valor = linha.valor_recebido or 0
+            dia["total_recebido"] += valor
+            metodos = dia["pagamentos_por_metodo"]
+            metodos[linha.metodo] = metodos.get(linha.metodo, 0) + valor
+            continue
+        quantidade = int(linha.pedidos or 0)
+        valor = linha.valor_pedidos or 0
+        dia["total_pedidos"] += quantidade
+        por_status = dia["pedidos_por_status"]
+        por_status[linha.status] = por_status.get(linha.status, 0) + quantidade
+        if linha.status == StatusPedido.CANCELADO.value:
+            dia["pedidos_cancelados"] += quantidade
+            dia["total_cancelado"] += valor
+            continue
+        dia["total_vendido"] += valor
+        por_tipo = dia["pedidos_por_tipo_entrega"]
+        por_tipo[linha.tipo_entrega] = por_tipo.get(linha.tipo_entrega, 0) + quantidade
+        faturamento = dia["faturamento_por_tipo_entrega"]
+        faturamento[linha.tipo_entrega] = faturamento.get(linha.tipo_entrega, 0) + valor
+    return dias
+
+
+def _em_reais(valores: dict[str, int]) -> dict[str, Decimal]:
+    return {chave: de_centavos(valor) for chave, valor in valores.items()}
+
+
 def resumo_dia(db: Session, data_ref: date) -> dict:
     inicio = datetime.combine(data_ref, time.min)
     fim = datetime.combine(data_ref, time.max)
 
-    total_vendido = db.scalar(
-        select(func.coalesce(func.sum(Pedido.total), 0)).where(
-            Pedido.criado_em >= inicio,
-            Pedido.criado_em <= fim,
-            Pedido.status != StatusPedido.CANCELADO,
-        )
-    )
-
-    status_rows = db.execute(
-        select(Pedido.status, func.count(Pedido.id))
-        .where(Pedido.criado_em >= inicio, Pedido.criado_em <= fim)
-        .group_by(Pedido.status)
-    ).all()
-
-    pedidos_por_status = {status.value: int(qtd) for status, qtd in status_rows}
-    for status in StatusPedido:
-        pedidos_por_status.setdefault(status.value, 0)
+    vendas = _somar_vendas_diarias(
+        vendas_diarias_service.linhas_periodo(db, data_ref, data_ref)
+    ).get(data_ref, _dia_vazio())
 
     quantidade_label = func.coalesce(func.sum(ItemPedido.quantidade), 0).label("qtd")
     total_label = func.coalesce(func.sum(ItemPedido.subtotal), 0).label("total")
@@ -65,120 +133,92 @@ def resumo_dia(db: Session, data_ref: date) -> dict:
             "produto_id": produto_id,
             "nome": nome,
             "quantidade": int(qtd),
-            "total": as_money(total),
+            "total": total,
         }
         for produto_id, nome, qtd, total in top_rows
     ]
 
     return {
         "data": data_ref,
-        "total_vendido": as_money(total_vendido or Decimal("0")),
-        "pedidos_por_status": pedidos_por_status,
+        "total_vendido": de_centavos(vendas["total_vendido"]),
+        "pedidos_por_status": vendas["pedidos_por_status"],
         "top_produtos": top_produtos,
     }
 
 
+def _soma_se(condicao, valor):
+    return func.coalesce(func.sum(case((condicao, valor), else_=0)), 0)
+
+
+def _soma_centavos_se(condicao, valor):
+    return em_centavos(_soma_se(condicao, valor))
+
+
 def fechamento_caixa(db: Session, data_ref: date) -> dict:
+    # Uma passada com agregacao condicional por tabela, direto na janela do dia
+    # (indices por criado_em); o rollup vendas_diarias fica para periodos longos.
     inicio = datetime.combine(data_ref, time.min)
     fim = datetime.combine(data_ref, time.max)
 
-    base_filter = [Pedido.criado_em >= inicio, Pedido.criado_em <= fim]
-
-    total_pedidos = int(
-        db.scalar(select(func.count(Pedido.id)).where(*base_filter)) or 0
-    )
-    pedidos_cancelados = int(
-        db.scalar(
-            select(func.count(Pedido.id)).where(
-                *base_filter,
-                Pedido.status == StatusPedido.CANCELADO,
-            )
-        )
-        or 0
+    cancelado = Pedido.status == StatusPedido.CANCELADO
+    valido = Pedido.status != StatusPedido.CANCELADO
+    colunas_pedido = [
+        func.count(Pedido.id),
+        _soma_se(cancelado, 1),
+        _soma_centavos_se(valido, Pedido.total),
+        _soma_centavos_se(cancelado, Pedido.total),
+    ]
+    colunas_pedido += [_soma_se(Pedido.status == status, 1) for status in StatusPedido]
+    for tipo in TipoEntrega:
+        colunas_pedido.append(_soma_se(valido & (Pedido.tipo_entrega == tipo), 1))
+        colunas_pedido.append(_soma_centavos_se(valido & (Pedido.tipo_entrega == tipo), Pedido.total))
+
+    pedidos_row = list(
+        db.execute(
+            select(*colunas_pedido).where(Pedido.criado_em >= inicio, Pedido.criado_em <= fim)
+        ).one()
     )
+    total_pedidos, pedidos_cancelados, total_vendido, total_cancelado = pedidos_row[:4]
+    total_pedidos = int(total_pedidos or 0)
+    pedidos_cancelados = int(pedidos_cancelados or 0)
     pedidos_validos = max(total_pedidos - pedidos_cancelados, 0)
 
-    total_vendido = as_money(
-        db.scalar(
-            select(func.coalesce(func.sum(Pedido.total), 0)).where(
-                *base_filter,
-                Pedido.status != StatusPedido.CANCELADO,
-            )
-        )
-        or Decimal("0")
-    )
-    total_cancelado = as_money(
-        db.scalar(
-            select(func.coalesce(func.sum(Pedido.total), 0)).where(
-                *base_filter,
-                Pedido.status == StatusPedido.CANCELADO,
-            )
-        )
-        or Decimal("0")
-    )
-
-    status_rows = db.execute(
-        select(Pedido.status, func.count(Pedido.id))
-        .where(*base_filter)
-        .group_by(Pedido.status)
-    ).all()
-    pedidos_por_status = {status.value: int(qtd) for status, qtd in status_rows}
-    for status in StatusPedido:
-        pedidos_por_status.setdefault(status.value, 0)
-
-    tipo_rows = db.execute(
+    status_counts = pedidos_row[4 : 4 + len(StatusPedido)]
+    pedidos_por_status = {
+        status.value: int(qtd or 0) for status, qtd in zip(StatusPedido, status_counts)
+    }
+    tipo_values = pedidos_row[4 + len(StatusPedido) :]
+    pedidos_por_tipo_entrega = {}
+    faturamento_por_tipo_entrega = {}
+    for indice, tipo in enumerate(TipoEntrega):
+        pedidos_por_tipo_entrega[tipo.value] = int(tipo_values[2 * indice] or 0)
+        faturamento_por_tipo_entrega[tipo.value] = de_centavos(tipo_values[2 * indice + 1] or 0)
+
+    pagamentos_row = db.execute(
         select(
-            Pedido.tipo_entrega,
-            func.count(Pedido.id),
-            func.coalesce(func.sum(Pedido.total), 0),
-        )
-        .where(*base_filter, Pedido.status != StatusPedido.CANCELADO)
-        .group_by(Pedido.tipo_entrega)
-    ).all()
-
-    pedidos_por_tipo_entrega = {tipo.value: 0 for tipo in TipoEntrega}
-    faturamento_por_tipo_entrega = {tipo.value: as_money(0) for tipo in TipoEntrega}
-    for tipo, qtd, total in tipo_rows:
-        pedidos_por_tipo_entrega[tipo.value] = int(qtd)
-        faturamento_por_tipo_entrega[tipo.value] = as_money(total)
-
-    total_recebido = as_money(
-        db.scalar(
-            select(func.coalesce(func.sum(Pagamento.valor), 0)).where(
-                Pagamento.criado_em >= inicio,
-                Pagamento.criado_em <= fim,
-                Pagamento.status == StatusPagamento.APROVADO,
-            )
-        )
-        or Decimal("0")
-    )
-
-    payment_rows = db.execute(
-        select(Pagamento.metodo, func.coalesce(func.sum(Pagamento.valor), 0))
-        .where(
+            em_centavos(func.coalesce(func.sum(Pagamento.valor), 0)),
+            *[_soma_centavos_se(Pagamento.metodo == method, Pagamento.valor) for method in MetodoPagamento],
+        ).where(
             Pagamento.criado_em >= inicio,
             Pagamento.criado_em <= fim,
             Pagamento.status == StatusPagamento.APROVADO,
         )
-        .group_by(Pagamento.metodo)
-    ).all()
-    pagamentos_por_metodo = {method.value: as_money(0) for method in MetodoPagamento}
-    for method, amount in payment_rows:
-        pagamentos_por_metodo[method.value] = as_money(amount)
-
-    ticket_medio = as_money(
-        total_recebido / pedidos_validos if pedidos_validos > 0 else Decimal("0")
-    )
+    ).one()
+    total_recebido = int(pagamentos_row[0] or 0)
+    pagamentos_por_metodo = {
+        method.value: de_centavos(amount or 0)
+        for method, amount in zip(MetodoPagamento, pagamentos_row[1:])
+    }
 
     return {
         "data": data_ref,
         "total_pedidos": total_pedidos,
         "pedidos_validos": pedidos_validos,
         "pedidos_cancelados": pedidos_cancelados,
-        "total_vendido": total_vendido,
-        "total_recebido": total_recebido,
-        "total_cancelado": total_cancelado,
-        "ticket_medio": ticket_medio,
+        "total_vendido": de_centavos(total_vendido or 0),
+        "total_recebido": de_centavos(total_recebido),
+        "total_cancelado": de_centavos(total_cancelado or 0),
+        "ticket_medio": de_centavos(dividir_centavos(total_recebido, pedidos_validos)),
         "pedidos_por_status": pedidos_por_status,
         "pedidos_por_tipo_entrega": pedidos_por_tipo_entrega,
         "faturamento_por_tipo_entrega": faturamento_por_tipo_entrega,
@@ -186,238 +226,272 @@ def fechamento_caixa(db: Session, data_ref: date) -> dict:
     }
 
 
-def fechamento_caixa_csv(data: dict) -> str:
+def _csv_stream(linhas: Iterable[list]) -> Iterator[str]:
+    # Um writer reaproveitado; cada bloco sai assim que e formatado.
     buffer = io.StringIO()
     writer = csv.writer(buffer, delimiter=";")
+    for linha in linhas:
+        writer.writerow(linha)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
 
-    writer.writerow(["relatorio", "Fechamento de Caixa"])
-    writer.writerow(["data_referencia", str(data["data"])])
-    writer.writerow(["gerado_em", datetime.now().strftime("%Y-%m-%d %H:%M:%S")])
-    writer.writerow([])
-
-    writer.writerow(["resumo_geral", "valor"])
-    writer.writerow(["total_pedidos", int(data["total_pedidos"])])
-    writer.writerow(["pedidos_validos", int(data["pedidos_validos"])])
-    writer.writerow(["pedidos_cancelados", int(data["pedidos_cancelados"])])
-    writer.writerow(["total_vendido", _fmt_money_csv(data["total_vendido"])])
-    writer.writerow(["total_recebido", _fmt_money_csv(data["total_recebido"])])
-    writer.writerow(["total_cancelado", _fmt_money_csv(data["total_cancelado"])])
-    writer.writerow(["ticket_medio", _fmt_money_csv(data["ticket_medio"])])
-    writer.writerow([])
-
-    writer.writerow(["pedidos_por_status", "quantidade"])
-    for status, quantidade in data["pedidos_por_status"].items():
-        writer.writerow([status, int(quantidade)])
-    writer.writerow([])
 
-    writer.writerow(["tipo_entrega", "pedidos", "faturamento"])
-    for tipo, quantidade in data["pedidos_por_tipo_entrega"].items():
-        faturamento = data["faturamento_por_tipo_entrega"].get(tipo, 0)
-        writer.writerow([tipo, int(quantidade), _fmt_money_csv(faturamento)])
+def fechamento_caixa_csv(data: dict) -> Iterator[str]:
+    return _csv_stream(_linhas_fechamento_caixa(data))
 
-    writer.writerow([])
-    writer.writerow(["metodo_pagamento", "total_recebido"])
-    for metodo, total in data["pagamentos_por_metodo"].items():
-        writer.writerow([metodo, _fmt_money_csv(total)])
 
-    return buffer.getvalue()
+def faturamento_periodo_csv(data: dict) -> Iterator[str]:
+    return _csv_stream(_linhas_faturamento_periodo(data))
+
 
+def lancamentos_csv(db: Session, data_inicial: date, data_final: date) -> Iterator[str]:
+    # Valida antes de devolver o gerador para o erro virar 400, nao um stream cortado.
+    _validar_periodo(data_inicial, data_final)
+    return _iter_lancamentos_csv(db, data_inicial, data_final)
 
-def faturamento_periodo_csv(data: dict) -> str:
+
+def _iter_lancamentos_csv(db: Session, data_inicial: date, data_final: date) -> Iterator[str]:
+    inicio = datetime.combine(data_inicial, time.min)
+    fim = datetime.combine(data_final, time.max)
     buffer = io.StringIO()
     writer = csv.writer(buffer, delimiter=";")
+    writer.writerow(LANCAMENTOS_COLUNAS)
+    yield buffer.getvalue()
 
-    writer.writerow(["relatorio", "Faturamento por Periodo"])
-    writer.writerow(["data_inicial", str(data["data_inicial"])])
-    writer.writerow(["data_final", str(data["data_final"])])
-    writer.writerow(["gerado_em", datetime.now().strftime("%Y-%m-%d %H:%M:%S")])
-    writer.writerow([])
-
-    writer.writerow(["resumo_geral", "valor"])
-    writer.writerow(["total_pedidos", int(data["total_pedidos"])])
-    writer.writerow(["pedidos_validos", int(data["pedidos_validos"])])
-    writer.writerow(["pedidos_cancelados", int(data["pedidos_cancelados"])])
-    writer.writerow(["total_vendido", _fmt_money_csv(data["total_vendido"])])
-    writer.writerow(["total_recebido", _fmt_money_csv(data["total_recebido"])])
-    writer.writerow(["total_cancelado", _fmt_money_csv(data["total_cancelado"])])
-    writer.writerow(["ticket_medio", _fmt_money_csv(data["ticket_medio"])])
-    writer.writerow([])
-
-    writer.writerow(["metodo_pagamento", "total_recebido"])
-    for metodo, total in data["pagamentos_por_metodo"].items():
-        writer.writerow([metodo, _fmt_money_csv(total)])
-    writer.writerow([])
-
-    writer.writerow(
-        [
-            "dia",
-            "total_pedidos",
-            "pedidos_validos",
-            "pedidos_cancelados",
-            "total_vendido",
-            "total_recebido",
-            "total_cancelado",
-            "ticket_medio",
-        ]
-    )
-    for row in data.get("dias", []):
-        writer.writerow(
-            [
-                str(row["data"]),
-                int(row["total_pedidos"]),
-                int(row["pedidos_validos"]),
-                int(row["pedidos_cancelados"]),
-                _fmt_money_csv(row["total_vendido"]),
-                _fmt_money_csv(row["total_recebido"]),
-                _fmt_money_csv(row["total_cancelado"]),
-                _fmt_money_csv(row["ticket_medio"]),
-            ]
+    consultas = [
+        select(
+            literal("pedido"),
+            Pedido.id,
+            Pedido.criado_em,
+            Pedido.status,
+            Pedido.tipo_entrega,
+            Pedido.comanda_codigo,
+            Pedido.mesa,
+            literal(None),
+            literal(None),
+            literal(None),
+            literal(None),
+            literal(None),
+            em_centavos(Pedido.total),
+            literal(None),
+        )
+        .where(Pedido.criado_em >= inicio, Pedido.criado_em <= fim)
+        .order_by(Pedido.id.asc()),
+        select(
+            literal("item"),
+            ItemPedido.pedido_id,
+            Pedido.criado_em,
+            Pedido.status,
+            Pedido.tipo_entrega,
+            Pedido.comanda_codigo,
+            Pedido.mesa,
+            ItemPedido.produto_id,
+            Produto.nome,
+            ItemPedido.quantidade,
+            em_centavos(ItemPedido.preco_unitario),
+            em_centavos(ItemPedido.desconto),
+            em_centavos(ItemPedido.subtotal),
+            literal(None),
         )
+        .join(Pedido, Pedido.id == ItemPedido.pedido_id)
+        .join(Produto, Produto.id == ItemPedido.produto_id)
+        .where(Pedido.criado_em >= inicio, Pedido.criado_em <= fim)
+        .order_by(ItemPedido.pedido_id.asc(), ItemPedido.id.asc()),
+        select(
+            literal("pagamento"),
+            Pagamento.pedido_id,
+            Pagamento.criado_em,
+            Pagamento.status,
+            literal(None),
+            literal(None),
+            literal(None),
+            literal(None),
+            literal(None),
+            literal(None),
+            literal(None),
+            literal(None),
+            em_centavos(Pagamento.valor),
+            Pagamento.metodo,
+        )
+        .where(Pagamento.criado_em >= inicio, Pagamento.criado_em <= fim)
+        .order_by(Pagamento.pedido_id.asc(), Pagamento.id.asc()),
+    ]
+    try:
+        for consulta in consultas:
+            resultado = db.execute(consulta.execution_options(yield_per=LANCAMENTOS_LOTE))
+            for lote in resultado.partitions():
+                buffer.seek(0)
+                buffer.truncate(0)
+                writer.writerows(_formatar_lancamento(row) for row in lote)
+                yield buffer.getvalue()
+    finally:
+        # O stream pode sobreviver ao Depends(get_db); devolve a conexao ao fim ou na desconexao.
+        db.close()
+
+
+def _formatar_lancamento(row) -> list:
+    (
+        tipo_linha,
+        pedido_id,
+        criado_em,
+        status,
+        tipo_entrega,
+        comanda_codigo,
+        mesa,
+        produto_id,
+        produto,
+        quantidade,
+        preco_unitario,
+        desconto,
+        valor,
+        metodo,
+    ) = row
+    return [
+        tipo_linha,
+        pedido_id,
+        criado_em.strftime("%Y-%m-%d %H:%M:%S") if criado_em else "",
+        getattr(status, "value", status) or "",
+        getattr(tipo_entrega, "value", tipo_entrega) or "",
+        comanda_codigo or "",
+        mesa or "",
+        produto_id or "",
+        produto or "",
+        quantidade if quantidade is not None else "",
+        _fmt_centavos_csv(preco_unitario) if preco_unitario is not None else "",
+        _fmt_centavos_csv(desconto) if desconto is not None else "",
+        _fmt_centavos_csv(valor or 0),
+        getattr(metodo, "value", metodo) or "",
+    ]
 
-    return buffer.getvalue()
 
+def _linhas_fechamento_caixa(data: dict) -> Iterator[list]:
+    yield ["relatorio", "Fechamento de Caixa"]
+    yield ["data_referencia", str(data["data"])]
+    yield ["gerado_em", datetime.now().strftime("%Y-%m-%d %H:%M:%S")]
+    yield []
 
-def faturamento_periodo(db: Session, data_inicial: date, data_final: date) -> dict:
-    if data_inicial > data_final:
-        raise ValueError("data_inicial não pode ser maior que data_final.")
+    yield ["resumo_geral", "valor"]
+    yield ["total_pedidos", int(data["total_pedidos"])]
+    yield ["pedidos_validos", int(data["pedidos_validos"])]
+    yield ["pedidos_cancelados", int(data["pedidos_cancelados"])]
+    yield ["total_vendido", _fmt_money_csv(data["total_vendido"])]
+    yield ["total_recebido", _fmt_money_csv(data["total_recebido"])]
+    yield ["total_cancelado", _fmt_money_csv(data["total_cancelado"])]
+    yield ["ticket_medio", _fmt_money_csv(data["ticket_medio"])]
+    yield []
 
-    limite_dias = 120
-    total_dias = (data_final - data_inicial).days + 1
-    if total_dias > limite_dias:
-        raise ValueError(f"Período máximo suportado: {limite_dias} dias.")
+    yield ["pedidos_por_status", "quantidade"]
+    for status, quantidade in data["pedidos_por_status"].items():
+        yield [status, int(quantidade)]
+    yield []
 
-    inicio = datetime.combine(data_inicial, time.min)
-    fim = datetime.combine(data_final, time.max)
+    yield ["tipo_entrega", "pedidos", "faturamento"]
+    for tipo, quantidade in data["pedidos_por_tipo_entrega"].items():
+        faturamento = data["faturamento_por_tipo_entrega"].get(tipo, 0)
+        yield [tipo, int(quantidade), _fmt_money_csv(faturamento)]
 
-    base_filter = [
-        Pedido.comanda_codigo.is_not(None),
-        Pedido.criado_em >= inicio,
-        Pedido.criado_em <= fim,
+    yield []
+    yield ["metodo_pagamento", "total_recebido"]
+    for metodo, total in data["pagamentos_por_metodo"].items():
+        yield [metodo, _fmt_money_csv(total)]
+
+
+def _linhas_faturamento_periodo(data: dict) -> Iterator[list]:
+    yield ["relatorio", "Faturamento por Periodo"]
+    yield ["data_inicial", str(data["data_inicial"])]
+    yield ["data_final", str(data["data_final"])]
+    yield ["gerado_em", datetime.now().strftime("%Y-%m-%d %H:%M:%S")]
+    yield []
+
+    yield ["resumo_geral", "valor"]
+    yield ["total_pedidos", int(data["total_pedidos"])]
+    yield ["pedidos_validos", int(data["pedidos_validos"])]
+    yield ["pedidos_cancelados", int(data["pedidos_cancelados"])]
+    yield ["total_vendido", _fmt_money_csv(data["total_vendido"])]
+    yield ["total_recebido", _fmt_money_csv(data["total_recebido"])]
+    yield ["total_cancelado", _fmt_money_csv(data["total_cancelado"])]
+    yield ["ticket_medio", _fmt_money_csv(data["ticket_medio"])]
+    yield []
+
+    yield ["metodo_pagamento", "total_recebido"]
+    for metodo, total in data["pagamentos_por_metodo"].items():
+        yield [metodo, _fmt_money_csv(total)]
+    yield []
+
+    yield [
+        "dia",
+        "total_pedidos",
+        "pedidos_validos",
+        "pedidos_cancelados",
+        "total_vendido",
+        "total_recebido",
+        "total_cancelado",
+        "ticket_medio",
     ]
+    for row in data.get("dias", []):
+        yield [
+            str(row["data"]),
+            int(row["total_pedidos"]),
+            int(row["pedidos_validos"]),
+            int(row["pedidos_cancelados"]),
+            _fmt_money_csv(row["total_vendido"]),
+            _fmt_money_csv(row["total_recebido"]),
+            _fmt_money_csv(row["total_cancelado"]),
+            _fmt_money_csv(row["ticket_medio"]),
+        ]
 
-    pedidos_rows = db.execute(
-        select(
-            func.date(Pedido.criado_em).label("dia"),
-            func.count(Pedido.id).label("total_pedidos"),
-            func.coalesce(
-                func.sum(
-                    case((Pedido.status == StatusPedido.CANCELADO, 1), else_=0)
-                ),
-                0,
-            ).label("pedidos_cancelados"),
-            func.coalesce(
-                func.sum(
-                    case((Pedido.status != StatusPedido.CANCELADO, Pedido.total), else_=0)
-                ),
-                0,
-            ).label("total_vendido"),
-            func.coalesce(
-                func.sum(
-                    case((Pedido.status == StatusPedido.CANCELADO, Pedido.total), else_=0)
-                ),
-                0,
-            ).label("total_cancelado"),
-        )
-        .where(*base_filter)
-        .group_by(func.date(Pedido.criado_em))
-        .order_by(func.date(Pedido.criado_em).asc())
-    ).all()
 
-    pagamentos_rows = db.execute(
-        select(
-            func.date(Pagamento.criado_em).label("dia"),
-            func.coalesce(func.sum(Pagamento.valor), 0).label("total_recebido"),
-        )
-        .where(
-            Pagamento.criado_em >= inicio,
-            Pagamento.criado_em <= fim,
-            Pagamento.status == StatusPagamento.APROVADO,
-        )
-        .group_by(func.date(Pagamento.criado_em))
-        .order_by(func.date(Pagamento.criado_em).asc())
-    ).all()
+def faturamento_periodo(db: Session, data_inicial: date, data_final: date) -> dict:
+    # Leitura direta do rollup vendas_diarias: custo proporcional aos dias, nao aos pedidos.
+    _validar_periodo(data_inicial, data_final)
 
-    pagamento_por_metodo_rows = db.execute(
-        select(Pagamento.metodo, func.coalesce(func.sum(Pagamento.valor), 0))
-        .where(
-            Pagamento.criado_em >= inicio,
-            Pagamento.criado_em <= fim,
-            Pagamento.status == StatusPagamento.APROVADO,
-        )
-        .group_by(Pagamento.metodo)
-    ).all()
-    pagamentos_por_metodo = {method.value: as_money(0) for method in MetodoPagamento}
-    for method, amount in pagamento_por_metodo_rows:
-        pagamentos_por_metodo[method.value] = as_money(amount)
-
-    pedidos_map = {
-        str(dia): {
-            "total_pedidos": int(total_pedidos or 0),
-            "pedidos_cancelados": int(pedidos_cancelados or 0),
-            "total_vendido": as_money(total_vendido or Decimal("0")),
-            "total_cancelado": as_money(total_cancelado or Decimal("0")),
-        }
-        for dia, total_pedidos, pedidos_cancelados, total_vendido, total_cancelado in pedidos_rows
-    }
-    recebidos_map = {
-        str(dia): as_money(total_recebido or Decimal("0"))
-        for dia, total_recebido in pagamentos_rows
-    }
+    vendas_por_dia = _somar_vendas_diarias(
+        vendas_diarias_service.linhas_periodo(db, data_inicial, data_final)
+    )
+    pagamentos_por_metodo = {method.value: 0 for method in MetodoPagamento}
+    for vendas in vendas_por_dia.values():
+        for method, amount in vendas["pagamentos_por_metodo"].items():
+            pagamentos_por_metodo[method] = pagamentos_por_metodo.get(method, 0) + amount
 
     dias_data: list[dict] = []
+    total_pedidos = pedidos_cancelados = total_vendido = total_recebido = total_cancelado = 0
     cursor = data_inicial
     while cursor <= data_final:
-        key = cursor.isoformat()
-        pedidos_dia = pedidos_map.get(
-            key,
-            {
-                "total_pedidos": 0,
-                "pedidos_cancelados": 0,
-                "total_vendido": as_money(0),
-                "total_cancelado": as_money(0),
-            },
-        )
-        total_pedidos = int(pedidos_dia["total_pedidos"])
-        pedidos_cancelados = int(pedidos_dia["pedidos_cancelados"])
-        pedidos_validos = max(total_pedidos - pedidos_cancelados, 0)
-        total_recebido = recebidos_map.get(key, as_money(0))
-        ticket_medio = as_money(
-            total_recebido / pedidos_validos if pedidos_validos > 0 else Decimal("0")
-        )
+        pedidos_dia = vendas_por_dia.get(cursor) or _dia_vazio()
+        pedidos_validos = max(pedidos_dia["total_pedidos"] - pedidos_dia["pedidos_cancelados"], 0)
         dias_data.append(
             {
                 "data": cursor,
-                "total_pedidos": total_pedidos,
+                "total_pedidos": pedidos_dia["total_pedidos"],
                 "pedidos_validos": pedidos_validos,
-                "pedidos_cancelados": pedidos_cancelados,
-                "total_vendido": pedidos_dia["total_vendido"],
-                "total_recebido": total_recebido,
-                "total_cancelado": pedidos_dia["total_cancelado"],
-                "ticket_medio": ticket_medio,
+                "pedidos_cancelados": pedidos_dia["pedidos_cancelados"],
+                "total_vendido": de_centavos(pedidos_dia["total_vendido"]),
+                "total_recebido": de_centavos(pedidos_dia["total_recebido"]),
+                "total_cancelado": de_centavos(pedidos_dia["total_cancelado"]),
+                "ticket_medio": de_centavos(
+                    dividir_centavos(pedidos_dia["total_recebido"], pedidos_validos)
+                ),
             }
         )
+        total_pedidos += pedidos_dia["total_pedidos"]
+        pedidos_cancelados += pedidos_dia["pedidos_cancelados"]
+        total_vendido += pedidos_dia["total_vendido"]
+        total_recebido += pedidos_dia["total_recebido"]
+        total_cancelado += pedidos_dia["total_cancelado"]
         cursor += timedelta(days=1)
 
-    total_pedidos = int(sum(row["total_pedidos"] for row in dias_data))
-    pedidos_cancelados = int(sum(row["pedidos_cancelados"] for row in dias_data))
     pedidos_validos = max(total_pedidos - pedidos_cancelados, 0)
-    total_vendido = as_money(sum((row["total_vendido"] for row in dias_data), start=Decimal("0")))
-    total_recebido = as_money(sum((row["total_recebido"] for row in dias_data), start=Decimal("0")))
-    total_cancelado = as_money(sum((row["total_cancelado"] for row in dias_data), start=Decimal("0")))
-    ticket_medio = as_money(
-        total_recebido / pedidos_validos if pedidos_validos > 0 else Decimal("0")
-    )
-
     return {
         "data_inicial": data_inicial,
         "data_final": data_final,
         "total_pedidos": total_pedidos,
         "pedidos_validos": pedidos_validos,
         "pedidos_cancelados": pedidos_cancelados,
-        "total_vendido": total_vendido,
-        "total_recebido": total_recebido,
-        "total_cancelado": total_cancelado,
-        "ticket_medio": ticket_medio,
-        "pagamentos_por_metodo": pagamentos_por_metodo,
+        "total_vendido": de_centavos(total_vendido),
+        "total_recebido": de_centavos(total_recebido),
+        "total_cancelado": de_centavos(total_cancelado),
+        "ticket_medio": de_centavos(dividir_centavos(total_recebido, pedidos_validos)),
+        "pagamentos_por_metodo": _em_reais(pagamentos_por_metodo),
         "dias": dias_data,
     }
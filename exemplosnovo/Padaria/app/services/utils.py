@@ -1,7 +1,19 @@
 from decimal import Decimal, ROUND_HALF_UP
 
+from app.models.tipos import ZERO, de_centavos, dividir_centavos, em_centavos, para_centavos
+
 MONEY_QUANT = Decimal("0.01")
 
+__all__ = [
+    "MONEY_QUANT",
+    "ZERO",
+    "as_money",
+    "de_centavos",
+    "dividir_centavos",
+    "em_centavos",
+    "para_centavos",
+]
+
 
 def as_money(value: Decimal | int | float | str) -> Decimal:
     return Decimal(value).quantize(MONEY_QUANT, rounding=ROUND_HALF_UP)
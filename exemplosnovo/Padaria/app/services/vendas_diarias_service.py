@@ -0,0 +1,264 @@
+from __future__ import annotations
+
+from datetime import date, datetime, time, timedelta
+from typing import Any
+
+from sqlalchemy import Row, delete, event, func, insert, inspect, literal, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.db.session import insert_com_conflito
+from app.models.enums import StatusPagamento, StatusPedido
+from app.models.pagamento import Pagamento
+from app.models.pedido import Pedido
+from app.models.venda_diaria import VendaDiaria
+from app.services.utils import de_centavos, em_centavos, para_centavos
+
+CAMPOS_PEDIDO = ("criado_em", "status", "tipo_entrega", "total")
+CAMPOS_PAGAMENTO = ("criado_em", "status", "metodo", "valor")
+
+# (dia, status, tipo_entrega, metodo) -> [pedidos, valor_pedidos, valor_recebido] (centavos)
+Deltas = dict[tuple[date, str, str, str], list]
+
+
+def linhas_periodo(db: Session, data_inicial: date, data_final: date) -> list[Row]:
+    # Valores em centavos inteiros: os relatorios somam sem criar Decimal por linha.
+    return list(
+        db.execute(
+            select(
+                VendaDiaria.dia,
+                VendaDiaria.status,
+                VendaDiaria.tipo_entrega,
+                VendaDiaria.metodo,
+                VendaDiaria.pedidos,
+                em_centavos(VendaDiaria.valor_pedidos).label("valor_pedidos"),
+                em_centavos(VendaDiaria.valor_recebido).label("valor_recebido"),
+            )
+            .where(VendaDiaria.dia >= data_inicial, VendaDiaria.dia <= data_final)
+            .order_by(VendaDiaria.dia.asc())
+        ).all()
+    )
+
+
+def reconstruir_vendas_diarias(
+    db: Session,
+    data_inicial: date | None = None,
+    data_final: date | None = None,
+) -> dict[str, Any]:
+    linhas = _reconstruir(db.connection(), data_inicial, data_final)
+    db.commit()
+    return {"data_inicial": data_inicial, "data_final": data_final, "linhas": linhas}
+
+
+def inicializar_vendas_diarias(conn: Connection) -> None:
+    # Bancos anteriores ao rollup: popula uma vez a partir do historico.
+    if conn.scalar(select(VendaDiaria.dia).limit(1)) is not None:
+        return
+    if conn.scalar(select(Pedido.id).limit(1)) is None:
+        return
+    _reconstruir(conn, None, None)
+
+
+def _reconstruir(conn: Connection, data_inicial: date | None, data_final: date | None) -> int:
+    filtro_rollup = []
+    filtro_pedido = []
+    filtro_pagamento = []
+    if data_inicial is not None:
+        inicio = datetime.combine(data_inicial, time.min)
+        filtro_rollup.append(VendaDiaria.dia >= data_inicial)
+        filtro_pedido.append(Pedido.criado_em >= inicio)
+        filtro_pagamento.append(Pagamento.criado_em >= inicio)
+    if data_final is not None:
+        fim = datetime.combine(data_final + timedelta(days=1), time.min)
+        filtro_rollup.append(VendaDiaria.dia <= data_final)
+        filtro_pedido.append(Pedido.criado_em < fim)
+        filtro_pagamento.append(Pagamento.criado_em < fim)
+
+    conn.execute(delete(VendaDiaria).where(*filtro_rollup))
+
+    colunas = ["dia", "status", "tipo_entrega", "metodo", "pedidos", "valor_pedidos", "valor_recebido"]
+    dia_pedido = func.date(Pedido.criado_em)
+    pedidos = conn.execute(
+        insert(VendaDiaria).from_select(
+            colunas,
+            select(
+                dia_pedido,
+                Pedido.status,
+                Pedido.tipo_entrega,
+                literal(""),
+                func.count(Pedido.id),
+                func.coalesce(func.sum(Pedido.total), 0),
+                literal(0),
+            )
+            .where(*filtro_pedido)
+            .group_by(dia_pedido, Pedido.status, Pedido.tipo_entrega),
+        )
+    ).rowcount
+    dia_pagamento = func.date(Pagamento.criado_em)
+    pagamentos = conn.execute(
+        insert(VendaDiaria).from_select(
+            colunas,
+            select(
+                dia_pagamento,
+                literal(""),
+                literal(""),
+                Pagamento.metodo,
+                literal(0),
+                literal(0),
+                func.coalesce(func.sum(Pagamento.valor), 0),
+            )
+            .where(*filtro_pagamento, Pagamento.status == StatusPagamento.APROVADO)
+            .group_by(dia_pagamento, Pagamento.metodo),
+        )
+    ).rowcount
+    return int(pedidos or 0) + int(pagamentos or 0)
+
+
+def _valor_enum(valor: Any) -> str:
+    return str(getattr(valor, "value", valor) or "")
+
+
+def _contribuicao_pedido(valores: dict[str, Any]) -> tuple[tuple, list]:
+    chave = (
+        valores["criado_em"].date(),
+        _valor_enum(valores["status"]),
+        _valor_enum(valores["tipo_entrega"]),
+        "",
+    )
+    return chave, [1, para_centavos(valores["total"] or 0), 0]
+
+
+def _contribuicao_pagamento(valores: dict[str, Any]) -> tuple[tuple, list] | None:
+    if _valor_enum(valores["status"]) != StatusPagamento.APROVADO.value:
+        return None
+    chave = (valores["criado_em"].date(), "", "", _valor_enum(valores["metodo"]))
+    return chave, [0, 0, para_centavos(valores["valor"] or 0)]
+
+
+def _acumular(deltas: Deltas, contribuicao: tuple[tuple, list] | None, sinal: int) -> None:
+    if contribuicao is None:
+        return
+    chave, medidas = contribuicao
+    atual = deltas.setdefault(chave, [0, 0, 0])
+    for indice, valor in enumerate(medidas):
+        atual[indice] += sinal * valor
+
+
+def _valores_antes_depois(
+    session: Session,
+    obj: Pedido | Pagamento,
+    campos: tuple[str, ...],
+) -> tuple[dict[str, Any], dict[str, Any]]:
+    estado = inspect(obj)
+    antes: dict[str, Any] = {}
+    depois: dict[str, Any] = {}
+    sem_historico = False
+    for campo in campos:
+        historico = estado.attrs[campo].history
+        if historico.added:
+            depois[campo] = historico.added[0]
+            if historico.deleted:
+                antes[campo] = historico.deleted[0]
+            else:
+                sem_historico = True
+        elif historico.unchanged:
+            antes[campo] = depois[campo] = historico.unchanged[0]
+        else:
+            antes[campo] = depois[campo] = getattr(obj, campo)
+    if sem_historico:
+        # Atributo alterado sem valor anterior carregado: o banco ainda tem a linha antiga.
+        modelo = type(obj)
+        linha = session.connection().execute(
+            select(*(getattr(modelo, campo) for campo in campos)).where(modelo.id == obj.id)
+        ).one()
+        antes = dict(zip(campos, linha))
+    return antes, depois
+
+
+def _pagamentos_aprovados_no_banco(session: Session, pedido_id: int) -> list[dict[str, Any]]:
+    linhas = session.connection().execute(
+        select(*(getattr(Pagamento, campo) for campo in CAMPOS_PAGAMENTO)).where(
+            Pagamento.pedido_id == pedido_id,
+            Pagamento.status == StatusPagamento.APROVADO,
+        )
+    )
+    return [dict(zip(CAMPOS_PAGAMENTO, linha)) for linha in linhas]
+
+
+@event.listens_for(Session, "before_flush")
+def _atualizar_vendas_diarias(session: Session, _flush_context, _instances) -> None:
+    # Deltas por escrita ORM, aplicados na mesma transacao do flush. Escritas em
+    # lote via Core (update()/insert()) nao passam aqui: use reconstruir_vendas_diarias.
+    deltas: Deltas = {}
+
+    for obj in session.new:
+        if isinstance(obj, (Pedido, Pagamento)) and obj.criado_em is None:
+            # Fixa o instante antes do INSERT para o dia do rollup bater com a linha.
+            obj.criado_em = datetime.now()
+        if isinstance(obj, Pedido):
+            if obj.status is None:
+                obj.status = StatusPedido.ABERTO
+            valores = {campo: getattr(obj, campo) for campo in CAMPOS_PEDIDO}
+            _acumular(deltas, _contribuicao_pedido(valores), 1)
+        elif isinstance(obj, Pagamento):
+            if obj.status is None:
+                obj.status = StatusPagamento.APROVADO
+            valores = {campo: getattr(obj, campo) for campo in CAMPOS_PAGAMENTO}
+            _acumular(deltas, _contribuicao_pagamento(valores), 1)
+
+    for obj in session.dirty:
+        if isinstance(obj, Pedido):
+            contribuicao, campos = _contribuicao_pedido, CAMPOS_PEDIDO
+        elif isinstance(obj, Pagamento):
+            contribuicao, campos = _contribuicao_pagamento, CAMPOS_PAGAMENTO
+        else:
+            continue
+        if not session.is_modified(obj, include_collections=False):
+            continue
+        antes, depois = _valores_antes_depois(session, obj, campos)
+        _acumular(deltas, contribuicao(antes), -1)
+        _acumular(deltas, contribuicao(depois), 1)
+
+    for obj in session.deleted:
+        if isinstance(obj, Pedido):
+            antes, _depois = _valores_antes_depois(session, obj, CAMPOS_PEDIDO)
+            _acumular(deltas, _contribuicao_pedido(antes), -1)
+            if "pagamentos" not in inspect(obj).dict:
+                # Colecao nao carregada: o ON DELETE CASCADE remove os pagamentos sem passar pelo ORM.
+                for valores in _pagamentos_aprovados_no_banco(session, obj.id):
+                    _acumular(deltas, _contribuicao_pagamento(valores), -1)
+        elif isinstance(obj, Pagamento):
+            antes, _depois = _valores_antes_depois(session, obj, CAMPOS_PAGAMENTO)
+            _acumular(deltas, _contribuicao_pagamento(antes), -1)
+
+    linhas = [
+        {
+            "dia": dia,
+            "status": status,
+            "tipo_entrega": tipo_entrega,
+            "metodo": metodo,
+            "pedidos": pedidos,
+            "valor_pedidos": de_centavos(valor_pedidos),
+            "valor_recebido": de_centavos(valor_recebido),
+        }
+        for (dia, status, tipo_entrega, metodo), (pedidos, valor_pedidos, valor_recebido) in deltas.items()
+        if pedidos or valor_pedidos or valor_recebido
+    ]
+    if not linhas:
+        return
+    conn = session.connection()
+    stmt = insert_com_conflito(conn, VendaDiaria)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[
+            VendaDiaria.dia,
+            VendaDiaria.status,
+            VendaDiaria.tipo_entrega,
+            VendaDiaria.metodo,
+        ],
+        set_={
+            "pedidos": VendaDiaria.pedidos + stmt.excluded.pedidos,
+            "valor_pedidos": VendaDiaria.valor_pedidos + stmt.excluded.valor_pedidos,
+            "valor_recebido": VendaDiaria.valor_recebido + stmt.excluded.valor_recebido,
+        },
+    )
+    conn.execute(stmt, linhas)
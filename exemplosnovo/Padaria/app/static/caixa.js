@@ -154,6 +154,10 @@ const state = {
     timerId: null,
     busy: false,
     lastTick: null,
+    source: null,
+    streamOnline: false,
+    debounceId: null,
+    pendentes: novosPendentesRealtime(),
   },
   quickPay: {
     pag: { mode: "total", itemIds: [], comandaId: null, itemsTouched: false },
@@ -267,6 +271,7 @@ const el = {
   fechamentoData: document.getElementById("fechamento-data"),
   exportarCsv: document.getElementById("exportar-csv"),
   exportarCsvPeriodo: document.getElementById("exportar-csv-periodo"),
+  exportarLancamentosPeriodo: document.getElementById("exportar-lancamentos-periodo"),
   exportarRelatorioPeriodo: document.getElementById("exportar-relatorio-periodo"),
   fcTotalPedidos: document.getElementById("fc-total-pedidos"),
   fcTotalVendido: document.getElementById("fc-total-vendido"),
@@ -378,7 +383,8 @@ async function api(path, options = {}) {
   if (!isFormData && !headers["Content-Type"]) {
     headers["Content-Type"] = "application/json";
   }
-  const response = await fetch(path, { ...options, headers, cache: "no-store" });
+  // "no-cache" revalida com If-None-Match: respostas inalteradas voltam como 304.
+  const response = await fetch(path, { ...options, headers, cache: "no-cache" });
   const text = await response.text();
   let payload = null;
   if (text) {
@@ -1234,6 +1240,11 @@ function updateRealtimeStatusLabel() {
     el.tempoRealStatus.textContent = "Atualização automática pausada.";
     return;
   }
+  if (state.realtime.streamOnline) {
+    el.tempoRealStatus.textContent =
+      `Atualização instantânea (push). Ultima: ${formatTimeClock(state.realtime.lastTick)}.`;
+    return;
+  }
   el.tempoRealStatus.textContent =
     `Atualização automática a cada ${Math.round(state.realtime.intervalMs / 1000)}s. ` +
     `Ultima: ${formatTimeClock(state.realtime.lastTick)}.`;
@@ -1242,6 +1253,8 @@ function updateRealtimeStatusLabel() {
 async function tickRealtime() {
   if (!state.realtime.enabled || state.realtime.busy || document.hidden) return;
   state.realtime.busy = true;
+  // Recarga completa cobre tudo que estava pendente do stream.
+  state.realtime.pendentes = novosPendentesRealtime();
   try {
     await refreshComandasESelecionada();
     state.realtime.lastTick = new Date();
@@ -1253,17 +1266,173 @@ async function tickRealtime() {
   }
 }
 
+function novosPendentesRealtime() {
+  return { completo: false, codigos: false, pedidos: new Map() };
+}
+
+function temPendentesRealtime() {
+  const pendentes = state.realtime.pendentes;
+  return pendentes.completo || pendentes.codigos || pendentes.pedidos.size > 0;
+}
+
+function scheduleRealtimeTick() {
+  if (state.realtime.debounceId) return;
+  // Agrupa rajadas de eventos (ex.: varios itens lancados) em uma unica atualizacao.
+  state.realtime.debounceId = window.setTimeout(() => {
+    state.realtime.debounceId = null;
+    run(tickRealtimeEventos);
+  }, 250);
+}
+
+function lerEventoRealtime(ev) {
+  try {
+    return JSON.parse(ev.data || "{}");
+  } catch (_err) {
+    return {};
+  }
+}
+
+function handleRealtimeEvento(tipo, ev) {
+  const pendentes = state.realtime.pendentes;
+  const data = lerEventoRealtime(ev);
+  const pedidoId = Number(data.pedido_id || 0);
+  if (tipo === "resync" || (tipo === "comanda" && !pedidoId)) {
+    pendentes.completo = true;
+  } else if (tipo === "codigo") {
+    pendentes.codigos = true;
+  } else {
+    // Mesma comanda em varios eventos da rajada: basta uma leitura; "aberta" e
+    // "excluida" mudam a lista e prevalecem sobre alteracoes de item/status.
+    const anterior = pendentes.pedidos.get(pedidoId);
+    if (anterior !== "aberta" && anterior !== "excluida") {
+      pendentes.pedidos.set(pedidoId, data.acao || tipo);
+    }
+    if (tipo === "comanda" && !String(data.acao || "").startsWith("item")) {
+      pendentes.codigos = true;
+    }
+  }
+  scheduleRealtimeTick();
+}
+
+function resumoComandaLista(comanda) {
+  return {
+    id: comanda.id,
+    comanda_codigo: comanda.comanda_codigo,
+    mesa: comanda.mesa,
+    status: comanda.status,
+    tipo_entrega: comanda.tipo_entrega,
+    total: comanda.total,
+    total_itens: comanda.total_itens,
+    complexidade: comanda.complexidade,
+    criado_em: comanda.criado_em,
+  };
+}
+
+async function aplicarEventosComandas(pendentes) {
+  // Cada evento traz pedido_id/acao: so as comandas afetadas que este caixa mostra
+  // (linha da lista ou selecionada) sao relidas, uma por uma.
+  const recarregarLista = [...pendentes.pedidos.values()].includes("aberta");
+  if (recarregarLista) {
+    await loadComandas();
+  }
+  for (const [pedidoId, acao] of pendentes.pedidos) {
+    const selecionada = Boolean(state.selecionada && state.selecionada.id === pedidoId);
+    const indice = state.comandas.findIndex((row) => row.id === pedidoId);
+    if (acao === "excluida") {
+      if (indice >= 0) state.comandas.splice(indice, 1);
+      if (selecionada) {
+        state.selecionada = null;
+        renderSelecionada();
+        await loadPagamentos();
+      }
+      continue;
+    }
+    if (indice < 0 && !selecionada) continue;
+    const comanda = await api(`/comandas/${pedidoId}`);
+    if (indice >= 0 && !recarregarLista) {
+      state.comandas[indice] = resumoComandaLista(comanda);
+    }
+    if (selecionada) {
+      state.selecionada = comanda;
+      renderSelecionada();
+      await loadPagamentos();
+    }
+  }
+  renderComandas();
+  if (pendentes.codigos) {
+    await loadCodigos();
+  }
+}
+
+async function tickRealtimeEventos() {
+  if (!state.realtime.enabled || state.realtime.busy || document.hidden) return;
+  if (state.realtime.pendentes.completo) {
+    await tickRealtime();
+    return;
+  }
+  const pendentes = state.realtime.pendentes;
+  state.realtime.pendentes = novosPendentesRealtime();
+  state.realtime.busy = true;
+  try {
+    await aplicarEventosComandas(pendentes);
+    state.realtime.lastTick = new Date();
+    updateRealtimeStatusLabel();
+  } catch (_err) {
+    // Eventos desta rodada podem ter ficado pela metade: a proxima recarrega tudo.
+    state.realtime.pendentes.completo = true;
+  } finally {
+    state.realtime.busy = false;
+    if (temPendentesRealtime()) scheduleRealtimeTick();
+  }
+}
+
+function stopRealtimeStream() {
+  if (state.realtime.source) {
+    state.realtime.source.close();
+  }
+  state.realtime.source = null;
+  state.realtime.streamOnline = false;
+}
+
+function startRealtimeStream() {
+  if (state.realtime.source || typeof window.EventSource !== "function") return;
+  const source = new window.EventSource("/comandas/stream");
+  state.realtime.source = source;
+  source.onopen = () => {
+    state.realtime.streamOnline = true;
+    startRealtime();
+    // Eventos perdidos enquanto desconectado: a primeira rodada recarrega tudo.
+    state.realtime.pendentes.completo = true;
+    scheduleRealtimeTick();
+  };
+  source.onerror = () => {
+    // O EventSource reconecta sozinho; enquanto isso volta para o polling.
+    if (!state.realtime.streamOnline) return;
+    state.realtime.streamOnline = false;
+    startRealtime();
+  };
+  ["comanda", "codigo", "pagamento", "resync"].forEach((tipo) => {
+    source.addEventListener(tipo, (ev) => handleRealtimeEvento(tipo, ev));
+  });
+}
+
 function startRealtime() {
   if (state.realtime.timerId) {
     window.clearInterval(state.realtime.timerId);
+    state.realtime.timerId = null;
   }
   if (!state.realtime.enabled) {
+    stopRealtimeStream();
     updateRealtimeStatusLabel();
     return;
   }
-  state.realtime.timerId = window.setInterval(() => {
-    run(tickRealtime);
-  }, state.realtime.intervalMs);
+  startRealtimeStream();
+  if (!state.realtime.streamOnline) {
+    // Polling fica apenas como fallback quando o stream nao esta conectado.
+    state.realtime.timerId = window.setInterval(() => {
+      run(tickRealtime);
+    }, state.realtime.intervalMs);
+  }
   updateRealtimeStatusLabel();
 }
 
@@ -1969,25 +2138,18 @@ async function loadProdutos() {
   const categoria = el.produtoFiltroCategoria.value.trim().toLowerCase();
   if (busca) params.set("q", busca);
   if (ativo === "true" || ativo === "false") params.set("ativo", ativo);
+  // Paginas por cursor (keyset): sem OFFSET nem COUNT a cada pagina.
+  params.set("incluir_total", "false");
   const rows = [];
-  let page = 1;
-  let total = null;
   while (rows.length < PRODUTOS_MAX_CAIXA) {
-    params.set("page", String(page));
     const query = params.toString() ? `?${params.toString()}` : "";
     const payload = await api(`/produtos${query}`);
     const batch = Array.isArray(payload.items) ? payload.items : [];
     rows.push(...batch);
-    if (total === null && Number.isFinite(Number(payload.total))) {
-      total = Number(payload.total);
-    }
-    if (!batch.length || batch.length < PRODUTOS_PAGE_SIZE) {
-      break;
-    }
-    if (total !== null && rows.length >= total) {
+    if (!batch.length || !payload.next_cursor) {
       break;
     }
-    page += 1;
+    params.set("cursor", payload.next_cursor);
   }
   const loadedRows = rows.slice(0, PRODUTOS_MAX_CAIXA);
   state.produtos = categoria
@@ -2673,6 +2835,15 @@ function exportarCsvPeriodo() {
   );
 }
 
+function exportarLancamentosPeriodo() {
+  const { dataInicial, dataFinal } = getPeriodoFaturamentoSelecionado();
+  window.open(
+    `/relatorios/lancamentos.csv?data_inicial=${dataInicial}&data_final=${dataFinal}`,
+    "_blank",
+    "noopener"
+  );
+}
+
 function exportarRelatorioPeriodo() {
   const { dataInicial, dataFinal } = getPeriodoFaturamentoSelecionado();
   window.open(
@@ -3056,6 +3227,7 @@ function bind() {
   on(el.faturamentoForm, "submit", (event) => run(() => carregarFaturamentoPeriodo(event)));
   on(el.exportarCsv, "click", () => run(() => exportarCsv()));
   on(el.exportarCsvPeriodo, "click", () => run(() => exportarCsvPeriodo()));
+  on(el.exportarLancamentosPeriodo, "click", () => run(() => exportarLancamentosPeriodo()));
   on(el.exportarRelatorioPeriodo, "click", () => run(() => exportarRelatorioPeriodo()));
   [el.uiTheme, el.uiDensity, el.uiFontSize, el.uiRadius, el.uiContrast, el.uiLayout, el.uiMotion, el.uiShowIcons]
     .filter(Boolean)
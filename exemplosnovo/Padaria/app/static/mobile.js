@@ -85,6 +85,7 @@ const state = {
   sugestoes: [],
   comandas: [],
   painelComandas: [],
+  painelVersao: null,
   painelFiltroStatus: "EM_PREPARO",
   historicoCupons: [],
   erpConfig: { ...DEFAULT_ERP_CONFIG },
@@ -101,6 +102,15 @@ const state = {
     intervalMs: 5000,
     timerId: null,
     busy: false,
+    source: null,
+    streamOnline: false,
+    debounceId: null,
+    pendentes: novosPendentesRealtime(),
+  },
+  loteRapido: {
+    pedidoId: null,
+    itens: new Map(),
+    timerId: null,
   },
 };
 
@@ -203,13 +213,12 @@ const el = {
 const money = new Intl.NumberFormat("pt-BR", { minimumFractionDigits: 2, maximumFractionDigits: 2 });
 const STATUS_EDITAVEIS_ITENS = new Set(["ABERTO", "EM_PREPARO", "PRONTO"]);
 const STATUS_PAINEL_EDITAVEL = new Set(["ABERTO", "EM_PREPARO", "PRONTO"]);
-const PRODUTOS_PAGE_SIZE = 500;
 const PRODUTOS_MAX_MOBILE = 5000;
-const ADICIONAIS_PAGE_SIZE = 500;
 const ADICIONAIS_MAX_MOBILE = 3000;
 const CATALOG_QUICK_QTY_MIN = 1;
 const CATALOG_QUICK_QTY_MAX = 99;
 const CATALOG_QUICK_QTY_DEFAULT = 1;
+const QUICK_BATCH_DELAY_MS = 400;
 
 function showToast(msg, error = false) {
   el.toast.textContent = msg;
@@ -610,8 +619,10 @@ function statusLabel(status) {
 }
 
 async function api(path, options = {}) {
-  const headers = { "Content-Type": "application/json", ...(options.headers || {}) };
-  const response = await fetch(path, { ...options, headers, cache: "no-store" });
+  const { aoReceberVersao, ...init } = options;
+  const headers = { "Content-Type": "application/json", ...(init.headers || {}) };
+  // "no-cache" revalida com If-None-Match: respostas inalteradas voltam como 304.
+  const response = await fetch(path, { ...init, headers, cache: "no-cache" });
   const text = await response.text();
   let payload = null;
   if (text) {
@@ -622,12 +633,28 @@ async function api(path, options = {}) {
     }
   }
   if (!response.ok) {
+    if (response.status === 409 && payload && payload.atual) {
+      // Outro aparelho alterou a comanda: mostra o estado atual para o usuario refazer.
+      if (state.selecionada && state.selecionada.id === payload.atual.id) {
+        state.selecionada = payload.atual;
+        renderSelecionada();
+      }
+    }
     const message = payload && payload.detail ? payload.detail : `Erro ${response.status}`;
     throw new Error(message);
   }
+  if (aoReceberVersao) {
+    aoReceberVersao(response.headers.get("X-Data-Version"));
+  }
   return payload;
 }
 
+function versaoSelecionada() {
+  // If-Match com a versao exibida: edicao sobre dado velho volta 409 em vez de sobrescrever.
+  if (!state.selecionada || !state.selecionada.versao) return {};
+  return { "If-Match": `"${state.selecionada.versao}"` };
+}
+
 function normalizeText(value) {
   return String(value || "").toLowerCase().trim();
 }
@@ -1596,26 +1623,13 @@ async function carregarCodigosDisponiveis() {
   });
 }
 
-async function carregarProdutos() {
-  const produtos = [];
-  let page = 1;
-  let total = null;
-  while (produtos.length < PRODUTOS_MAX_MOBILE) {
-    const data = await api(`/produtos?page=${page}&page_size=${PRODUTOS_PAGE_SIZE}&ativo=true`);
-    const items = Array.isArray(data.items) ? data.items : [];
-    produtos.push(...items);
-    if (total === null && Number.isFinite(Number(data.total))) {
-      total = Number(data.total);
-    }
-    if (!items.length || items.length < PRODUTOS_PAGE_SIZE) {
-      break;
-    }
-    if (total !== null && produtos.length >= total) {
-      break;
-    }
-    page += 1;
-  }
+async function carregarCatalogo() {
+  // Produtos, adicionais e vínculos vêm de um único snapshot versionado (ETag/304).
+  const catalogo = await api("/catalogo");
+  const produtos = Array.isArray(catalogo.produtos) ? catalogo.produtos : [];
+  const adicionais = Array.isArray(catalogo.adicionais) ? catalogo.adicionais : [];
   state.produtos = produtos.slice(0, PRODUTOS_MAX_MOBILE);
+  state.adicionais = adicionais.slice(0, ADICIONAIS_MAX_MOBILE);
   const produtoAtual = Number(el.produtoId.value || "0");
   el.produtoId.innerHTML = "";
   const placeholder = document.createElement("option");
@@ -1636,29 +1650,33 @@ async function carregarProdutos() {
   renderCatalogo();
 }
 
-async function carregarAdicionais() {
-  const adicionais = [];
-  let offset = 0;
-  while (adicionais.length < ADICIONAIS_MAX_MOBILE) {
-    const batch = await api(
-      `/adicionais?ativo=true&offset=${offset}&limit=${ADICIONAIS_PAGE_SIZE}`
-    );
-    if (!Array.isArray(batch) || !batch.length) {
-      break;
-    }
-    adicionais.push(...batch);
-    if (batch.length < ADICIONAIS_PAGE_SIZE) {
-      break;
-    }
-    offset += ADICIONAIS_PAGE_SIZE;
+async function carregarPainelComandas({ incremental = false } = {}) {
+  if (incremental && state.painelVersao !== null) {
+    // So as linhas dos codigos alterados desde a versao que este aparelho ja tem.
+    aplicarDeltaPainel(await api(`/comandas/painel?ativo=true&since=${state.painelVersao}`));
+  } else {
+    state.painelComandas = await api("/comandas/painel?ativo=true", {
+      aoReceberVersao: (versao) => {
+        state.painelVersao = versao === null ? null : Number(versao);
+      },
+    });
   }
-  state.adicionais = adicionais.slice(0, ADICIONAIS_MAX_MOBILE);
-  renderAdicionaisPicker();
+  renderPainelComandas();
 }
 
-async function carregarPainelComandas() {
-  state.painelComandas = await api("/comandas/painel?ativo=true");
-  renderPainelComandas();
+function aplicarDeltaPainel(delta) {
+  state.painelVersao = delta.versao;
+  if (delta.completo) {
+    state.painelComandas = delta.itens;
+    return;
+  }
+  const porCodigo = new Map((state.painelComandas || []).map((linha) => [linha.codigo, linha]));
+  delta.itens.forEach((linha) => porCodigo.set(linha.codigo, linha));
+  (delta.removidos || []).forEach((codigo) => porCodigo.delete(codigo));
+  // Mesma ordem do servidor (codigo asc).
+  state.painelComandas = [...porCodigo.values()].sort((a, b) =>
+    a.codigo < b.codigo ? -1 : a.codigo > b.codigo ? 1 : 0,
+  );
 }
 
 async function carregarHistoricoCupons() {
@@ -1745,7 +1763,11 @@ async function carregarSugestoes() {
 }
 
 async function selecionarComanda(id) {
-  state.selecionada = await api(`/comandas/${id}`);
+  mostrarComandaSelecionada(await api(`/comandas/${id}`));
+}
+
+function mostrarComandaSelecionada(comanda) {
+  state.selecionada = comanda;
   if (
     state.itemEditId &&
     !(state.selecionada.itens || []).some((item) => item.id === state.itemEditId)
@@ -1884,6 +1906,7 @@ async function adicionarItem(event) {
   if (editando) {
     await api(`/comandas/${state.selecionada.id}/itens/${state.itemEditId}`, {
       method: "PUT",
+      headers: versaoSelecionada(),
       body: JSON.stringify(payload),
     });
   } else {
@@ -1916,20 +1939,47 @@ async function adicionarItemRapido(produtoId, quantidade = 1) {
   if (!state.produtos.some((row) => row.id === produtoValido)) {
     throw new Error("Produto não encontrado.");
   }
-  await api(`/comandas/${state.selecionada.id}/itens`, {
+  const lote = state.loteRapido;
+  if (lote.pedidoId && lote.pedidoId !== state.selecionada.id) {
+    await enviarLoteRapido();
+  }
+  lote.pedidoId = state.selecionada.id;
+  const acumulado = (lote.itens.get(produtoValido) || 0) + quantidadeValida;
+  lote.itens.set(produtoValido, Math.min(acumulado, CATALOG_QUICK_QTY_MAX));
+  // Toques seguidos no catálogo viram uma única requisição em lote.
+  if (lote.timerId) window.clearTimeout(lote.timerId);
+  lote.timerId = window.setTimeout(() => run(enviarLoteRapido), QUICK_BATCH_DELAY_MS);
+}
+
+async function enviarLoteRapido() {
+  const lote = state.loteRapido;
+  if (lote.timerId) {
+    window.clearTimeout(lote.timerId);
+    lote.timerId = null;
+  }
+  if (!lote.pedidoId || !lote.itens.size) return;
+  const pedidoId = lote.pedidoId;
+  const adicionar = Array.from(lote.itens, ([produtoId, quantidade]) => ({
+    produto_id: produtoId,
+    quantidade,
+    desconto: "0.00",
+    observacoes: null,
+    adicionais: [],
+  }));
+  lote.pedidoId = null;
+  lote.itens = new Map();
+  await api(`/comandas/${pedidoId}/itens:batch`, {
     method: "POST",
-    body: JSON.stringify({
-      produto_id: produtoValido,
-      quantidade: quantidadeValida,
-      desconto: "0.00",
-      observacoes: null,
-      adicionais: [],
-    }),
+    body: JSON.stringify({ adicionar }),
   });
-  await selecionarComanda(state.selecionada.id);
+  if (state.selecionada && state.selecionada.id === pedidoId) {
+    await selecionarComanda(pedidoId);
+  }
   await carregarComandasAbertas();
   await carregarSugestoes();
-  showToast("Item adicionado rapidamente.");
+  showToast(
+    adicionar.length > 1 ? `${adicionar.length} itens adicionados.` : "Item adicionado rapidamente."
+  );
 }
 
 async function mudarStatus(status) {
@@ -1945,6 +1995,7 @@ async function mudarStatus(status) {
   }
   await api(`/comandas/${state.selecionada.id}/status`, {
     method: "PATCH",
+    headers: versaoSelecionada(),
     body: JSON.stringify({ status, repor_estoque: reporEstoque }),
   });
   await carregarComandasAbertas();
@@ -1974,7 +2025,10 @@ async function removerItem(itemId) {
   if (!isComandaEditavel(state.selecionada)) {
     throw new Error("Status atual não permite remover itens.");
   }
-  await api(`/comandas/${state.selecionada.id}/itens/${itemId}`, { method: "DELETE" });
+  await api(`/comandas/${state.selecionada.id}/itens/${itemId}`, {
+    method: "DELETE",
+    headers: versaoSelecionada(),
+  });
   if (state.itemEditId === itemId) {
     resetItemFormMode();
   }
@@ -1995,6 +2049,7 @@ async function moverItem(itemId) {
   }
   await api(`/comandas/${state.selecionada.id}/itens/${itemId}/mover`, {
     method: "POST",
+    headers: versaoSelecionada(),
     body: JSON.stringify({ destino_pedido_id: destinoPedidoId }),
   });
   if (state.itemEditId === itemId) {
@@ -2057,6 +2112,8 @@ async function run(fn) {
 async function tickRealtimeMobile() {
   if (!state.realtime.enabled || state.realtime.busy || document.hidden) return;
   state.realtime.busy = true;
+  // Recarga completa cobre tudo que estava pendente do stream.
+  state.realtime.pendentes = novosPendentesRealtime();
   try {
     const selectedId = state.selecionada ? state.selecionada.id : null;
     await carregarComandasAbertas();
@@ -2092,11 +2149,161 @@ async function tickRealtimeMobile() {
   }
 }
 
+function novosPendentesRealtime() {
+  return { completo: false, painel: false, pedidos: new Map() };
+}
+
+function temPendentesRealtime() {
+  const pendentes = state.realtime.pendentes;
+  return pendentes.completo || pendentes.painel || pendentes.pedidos.size > 0;
+}
+
+function scheduleRealtimeMobileTick() {
+  if (state.realtime.debounceId) return;
+  state.realtime.debounceId = window.setTimeout(() => {
+    state.realtime.debounceId = null;
+    run(tickRealtimeMobileEventos);
+  }, 250);
+}
+
+function handleRealtimeMobileEvento(tipo, ev) {
+  const pendentes = state.realtime.pendentes;
+  let data = {};
+  try {
+    data = JSON.parse(ev.data || "{}");
+  } catch (_err) {
+    data = {};
+  }
+  const pedidoId = Number(data.pedido_id || 0);
+  if (tipo === "resync" || (tipo === "comanda" && !pedidoId)) {
+    pendentes.completo = true;
+  } else if (tipo === "comanda") {
+    const anterior = pendentes.pedidos.get(pedidoId);
+    if (anterior !== "aberta" && anterior !== "excluida") {
+      pendentes.pedidos.set(pedidoId, data.acao || tipo);
+    }
+  }
+  // Toda comanda/codigo alterado aparece no painel: vem pelo delta ?since=.
+  pendentes.painel = true;
+  scheduleRealtimeMobileTick();
+}
+
+function resumoComandaLista(comanda) {
+  return {
+    id: comanda.id,
+    comanda_codigo: comanda.comanda_codigo,
+    mesa: comanda.mesa,
+    status: comanda.status,
+    tipo_entrega: comanda.tipo_entrega,
+    total: comanda.total,
+    total_itens: comanda.total_itens,
+    complexidade: comanda.complexidade,
+    criado_em: comanda.criado_em,
+  };
+}
+
+async function aplicarEventosComandasMobile(pendentes) {
+  await carregarPainelComandas({ incremental: true });
+  for (const [pedidoId, acao] of pendentes.pedidos) {
+    const selecionada = Boolean(state.selecionada && state.selecionada.id === pedidoId);
+    const indice = state.comandas.findIndex((row) => row.id === pedidoId);
+    if (acao === "excluida") {
+      if (indice >= 0) state.comandas.splice(indice, 1);
+      if (selecionada) {
+        state.selecionada = null;
+        renderSelecionada();
+      }
+      continue;
+    }
+    // Comanda que este aparelho nao mostra nem acabou de ser aberta: nada a reler.
+    if (indice < 0 && !selecionada && acao !== "aberta") continue;
+    const comanda = await api(`/comandas/${pedidoId}`);
+    if (comanda.status === "CANCELADO") {
+      if (indice >= 0) state.comandas.splice(indice, 1);
+    } else if (indice >= 0) {
+      state.comandas[indice] = resumoComandaLista(comanda);
+    } else {
+      // Lista em ordem de id desc: comanda nova entra no topo.
+      state.comandas.unshift(resumoComandaLista(comanda));
+    }
+    if (selecionada) {
+      if (comanda.status === "CANCELADO") {
+        state.selecionada = null;
+        renderSelecionada();
+      } else {
+        mostrarComandaSelecionada(comanda);
+      }
+    }
+  }
+  renderComandaPicker();
+
+  const editaveis = comandasParaAlteracao();
+  if (state.anotando && !state.selecionada && editaveis.length) {
+    await selecionarComanda(editaveis[0].id);
+  }
+}
+
+async function tickRealtimeMobileEventos() {
+  if (!state.realtime.enabled || state.realtime.busy || document.hidden) return;
+  if (state.realtime.pendentes.completo) {
+    await tickRealtimeMobile();
+    return;
+  }
+  const pendentes = state.realtime.pendentes;
+  state.realtime.pendentes = novosPendentesRealtime();
+  state.realtime.busy = true;
+  try {
+    await aplicarEventosComandasMobile(pendentes);
+  } catch (_err) {
+    // Eventos desta rodada podem ter ficado pela metade: a proxima recarrega tudo.
+    state.realtime.pendentes.completo = true;
+  } finally {
+    state.realtime.busy = false;
+    if (temPendentesRealtime()) scheduleRealtimeMobileTick();
+  }
+}
+
+function stopRealtimeMobileStream() {
+  if (state.realtime.source) {
+    state.realtime.source.close();
+  }
+  state.realtime.source = null;
+  state.realtime.streamOnline = false;
+}
+
+function startRealtimeMobileStream() {
+  if (state.realtime.source || typeof window.EventSource !== "function") return;
+  const source = new window.EventSource("/comandas/stream");
+  state.realtime.source = source;
+  source.onopen = () => {
+    state.realtime.streamOnline = true;
+    startRealtimeMobile();
+    // Eventos perdidos enquanto desconectado: a primeira rodada recarrega tudo.
+    state.realtime.pendentes.completo = true;
+    scheduleRealtimeMobileTick();
+  };
+  source.onerror = () => {
+    // O EventSource reconecta sozinho; enquanto isso volta para o polling.
+    if (!state.realtime.streamOnline) return;
+    state.realtime.streamOnline = false;
+    startRealtimeMobile();
+  };
+  ["comanda", "codigo", "resync"].forEach((tipo) => {
+    source.addEventListener(tipo, (ev) => handleRealtimeMobileEvento(tipo, ev));
+  });
+}
+
 function startRealtimeMobile() {
   if (state.realtime.timerId) {
     window.clearInterval(state.realtime.timerId);
+    state.realtime.timerId = null;
+  }
+  if (!state.realtime.enabled) {
+    stopRealtimeMobileStream();
+    return;
   }
-  if (!state.realtime.enabled) return;
+  startRealtimeMobileStream();
+  if (state.realtime.streamOnline) return;
   state.realtime.timerId = window.setInterval(() => {
     run(tickRealtimeMobile);
   }, state.realtime.intervalMs);
@@ -2312,8 +2519,7 @@ document.addEventListener("DOMContentLoaded", async () => {
       run(tickRealtimeMobile);
     }
   });
-  await run(carregarProdutos);
-  await run(carregarAdicionais);
+  await run(carregarCatalogo);
   await run(carregarSugestoes);
   await run(carregarCodigosDisponiveis);
   await run(carregarComandasAbertas);
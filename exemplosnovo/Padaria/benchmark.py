@@ -0,0 +1,343 @@
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import shutil
+import sqlite3
+import sys
+from collections.abc import Callable
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from statistics import mean, median, quantiles
+from time import perf_counter
+from typing import Any, NamedTuple
+
+from sqlalchemy import create_engine, event, insert, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+
+import seed
+from app.db.session import configurar_sqlite
+from app.models.comanda_codigo import ComandaCodigo
+from app.models.enums import MetodoPagamento, StatusPedido
+from app.models.produto import Produto
+from app.schemas.comanda import ComandaAbrirIn, ComandaItemCreate
+from app.schemas.pagamento import PagamentoCreate
+from app.services import comanda_service, estoque_service, pagamento_service, relatorio_service
+
+
+class Tamanho(NamedTuple):
+    pedidos: int
+    dias: int
+    codigos: int
+
+
+# Bancos gerados pelo seed.gerar_carga; ficam em cache no --dir entre execucoes.
+TAMANHOS = {
+    "pequeno": Tamanho(pedidos=2_000, dias=30, codigos=50),
+    "medio": Tamanho(pedidos=100_000, dias=180, codigos=200),
+    "grande": Tamanho(pedidos=1_000_000, dias=730, codigos=300),
+}
+OPERACOES = (
+    "abrir_comanda",
+    "add_item",
+    "get_comanda",
+    "change_status",
+    "create_pagamento_manual",
+    "list_painel_comandas",
+    "list_comandas",
+    "fechamento_caixa",
+    "faturamento_periodo",
+)
+SEMENTE = 42
+VERSAO_FORMATO = 1
+
+
+def executar(
+    tamanhos: dict[str, Tamanho],
+    rodadas: int = 30,
+    diretorio: Path = Path(".bench"),
+) -> dict[str, Any]:
+    resultado: dict[str, Any] = {
+        "versao": VERSAO_FORMATO,
+        "executado_em": datetime.now().isoformat(timespec="seconds"),
+        "rodadas": rodadas,
+        "ambiente": {
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "plataforma": platform.platform(),
+        },
+        "tamanhos": {},
+    }
+    diretorio.mkdir(parents=True, exist_ok=True)
+    for nome, tamanho in tamanhos.items():
+        base, meta = _banco_base(diretorio, nome, tamanho)
+        copia = diretorio / f"padaria_{nome}.run.db"
+        # Cada execucao parte do mesmo banco: as escritas medidas nao se acumulam.
+        _remover_banco(copia)
+        shutil.copyfile(base, copia)
+        try:
+            operacoes = _medir(copia, date.fromisoformat(meta["gerado_em"]) - timedelta(days=1), rodadas)
+        finally:
+            _remover_banco(copia)
+        resultado["tamanhos"][nome] = {"banco": meta, "operacoes": operacoes}
+    return resultado
+
+
+def comparar(
+    base: dict[str, Any],
+    atual: dict[str, Any],
+    limite_pct: float = 20.0,
+    tolerancia_ms: float = 0.5,
+) -> list[dict[str, Any]]:
+    # p50/p95 so contam como regressao acima do limite percentual E da tolerancia
+    # absoluta (ruido em operacoes de microssegundos); consultas sao deterministicas
+    # e qualquer aumento conta.
+    linhas = []
+    for nome, medidas in atual["tamanhos"].items():
+        anteriores = base["tamanhos"].get(nome, {}).get("operacoes", {})
+        for operacao, metricas in medidas["operacoes"].items():
+            anterior = anteriores.get(operacao)
+            if anterior is None:
+                continue
+            for metrica in ("p50_ms", "p95_ms", "consultas"):
+                antes, depois = anterior[metrica], metricas[metrica]
+                variacao = (depois - antes) / antes * 100 if antes else 0.0
+                if metrica == "consultas":
+                    regressao = depois > antes
+                else:
+                    regressao = variacao > limite_pct and depois - antes > tolerancia_ms
+                linhas.append(
+                    {
+                        "tamanho": nome,
+                        "operacao": operacao,
+                        "metrica": metrica,
+                        "base": antes,
+                        "atual": depois,
+                        "variacao_pct": round(variacao, 1),
+                        "regressao": regressao,
+                    }
+                )
+    return linhas
+
+
+def _banco_base(diretorio: Path, nome: str, tamanho: Tamanho) -> tuple[Path, dict[str, Any]]:
+    caminho = diretorio / f"padaria_{nome}.db"
+    arquivo_meta = caminho.with_suffix(".json")
+    esperado = {**tamanho._asdict(), "semente": SEMENTE}
+    if caminho.exists() and arquivo_meta.exists():
+        meta = json.loads(arquivo_meta.read_text(encoding="utf-8"))
+        if {chave: meta.get(chave) for chave in esperado} == esperado:
+            return caminho, meta
+
+    _remover_banco(caminho)
+    print(f"Gerando banco {nome} ({tamanho.pedidos} pedidos em {tamanho.dias} dias)...")
+    engine = _criar_engine(caminho)
+    try:
+        seed.run_seed(engine)
+        seed.gerar_carga(engine, tamanho.pedidos, tamanho.dias, tamanho.codigos, semente=SEMENTE)
+        with engine.connect() as conn:
+            conn.execute(text("PRAGMA wal_checkpoint(TRUNCATE)"))
+    finally:
+        engine.dispose()
+    # O historico vai ate a vespera da geracao: os relatorios usam essa data,
+    # entao o mesmo banco mede o mesmo volume em qualquer dia.
+    meta = {**esperado, "gerado_em": date.today().isoformat()}
+    arquivo_meta.write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    return caminho, meta
+
+
+def _medir(caminho: Path, data_ref: date, rodadas: int) -> dict[str, dict[str, float]]:
+    engine = _criar_engine(caminho)
+    consultas = [0]
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _contar(*_args):
+        consultas[0] += 1
+
+    Sessao = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False, future=True)
+    tempos: dict[str, list[float]] = {operacao: [] for operacao in OPERACOES}
+    contagens: dict[str, list[int]] = {operacao: [] for operacao in OPERACOES}
+
+    def cronometrar(operacao: str, fn: Callable[[], Any]) -> Any:
+        # Cache de leitura limpo antes de cada chamada: mede o caminho frio, que e o
+        # que cresce com o banco; um acerto de cache custa o mesmo em qualquer tamanho.
+        comanda_service.invalidate_read_caches()
+        consultas[0] = 0
+        inicio = perf_counter()
+        retorno = fn()
+        tempos[operacao].append(perf_counter() - inicio)
+        contagens[operacao].append(consultas[0])
+        return retorno
+
+    try:
+        with Sessao() as db:
+            produto_id = _preparar(db, rodadas + 1)
+        filtros = {
+            "status_filter": None,
+            "tipo_entrega": None,
+            "codigo": None,
+            "mesa": None,
+            "data_inicial": None,
+            "data_final": None,
+            "total_min": None,
+            "total_max": None,
+            "order_by": "criado_em",
+            "order_dir": "desc",
+            "limit": 50,
+        }
+        # Rodada 0 aquece conexao, statement cache e paginas do SQLite; fica de fora.
+        for rodada in range(rodadas + 1):
+            with Sessao() as db:
+                comanda = cronometrar(
+                    "abrir_comanda",
+                    lambda: comanda_service.abrir_comanda(
+                        db, ComandaAbrirIn(codigo=f"BENCH-{rodada:04d}", mesa=str(rodada % 40))
+                    ),
+                )
+                pedido_id = comanda["id"]
+                cronometrar(
+                    "add_item",
+                    lambda: comanda_service.add_item(db, pedido_id, ComandaItemCreate(produto_id=produto_id, quantidade=2)),
+                )
+                comanda = cronometrar("get_comanda", lambda: comanda_service.get_comanda(db, pedido_id))
+                cronometrar(
+                    "change_status",
+                    lambda: comanda_service.change_status(db, pedido_id, StatusPedido.EM_PREPARO),
+                )
+                cronometrar(
+                    "create_pagamento_manual",
+                    lambda: pagamento_service.create_pagamento_manual(
+                        db, PagamentoCreate(pedido_id=pedido_id, valor=comanda["total"], metodo=MetodoPagamento.PIX)
+                    ),
+                )
+                cronometrar("list_painel_comandas", lambda: comanda_service.list_painel_comandas(db))
+                cronometrar("list_comandas", lambda: comanda_service.list_comandas(db, **filtros))
+                cronometrar("fechamento_caixa", lambda: relatorio_service.fechamento_caixa(db, data_ref))
+                cronometrar(
+                    "faturamento_periodo",
+                    lambda: relatorio_service.faturamento_periodo(db, data_ref - timedelta(days=29), data_ref),
+                )
+    finally:
+        comanda_service.invalidate_read_caches()
+        engine.dispose()
+
+    return {
+        operacao: _resumir(tempos[operacao][1:], contagens[operacao][1:])
+        for operacao in OPERACOES
+    }
+
+
+def _preparar(db: Session, rodadas: int) -> int:
+    # Codigos livres para abrir uma comanda por rodada e estoque de sobra para os itens.
+    existentes = set(db.scalars(select(ComandaCodigo.codigo).where(ComandaCodigo.codigo.like("BENCH-%"))))
+    novos = [
+        {"codigo": f"BENCH-{indice:04d}", "ativo": True, "em_uso": False}
+        for indice in range(rodadas)
+        if f"BENCH-{indice:04d}" not in existentes
+    ]
+    if novos:
+        db.execute(insert(ComandaCodigo), novos)
+    produto_id = db.scalar(
+        select(Produto.id).where(Produto.ativo.is_(True)).order_by(Produto.estoque_atual.desc()).limit(1)
+    )
+    if produto_id is None:
+        raise SystemExit("Banco sem produto ativo para o benchmark.")
+    estoque_service.ajustar(db, produto_id, rodadas * 2)
+    db.commit()
+    return produto_id
+
+
+def _resumir(tempos: list[float], contagens: list[int]) -> dict[str, float]:
+    milissegundos = sorted(tempo * 1000 for tempo in tempos)
+    p95 = quantiles(milissegundos, n=100, method="inclusive")[94] if len(milissegundos) > 1 else milissegundos[0]
+    return {
+        "p50_ms": round(median(milissegundos), 3),
+        "p95_ms": round(p95, 3),
+        "media_ms": round(mean(milissegundos), 3),
+        "max_ms": round(milissegundos[-1], 3),
+        "consultas": round(mean(contagens), 2),
+        "amostras": len(milissegundos),
+    }
+
+
+def _criar_engine(caminho: Path) -> Engine:
+    engine = create_engine(f"sqlite:///{caminho}", future=True)
+    event.listen(engine, "connect", configurar_sqlite)
+    return engine
+
+
+def _remover_banco(caminho: Path) -> None:
+    for sufixo in ("", "-wal", "-shm"):
+        Path(f"{caminho}{sufixo}").unlink(missing_ok=True)
+
+
+def _imprimir_resultado(resultado: dict[str, Any]) -> None:
+    for nome, medidas in resultado["tamanhos"].items():
+        print(f"\n[{nome}] {medidas['banco']['pedidos']} pedidos, {resultado['rodadas']} rodadas")
+        print(f"  {'operacao':<26}{'p50 ms':>10}{'p95 ms':>10}{'consultas':>11}")
+        for operacao, metricas in medidas["operacoes"].items():
+            print(
+                f"  {operacao:<26}{metricas['p50_ms']:>10.2f}{metricas['p95_ms']:>10.2f}"
+                f"{metricas['consultas']:>11g}"
+            )
+
+
+def run_benchmark(nomes: list[str], rodadas: int, diretorio: Path, saida: Path, base: Path | None, limite: float) -> int:
+    resultado = executar({nome: TAMANHOS[nome] for nome in nomes}, rodadas, diretorio)
+    saida.parent.mkdir(parents=True, exist_ok=True)
+    saida.write_text(json.dumps(resultado, indent=2, ensure_ascii=False), encoding="utf-8")
+    _imprimir_resultado(resultado)
+    print(f"\nResultado gravado em {saida}")
+    if base is None:
+        return 0
+    return run_compare(base, saida, limite)
+
+
+def run_compare(base: Path, atual: Path, limite: float, tolerancia_ms: float = 0.5) -> int:
+    linhas = comparar(
+        json.loads(base.read_text(encoding="utf-8")),
+        json.loads(atual.read_text(encoding="utf-8")),
+        limite,
+        tolerancia_ms,
+    )
+    regressoes = [linha for linha in linhas if linha["regressao"]]
+    for linha in linhas:
+        marca = "REGRESSAO" if linha["regressao"] else ""
+        print(
+            f"  {linha['tamanho']:<8}{linha['operacao']:<26}{linha['metrica']:<10}"
+            f"{linha['base']:>10g} -> {linha['atual']:<10g}{linha['variacao_pct']:>+8.1f}%  {marca}"
+        )
+    print(f"\n{len(regressoes)} regressao(oes) acima de {limite:g}% (base {base}, atual {atual})")
+    return 1 if regressoes else 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark dos servicos quentes em bancos gerados.")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    run = sub.add_parser("run", help="Mede p50/p95 e consultas por operacao e grava o JSON.")
+    run.add_argument("--tamanho", nargs="+", choices=list(TAMANHOS), default=["pequeno"])
+    run.add_argument("--rodadas", type=int, default=30, help="chamadas medidas por operacao")
+    run.add_argument("--dir", type=Path, default=Path(".bench"), help="cache dos bancos gerados")
+    run.add_argument("--saida", type=Path, default=Path(".bench/resultado.json"))
+    run.add_argument("--base", type=Path, default=None, help="JSON anterior para comparar no fim")
+    run.add_argument("--limite", type=float, default=20.0, help="regressao acima de X%% (p50/p95)")
+
+    compare = sub.add_parser("compare", help="Compara dois JSON e sai com 1 se houver regressao.")
+    compare.add_argument("base", type=Path)
+    compare.add_argument("atual", type=Path)
+    compare.add_argument("--limite", type=float, default=20.0, help="regressao acima de X%% (p50/p95)")
+    compare.add_argument("--tolerancia-ms", type=float, default=0.5, help="ignora variacoes menores que isso")
+
+    args = parser.parse_args(argv)
+    if args.comando == "run":
+        return run_benchmark(args.tamanho, args.rodadas, args.dir, args.saida, args.base, args.limite)
+    if args.comando == "compare":
+        return run_compare(args.base, args.atual, args.limite, args.tolerancia_ms)
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
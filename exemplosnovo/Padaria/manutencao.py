@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from datetime import date
+
+from app.db.base import Base
+from app.db.bootstrap import ensure_schema
+from app.db.session import SessionLocal, engine
+from app.services import busca_service, manutencao_service, vendas_diarias_service
+
+
+def run_verify_totals(corrigir: bool) -> int:
+    Base.metadata.create_all(bind=engine)
+    ensure_schema(engine)
+    with SessionLocal() as db:
+        relatorio = manutencao_service.verificar_totais(db, corrigir=corrigir)
+    print(json.dumps(relatorio, indent=2, ensure_ascii=False, default=str))
+    divergencias = relatorio["itens_divergentes"] + relatorio["pedidos_divergentes"]
+    return 1 if divergencias and not relatorio["corrigido"] else 0
+
+
+def run_rebuild_vendas_diarias(data_inicial: date | None, data_final: date | None) -> int:
+    Base.metadata.create_all(bind=engine)
+    ensure_schema(engine)
+    with SessionLocal() as db:
+        relatorio = vendas_diarias_service.reconstruir_vendas_diarias(db, data_inicial, data_final)
+    print(json.dumps(relatorio, indent=2, ensure_ascii=False, default=str))
+    return 0
+
+
+def run_repair_ponteiros_comanda() -> int:
+    Base.metadata.create_all(bind=engine)
+    ensure_schema(engine)
+    with SessionLocal() as db:
+        relatorio = manutencao_service.reparar_ponteiros_comanda(db)
+    print(json.dumps(relatorio, indent=2, ensure_ascii=False, default=str))
+    return 0
+
+
+def run_audit_estoque(corrigir: bool) -> int:
+    Base.metadata.create_all(bind=engine)
+    ensure_schema(engine)
+    with SessionLocal() as db:
+        relatorio = manutencao_service.auditar_estoque(db, corrigir=corrigir)
+    print(json.dumps(relatorio, indent=2, ensure_ascii=False, default=str))
+    return 1 if relatorio["produtos_divergentes"] and not relatorio["corrigido"] else 0
+
+
+def run_rebuild_busca() -> int:
+    Base.metadata.create_all(bind=engine)
+    ensure_schema(engine)
+    with engine.begin() as conn:
+        busca_service.reconstruir_busca(conn)
+    print(json.dumps({"reconstruido": True}, indent=2))
+    return 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Comandos de manutencao do banco.")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    verify = sub.add_parser(
+        "verify_totals",
+        help="Recalcula subtotais de itens e totais de comandas e reporta divergencias.",
+    )
+    verify.add_argument("--corrigir", action="store_true", help="Grava os valores recalculados.")
+
+    rebuild = sub.add_parser(
+        "rebuild_vendas_diarias",
+        help="Reconstroi o rollup vendas_diarias a partir de pedidos e pagamentos.",
+    )
+    rebuild.add_argument("--de", type=date.fromisoformat, default=None, help="YYYY-MM-DD (padrao: tudo)")
+    rebuild.add_argument("--ate", type=date.fromisoformat, default=None, help="YYYY-MM-DD (padrao: tudo)")
+
+    sub.add_parser(
+        "repair_ponteiros_comanda",
+        help="Reconstroi do zero o pedido atual (pedido_atual_id) de cada codigo de comanda.",
+    )
+
+    audit = sub.add_parser(
+        "audit_estoque",
+        help="Compara estoque_atual com a soma de movimentos_estoque de cada produto.",
+    )
+    audit.add_argument(
+        "--corrigir",
+        action="store_true",
+        help="Regrava estoque_atual com o saldo do livro-razao.",
+    )
+
+    sub.add_parser(
+        "rebuild_busca",
+        help="Reconstroi os indices FTS5 de busca (produtos, codigo e mesa das comandas).",
+    )
+
+    args = parser.parse_args(argv)
+    if args.comando == "verify_totals":
+        return run_verify_totals(corrigir=args.corrigir)
+    if args.comando == "rebuild_vendas_diarias":
+        return run_rebuild_vendas_diarias(args.de, args.ate)
+    if args.comando == "repair_ponteiros_comanda":
+        return run_repair_ponteiros_comanda()
+    if args.comando == "audit_estoque":
+        return run_audit_estoque(corrigir=args.corrigir)
+    if args.comando == "rebuild_busca":
+        return run_rebuild_busca()
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
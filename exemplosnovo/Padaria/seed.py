@@ -1,8 +1,15 @@
 from __future__ import annotations
 
+import argparse
+import random
+from bisect import bisect_right
+from datetime import date, datetime, timedelta
 from decimal import Decimal
+from itertools import accumulate
+from time import perf_counter
 
-from sqlalchemy import func, select
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.engine import Engine
 
 from app.db.base import Base
 from app.db.bootstrap import ensure_schema
@@ -17,17 +24,21 @@ from app.models.pagamento import Pagamento
 from app.models.pedido import Pedido
 from app.models.produto import Produto
 from app.models.produto_adicional import ProdutoAdicional
+from app.models.tipos import de_centavos, para_centavos
+from app.services import busca_service, estoque_service
+from app.services.manutencao_service import reconstruir_ponteiros_comanda
+from app.services.vendas_diarias_service import reconstruir_vendas_diarias
 
 
 def money(value: str | Decimal | int | float) -> Decimal:
     return Decimal(value).quantize(Decimal("0.01"))
 
 
-def run_seed() -> None:
-    Base.metadata.create_all(bind=engine)
-    ensure_schema(engine)
+def run_seed(alvo: Engine = engine) -> None:
+    Base.metadata.create_all(bind=alvo)
+    ensure_schema(alvo)
 
-    with SessionLocal() as db:
+    with SessionLocal(bind=alvo) as db:
         cliente = _get_or_create_cliente_balcao(db)
         produtos = _seed_produtos(db)
         adicionais = _seed_adicionais(db)
@@ -84,10 +95,13 @@ def _seed_produtos(db) -> dict[str, Produto]:
                 descricao=descricao,
             )
             db.add(produto)
+            db.flush()
+            estoque_service.registrar_saldo_inicial(db, produto.id, estoque)
         else:
             produto.preco = money(preco)
             produto.ativo = True
-            produto.estoque_atual = max(produto.estoque_atual, estoque)
+            if produto.estoque_atual < estoque:
+                estoque_service.ajustar(db, produto.id, estoque - produto.estoque_atual)
             produto.imagem_url = imagem
             produto.categoria = categoria
             produto.descricao = descricao
@@ -321,5 +335,328 @@ def _seed_comandas_fake(db, cliente: Cliente, produtos: dict, adicionais: dict,
             }
 
 
+# Carga sintetica (python seed.py --pedidos N --dias D --codigos C): historico
+# de D dias ate ontem mais as comandas abertas agora, com picos por horario,
+# produtos populares, adicionais, mix de pagamentos e cancelamentos. Tudo em
+# INSERTs Core em lote, uma transacao por lote de pedidos. O estoque nao e
+# baixado pelo historico (saldo e razao continuam batendo).
+PICOS_POR_HORA = {
+    6: 9, 7: 15, 8: 13, 9: 8, 10: 5, 11: 6, 12: 8, 13: 6,
+    14: 4, 15: 5, 16: 7, 17: 9, 18: 8, 19: 4, 20: 2,
+}
+# Segunda..domingo: fim de semana mais cheio.
+PESO_DIA_SEMANA = (0.9, 0.9, 0.95, 1.0, 1.1, 1.35, 1.25)
+POPULARIDADE = {
+    "Pao Frances": 30,
+    "Cafe Coado": 22,
+    "Pao de Queijo": 16,
+    "Misto Quente": 10,
+    "Capuccino": 8,
+    "Suco de Laranja": 7,
+    "Esfiha de Carne": 6,
+    "Empada de Frango": 5,
+    "Croissant": 5,
+    "Sanduiche Natural": 4,
+    "Bolo de Cenoura": 3,
+    "Bolo de Chocolate": 3,
+}
+QUANTIDADES = {"Pao Frances": (2, 12), "Pao de Queijo": (1, 6)}
+ITENS_POR_PEDIDO = {1: 30, 2: 30, 3: 20, 4: 10, 5: 6, 6: 4}
+METODOS = {
+    MetodoPagamento.PIX: 38,
+    MetodoPagamento.DINHEIRO: 20,
+    MetodoPagamento.CARTAO_DEBITO: 24,
+    MetodoPagamento.CARTAO_CREDITO: 18,
+}
+STATUS_ABERTOS = (StatusPedido.ABERTO, StatusPedido.EM_PREPARO, StatusPedido.PRONTO)
+TAXA_CANCELAMENTO = 0.04
+TAXA_ENTREGA = 0.15
+TAXA_MESA = 0.4
+TAXA_ADICIONAL = 0.3
+TAXA_DESCONTO = 0.03
+TAXA_PAGAMENTO_DIVIDIDO = 0.08
+TAXA_CARTAO_RECUSADO = 0.02
+
+
+class _Sorteio:
+    # random.choices com os pesos acumulados uma vez so.
+    def __init__(self, rng: random.Random, pesos: dict) -> None:
+        self.rng = rng
+        self.valores = list(pesos)
+        self.acumulados = list(accumulate(pesos.values()))
+        self.total = self.acumulados[-1]
+
+    def __call__(self):
+        return self.valores[bisect_right(self.acumulados, self.rng.random() * self.total)]
+
+
+def gerar_carga(
+    alvo: Engine,
+    pedidos: int,
+    dias: int,
+    codigos: int,
+    semente: int = 42,
+    lote: int = 20_000,
+) -> dict[str, int]:
+    rng = random.Random(semente)
+    inicio_execucao = perf_counter()
+    with alvo.connect() as conn:
+        cliente_id = conn.scalar(select(Cliente.id).where(func.lower(Cliente.nome) == "balcao"))
+        catalogo = conn.execute(
+            select(Produto.id, Produto.nome, Produto.preco).where(Produto.ativo.is_(True)).order_by(Produto.id)
+        ).all()
+        adicionais = {
+            adicional_id: para_centavos(preco)
+            for adicional_id, preco in conn.execute(
+                select(Adicional.id, Adicional.preco).where(Adicional.ativo.is_(True))
+            )
+        }
+        permitidos: dict[int, list[int]] = {}
+        for produto_id, adicional_id in conn.execute(
+            select(ProdutoAdicional.produto_id, ProdutoAdicional.adicional_id)
+        ):
+            if adicional_id in adicionais:
+                permitidos.setdefault(produto_id, []).append(adicional_id)
+        proximo = {
+            tabela: (conn.scalar(select(func.max(coluna))) or 0) + 1
+            for tabela, coluna in (
+                ("pedidos", Pedido.id),
+                ("itens", ItemPedido.id),
+                ("adicionais", ItemPedidoAdicional.id),
+                ("pagamentos", Pagamento.id),
+            )
+        }
+    if cliente_id is None or not catalogo:
+        raise SystemExit("Rode o seed base antes (cliente Balcao e catalogo).")
+
+    produtos = {produto_id: (nome, para_centavos(preco)) for produto_id, nome, preco in catalogo}
+    sortear_produto = _Sorteio(rng, {produto_id: POPULARIDADE.get(nome, 1) for produto_id, nome, _ in catalogo})
+    sortear_hora = _Sorteio(rng, PICOS_POR_HORA)
+    sortear_qtd_itens = _Sorteio(rng, ITENS_POR_PEDIDO)
+    sortear_metodo = _Sorteio(rng, METODOS)
+
+    nomes_codigos = _garantir_codigos(alvo, codigos)
+    abertas = min(len(nomes_codigos), max(1, codigos // 4), pedidos)
+    agenda = _agenda(rng, pedidos - abertas, dias, sortear_hora)
+    agora = datetime.now().replace(microsecond=0)
+    agenda += sorted(agora - timedelta(seconds=rng.randint(60, 90 * 60)) for _ in range(abertas))
+    codigos_abertos = rng.sample(nomes_codigos, abertas)
+
+    contagem = {"pedidos": 0, "itens": 0, "adicionais": 0, "pagamentos": 0}
+    busca_pausada = _pausar_busca(alvo)
+    try:
+        for inicio_lote in range(0, len(agenda), lote):
+            linhas: dict[str, list[dict]] = {"pedidos": [], "itens": [], "adicionais": [], "pagamentos": []}
+            for posicao in range(inicio_lote, min(inicio_lote + lote, len(agenda))):
+                criado_em = agenda[posicao]
+                indice_aberta = posicao - (len(agenda) - abertas)
+                if indice_aberta >= 0:
+                    status = STATUS_ABERTOS[indice_aberta % len(STATUS_ABERTOS)]
+                    codigo = codigos_abertos[indice_aberta]
+                else:
+                    status = StatusPedido.CANCELADO if rng.random() < TAXA_CANCELAMENTO else StatusPedido.ENTREGUE
+                    codigo = rng.choice(nomes_codigos)
+                _gerar_pedido(
+                    rng, linhas, proximo, cliente_id, codigo, status, criado_em,
+                    produtos, permitidos, adicionais,
+                    sortear_produto, sortear_qtd_itens, sortear_metodo,
+                )
+            with alvo.begin() as conn:
+                for tabela, modelo in (
+                    ("pedidos", Pedido),
+                    ("itens", ItemPedido),
+                    ("adicionais", ItemPedidoAdicional),
+                    ("pagamentos", Pagamento),
+                ):
+                    if linhas[tabela]:
+                        conn.execute(insert(modelo), linhas[tabela])
+                        contagem[tabela] += len(linhas[tabela])
+            print(f"  {contagem['pedidos']}/{len(agenda)} pedidos ({perf_counter() - inicio_execucao:.0f}s)")
+    finally:
+        _retomar_busca(alvo, busca_pausada)
+
+    with alvo.begin() as conn:
+        conn.execute(
+            update(ComandaCodigo)
+            .where(ComandaCodigo.codigo.in_(nomes_codigos))
+            .values(em_uso=False, status_visual="LIBERADO")
+        )
+        for indice, codigo in enumerate(codigos_abertos):
+            conn.execute(
+                update(ComandaCodigo)
+                .where(ComandaCodigo.codigo == codigo)
+                .values(em_uso=True, status_visual=STATUS_ABERTOS[indice % len(STATUS_ABERTOS)].value)
+            )
+        reconstruir_ponteiros_comanda(conn)
+    with SessionLocal(bind=alvo) as db:
+        reconstruir_vendas_diarias(db)
+    contagem["segundos"] = round(perf_counter() - inicio_execucao)
+    return contagem
+
+
+def _garantir_codigos(alvo: Engine, quantidade: int) -> list[str]:
+    nomes = [f"G-{indice:04d}" for indice in range(1, quantidade + 1)]
+    with alvo.begin() as conn:
+        existentes = set(conn.scalars(select(ComandaCodigo.codigo).where(ComandaCodigo.codigo.in_(nomes))))
+        novos = [{"codigo": nome, "ativo": True, "em_uso": False} for nome in nomes if nome not in existentes]
+        if novos:
+            conn.execute(insert(ComandaCodigo), novos)
+    return nomes
+
+
+def _agenda(rng: random.Random, quantidade: int, dias: int, sortear_hora: _Sorteio) -> list[datetime]:
+    # Volume por dia: dia da semana e crescimento leve ao longo do periodo.
+    ontem = date.today() - timedelta(days=1)
+    datas = [ontem - timedelta(days=dias - 1 - indice) for indice in range(dias)]
+    pesos = [PESO_DIA_SEMANA[dia.weekday()] * (0.8 + 0.2 * indice / max(dias - 1, 1)) for indice, dia in enumerate(datas)]
+    total_pesos = sum(pesos)
+    por_dia = [int(quantidade * peso / total_pesos) for peso in pesos]
+    for indice in rng.sample(range(dias), quantidade - sum(por_dia)):
+        por_dia[indice] += 1
+
+    agenda: list[datetime] = []
+    for dia, total in zip(datas, por_dia):
+        base = datetime.combine(dia, datetime.min.time())
+        agenda.extend(
+            sorted(base + timedelta(hours=sortear_hora(), seconds=rng.randrange(3600)) for _ in range(total))
+        )
+    return agenda
+
+
+def _gerar_pedido(
+    rng: random.Random,
+    linhas: dict[str, list[dict]],
+    proximo: dict[str, int],
+    cliente_id: int,
+    codigo: str,
+    status: StatusPedido,
+    criado_em: datetime,
+    produtos: dict[int, tuple[str, int]],
+    permitidos: dict[int, list[int]],
+    adicionais: dict[int, int],
+    sortear_produto: _Sorteio,
+    sortear_qtd_itens: _Sorteio,
+    sortear_metodo: _Sorteio,
+) -> None:
+    pedido_id = proximo["pedidos"]
+    proximo["pedidos"] += 1
+    entrega = rng.random() < TAXA_ENTREGA
+    mesa = None if entrega or rng.random() >= TAXA_MESA else str(rng.randint(1, 30))
+    total = 0
+    for produto_id in {sortear_produto() for _ in range(sortear_qtd_itens())}:
+        nome, preco = produtos[produto_id]
+        minimo, maximo = QUANTIDADES.get(nome, (1, 3))
+        quantidade = rng.randint(minimo, maximo) if maximo > 3 else rng.choice((1, 1, 1, 2, 2, 3))
+        item_id = proximo["itens"]
+        proximo["itens"] += 1
+        bruto = preco * quantidade
+        if produto_id in permitidos and rng.random() < TAXA_ADICIONAL:
+            adicional_id = rng.choice(permitidos[produto_id])
+            linhas["adicionais"].append(
+                {
+                    "id": proximo["adicionais"],
+                    "item_pedido_id": item_id,
+                    "adicional_id": adicional_id,
+                    "quantidade": 1,
+                    "preco_unitario": de_centavos(adicionais[adicional_id]),
+                    "subtotal": de_centavos(adicionais[adicional_id]),
+                }
+            )
+            proximo["adicionais"] += 1
+            bruto += adicionais[adicional_id]
+        desconto = min(bruto, rng.choice((50, 100, 200))) if rng.random() < TAXA_DESCONTO else 0
+        total += bruto - desconto
+        linhas["itens"].append(
+            {
+                "id": item_id,
+                "pedido_id": pedido_id,
+                "produto_id": produto_id,
+                "quantidade": quantidade,
+                "preco_unitario": de_centavos(preco),
+                "desconto": de_centavos(desconto),
+                "subtotal": de_centavos(bruto - desconto),
+            }
+        )
+    linhas["pedidos"].append(
+        {
+            "id": pedido_id,
+            "cliente_id": cliente_id,
+            "comanda_codigo": codigo,
+            "mesa": mesa,
+            "status": status,
+            "tipo_entrega": TipoEntrega.ENTREGA if entrega else TipoEntrega.RETIRADA,
+            "observacoes": None,
+            "total": de_centavos(total),
+            "criado_em": criado_em,
+        }
+    )
+    if status == StatusPedido.ENTREGUE:
+        _gerar_pagamentos(rng, linhas, proximo, pedido_id, total, criado_em, sortear_metodo)
+
+
+def _gerar_pagamentos(
+    rng: random.Random,
+    linhas: dict[str, list[dict]],
+    proximo: dict[str, int],
+    pedido_id: int,
+    total: int,
+    criado_em: datetime,
+    sortear_metodo: _Sorteio,
+) -> None:
+    partes = [total]
+    if total > 200 and rng.random() < TAXA_PAGAMENTO_DIVIDIDO:
+        primeira = rng.randint(1, total - 1)
+        partes = [primeira, total - primeira]
+    pago_em = criado_em + timedelta(minutes=rng.randint(5, 40))
+    for valor in partes:
+        metodo = sortear_metodo()
+        cartao = metodo in {MetodoPagamento.CARTAO_DEBITO, MetodoPagamento.CARTAO_CREDITO}
+        tentativas = [StatusPagamento.RECUSADO] if cartao and rng.random() < TAXA_CARTAO_RECUSADO else []
+        for status in [*tentativas, StatusPagamento.APROVADO]:
+            pagamento_id = proximo["pagamentos"]
+            proximo["pagamentos"] += 1
+            linhas["pagamentos"].append(
+                {
+                    "id": pagamento_id,
+                    "pedido_id": pedido_id,
+                    "metodo": metodo,
+                    "status": status,
+                    "valor": de_centavos(valor),
+                    "referencia_externa": f"NSU-{pagamento_id}" if cartao else None,
+                    "maquininha_id": "MAQ-01" if cartao else None,
+                    "criado_em": pago_em,
+                }
+            )
+
+
+def _pausar_busca(alvo: Engine) -> bool:
+    # Sem os triggers do indice trigram a carga nao paga um INSERT no FTS por pedido;
+    # no fim o indice e reconstruido de uma vez.
+    with alvo.begin() as conn:
+        return busca_service.remover_gatilhos(conn, busca_service.TABELA_PEDIDOS)
+
+
+def _retomar_busca(alvo: Engine, pausada: bool) -> None:
+    if not pausada:
+        return
+    with alvo.begin() as conn:
+        busca_service.instalar_busca(conn)
+        busca_service.reconstruir_busca(conn)
+
+
+def _argumentos() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Seed base e carga sintetica para testes de volume.")
+    parser.add_argument("--pedidos", type=int, default=0, help="pedidos sinteticos (ex.: 1_000_000)")
+    parser.add_argument("--dias", type=int, default=365, help="dias de historico ate ontem")
+    parser.add_argument("--codigos", type=int, default=300, help="codigos de comanda G-0001..")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--lote", type=int, default=20_000, help="pedidos por transacao")
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
+    args = _argumentos()
     run_seed()
+    if args.pedidos > 0:
+        resultado = gerar_carga(engine, args.pedidos, args.dias, args.codigos, args.semente, args.lote)
+        print(f"Carga sintetica concluida: {resultado}")
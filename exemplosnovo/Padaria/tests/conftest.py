@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import os
 import sys
 from pathlib import Path
 
@@ -7,3 +8,6 @@ PROJECT_ROOT = Path(__file__).resolve().parents[1]
 
 if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
+
+# O agendador do lifespan usa o banco real; nos testes as tarefas sao chamadas direto.
+os.environ.setdefault("AGENDADOR_ATIVO", "false")
@@ -2,33 +2,53 @@
 from decimal import Decimal
 from pathlib import Path
 import re
+from types import SimpleNamespace
 
 import pytest
+from fastapi import HTTPException
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import NullPool
 
 from app.db.base import Base
-from app.db.session import get_db
+from app.core import metricas
+from app.db import consultas_lentas
+from app.db.session import get_async_db, get_db, instrumentar_engine, url_async
 from app.main import app
+from app.models.enums import MetodoPagamento, StatusPagamento, StatusPedido, TipoEntrega
+from app.models.pagamento import Pagamento
+from app.models.pedido import Pedido
+from app.models.tipos import de_centavos, para_centavos
+from app.services import (
+    busca_service,
+    catalogo_service,
+    comanda_service,
+    pagamento_service,
+    relatorio_service,
+)
 
 
 @pytest.fixture()
-def client():
-    engine = create_engine(
-        "sqlite://",
-        connect_args={"check_same_thread": False},
-        poolclass=StaticPool,
-        future=True,
-    )
+def client(tmp_path: Path):
+    # Arquivo (e nao :memory:) para as rotas async enxergarem o mesmo banco via aiosqlite.
+    url = f"sqlite:///{tmp_path / 'padaria_teste.db'}"
+    engine = create_engine(url, connect_args={"check_same_thread": False}, future=True)
+    async_engine = create_async_engine(url_async(make_url(url)), poolclass=NullPool)
 
-    @event.listens_for(engine, "connect")
     def _enable_fk(dbapi_connection, _connection_record):
         cursor = dbapi_connection.cursor()
         cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.execute("PRAGMA synchronous=OFF")
         cursor.close()
 
+    event.listen(engine, "connect", _enable_fk)
+    event.listen(async_engine.sync_engine, "connect", _enable_fk)
+    instrumentar_engine(engine)
+    instrumentar_engine(async_engine.sync_engine)
+
     TestingSessionLocal = sessionmaker(
         bind=engine,
         autoflush=False,
@@ -38,6 +58,8 @@ def client():
     )
 
     Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        busca_service.instalar_busca(conn)
 
     def override_get_db():
         db = TestingSessionLocal()
@@ -46,12 +68,27 @@ def client():
         finally:
             db.close()
 
+    TestingAsyncSessionLocal = async_sessionmaker(
+        bind=async_engine,
+        autoflush=False,
+        expire_on_commit=False,
+    )
+
+    async def override_get_async_db():
+        async with TestingAsyncSessionLocal() as db:
+            yield db
+
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    # Cache de leitura e global ao processo; cada teste usa um banco novo.
+    comanda_service.invalidate_read_caches()
+    catalogo_service.invalidar_catalogo()
     with TestClient(app) as test_client:
         yield test_client
 
     app.dependency_overrides.clear()
     Base.metadata.drop_all(bind=engine)
+    engine.dispose()
 
 
 def _create_produto(client: TestClient):
@@ -322,6 +359,141 @@ def test_comanda_agrega_adicionais_duplicados(client: TestClient):
     assert Decimal(str(item["subtotal"])) == Decimal("40.00")
 
 
+def test_catalogo_snapshot_versionado_e_validacao_sem_consulta(client: TestClient):
+    from sqlalchemy import event as sa_event
+
+    adicional = _create_adicional(client)
+    outro = client.post("/adicionais", json={"nome": "Queijo Extra", "preco": "3.00", "ativo": True})
+    produto = client.post(
+        "/produtos",
+        json={
+            "nome": "X-Salada",
+            "preco": "20.00",
+            "ativo": True,
+            "estoque_atual": 10,
+            "adicional_ids": [adicional["id"]],
+        },
+    ).json()
+    inativo = client.post(
+        "/produtos",
+        json={"nome": "Produto Antigo", "preco": "9.00", "ativo": False, "estoque_atual": 1},
+    ).json()
+
+    catalogo = client.get("/catalogo")
+    assert catalogo.status_code == 200
+    body = catalogo.json()
+    assert [row["id"] for row in body["produtos"]] == [produto["id"]]
+    assert body["produtos"][0]["adicional_ids"] == [adicional["id"]]
+    assert {row["nome"] for row in body["adicionais"]} == {"Bacon Extra", "Queijo Extra"}
+    etag = catalogo.headers["etag"]
+    assert client.get("/catalogo", headers={"If-None-Match": etag}).status_code == 304
+
+    _create_codigo(client, "C-370")
+    comanda = _abrir_comanda(client, "C-370")
+    engine = next(app.dependency_overrides[get_db]()).get_bind()
+    statements: list[str] = []
+
+    def _capturar(_conn, _cursor, statement, *_args):
+        statements.append(statement.lower())
+
+    sa_event.listen(engine, "before_cursor_execute", _capturar)
+    try:
+        add = client.post(
+            f"/comandas/{comanda['id']}/itens",
+            json={
+                "produto_id": produto["id"],
+                "quantidade": 1,
+                "adicionais": [{"adicional_id": adicional["id"], "quantidade": 2}],
+            },
+        )
+    finally:
+        sa_event.remove(engine, "before_cursor_execute", _capturar)
+    assert add.status_code == 200
+    assert Decimal(add.json()["total"]) == Decimal("30.00")
+    assert not [sql for sql in statements if "from produtos_adicionais" in sql]
+    assert not [sql for sql in statements if sql.startswith("select") and "from adicionais" in sql]
+
+    nao_permitido = client.post(
+        f"/comandas/{comanda['id']}/itens",
+        json={
+            "produto_id": produto["id"],
+            "quantidade": 1,
+            "adicionais": [{"adicional_id": outro.json()["id"], "quantidade": 1}],
+        },
+    )
+    assert nao_permitido.status_code == 400
+    item_inativo = client.post(
+        f"/comandas/{comanda['id']}/itens",
+        json={"produto_id": inativo["id"], "quantidade": 1},
+    )
+    assert item_inativo.status_code == 400
+
+    # Escrita no catalogo troca a versao e o preco novo vale para os proximos itens.
+    atualizado = client.put(
+        f"/produtos/{produto['id']}",
+        json={"nome": "X-Salada", "preco": "22.00", "ativo": True, "adicional_ids": []},
+    )
+    assert atualizado.status_code == 200
+    novo = client.get("/catalogo", headers={"If-None-Match": etag})
+    assert novo.status_code == 200
+    assert Decimal(novo.json()["produtos"][0]["preco"]) == Decimal("22.00")
+    add_novo = client.post(
+        f"/comandas/{comanda['id']}/itens",
+        json={"produto_id": produto["id"], "quantidade": 1},
+    )
+    assert Decimal(add_novo.json()["total"]) == Decimal("52.00")
+
+
+def test_catalogo_id_desconhecido_nao_reconstroi_snapshot(client: TestClient, monkeypatch):
+    from app.models.produto import Produto
+
+    adicional = _create_adicional(client)
+    produto = _create_produto(client)
+    _create_codigo(client, "C-371")
+    comanda = _abrir_comanda(client, "C-371")
+    catalogo_service.obter_catalogo(next(app.dependency_overrides[get_db]()))
+
+    montagens: list[int] = []
+    montar = catalogo_service._montar_snapshot
+    monkeypatch.setattr(
+        catalogo_service,
+        "_montar_snapshot",
+        lambda db, versao: montagens.append(versao) or montar(db, versao),
+    )
+    for _ in range(3):
+        sem_produto = client.post(f"/comandas/{comanda['id']}/itens", json={"produto_id": 99999, "quantidade": 1})
+        assert sem_produto.status_code == 404
+        sem_adicional = client.post(
+            f"/comandas/{comanda['id']}/itens",
+            json={
+                "produto_id": produto["id"],
+                "quantidade": 1,
+                "adicionais": [{"adicional_id": 99999, "quantidade": 1}],
+            },
+        )
+        assert sem_adicional.status_code == 404
+    assert montagens == []
+    com_adicional = client.post(
+        f"/comandas/{comanda['id']}/itens",
+        json={
+            "produto_id": produto["id"],
+            "quantidade": 1,
+            "adicionais": [{"adicional_id": adicional["id"], "quantidade": 1}],
+        },
+    )
+    assert com_adicional.status_code == 200
+
+    # Produto gravado por outro processo (sem invalidar este): o id existe no banco e recarrega.
+    db = next(app.dependency_overrides[get_db]())
+    externo = Produto(nome="Broa", preco=Decimal("6.00"), controla_estoque=False)
+    db.add(externo)
+    db.commit()
+    add = client.post(f"/comandas/{comanda['id']}/itens", json={"produto_id": externo.id, "quantidade": 1})
+    db.close()
+    assert add.status_code == 200
+    assert len(montagens) == 1
+
+
 def test_produto_hard_delete_remove_das_notas_quando_ja_usado(client: TestClient):
     _create_codigo(client, "C-099")
     produto = _create_produto(client)
@@ -462,6 +634,19 @@ def test_produtos_paginacao_multiplas_paginas(client: TestClient):
     assert page3["items"][0]["id"] > page3["items"][1]["id"]
 
 
+def test_produtos_total_por_busca_em_lru_limitado(client: TestClient, monkeypatch):
+    from app.services import produto_service
+
+    monkeypatch.setattr(produto_service, "TOTAIS_MAX_ITEMS", 2)
+    _create_produto(client)
+    for termo in ("h", "ha", "ham", "ha"):
+        listagem = client.get("/produtos", params={"q": termo, "page": 1, "page_size": 10})
+        assert listagem.status_code == 200
+        assert listagem.json()["total"] == 1
+    # Uma chave por termo digitado, mas so as mais recentes ficam.
+    assert list(produto_service._totais) == [(None, "ham"), (None, "ha")]
+
+
 def test_pagamentos_manual_and_maquininha(client: TestClient):
     _create_codigo(client, "C-020")
     _create_codigo(client, "C-020B")
@@ -648,6 +833,80 @@ def test_comanda_reabrir_entregue_exige_confirmacao_e_motivo(client: TestClient)
     assert c032["status_visual"] == "EM_PREPARO"
 
 
+def test_comanda_versao_otimista_e_reivindicacao_de_codigo(client: TestClient, monkeypatch):
+    from sqlalchemy import update
+    from sqlalchemy.orm import object_session
+
+    from app.models.pedido import Pedido
+
+    _create_codigo(client, "C-033")
+    produto = _create_produto(client)
+    comanda = _abrir_comanda(client, "C-033")
+    assert comanda["versao"] == 1
+    duplicada = client.post("/comandas/abrir", json={"codigo": "C-033", "tipo_entrega": "RETIRADA"})
+    assert duplicada.status_code == 409
+
+    adicionado = client.post(
+        f"/comandas/{comanda['id']}/itens",
+        json={"produto_id": produto["id"], "quantidade": 2, "adicionais": []},
+        headers={"If-Match": '"1"'},
+    )
+    assert adicionado.json()["versao"] == 2
+    item_id = adicionado.json()["itens"][0]["id"]
+
+    # Edicao feita sobre a versao 1 (tela desatualizada): 409 com o estado atual.
+    obsoleto = client.put(
+        f"/comandas/{comanda['id']}/itens/{item_id}",
+        json={"quantidade": 5, "adicionais": []},
+        headers={"If-Match": '"1"'},
+    )
+    assert obsoleto.status_code == 409
+    assert obsoleto.json()["atual"]["versao"] == 2
+    assert obsoleto.json()["atual"]["itens"][0]["quantidade"] == 2
+    invalido = client.delete(
+        f"/comandas/{comanda['id']}/itens/{item_id}", headers={"If-Match": "abc"}
+    )
+    assert invalido.status_code == 400
+
+    # Outro aparelho grava entre a leitura e o commit: a escrita inteira e desfeita.
+    aplicar_total = comanda_service._apply_total_delta
+
+    def _escrita_concorrente(pedido, delta):
+        aplicar_total(pedido, delta)
+        db = object_session(pedido)
+        db.execute(
+            update(Pedido)
+            .where(Pedido.id == pedido.id)
+            .values(versao=Pedido.versao + 1)
+            .execution_options(synchronize_session=False)
+        )
+
+    em_preparo = client.patch(f"/comandas/{comanda['id']}/status", json={"status": "EM_PREPARO"})
+    assert em_preparo.json()["versao"] == 3
+    monkeypatch.setattr(comanda_service, "_apply_total_delta", _escrita_concorrente)
+    corrida = client.post(
+        f"/comandas/{comanda['id']}/itens",
+        json={"produto_id": produto["id"], "quantidade": 1, "adicionais": []},
+    )
+    monkeypatch.undo()
+    assert corrida.status_code == 409
+    assert corrida.json()["atual"]["versao"] == 3
+    assert len(client.get(f"/comandas/{comanda['id']}").json()["itens"]) == 1
+    assert client.get(f"/produtos/{produto['id']}").json()["estoque_atual"] == 48
+
+    # Reabrir comanda entregue cujo codigo ja foi tomado por outra: 409, sem roubar o codigo.
+    assert client.patch(f"/comandas/{comanda['id']}/status", json={"status": "ENTREGUE"}).status_code == 200
+    nova = _abrir_comanda(client, "C-033")
+    reabertura = client.patch(
+        f"/comandas/{comanda['id']}/status",
+        json={"status": "EM_PREPARO", "confirmar_reabertura": True, "motivo_status": "Ajuste"},
+    )
+    assert reabertura.status_code == 409
+    painel = {linha["codigo"]: linha for linha in client.get("/comandas/painel").json()}
+    assert painel["C-033"]["pedido_id"] == nova["id"]
+    assert client.get(f"/comandas/{comanda['id']}").json()["status"] == "ENTREGUE"
+
+
 def test_painel_comandas_e_liberacao_com_confirmacao(client: TestClient):
     _create_codigo(client, "C-310")
     _create_codigo(client, "C-311")
@@ -689,6 +948,939 @@ def test_painel_comandas_e_liberacao_com_confirmacao(client: TestClient):
     assert com_confirmar.json()["status_visual"] == "LIBERADO"
 
 
+def test_painel_ponteiro_pedido_atual_e_reparo(client: TestClient):
+    from sqlalchemy import update
+
+    from app.models.comanda_codigo import ComandaCodigo
+    from app.services import manutencao_service
+
+    codigo = _create_codigo(client, "C-315")
+
+    def _linha():
+        return {row["codigo"]: row for row in client.get("/comandas/painel").json()}["C-315"]
+
+    primeira = _abrir_comanda(client, "C-315")
+    cancelada = client.patch(f"/comandas/{primeira['id']}/status", json={"status": "CANCELADO"})
+    assert cancelada.status_code == 200
+    assert _linha()["pedido_id"] == primeira["id"]
+    client.post(f"/comandas/codigos/{codigo['id']}/liberar", json={"confirmar": True})
+
+    segunda = _abrir_comanda(client, "C-315")
+    assert _linha()["pedido_id"] == segunda["id"]
+    assert _linha()["status"] == "ABERTO"
+
+    # Reset desvincula a segunda: o ponteiro volta ao ultimo pedido ainda vinculado.
+    assert client.post(f"/comandas/{segunda['id']}/reset").status_code == 200
+    assert _linha()["pedido_id"] == primeira["id"]
+    assert _linha()["status"] == "LIBERADO"
+
+    db = next(app.dependency_overrides[get_db]())
+    assert manutencao_service.reparar_ponteiros_comanda(db)["ponteiros_corrigidos"] == 0
+    db.execute(update(ComandaCodigo).values(pedido_atual_id=None))
+    db.commit()
+    assert manutencao_service.reparar_ponteiros_comanda(db)["ponteiros_corrigidos"] == 1
+    assert db.get(ComandaCodigo, codigo["id"]).pedido_atual_id == primeira["id"]
+    db.close()
+    assert _linha()["pedido_id"] == primeira["id"]
+
+
+def test_agendador_expurgo_uma_vez_por_janela(client: TestClient):
+    from datetime import datetime
+
+    from sqlalchemy.orm import sessionmaker
+
+    from app.services import agendador_service
+
+    _create_codigo(client, "C-316")
+    comanda = _abrir_comanda(client, "C-316")
+    client.patch(f"/comandas/{comanda['id']}/status", json={"status": "CANCELADO"})
+
+    db = next(app.dependency_overrides[get_db]())
+    fabrica = sessionmaker(bind=db.get_bind(), autoflush=False, expire_on_commit=False)
+    db.close()
+
+    def _linha():
+        return {row["codigo"]: row for row in client.get("/comandas/painel").json()}["C-316"]
+
+    sabado = datetime(2024, 6, 1, 23, 15)
+    executadas = {row["nome"] for row in agendador_service.executar_pendentes(fabrica, agora=sabado)}
+    assert "expurgo_historico" not in executadas
+    assert {"retencao_snapshots_cozinha", "checkpoint_wal"} <= executadas
+    assert _linha()["status"] == "CANCELADO"
+
+    domingo = datetime(2024, 6, 2, 23, 15)
+    executadas = {row["nome"] for row in agendador_service.executar_pendentes(fabrica, agora=domingo)}
+    assert "expurgo_historico" in executadas
+    assert _linha()["status"] == "LIBERADO"
+    assert agendador_service.executar_pendentes(fabrica, agora=domingo.replace(minute=45)) == []
+
+    tarefas = {row["nome"]: row for row in client.get("/manutencao/tarefas").json()}
+    expurgo = tarefas["expurgo_historico"]
+    assert expurgo["execucoes"] == 1
+    assert expurgo["status"] == "OK"
+    assert expurgo["ultima_janela"] == "2024-06-02"
+    assert expurgo["duracao_ms"] is not None
+    assert expurgo["resultado"]["pedidos_desvinculados"] == 1
+
+
+def test_painel_cache_invalidado_por_codigo(client: TestClient):
+    _create_codigo(client, "C-320")
+    _create_codigo(client, "C-321")
+    produto = _create_produto(client)
+    comanda_a = _abrir_comanda(client, "C-320")
+    comanda_b = _abrir_comanda(client, "C-321")
+
+    assert client.get("/comandas/painel").status_code == 200
+    assert client.get(f"/comandas/{comanda_b['id']}").status_code == 200
+    antes = comanda_service.read_cache_stats()
+    painel = client.get("/comandas/painel").json()
+    depois = comanda_service.read_cache_stats()
+    assert depois["misses"] == antes["misses"]
+    assert depois["hits"] > antes["hits"]
+    assert {row["codigo"] for row in painel} == {"C-320", "C-321"}
+
+    add_item = client.post(
+        f"/comandas/{comanda_a['id']}/itens",
+        json={"produto_id": produto["id"], "quantidade": 2, "observacoes": None, "adicionais": []},
+    )
+    assert add_item.status_code == 200
+
+    # Somente a linha do codigo alterado sai do cache; o detalhe da outra comanda fica.
+    assert comanda_service._read_model.get(("painel_linha", "C-320")) is None
+    assert comanda_service._read_model.get(("painel_linha", "C-321")) is not None
+    assert comanda_service._read_model.get(("get_comanda", comanda_b["id"])) is not None
+
+    by_codigo = {row["codigo"]: row for row in client.get("/comandas/painel").json()}
+    assert Decimal(by_codigo["C-320"]["total"]) == Decimal("50.00")
+    assert Decimal(by_codigo["C-321"]["total"]) == Decimal("0.00")
+
+
+def test_read_model_cache_lru_e_geracao():
+    from app.services.read_model import ReadModelCache
+
+    cache = ReadModelCache(max_items=2)
+    geracao = cache.generation
+    assert cache.put("a", 1, [("pedido", 1)], geracao)
+    assert cache.put("b", 2, [("pedido", 2)], geracao)
+    assert cache.get("a") == 1
+    assert cache.put("c", 3, [("pedido", 3)], geracao)
+    assert cache.get("b") is None
+    assert cache.stats()["evictions"] == 1
+
+    cache.invalidate([("pedido", 1)])
+    assert cache.get("a") is None
+    assert cache.get("c") == 3
+    # Leitura iniciada antes da invalidacao nao pode repopular o cache.
+    assert cache.put("a", 1, [("pedido", 1)], geracao) is False
+
+
+def test_stream_sse_recebe_eventos_das_escritas(client: TestClient):
+    import asyncio
+    import json
+
+    from app.services import eventos_service
+
+    _create_codigo(client, "C-330")
+    inicio = eventos_service.ultimo_id()
+
+    async def _nunca_desconecta() -> bool:
+        return False
+
+    async def _proximo_evento(stream) -> str:
+        while True:
+            frame = await stream.__anext__()
+            if not frame.startswith(":"):
+                return frame
+
+    async def _coletar():
+        stream = eventos_service.stream_sse(_nunca_desconecta, heartbeat=0.05)
+        assert await stream.__anext__() == "retry: 3000\n\n"
+        comanda = await asyncio.to_thread(_abrir_comanda, client, "C-330")
+        frame = await _proximo_evento(stream)
+        await stream.aclose()
+        return comanda, frame
+
+    comanda, frame = asyncio.run(_coletar())
+    linhas = frame.strip().split("\n")
+    assert linhas[1] == "event: comanda"
+    dados = json.loads(linhas[2].removeprefix("data: "))
+    assert dados["acao"] == "aberta"
+    assert dados["pedido_id"] == comanda["id"]
+    assert dados["codigo"] == "C-330"
+    assert eventos_service.total_assinantes() == 0
+
+    # Reconexao com Last-Event-ID reenvia o que foi perdido, sem duplicar.
+    async def _replay():
+        stream = eventos_service.stream_sse(_nunca_desconecta, last_event_id=inicio, heartbeat=0.05)
+        await stream.__anext__()
+        frame = await _proximo_evento(stream)
+        await stream.aclose()
+        return frame
+
+    assert asyncio.run(_replay()) == frame
+    assert eventos_service.eventos_desde(eventos_service.ultimo_id()) == []
+
+
+def test_rotas_quentes_de_comanda_nao_ocupam_threadpool(client: TestClient, monkeypatch):
+    import fastapi.dependencies.utils
+    import fastapi.routing
+
+    produto = _create_produto(client)
+    _create_codigo(client, "C-340")
+    comanda = _abrir_comanda(client, "C-340")
+
+    em_thread: list[str] = []
+    original = fastapi.routing.run_in_threadpool
+
+    async def _registrar(func, *args, **kwargs):
+        em_thread.append(getattr(func, "__name__", repr(func)))
+        return await original(func, *args, **kwargs)
+
+    monkeypatch.setattr(fastapi.routing, "run_in_threadpool", _registrar)
+    monkeypatch.setattr(fastapi.dependencies.utils, "run_in_threadpool", _registrar)
+
+    assert client.get("/comandas/painel").status_code == 200
+    assert client.get("/comandas/painel", params={"since": 0}).status_code == 200
+    assert client.get("/comandas").status_code == 200
+    response = client.post(
+        f"/comandas/{comanda['id']}/itens",
+        json={"produto_id": produto["id"], "quantidade": 2},
+        headers={"If-Match": f'"{comanda["versao"]}"'},
+    )
+    assert response.status_code == 200
+    assert response.json()["versao"] == comanda["versao"] + 1
+    detalhe = client.get(f"/comandas/{comanda['id']}")
+    assert detalhe.status_code == 200
+    assert [item["quantidade"] for item in detalhe.json()["itens"]] == [2]
+    assert em_thread == []
+
+    # Rotas sync continuam no threadpool.
+    assert client.get("/comandas/codigos").status_code == 200
+    assert em_thread
+
+
+def test_painel_etag_304_e_delta_since(client: TestClient):
+    _create_codigo(client, "C-340")
+    codigo_b = _create_codigo(client, "C-341")
+    produto = _create_produto(client)
+    comanda = _abrir_comanda(client, "C-340")
+
+    painel = client.get("/comandas/painel")
+    assert painel.status_code == 200
+    etag = painel.headers["etag"]
+    versao = int(painel.headers["x-data-version"])
+    assert client.get("/comandas/painel", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/comandas", headers={"If-None-Match": etag}).status_code == 304
+
+    detalhe = client.get(f"/comandas/{comanda['id']}")
+    assert detalhe.status_code == 200
+    etag_detalhe = detalhe.headers["etag"]
+    assert (
+        client.get(f"/comandas/{comanda['id']}", headers={"If-None-Match": etag_detalhe}).status_code
+        == 304
+    )
+
+    # Escrita em outro codigo nao muda o ETag do detalhe desta comanda.
+    assert client.patch(f"/comandas/codigos/{codigo_b['id']}", json={"ativo": False}).status_code == 200
+    assert (
+        client.get(f"/comandas/{comanda['id']}", headers={"If-None-Match": etag_detalhe}).status_code
+        == 304
+    )
+    assert client.get("/comandas/painel", headers={"If-None-Match": etag}).status_code == 200
+
+    add_item = client.post(
+        f"/comandas/{comanda['id']}/itens",
+        json={"produto_id": produto["id"], "quantidade": 1, "observacoes": None, "adicionais": []},
+    )
+    assert add_item.status_code == 200
+    assert (
+        client.get(f"/comandas/{comanda['id']}", headers={"If-None-Match": etag_detalhe}).status_code
+        == 200
+    )
+
+    delta = client.get(f"/comandas/painel?since={versao}")
+    assert delta.status_code == 200
+    body = delta.json()
+    assert body["completo"] is False
+    assert [row["codigo"] for row in body["itens"]] == ["C-340"]
+    assert Decimal(body["itens"][0]["total"]) == Decimal("25.00")
+    assert body["removidos"] == ["C-341"]
+    assert body["versao"] == int(delta.headers["x-data-version"])
+
+    sem_mudancas = client.get(f"/comandas/painel?since={body['versao']}").json()
+    assert sem_mudancas["itens"] == [] and sem_mudancas["removidos"] == []
+
+    # Versao anterior ao historico disponivel devolve o painel completo.
+    completo = client.get("/comandas/painel?since=0").json()
+    assert completo["completo"] is True
+    assert [row["codigo"] for row in completo["itens"]] == ["C-340"]
+
+
+def test_total_incremental_e_verify_totals(client: TestClient):
+    from sqlalchemy import update
+
+    from app.models.pedido import Pedido
+    from app.services import manutencao_service
+
+    _create_codigo(client, "C-350")
+    _create_codigo(client, "C-351")
+    produto = _create_produto(client)
+    adicional = _create_adicional(client)
+    origem = _abrir_comanda(client, "C-350")
+    destino = _abrir_comanda(client, "C-351")
+
+    for quantidade in (1, 2, 3):
+        response = client.post(
+            f"/comandas/{origem['id']}/itens",
+            json={
+                "produto_id": produto["id"],
+                "quantidade": quantidade,
+                "desconto": "1.00",
+                "adicionais": [{"adicional_id": adicional["id"], "quantidade": 1}],
+            },
+        )
+        assert response.status_code == 200
+    itens = response.json()["itens"]
+    assert Decimal(response.json()["total"]) == Decimal("162.00")
+
+    alterado = client.put(
+        f"/comandas/{origem['id']}/itens/{itens[0]['id']}",
+        json={"produto_id": produto["id"], "quantidade": 4, "desconto": "0", "adicionais": []},
+    )
+    assert Decimal(alterado.json()["total"]) == Decimal("233.00")
+    removido = client.delete(f"/comandas/{origem['id']}/itens/{itens[1]['id']}")
+    assert Decimal(removido.json()["total"]) == Decimal("179.00")
+    movido = client.post(
+        f"/comandas/{origem['id']}/itens/{itens[2]['id']}/mover",
+        json={"destino_pedido_id": destino["id"]},
+    )
+    assert Decimal(movido.json()["total"]) == Decimal("100.00")
+    assert Decimal(client.get(f"/comandas/{destino['id']}").json()["total"]) == Decimal("79.00")
+
+    db = next(app.dependency_overrides[get_db]())
+    relatorio = manutencao_service.verificar_totais(db)
+    assert relatorio["pedidos_divergentes"] == 0
+    assert relatorio["itens_divergentes"] == 0
+
+    db.execute(update(Pedido).where(Pedido.id == origem["id"]).values(total=Decimal("1.00")))
+    db.commit()
+    relatorio = manutencao_service.verificar_totais(db, corrigir=True)
+    assert relatorio["pedidos_divergentes"] == 1
+    assert relatorio["amostra_pedidos"][0]["esperado"] == Decimal("100.00")
+    assert relatorio["corrigido"] is True
+    assert Decimal(client.get(f"/comandas/{origem['id']}").json()["total"]) == Decimal("100.00")
+    assert manutencao_service.verificar_totais(db)["pedidos_divergentes"] == 0
+    db.close()
+
+
+def test_paginacao_por_cursor_percorre_sem_repetir(client: TestClient):
+    from datetime import datetime, timedelta
+
+    from sqlalchemy import insert
+
+    from app.models.cliente import Cliente
+    from app.models.enums import MetodoPagamento, StatusPagamento, StatusPedido, TipoEntrega
+    from app.models.pagamento import Pagamento
+    from app.models.pedido import Pedido
+    from app.models.produto import Produto
+
+    agora = datetime.now()
+    db = next(app.dependency_overrides[get_db]())
+    cliente_id = db.scalar(insert(Cliente).values(nome="Balcao").returning(Cliente.id))
+    # Totais e horarios repetidos e mesas nulas: o desempate pelo id precisa segurar.
+    db.execute(
+        insert(Pedido),
+        [
+            {
+                "cliente_id": cliente_id,
+                "comanda_codigo": f"K-{idx % 7:02d}",
+                "mesa": None if idx % 4 == 0 else str(idx % 3),
+                "status": StatusPedido.ENTREGUE,
+                "tipo_entrega": TipoEntrega.RETIRADA,
+                "total": Decimal(idx % 5),
+                "criado_em": agora - timedelta(minutes=idx // 3),
+            }
+            for idx in range(47)
+        ],
+    )
+    db.execute(
+        insert(Pagamento),
+        [
+            {"pedido_id": 1, "metodo": MetodoPagamento.PIX, "status": StatusPagamento.APROVADO, "valor": 1}
+            for _ in range(23)
+        ],
+    )
+    db.execute(insert(Produto), [{"nome": f"Produto {idx}", "preco": 1} for idx in range(31)])
+    db.commit()
+    db.close()
+
+    def _percorrer(rota: str, params: dict, chave: str = "id") -> list:
+        vistos, cursor = [], None
+        while True:
+            response = client.get(rota, params={**params, **({"cursor": cursor} if cursor else {})})
+            assert response.status_code == 200
+            pagina = response.json()
+            vistos.extend(item[chave] for item in pagina)
+            cursor = response.headers.get("X-Next-Cursor")
+            if cursor is None:
+                return vistos
+
+    for order_by in ("id", "total", "mesa", "criado_em", "codigo"):
+        for order_dir in ("asc", "desc"):
+            params = {"order_by": order_by, "order_dir": order_dir}
+            completo = [item["id"] for item in client.get("/comandas", params=params).json()]
+            assert len(completo) == 47
+            assert _percorrer("/comandas", {**params, "limit": 5}) == completo
+
+    historico = [item["pedido_id"] for item in client.get("/comandas/historico/cupons").json()]
+    assert _percorrer("/comandas/historico/cupons", {"limit": 4}, "pedido_id") == historico
+    assert len(historico) == 47
+
+    pagamentos = [item["id"] for item in client.get("/pagamentos").json()]
+    assert _percorrer("/pagamentos", {"limit": 6}) == pagamentos
+
+    ids, cursor = [], None
+    while True:
+        params = {"page_size": 7, "incluir_total": "false"}
+        pagina = client.get("/produtos", params={**params, **({"cursor": cursor} if cursor else {})}).json()
+        assert pagina["total"] is None
+        ids.extend(item["id"] for item in pagina["items"])
+        cursor = pagina["next_cursor"]
+        if cursor is None:
+            break
+    assert ids == sorted(ids, reverse=True)
+    assert len(ids) == 31
+    assert client.get("/produtos", params={"page_size": 7}).json()["total"] == 31
+
+    assert client.get("/comandas", params={"cursor": "nao-e-cursor"}).status_code == 400
+    assert client.get("/pagamentos", params={"cursor": "bm9wZQ"}).status_code == 400
+
+
+def test_busca_sem_acento_por_prefixo_e_fallback(client: TestClient, tmp_path: Path):
+    from app.services import produto_service
+
+    for nome, categoria in (
+        ("Pão Francês", "Padaria"),
+        ("Pão de Queijo", "Padaria"),
+        ("Café com Leite", "Bebidas"),
+        ("Bolo de Pão de Ló", "Confeitaria"),
+    ):
+        assert client.post("/produtos", json={"nome": nome, "categoria": categoria, "preco": "5.00"}).status_code == 201
+
+    def _nomes(params: dict) -> list[str]:
+        return [item["nome"] for item in client.get("/produtos", params=params).json()["items"]]
+
+    assert set(_nomes({"q": "pao"})) == {"Pão Francês", "Pão de Queijo", "Bolo de Pão de Ló"}
+    assert _nomes({"q": "PAO fra"}) == ["Pão Francês"]
+    assert _nomes({"q": "caf"}) == ["Café com Leite"]
+    assert client.get("/produtos", params={"q": "pao"}).json()["total"] == 3
+
+    busca = client.get("/produtos/busca", params={"q": "pão"}).json()
+    assert [item["nome"] for item in busca][-1] == "Bolo de Pão de Ló"
+    assert client.get("/produtos/busca", params={"q": "padaria"}).status_code == 200
+    assert len(client.get("/produtos/busca", params={"q": "padaria"}).json()) == 2
+
+    # Triggers mantem o indice: renomear tira o produto da busca antiga.
+    cafe_id = client.get("/produtos/busca", params={"q": "cafe"}).json()[0]["id"]
+    atualizado = client.put(
+        f"/produtos/{cafe_id}", json={"nome": "Cappuccino", "categoria": "Bebidas", "preco": "7.00"}
+    )
+    assert atualizado.status_code == 200
+    assert _nomes({"q": "cafe"}) == []
+    assert _nomes({"q": "capp"}) == ["Cappuccino"]
+
+    for codigo in ("MESA-101", "MESA-102", "BALCAO-7"):
+        _create_codigo(client, codigo)
+        _abrir_comanda(client, codigo)
+
+    def codigos(termo: str) -> list[str]:
+        return sorted(c["comanda_codigo"] for c in client.get("/comandas", params={"codigo": termo}).json())
+
+    assert codigos("sa-10") == ["MESA-101", "MESA-102"]
+    assert codigos("balcao") == ["BALCAO-7"]
+    assert codigos("7") == ["BALCAO-7"]
+
+    # Banco sem FTS5 (create_all puro): mesma resposta pelo ilike.
+    engine = create_engine(f"sqlite:///{tmp_path / 'sem_fts.db'}", future=True)
+    Base.metadata.create_all(bind=engine)
+    with sessionmaker(bind=engine, future=True)() as db:
+        produto_service.create_produto(db, produto_service.ProdutoCreate(nome="Pão Doce", preco=Decimal("4")))
+        itens, total = produto_service.list_produtos(db, 1, 20, None, "Pão")
+        assert [item["nome"] for item in itens] == ["Pão Doce"] and total == 1
+        assert [item["nome"] for item in produto_service.buscar_produtos(db, "Pão", None, 5)] == ["Pão Doce"]
+    engine.dispose()
+
+
+def test_vendas_diarias_incremental_igual_reconstrucao(client: TestClient):
+    from sqlalchemy import select
+
+    from app.models.venda_diaria import VendaDiaria
+    from app.services import vendas_diarias_service
+
+    produto = _create_produto(client)
+    comandas = []
+    for codigo in ("C-370", "C-371", "C-372"):
+        _create_codigo(client, codigo)
+        comanda = _abrir_comanda(client, codigo)
+        client.post(
+            f"/comandas/{comanda['id']}/itens",
+            json={"produto_id": produto["id"], "quantidade": 2, "adicionais": []},
+        )
+        comandas.append(comanda)
+
+    assert client.post(
+        "/pagamentos",
+        json={"pedido_id": comandas[0]["id"], "valor": "50.00", "metodo": "PIX"},
+    ).status_code == 201
+    maquininha = client.post(
+        "/pagamentos/maquininha/iniciar",
+        json={"pedido_id": comandas[1]["id"], "valor": "50.00", "metodo": "CARTAO_DEBITO"},
+    ).json()
+    client.patch(f"/pagamentos/maquininha/{maquininha['id']}/confirmar", json={"aprovado": True})
+    client.post(
+        "/pagamentos",
+        json={"pedido_id": comandas[2]["id"], "valor": "50.00", "metodo": "DINHEIRO"},
+    )
+    client.patch(f"/comandas/{comandas[1]['id']}/status", json={"status": "CANCELADO"})
+    assert client.delete(f"/comandas/{comandas[2]['id']}").status_code == 200
+
+    hoje = date.today().isoformat()
+    fechamento = client.get(f"/relatorios/fechamento-caixa?data={hoje}").json()
+    assert fechamento["total_pedidos"] == 2
+    assert fechamento["pedidos_cancelados"] == 1
+    assert Decimal(str(fechamento["total_vendido"])) == Decimal("50.00")
+    assert Decimal(str(fechamento["total_cancelado"])) == Decimal("50.00")
+    assert Decimal(str(fechamento["total_recebido"])) == Decimal("100.00")
+    assert Decimal(str(fechamento["pagamentos_por_metodo"]["DINHEIRO"])) == Decimal("0.00")
+
+    db = next(app.dependency_overrides[get_db]())
+
+    def _rollup():
+        return {
+            (row.dia, row.status, row.tipo_entrega, row.metodo): (
+                row.pedidos,
+                Decimal(str(row.valor_pedidos)).quantize(Decimal("0.01")),
+                Decimal(str(row.valor_recebido)).quantize(Decimal("0.01")),
+            )
+            for row in db.scalars(select(VendaDiaria))
+            if row.pedidos or row.valor_pedidos or row.valor_recebido
+        }
+
+    incremental = _rollup()
+    vendas_diarias_service.reconstruir_vendas_diarias(db, date.today(), date.today())
+    assert _rollup() == incremental
+    db.close()
+
+    longo = client.get("/relatorios/faturamento-periodo?data_inicial=2023-01-01&data_final=2025-12-31")
+    assert longo.status_code == 200
+    assert len(longo.json()["dias"]) == 1096
+
+
+def test_upsert_segue_dialeto_da_conexao():
+    from sqlalchemy.dialects import postgresql, sqlite
+
+    from app.db.session import insert_com_conflito
+    from app.models.venda_diaria import VendaDiaria
+
+    # Rollup e agendador rodam no flush de qualquer banco: nunca o insert do SQLite no Postgres.
+    for dialeto, tipo in ((postgresql.dialect(), postgresql.Insert), (sqlite.dialect(), sqlite.Insert)):
+        stmt = insert_com_conflito(SimpleNamespace(dialect=dialeto), VendaDiaria)
+        assert isinstance(stmt, tipo)
+        sql = str(stmt.on_conflict_do_nothing().compile(dialect=dialeto))
+        assert "ON CONFLICT DO NOTHING" in sql
+
+
+def test_itens_batch_atomico(client: TestClient):
+    _create_codigo(client, "C-360")
+    produto = _create_produto(client)
+    adicional = _create_adicional(client)
+    comanda = _abrir_comanda(client, "C-360")
+    primeiro = client.post(
+        f"/comandas/{comanda['id']}/itens",
+        json={"produto_id": produto["id"], "quantidade": 2, "adicionais": []},
+    )
+    item_id = primeiro.json()["itens"][0]["id"]
+    em_preparo = client.patch(f"/comandas/{comanda['id']}/status", json={"status": "EM_PREPARO"})
+    assert em_preparo.status_code == 200
+    assert client.get(f"/produtos/{produto['id']}").json()["estoque_atual"] == 48
+
+    lote = client.post(
+        f"/comandas/{comanda['id']}/itens:batch",
+        json={
+            "adicionar": [
+                {"produto_id": produto["id"], "quantidade": 3},
+                {
+                    "produto_id": produto["id"],
+                    "quantidade": 5,
+                    "adicionais": [{"adicional_id": adicional["id"], "quantidade": 1}],
+                },
+            ],
+            "alterar": [{"item_id": item_id, "quantidade": 1}],
+        },
+    )
+    assert lote.status_code == 200
+    body = lote.json()
+    assert len(body["itens"]) == 3
+    assert Decimal(body["total"]) == Decimal("230.00")
+    assert client.get(f"/produtos/{produto['id']}").json()["estoque_atual"] == 41
+
+    # Falha de estoque em uma operacao desfaz o lote inteiro.
+    sem_estoque = client.post(
+        f"/comandas/{comanda['id']}/itens:batch",
+        json={
+            "remover": [item_id],
+            "adicionar": [{"produto_id": produto["id"], "quantidade": 100}],
+        },
+    )
+    assert sem_estoque.status_code == 400
+    assert "Estoque insuficiente" in sem_estoque.json()["detail"]
+    atual = client.get(f"/comandas/{comanda['id']}").json()
+    assert len(atual["itens"]) == 3
+    assert Decimal(atual["total"]) == Decimal("230.00")
+    assert client.get(f"/produtos/{produto['id']}").json()["estoque_atual"] == 41
+
+    duplicado = client.post(
+        f"/comandas/{comanda['id']}/itens:batch",
+        json={"remover": [item_id], "alterar": [{"item_id": item_id, "quantidade": 2}]},
+    )
+    assert duplicado.status_code == 400
+    assert client.post(f"/comandas/{comanda['id']}/itens:batch", json={}).status_code == 400
+    inexistente = client.post(f"/comandas/{comanda['id']}/itens:batch", json={"remover": [999999]})
+    assert inexistente.status_code == 404
+
+    removido = client.post(f"/comandas/{comanda['id']}/itens:batch", json={"remover": [item_id]})
+    assert Decimal(removido.json()["total"]) == Decimal("205.00")
+    assert client.get(f"/produtos/{produto['id']}").json()["estoque_atual"] == 42
+
+
+def test_movimentos_estoque_razao_e_auditoria(client: TestClient):
+    from sqlalchemy import update
+
+    from app.models.produto import Produto
+    from app.services import manutencao_service
+
+    _create_codigo(client, "C-370")
+    produto = _create_produto(client)
+    comanda = _abrir_comanda(client, "C-370")
+    for quantidade in (3, 2):
+        client.post(
+            f"/comandas/{comanda['id']}/itens",
+            json={"produto_id": produto["id"], "quantidade": quantidade, "adicionais": []},
+        )
+    assert client.patch(f"/comandas/{comanda['id']}/status", json={"status": "EM_PREPARO"}).status_code == 200
+    assert client.patch(f"/produtos/{produto['id']}/estoque", json={"delta": 10}).json()["estoque_atual"] == 55
+    recusado = client.patch(f"/produtos/{produto['id']}/estoque", json={"delta": -1000})
+    assert recusado.status_code == 400
+    assert "Atual: 55" in recusado.json()["detail"]
+    cancelado = client.patch(
+        f"/comandas/{comanda['id']}/status",
+        json={"status": "CANCELADO", "repor_estoque": True},
+    )
+    assert cancelado.status_code == 200
+    editado = client.put(
+        f"/produtos/{produto['id']}",
+        json={"nome": produto["nome"], "preco": "25.00", "estoque_atual": 40},
+    )
+    assert editado.json()["estoque_atual"] == 40
+
+    movimentos = client.get(f"/produtos/{produto['id']}/movimentos").json()
+    assert [(m["motivo"], m["delta"], m["pedido_id"]) for m in movimentos] == [
+        ("AJUSTE", -20, None),
+        ("ESTORNO", 5, comanda["id"]),
+        ("AJUSTE", 10, None),
+        ("CONSUMO", -5, comanda["id"]),
+        ("SALDO_INICIAL", 50, None),
+    ]
+
+    db = next(app.dependency_overrides[get_db]())
+    assert manutencao_service.auditar_estoque(db)["produtos_divergentes"] == 0
+    db.execute(update(Produto).where(Produto.id == produto["id"]).values(estoque_atual=7))
+    db.commit()
+    relatorio = manutencao_service.auditar_estoque(db, corrigir=True)
+    assert relatorio["divergencias"] == [
+        {"produto_id": produto["id"], "estoque_atual": 7, "saldo_razao": 40}
+    ]
+    assert client.get(f"/produtos/{produto['id']}").json()["estoque_atual"] == 40
+
+
+def test_migracao_dinheiro_para_centavos(tmp_path: Path):
+    from sqlalchemy import select, text
+
+    from app.db.bootstrap import ensure_schema
+    from app.models.produto import Produto
+    from app.services.utils import para_centavos
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'legado.db'}", future=True)
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                "CREATE TABLE produtos (id INTEGER PRIMARY KEY, nome VARCHAR(120) NOT NULL, "
+                "preco NUMERIC(10, 2) NOT NULL, ativo BOOLEAN NOT NULL DEFAULT 1, "
+                "estoque_atual INTEGER NOT NULL DEFAULT 0, criado_em DATETIME DEFAULT CURRENT_TIMESTAMP)"
+            )
+        )
+        conn.execute(text("INSERT INTO produtos (nome, preco) VALUES ('Bala', 0.29), ('Torta', 12.5), ('Cafe', 7)"))
+
+    for _ in range(2):
+        # Idempotente: a segunda passada nao multiplica de novo.
+        Base.metadata.create_all(bind=engine)
+        ensure_schema(engine)
+        with engine.connect() as conn:
+            assert conn.execute(text("SELECT preco FROM produtos ORDER BY id")).scalars().all() == [29, 1250, 700]
+
+    with sessionmaker(bind=engine, future=True)() as db:
+        precos = db.scalars(select(Produto.preco).order_by(Produto.id)).all()
+        assert [str(preco) for preco in precos] == ["0.29", "12.50", "7.00"]
+        # Em centavos o float 0.1 + 0.2 vira 30, sem sobra de arredondamento.
+        assert para_centavos(0.1 + 0.2) == 30
+    engine.dispose()
+
+
+def test_dinheiro_em_centavos_exato(monkeypatch):
+    # Valores fixos que em float/Decimal sem quantize dariam residuo (0.1 + 0.2 etc.).
+    assert para_centavos(0.1 + 0.2) == 30
+    assert para_centavos(Decimal("0.1") + Decimal("0.2")) == 30
+    assert para_centavos(Decimal("3.335")) == 334
+    assert para_centavos(Decimal("3.3349")) == 333
+    assert str(de_centavos(30)) == "0.30"
+    assert str(de_centavos(-1999)) == "-19.99"
+
+    hoje = date(2024, 3, 1)
+    campos = ("dia", "status", "tipo_entrega", "metodo", "pedidos", "valor_pedidos", "valor_recebido")
+    linhas = [
+        (hoje, StatusPedido.ENTREGUE.value, TipoEntrega.RETIRADA.value, "", 3, 10, 0),
+        (hoje, StatusPedido.ENTREGUE.value, TipoEntrega.ENTREGA.value, "", 2, 20, 0),
+        (hoje, StatusPedido.CANCELADO.value, TipoEntrega.RETIRADA.value, "", 1, 1999, 0),
+        (hoje, "", "", MetodoPagamento.PIX.value, 0, 0, 10),
+        (hoje, "", "", MetodoPagamento.PIX.value, 0, 0, 20),
+        (hoje, "", "", MetodoPagamento.DINHEIRO.value, 0, 0, 1999),
+    ]
+    dia = relatorio_service._somar_vendas_diarias(
+        [SimpleNamespace(**dict(zip(campos, linha))) for linha in linhas]
+    )[hoje]
+    assert str(de_centavos(dia["total_vendido"])) == "0.30"
+    assert str(de_centavos(dia["total_cancelado"])) == "19.99"
+    assert str(de_centavos(dia["total_recebido"])) == "20.29"
+    assert relatorio_service._em_reais(dia["faturamento_por_tipo_entrega"]) == {
+        TipoEntrega.RETIRADA.value: Decimal("0.10"),
+        TipoEntrega.ENTREGA.value: Decimal("0.20"),
+    }
+    assert relatorio_service._em_reais(dia["pagamentos_por_metodo"]) == {
+        MetodoPagamento.DINHEIRO.value: Decimal("19.99"),
+        MetodoPagamento.PIX.value: Decimal("0.30"),
+        MetodoPagamento.CARTAO_DEBITO.value: Decimal("0.00"),
+        MetodoPagamento.CARTAO_CREDITO.value: Decimal("0.00"),
+    }
+
+    pagamentos = [
+        Pagamento(valor=Decimal("12.35"), status=StatusPagamento.APROVADO, metodo=MetodoPagamento.PIX)
+        for _ in range(200)
+    ]
+    pagamentos.append(Pagamento(valor=Decimal("0.01"), status=StatusPagamento.RECUSADO, metodo=MetodoPagamento.PIX))
+    resumo = pagamento_service.resumo_pagamentos_lista(pagamentos, Decimal("2470.00"))
+    assert resumo["total_pago"] == Decimal("2470.00")
+    assert resumo["saldo_pendente"] == Decimal("0")
+
+    # Total 10.00 com 2 x 3.33 aprovados: saldo exato de 3.34.
+    pedido = Pedido(id=1, total=Decimal("10.00"))
+    monkeypatch.setattr(pagamento_service, "_total_pago_centavos", lambda db, pedido_id: 666)
+    pagamento_service._validate_valor_exato_no_saldo(None, pedido, Decimal("3.34"))
+    pagamento_service._validate_valor_exato_no_saldo(None, pedido, Decimal("3.335"))
+    for valor in (Decimal("3.33"), Decimal("3.3349"), Decimal("3.35")):
+        with pytest.raises(HTTPException) as erro:
+            pagamento_service._validate_valor_exato_no_saldo(None, pedido, valor)
+        assert erro.value.status_code == 400
+        assert "Saldo: R$ 3.34" in erro.value.detail
+
+    monkeypatch.setattr(pagamento_service, "_total_pago_centavos", lambda db, pedido_id: 1000)
+    with pytest.raises(HTTPException) as erro:
+        pagamento_service._validate_valor_exato_no_saldo(None, pedido, Decimal("0.01"))
+    assert erro.value.status_code == 400
+    assert "quitada" in erro.value.detail
+
+
+def test_estoque_concorrente_sem_perda_de_atualizacao(tmp_path: Path):
+    # Banco em arquivo (WAL + busy_timeout como em producao): cada thread com sua conexao.
+    from concurrent.futures import ThreadPoolExecutor
+
+    from fastapi import HTTPException
+
+    from app.models.produto import Produto
+    from app.services import estoque_service
+
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'estoque.db'}",
+        connect_args={"check_same_thread": False, "timeout": 30},
+        future=True,
+    )
+
+    @event.listens_for(engine, "connect")
+    def _pragmas(dbapi_connection, _connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.close()
+
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False, future=True)
+    estoque_inicial = 300
+    with SessionLocal() as db:
+        produto = Produto(nome="Pao Frances", preco=Decimal("1.00"), estoque_atual=estoque_inicial)
+        db.add(produto)
+        db.flush()
+        estoque_service.registrar_saldo_inicial(db, produto.id, estoque_inicial)
+        db.commit()
+        produto_id = produto.id
+
+    def baixar_um(_):
+        with SessionLocal() as db:
+            try:
+                estoque_service.baixar(db, {produto_id: 1})
+            except HTTPException as exc:
+                assert exc.status_code == 400
+                return False
+            db.commit()
+            return True
+
+    def repor_um(_):
+        with SessionLocal() as db:
+            assert estoque_service.ajustar(db, produto_id, 1)
+            db.commit()
+
+    tentativas = 400
+    ajustes = 40
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        futuros_ajuste = [pool.submit(repor_um, i) for i in range(ajustes)]
+        resultados = list(pool.map(baixar_um, range(tentativas)))
+        for futuro in futuros_ajuste:
+            futuro.result()
+
+    vendidos = sum(resultados)
+    # Nunca vende mais do que existiu (inicial + reposicoes).
+    assert vendidos <= estoque_inicial + ajustes
+    assert tentativas - vendidos > 0
+    with SessionLocal() as db:
+        estoque_final = db.get(Produto, produto_id).estoque_atual
+        assert estoque_final == estoque_inicial + ajustes - vendidos
+        assert estoque_final >= 0
+        assert estoque_service.saldos_do_razao(db) == {produto_id: estoque_final}
+    engine.dispose()
+
+
+def test_escritor_unico_agrupa_commits_e_isola_erros(tmp_path: Path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    from fastapi import HTTPException
+
+    from app.db.escritor import EscritorUnico, criar_engine_escritor
+    from app.models.produto import Produto
+    from app.schemas.comanda import ComandaAbrirIn, ComandaItemCreate
+    from app.services import eventos_service
+
+    url = f"sqlite:///{tmp_path / 'escritor.db'}"
+    engine = create_engine(url, connect_args={"check_same_thread": False}, future=True)
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False, future=True)
+    with SessionLocal() as db:
+        produto = Produto(nome="Pao Frances", preco=Decimal("1.00"), controla_estoque=False)
+        db.add(produto)
+        db.commit()
+        produto_id = produto.id
+        comanda_service.create_codigo(db, "G-01")
+        pedido_id = comanda_service.abrir_comanda(db, ComandaAbrirIn(codigo="G-01"))["id"]
+
+    def _publica(_db):
+        antes = eventos_service.ultimo_id()
+        eventos_service.publicar("teste_escritor")
+        # Dentro do lote o evento fica retido ate o COMMIT real.
+        return antes, eventos_service.ultimo_id()
+
+    # Janela longa: as chamadas concorrentes caem no mesmo lote.
+    escritor = EscritorUnico(criar_engine_escritor(url), espera_ms=300)
+    escritor.iniciar()
+    try:
+        chamadas = [
+            (comanda_service.add_item, pedido_id, ComandaItemCreate(produto_id=produto_id, quantidade=2)),
+            (comanda_service.add_item, pedido_id, ComandaItemCreate(produto_id=9999, quantidade=1)),
+            (comanda_service.add_item, pedido_id, ComandaItemCreate(produto_id=produto_id, quantidade=1)),
+            (_publica,),
+        ]
+        with ThreadPoolExecutor(max_workers=len(chamadas)) as pool:
+            futuros = [pool.submit(escritor.executar, *chamada) for chamada in chamadas]
+        with pytest.raises(HTTPException) as erro:
+            futuros[1].result()
+        assert erro.value.status_code == 404
+        assert futuros[0].result()["id"] == pedido_id
+        antes, durante = futuros[3].result()
+        assert durante == antes
+        assert eventos_service.ultimo_id() > antes
+        assert escritor.lotes == 1
+        assert escritor.tarefas == len(chamadas)
+
+        with pytest.raises(RuntimeError):
+            escritor.executar(lambda _db: escritor.executar(_publica))
+    finally:
+        escritor.parar()
+        escritor.engine.dispose()
+
+    with SessionLocal() as db:
+        comanda = comanda_service.get_comanda(db, pedido_id)
+    # O 404 desfez so o proprio savepoint; as vizinhas do lote foram gravadas.
+    assert sorted(item["quantidade"] for item in comanda["itens"]) == [1, 2]
+    assert comanda["versao"] == 3
+    engine.dispose()
+    comanda_service.invalidate_read_caches()
+
+
+def test_escritor_commit_falho_nao_deixa_leitura_fantasma_no_cache(tmp_path: Path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    from app.db.escritor import EscritorUnico, criar_engine_escritor
+    from app.models.produto import Produto
+    from app.schemas.comanda import ComandaAbrirIn, ComandaItemCreate
+
+    url = f"sqlite:///{tmp_path / 'escritor_falho.db'}"
+    engine = create_engine(url, connect_args={"check_same_thread": False}, future=True)
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False, future=True)
+    with SessionLocal() as db:
+        produto = Produto(nome="Sonho", preco=Decimal("4.50"), controla_estoque=False)
+        db.add(produto)
+        db.commit()
+        produto_id = produto.id
+        comanda_service.create_codigo(db, "F-01")
+        pedido_id = comanda_service.abrir_comanda(db, ComandaAbrirIn(codigo="F-01"))["id"]
+
+    escritor = EscritorUnico(criar_engine_escritor(url), espera_ms=300)
+
+    @event.listens_for(escritor.engine, "commit")
+    def _falha_no_commit(_conn):
+        raise RuntimeError("disco cheio")
+
+    escritor.iniciar()
+    try:
+        chamadas = [
+            (comanda_service.add_item, pedido_id, ComandaItemCreate(produto_id=produto_id, quantidade=2)),
+            # Leitura no mesmo lote enxerga (e cacheia) o item ainda nao commitado.
+            (comanda_service.get_comanda, pedido_id),
+        ]
+        with ThreadPoolExecutor(max_workers=len(chamadas)) as pool:
+            futuros = [pool.submit(escritor.executar, *chamada) for chamada in chamadas]
+        for futuro in futuros:
+            with pytest.raises(RuntimeError, match="disco cheio"):
+                futuro.result()
+    finally:
+        escritor.parar()
+        escritor.engine.dispose()
+
+    with SessionLocal() as db:
+        comanda = comanda_service.get_comanda(db, pedido_id)
+    assert len(comanda["itens"]) == 0
+    assert comanda["total"] == Decimal("0.00")
+    engine.dispose()
+    comanda_service.invalidate_read_caches()
+
+
 def test_comandas_filter_by_tipo_and_status(client: TestClient):
     _create_codigo(client, "C-060")
     _create_codigo(client, "C-061")
@@ -1135,6 +2327,39 @@ def test_fechamento_caixa_and_csv(client: TestClient):
     assert "total_recebido" in csv_resp.text
 
 
+def test_lancamentos_csv_streaming(client: TestClient):
+    _create_codigo(client, "C-042")
+    produto = _create_produto(client)
+    comanda = _abrir_comanda(client, "C-042")
+    client.post(
+        f"/comandas/{comanda['id']}/itens",
+        json={"produto_id": produto["id"], "quantidade": 2, "observacoes": None, "adicionais": []},
+    )
+    client.post(
+        "/pagamentos",
+        json={"pedido_id": comanda["id"], "valor": "50.00", "metodo": "PIX"},
+    )
+
+    hoje = date.today().isoformat()
+    with client.stream(
+        "GET", f"/relatorios/lancamentos.csv?data_inicial={hoje}&data_final={hoje}"
+    ) as response:
+        assert response.status_code == 200
+        assert "text/csv" in response.headers["content-type"]
+        assert "content-length" not in response.headers
+        linhas = response.read().decode("utf-8-sig").splitlines()
+
+    assert linhas[0].startswith("tipo_linha;pedido_id;criado_em")
+    por_tipo = {linha.split(";")[0]: linha.split(";") for linha in linhas[1:]}
+    assert por_tipo["pedido"][12] == "50,00"
+    assert por_tipo["item"][8] == "Hamburguer Artesanal"
+    assert por_tipo["item"][9] == "2"
+    assert por_tipo["pagamento"][13] == "PIX"
+
+    invalido = client.get("/relatorios/lancamentos.csv?data_inicial=2020-01-01&data_final=2019-01-01")
+    assert invalido.status_code == 400
+
+
 def test_pagamentos_paginacao_limit_offset(client: TestClient):
     _create_codigo(client, "C-041")
     produto = _create_produto(client)
@@ -1436,3 +2661,109 @@ def test_cupom_cozinha_mostra_pedido_comanda_e_flag_alteracao(client: TestClient
     assert "Lista da Cozinha" not in cupom.text
     assert "Valor final do item" not in cupom.text
 
+
+def test_metrics_e_server_timing_por_requisicao(client: TestClient):
+    metricas.limpar()
+    produto_id = _create_produto(client)["id"]
+    _create_codigo(client)
+    pedido_id = _abrir_comanda(client)["id"]
+
+    response = client.post(f"/comandas/{pedido_id}/itens", json={"produto_id": produto_id, "quantidade": 1})
+    assert response.status_code == 200
+    timing = response.headers["server-timing"]
+    consultas = int(re.search(r'db;dur=[\d.]+;desc="(\d+) consultas"', timing).group(1))
+    assert consultas > 0
+    assert "app;dur=" in timing
+
+    client.get(f"/comandas/{pedido_id}")
+    client.get(f"/comandas/{pedido_id}")
+    client.get("/comandas/999999")
+
+    corpo = client.get("/metrics")
+    assert corpo.status_code == 200
+    assert corpo.headers["content-type"].startswith("text/plain")
+    texto = corpo.text
+    # Rotulo e o template da rota, nao o path com o id.
+    assert 'padaria_http_requisicoes_total{metodo="GET",rota="/comandas/{pedido_id}",status="200"} 2' in texto
+    assert 'padaria_http_requisicoes_total{metodo="GET",rota="/comandas/{pedido_id}",status="404"} 1' in texto
+    assert f"/comandas/{pedido_id}\"" not in texto
+    assert (
+        'padaria_http_duracao_segundos_bucket{metodo="POST",rota="/comandas/{pedido_id}/itens",le="+Inf"} 1'
+        in texto
+    )
+    assert (
+        f'padaria_sql_consultas_por_requisicao_sum{{metodo="POST",rota="/comandas/{{pedido_id}}/itens"}} '
+        f"{float(consultas):.6f}"
+    ) in texto
+    assert "padaria_comandas_cache_hit_ratio" in texto
+    assert "padaria_threadpool_saturacao" in texto
+
+
+def test_consultas_lentas_registram_plano_origem_e_alertas(client: TestClient, tmp_path: Path):
+    arquivo = tmp_path / "lentas.log"
+    consultas_lentas.registro.configurar(0.0, str(arquivo))
+    consultas_lentas.registro.limpar()
+    try:
+        _create_codigo(client)
+        _abrir_comanda(client)
+        assert client.get("/comandas", params={"codigo": "C"}).status_code == 200
+
+        consultas = client.get("/diagnostico/slow-queries.json").json()
+    finally:
+        consultas_lentas.registro.configurar(None)
+
+    filtro = next(c for c in consultas if " LIKE " in c["sql"] and "FROM pedidos" in c["sql"])
+    assert filtro["origem"].startswith("app.services.comanda_service.")
+    assert any("pedidos" in linha for linha in filtro["plano"])
+    assert "LIKE com curinga no inicio nao usa indice" in filtro["alertas"]
+    assert "str" in filtro["parametros"]
+    assert "'" not in filtro["sql"]
+    assert arquivo.read_text(encoding="utf-8").count("\n") >= len(consultas)
+
+    pagina = client.get("/diagnostico/slow-queries")
+    assert pagina.status_code == 200
+    assert "LIKE com curinga no inicio" in pagina.text
+
+    assert client.delete("/diagnostico/slow-queries").status_code == 204
+    assert client.get("/diagnostico/slow-queries.json").json() == []
+
+
+def test_normalizar_sql_agrupa_literais_e_listas():
+    sql = "SELECT *  FROM pedidos\n WHERE id IN (?, ?, ?) AND status = 'ABERTO' LIMIT 20"
+    assert consultas_lentas.normalizar_sql(sql) == "SELECT * FROM pedidos WHERE id IN (?...) AND status = ? LIMIT ?"
+    assert consultas_lentas.forma_parametros((1, 2, 3, "x")) == "(int x3, str)"
+
+
+def test_seed_carga_sintetica_consistente(tmp_path: Path):
+    import seed
+    from sqlalchemy import func, select, text
+
+    from app.db.session import configurar_sqlite
+    from app.models.comanda_codigo import ComandaCodigo
+    from app.models.pedido import Pedido
+    from app.services.manutencao_service import auditar_estoque, verificar_totais
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'carga.db'}", future=True)
+    event.listen(engine, "connect", configurar_sqlite)
+    seed.run_seed(engine)
+    # Lote menor que o total: exercita varias transacoes e os ids explicitos entre elas.
+    resultado = seed.gerar_carga(engine, pedidos=400, dias=10, codigos=20, lote=150)
+    assert resultado["pedidos"] == 400
+    assert resultado["itens"] > 400 and resultado["pagamentos"] > 0
+
+    with sessionmaker(bind=engine, future=True)() as db:
+        totais = verificar_totais(db)
+        assert totais["itens_divergentes"] == 0 and totais["pedidos_divergentes"] == 0
+        assert auditar_estoque(db)["produtos_divergentes"] == 0
+        assert db.scalar(
+            select(func.count()).select_from(ComandaCodigo).where(
+                ComandaCodigo.codigo.like("G-%"), ComandaCodigo.em_uso.is_(True)
+            )
+        ) == 5
+        assert db.scalar(select(func.count()).where(Pedido.comanda_codigo.like("G-%"))) == 400
+        # Triggers de busca pausados durante a carga voltam no fim.
+        gatilhos = db.scalars(
+            text("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'pedidos_%'")
+        ).all()
+        assert gatilhos
+    engine.dispose()
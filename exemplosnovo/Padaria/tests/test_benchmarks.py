@@ -0,0 +1,813 @@
+import threading
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from copy import deepcopy
+from datetime import datetime, timedelta
+from decimal import Decimal
+from statistics import median
+from time import perf_counter, process_time
+
+import pytest
+from fastapi.testclient import TestClient
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, desc, event, func, insert, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import selectinload, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.db.base import Base
+from app.db.consultas_lentas import explicar
+from app.db.escritor import EscritorUnico, criar_engine_escritor
+from app.db.session import configurar_sqlite, get_db
+from app.main import app
+from app.models.cliente import Cliente
+from app.models.comanda_codigo import ComandaCodigo
+from app.models.enums import MetodoPagamento, StatusPagamento, StatusPedido, TipoEntrega
+from app.models.item_pedido import ItemPedido
+from app.models.pagamento import Pagamento
+from app.models.pedido import Pedido
+from app.models.produto import Produto
+from app.schemas.comanda import ComandaAbrirIn, ComandaCodigoOut, ComandaItemCreate, ComandaListOut
+from app.schemas.pagamento import PagamentoOut
+from app.schemas.produto import ProdutoOut
+from app.services import comanda_service, pagamento_service, produto_service
+from app.services.manutencao_service import reconstruir_ponteiros_comanda
+from app.services.paginacao import codificar_cursor
+from app.services.read_model import freeze
+from app.services.utils import as_money, de_centavos
+
+BENCH_CODIGOS = 300
+BENCH_PEDIDOS = 500
+BENCH_RODADAS = 200
+BENCH_RELATORIO_PEDIDOS = 100_000
+BENCH_RELATORIO_DIAS = 30
+BENCH_RELATORIO_RODADAS = 20
+RELATORIO_PEQUENO_PEDIDOS = 3_000
+BENCH_PROJECAO_LINHAS = 10_000
+BENCH_PROJECAO_RODADAS = 3
+
+
+@pytest.fixture()
+def bench_db():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+        future=True,
+    )
+
+    @event.listens_for(engine, "connect")
+    def _enable_fk(dbapi_connection, _connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+    Base.metadata.create_all(bind=engine)
+    BenchSession = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False, future=True)
+    _seed_comandas(engine)
+    comanda_service.invalidate_read_caches()
+
+    db = BenchSession()
+    try:
+        yield db
+    finally:
+        db.close()
+        comanda_service.invalidate_read_caches()
+        Base.metadata.drop_all(bind=engine)
+
+
+def _seed_comandas(engine) -> None:
+    agora = datetime.now()
+    status_ciclo = [StatusPedido.ABERTO, StatusPedido.EM_PREPARO, StatusPedido.ENTREGUE]
+    with engine.begin() as conn:
+        conn.execute(insert(Cliente), [{"nome": "Balcao"}])
+        conn.execute(
+            insert(ComandaCodigo),
+            [
+                {
+                    "codigo": f"B-{idx:04d}",
+                    "ativo": True,
+                    "em_uso": idx % 3 != 2,
+                    "status_visual": status_ciclo[idx % 3].value,
+                }
+                for idx in range(BENCH_CODIGOS)
+            ],
+        )
+        conn.execute(
+            insert(Pedido),
+            [
+                {
+                    "cliente_id": 1,
+                    "comanda_codigo": f"B-{idx % BENCH_CODIGOS:04d}",
+                    "mesa": str(idx % 40),
+                    "status": status_ciclo[idx % 3],
+                    "tipo_entrega": TipoEntrega.RETIRADA,
+                    "observacoes": "Sem cebola " * 20,
+                    "total": Decimal("37.50"),
+                    "criado_em": agora - timedelta(minutes=idx),
+                }
+                for idx in range(BENCH_PEDIDOS)
+            ],
+        )
+        reconstruir_ponteiros_comanda(conn)
+
+
+def _cpu_por_request(fn, rodadas: int = BENCH_RODADAS) -> float:
+    inicio = process_time()
+    for _ in range(rodadas):
+        fn()
+    return (process_time() - inicio) / rodadas
+
+
+def _thaw(payload):
+    if isinstance(payload, (list, tuple)):
+        return [_thaw(item) for item in payload]
+    if hasattr(payload, "items"):
+        return {key: _thaw(value) for key, value in payload.items()}
+    return payload
+
+
+def _list_comandas(db):
+    return comanda_service.list_comandas(
+        db,
+        status_filter=None,
+        tipo_entrega=None,
+        codigo=None,
+        mesa=None,
+        data_inicial=None,
+        data_final=None,
+        total_min=None,
+        total_max=None,
+        order_by="id",
+        order_dir="desc",
+        offset=0,
+        limit=500,
+    )
+
+
+def _leituras_cacheadas(db) -> dict:
+    return {
+        "painel": lambda: comanda_service.list_painel_comandas(db),
+        "list_comandas": lambda: _list_comandas(db),
+    }
+
+
+def test_cache_leitura_devolve_payload_congelado(bench_db):
+    for fn in _leituras_cacheadas(bench_db).values():
+        payload = fn()
+        assert payload
+        # Acerto de cache devolve as proprias linhas congeladas, sem copia.
+        de_novo = fn()
+        assert len(de_novo) == len(payload)
+        assert all(linha is cacheada for linha, cacheada in zip(de_novo, payload))
+        with pytest.raises(TypeError):
+            payload[0]["status"] = "LIBERADO"
+
+
+@pytest.mark.bench
+def test_bench_cache_leitura_sem_deepcopy(bench_db):
+    for nome, fn in _leituras_cacheadas(bench_db).items():
+        payload = fn()
+        # O _cache_read antigo guardava dicts e fazia deepcopy a cada acerto.
+        guardado = _thaw(payload)
+
+        def _leitura_antiga(fn=fn, guardado=guardado):
+            fn()
+            return deepcopy(guardado)
+
+        assert _leitura_antiga() == guardado
+        antes = _cpu_por_request(_leitura_antiga, rodadas=20)
+        depois = _cpu_por_request(fn)
+        print(
+            f"\n[bench] {nome}: {len(payload)} linhas | "
+            f"deepcopy {antes * 1e6:.1f} us/req | congelado {depois * 1e6:.1f} us/req"
+        )
+        assert depois < antes
+
+
+@pytest.fixture()
+def bench_relatorio():
+    yield from _cliente_relatorio(BENCH_RELATORIO_PEDIDOS)
+
+
+@pytest.fixture()
+def relatorio_pequeno():
+    yield from _cliente_relatorio(RELATORIO_PEQUENO_PEDIDOS)
+
+
+def _cliente_relatorio(pedidos: int):
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+        future=True,
+    )
+    Base.metadata.create_all(bind=engine)
+    _seed_relatorio(engine, pedidos)
+    consultas: list[str] = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _contar(_conn, _cursor, statement, _params, _context, _executemany):
+        consultas.append(statement)
+
+    BenchSession = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False, future=True)
+
+    def override_get_db():
+        db = BenchSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    with TestClient(app) as client:
+        yield client, consultas
+    app.dependency_overrides.clear()
+    Base.metadata.drop_all(bind=engine)
+
+
+def _seed_relatorio(engine, pedidos: int) -> None:
+    # Pedidos espalhados em 30 dias (100k: ~3.3k por dia), pagamento aprovado nos entregues.
+    inicio = datetime.combine(datetime.now().date(), datetime.min.time()) - timedelta(
+        days=BENCH_RELATORIO_DIAS - 1
+    )
+    passo = timedelta(days=BENCH_RELATORIO_DIAS) / pedidos
+    status_ciclo = list(StatusPedido)
+    tipos = list(TipoEntrega)
+    metodos = list(MetodoPagamento)
+    with engine.begin() as conn:
+        conn.execute(insert(Cliente), [{"nome": "Balcao"}])
+        conn.execute(
+            insert(Pedido),
+            [
+                {
+                    "cliente_id": 1,
+                    "status": status_ciclo[idx % len(status_ciclo)],
+                    "tipo_entrega": tipos[idx % len(tipos)],
+                    "total": Decimal("37.50"),
+                    "criado_em": inicio + passo * idx,
+                }
+                for idx in range(pedidos)
+            ],
+        )
+        conn.execute(
+            insert(Pagamento),
+            [
+                {
+                    "pedido_id": idx + 1,
+                    "metodo": metodos[idx % len(metodos)],
+                    "status": StatusPagamento.APROVADO,
+                    "valor": Decimal("37.50"),
+                    "criado_em": inicio + passo * idx,
+                }
+                for idx in range(pedidos)
+                if status_ciclo[idx % len(status_ciclo)] == StatusPedido.ENTREGUE
+            ],
+        )
+
+
+def test_fechamento_caixa_duas_consultas_por_request(relatorio_pequeno):
+    client, consultas = relatorio_pequeno
+    hoje = datetime.now().date().isoformat()
+    for rota in (f"/relatorios/fechamento-caixa?data={hoje}", f"/relatorios/fechamento-caixa.csv?data={hoje}"):
+        assert client.get(rota).status_code == 200
+        consultas.clear()
+        for _ in range(3):
+            assert client.get(rota).status_code == 200
+        # Uma passada em pedidos e uma em pagamentos, qualquer que seja o volume do dia.
+        assert len(consultas) == 3 * 2
+
+    payload = client.get(f"/relatorios/fechamento-caixa?data={hoje}").json()
+    por_dia = RELATORIO_PEQUENO_PEDIDOS // BENCH_RELATORIO_DIAS
+    assert abs(payload["total_pedidos"] - por_dia) <= 1
+    assert payload["pedidos_cancelados"] == payload["pedidos_por_status"]["CANCELADO"]
+    assert sum(payload["pedidos_por_tipo_entrega"].values()) == payload["pedidos_validos"]
+
+
+@pytest.mark.bench
+def test_bench_fechamento_caixa_100k(bench_relatorio):
+    client, consultas = bench_relatorio
+    hoje = datetime.now().date().isoformat()
+    for rota in (f"/relatorios/fechamento-caixa?data={hoje}", f"/relatorios/fechamento-caixa.csv?data={hoje}"):
+        assert client.get(rota).status_code == 200
+        consultas.clear()
+        latencias = []
+        for _ in range(BENCH_RELATORIO_RODADAS):
+            inicio = perf_counter()
+            response = client.get(rota)
+            latencias.append(perf_counter() - inicio)
+            assert response.status_code == 200
+        por_request = len(consultas) / BENCH_RELATORIO_RODADAS
+        print(
+            f"\n[bench] {rota.split('?')[0]}: {BENCH_RELATORIO_PEDIDOS} pedidos | "
+            f"p50 {median(latencias) * 1e3:.1f} ms | max {max(latencias) * 1e3:.1f} ms | "
+            f"{por_request:.0f} consultas/req"
+        )
+        # Uma passada em pedidos e uma em pagamentos.
+        assert por_request == 2
+
+    payload = client.get(f"/relatorios/fechamento-caixa?data={hoje}").json()
+    por_dia = BENCH_RELATORIO_PEDIDOS // BENCH_RELATORIO_DIAS
+    assert abs(payload["total_pedidos"] - por_dia) <= 1
+    assert payload["pedidos_cancelados"] == payload["pedidos_por_status"]["CANCELADO"]
+    assert sum(payload["pedidos_por_tipo_entrega"].values()) == payload["pedidos_validos"]
+
+
+BENCH_ESCRITORES = 16
+BENCH_ESCRITAS_POR_THREAD = 25
+
+
+@pytest.fixture()
+def bench_escritas(tmp_path):
+    # Banco em arquivo com os mesmos PRAGMAs de producao (WAL, busy_timeout).
+    url = f"sqlite:///{tmp_path / 'escritas.db'}"
+    engine = create_engine(url, connect_args={"check_same_thread": False}, future=True)
+    event.listen(engine, "connect", configurar_sqlite)
+    Base.metadata.create_all(bind=engine)
+    BenchSession = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False, future=True)
+    with BenchSession() as db:
+        produto = Produto(nome="Pao Frances", preco=Decimal("1.00"), controla_estoque=False)
+        db.add(produto)
+        db.commit()
+        produto_id = produto.id
+        pedidos = []
+        for idx in range(BENCH_ESCRITORES * 2):
+            comanda_service.create_codigo(db, f"W-{idx:03d}")
+            aberta = comanda_service.abrir_comanda(db, ComandaAbrirIn(codigo=f"W-{idx:03d}"))
+            pedidos.append(aberta["id"])
+    comanda_service.invalidate_read_caches()
+    try:
+        yield url, BenchSession, produto_id, pedidos
+    finally:
+        comanda_service.invalidate_read_caches()
+        engine.dispose()
+
+
+def _rajada_de_escritas(escrever, pedidos: list[int], produto_id: int) -> tuple[float, list[float], int]:
+    item = ComandaItemCreate(produto_id=produto_id, quantidade=1)
+    travados = 0
+    latencias: list[float] = []
+    lock = threading.Lock()
+
+    def _thread(pedido_id: int) -> None:
+        nonlocal travados
+        for _ in range(BENCH_ESCRITAS_POR_THREAD):
+            inicio = perf_counter()
+            try:
+                escrever(comanda_service.add_item, pedido_id, item)
+            except OperationalError as exc:
+                assert "locked" in str(exc)
+                with lock:
+                    travados += 1
+                continue
+            with lock:
+                latencias.append(perf_counter() - inicio)
+
+    inicio = perf_counter()
+    with ThreadPoolExecutor(max_workers=BENCH_ESCRITORES) as pool:
+        list(pool.map(_thread, pedidos))
+    return perf_counter() - inicio, latencias, travados
+
+
+@pytest.mark.bench
+def test_bench_escritor_group_commit(bench_escritas):
+    url, BenchSession, produto_id, pedidos = bench_escritas
+
+    def _direto(funcao, *args):
+        with BenchSession() as db:
+            return funcao(db, *args)
+
+    escritor = EscritorUnico(criar_engine_escritor(url))
+    escritor.iniciar()
+    try:
+        cenarios = {
+            "commit por request": (_direto, pedidos[:BENCH_ESCRITORES]),
+            "escritor unico": (escritor.executar, pedidos[BENCH_ESCRITORES:]),
+        }
+        resultados = {}
+        for nome, (escrever, alvo) in cenarios.items():
+            duracao, latencias, travados = _rajada_de_escritas(escrever, alvo, produto_id)
+            resultados[nome] = (len(latencias), travados)
+            latencias.sort()
+            p95 = latencias[int(len(latencias) * 0.95) - 1]
+            p99 = latencias[int(len(latencias) * 0.99) - 1]
+            print(
+                f"\n[bench] {nome}: {len(latencias) / duracao:.0f} escritas/s | "
+                f"p50 {median(latencias) * 1e3:.1f} ms | p95 {p95 * 1e3:.1f} ms | "
+                f"p99 {p99 * 1e3:.1f} ms | {travados} 'database is locked'"
+            )
+    finally:
+        escritor.parar()
+        escritor.engine.dispose()
+    print(f"[bench] escritor: {escritor.tarefas} escritas em {escritor.lotes} commits")
+
+    total = BENCH_ESCRITORES * BENCH_ESCRITAS_POR_THREAD
+    assert resultados["escritor unico"] == (total, 0)
+    assert escritor.lotes < escritor.tarefas
+    with BenchSession() as db:
+        for pedido_id in pedidos[BENCH_ESCRITORES:]:
+            comanda = comanda_service.get_comanda(db, pedido_id)
+            assert len(comanda["itens"]) == BENCH_ESCRITAS_POR_THREAD
+            assert comanda["versao"] == BENCH_ESCRITAS_POR_THREAD + 1
+
+
+@pytest.fixture()
+def bench_projecao():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+        future=True,
+    )
+    Base.metadata.create_all(bind=engine)
+    _seed_projecao(engine)
+    BenchSession = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False, future=True)
+    comanda_service.invalidate_read_caches()
+    try:
+        yield BenchSession
+    finally:
+        comanda_service.invalidate_read_caches()
+        Base.metadata.drop_all(bind=engine)
+
+
+def _seed_projecao(engine) -> None:
+    # Textos longos (observacoes/descricao) que as listagens nao devolvem.
+    agora = datetime.now()
+    total = BENCH_PROJECAO_LINHAS
+    with engine.begin() as conn:
+        conn.execute(insert(Cliente), [{"nome": "Balcao"}])
+        conn.execute(
+            insert(ComandaCodigo),
+            [
+                {"codigo": f"P-{idx:05d}", "ativo": True, "em_uso": False, "status_visual": "ENTREGUE"}
+                for idx in range(total)
+            ],
+        )
+        conn.execute(
+            insert(Pedido),
+            [
+                {
+                    "cliente_id": 1,
+                    "comanda_codigo": f"P-{idx:05d}",
+                    "mesa": str(idx % 40),
+                    "status": StatusPedido.ENTREGUE if idx % 5 else StatusPedido.CANCELADO,
+                    "tipo_entrega": TipoEntrega.RETIRADA,
+                    "observacoes": "Sem cebola, molho a parte e ponto da carne bem passado. " * 40,
+                    "total": Decimal("37.50"),
+                    "criado_em": agora - timedelta(minutes=idx),
+                }
+                for idx in range(total)
+            ],
+        )
+        conn.execute(
+            insert(Pagamento),
+            [
+                {
+                    "pedido_id": idx + 1,
+                    "metodo": MetodoPagamento.PIX,
+                    "status": StatusPagamento.APROVADO,
+                    "valor": Decimal("37.50"),
+                    "criado_em": agora - timedelta(minutes=idx),
+                }
+                for idx in range(total)
+            ],
+        )
+        conn.execute(
+            insert(Produto),
+            [
+                {
+                    "nome": f"Produto {idx:05d}",
+                    "descricao": "Massa de fermentacao natural, assada no forno a lenha. " * 15,
+                    "preco": Decimal("9.90"),
+                    "estoque_atual": 10,
+                }
+                for idx in range(total)
+            ],
+        )
+        reconstruir_ponteiros_comanda(conn)
+
+
+def _comandas_com_entidades(db):
+    # Caminho antigo: Pedido inteiro (com observacoes) no identity map para copiar 7 campos.
+    pedidos = db.scalars(
+        select(Pedido)
+        .where(Pedido.comanda_codigo.is_not(None))
+        .order_by(desc(Pedido.id))
+        .limit(BENCH_PROJECAO_LINHAS)
+    ).all()
+    total_itens = dict(
+        db.execute(
+            select(ItemPedido.pedido_id, func.coalesce(func.sum(ItemPedido.quantidade), 0))
+            .where(ItemPedido.pedido_id.in_([p.id for p in pedidos]))
+            .group_by(ItemPedido.pedido_id)
+        ).all()
+    )
+    return freeze(
+        [
+            {
+                "id": p.id,
+                "comanda_codigo": p.comanda_codigo,
+                "mesa": p.mesa,
+                "status": p.status,
+                "tipo_entrega": p.tipo_entrega,
+                "total": as_money(p.total),
+                "total_itens": total_itens.get(p.id, 0),
+                "complexidade": "Sem itens",
+                "criado_em": p.criado_em,
+            }
+            for p in pedidos
+        ]
+    )
+
+
+def _historico_com_entidades(db):
+    pedidos = db.scalars(
+        select(Pedido)
+        .where(
+            Pedido.comanda_codigo.is_not(None),
+            Pedido.status.in_([StatusPedido.ENTREGUE, StatusPedido.CANCELADO]),
+        )
+        .order_by(desc(Pedido.criado_em))
+        .limit(BENCH_PROJECAO_LINHAS)
+    ).all()
+    return freeze(
+        [
+            {
+                "pedido_id": p.id,
+                "cliente_id": p.cliente_id,
+                "cliente_nome": "Balcao",
+                "status": p.status,
+                "tipo_entrega": p.tipo_entrega,
+                "mesa": p.mesa,
+                "total": as_money(p.total),
+                "criado_em": p.criado_em,
+                "comanda_codigo": p.comanda_codigo,
+            }
+            for p in pedidos
+        ]
+    )
+
+
+def _medir_listagem(BenchSession, fn) -> tuple[float, int]:
+    # Sessao nova por chamada (como uma request); cache de leitura zerado antes.
+    def _chamar():
+        comanda_service.invalidate_read_caches()
+        with BenchSession() as db:
+            return fn(db)
+
+    tempos = []
+    for _ in range(BENCH_PROJECAO_RODADAS):
+        inicio = process_time()
+        resultado = _chamar()
+        tempos.append(process_time() - inicio)
+    assert len(resultado) == BENCH_PROJECAO_LINHAS
+    tracemalloc.start()
+    try:
+        _chamar()
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return median(tempos), pico
+
+
+def _cenarios_projecao(n: int) -> dict[str, tuple]:
+    # nome -> (caminho antigo com entidades ORM, caminho atual por projecao)
+    comandas_out = TypeAdapter(list[ComandaListOut])
+    codigos_out = TypeAdapter(list[ComandaCodigoOut])
+    pagamentos_out = TypeAdapter(list[PagamentoOut])
+    produtos_out = TypeAdapter(list[ProdutoOut])
+
+    def _validar(adapter, fn):
+        return lambda db: adapter.validate_python(fn(db), from_attributes=True)
+
+    def _produtos_com_entidades(db):
+        stmt = select(Produto).options(selectinload(Produto.adicionais_links))
+        return db.scalars(stmt.order_by(Produto.id.desc()).limit(n)).all()
+
+    return {
+        "list_comandas": (
+            _validar(comandas_out, _comandas_com_entidades),
+            _validar(
+                comandas_out,
+                lambda db: comanda_service.list_comandas(
+                    db, None, None, None, None, None, None, None, None, "id", "desc", limit=n
+                ),
+            ),
+        ),
+        "list_historico": (
+            _historico_com_entidades,
+            lambda db: comanda_service.list_historico(
+                db, data_inicial=None, data_final=None, status_filter=None, somente_finalizadas=True, limit=n
+            ),
+        ),
+        "list_codigos": (
+            _validar(
+                codigos_out,
+                lambda db: db.scalars(select(ComandaCodigo).order_by(ComandaCodigo.codigo.asc())).all(),
+            ),
+            _validar(codigos_out, lambda db: comanda_service.list_codigos(db, None, None)),
+        ),
+        "list_pagamentos": (
+            _validar(
+                pagamentos_out,
+                lambda db: db.scalars(select(Pagamento).order_by(Pagamento.id.desc()).limit(n)).all(),
+            ),
+            _validar(pagamentos_out, lambda db: pagamento_service.list_pagamentos(db, None, limit=n)),
+        ),
+        "list_produtos": (
+            _validar(produtos_out, _produtos_com_entidades),
+            _validar(
+                produtos_out,
+                lambda db: produto_service.list_produtos(db, page=1, page_size=n, ativo=None, q=None)[0],
+            ),
+        ),
+    }
+
+
+# Comandos SQL por listagem, independentes do numero de linhas.
+CONSULTAS_POR_LISTAGEM = {
+    "list_comandas": 2,
+    "list_historico": 1,
+    "list_codigos": 1,
+    "list_pagamentos": 1,
+    "list_produtos": 3,  # contagem, pagina e vinculos de adicionais
+}
+
+
+def test_listagens_por_projecao_sem_entidades(bench_projecao):
+    n = BENCH_PROJECAO_LINHAS
+    consultas: list[str] = []
+
+    def _capturar(_conn, _cursor, statement, _params, _context, _executemany):
+        consultas.append(statement)
+
+    engine = bench_projecao.kw["bind"]
+    event.listen(engine, "before_cursor_execute", _capturar)
+    try:
+        for nome, (_entidades, projecao) in _cenarios_projecao(n).items():
+            comanda_service.invalidate_read_caches()
+            consultas.clear()
+            with bench_projecao() as db:
+                assert len(projecao(db)) == n
+                # Linhas montadas das colunas: nada de entidade carregada na sessao.
+                assert not db.identity_map, nome
+            assert len(consultas) == CONSULTAS_POR_LISTAGEM[nome], (nome, consultas)
+            if nome in {"list_comandas", "list_historico"}:
+                # O texto longo de observacoes nao sai do banco nas listagens.
+                assert not any("observacoes" in sql for sql in consultas), nome
+    finally:
+        event.remove(engine, "before_cursor_execute", _capturar)
+
+    # Painel com 10k codigos: linhas montadas a partir das colunas do join.
+    with bench_projecao() as db:
+        painel = comanda_service.list_painel_comandas(db)
+        assert len(painel) == n
+        assert painel[0]["pedido_id"] is not None
+        assert not db.identity_map
+
+
+@pytest.mark.bench
+def test_bench_listagens_por_projecao_10k(bench_projecao):
+    # CPU so e impresso: com a maquina carregada a diferenca em list_comandas some no
+    # ruido (ja mediu projecao mais lenta que entidades), entao nao ha assert de tempo.
+    # O ganho que se sustenta e de memoria e de nao montar o identity map.
+    n = BENCH_PROJECAO_LINHAS
+    for nome, (entidades, projecao) in _cenarios_projecao(n).items():
+        cpu_antes, mem_antes = _medir_listagem(bench_projecao, entidades)
+        cpu_depois, mem_depois = _medir_listagem(bench_projecao, projecao)
+        print(
+            f"\n[bench] {nome} ({n} linhas): entidades {cpu_antes * 1e3:.0f} ms / "
+            f"{mem_antes / 2**20:.1f} MiB | projecao {cpu_depois * 1e3:.0f} ms / "
+            f"{mem_depois / 2**20:.1f} MiB"
+        )
+        assert mem_depois < mem_antes
+
+
+def test_pagamentos_cursor_independe_da_profundidade(relatorio_pequeno):
+    client, _consultas = relatorio_pequeno
+    total = len(client.get("/pagamentos", params={"limit": 5000}).json())
+    ids = []
+    cursor = None
+    while True:
+        response = client.get("/pagamentos", params={"limit": 500, **({"cursor": cursor} if cursor else {})})
+        ids.extend(item["id"] for item in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    profundidade = len(ids) - 100
+    assert len(ids) == len(set(ids)) == total and profundidade > 0
+
+    # Mesma pagina funda pelos dois caminhos.
+    por_offset = client.get("/pagamentos", params={"limit": 50, "offset": profundidade}).json()
+    cursor_fundo = codificar_cursor(ids[profundidade - 1])
+    por_cursor = client.get("/pagamentos", params={"limit": 50, "cursor": cursor_fundo}).json()
+    assert por_cursor == por_offset
+
+    # Tempo nao prova nada neste volume (OFFSET de alguns milhares e barato); o plano
+    # prova: o cursor entra direto pela chave e le so as 50 linhas da pagina, em
+    # qualquer profundidade, enquanto o OFFSET percorre e descarta as anteriores.
+    db = next(app.dependency_overrides[get_db]())
+    engine = db.get_bind()
+    capturadas: list[tuple[tuple, list[str]]] = []
+
+    def _capturar(conn, _cursor, statement, parameters, _context, _executemany):
+        if "FROM pagamentos" in statement:
+            capturadas.append((tuple(parameters), explicar(conn, statement, parameters)))
+
+    event.listen(engine, "before_cursor_execute", _capturar)
+    try:
+        pagamento_service.list_pagamentos(db, None, limit=50, cursor=cursor_fundo)
+        pagamento_service.list_pagamentos(db, None, limit=50, offset=profundidade)
+    finally:
+        event.remove(engine, "before_cursor_execute", _capturar)
+        db.close()
+    (params_cursor, plano_cursor), (params_offset, plano_offset) = capturadas
+    # O dialeto SQLite sempre escreve "LIMIT ? OFFSET ?": o que importa e o valor.
+    assert params_cursor[-2:] == (50, 0)
+    assert any("SEARCH pagamentos USING INTEGER PRIMARY KEY (rowid<?)" in linha for linha in plano_cursor)
+    assert params_offset[-2:] == (50, profundidade)
+    assert any(linha.strip().startswith("SCAN pagamentos") for linha in plano_offset)
+
+
+BENCH_DINHEIRO_DIAS = 366 * 5
+
+
+@pytest.mark.bench
+def test_bench_rollup_em_centavos():
+    # Mesmo _somar_vendas_diarias sobre 5 anos de rollup: linhas com centavos
+    # inteiros (colunas atuais) contra Decimal de 2 casas (colunas NUMERIC antigas).
+    from types import SimpleNamespace
+
+    from app.services import relatorio_service
+
+    inicio = datetime(2020, 1, 1).date()
+    campos = ("dia", "status", "tipo_entrega", "metodo", "pedidos", "valor_pedidos", "valor_recebido")
+    em_centavos = []
+    em_decimal = []
+    for dia in range(BENCH_DINHEIRO_DIAS):
+        data = inicio + timedelta(days=dia)
+        linhas = [
+            (data, status.value, tipo.value, "", 3, 3750 * (idx + 1) + dia, 0)
+            for idx, status in enumerate(StatusPedido)
+            for tipo in TipoEntrega
+        ]
+        linhas.extend((data, "", "", metodo.value, 0, 0, 1999 + dia) for metodo in MetodoPagamento)
+        for linha in linhas:
+            em_centavos.append(SimpleNamespace(**dict(zip(campos, linha))))
+            reais = (*linha[:5], de_centavos(linha[5]), de_centavos(linha[6]))
+            em_decimal.append(SimpleNamespace(**dict(zip(campos, reais))))
+
+    atual = relatorio_service._somar_vendas_diarias(em_centavos)
+    legado = relatorio_service._somar_vendas_diarias(em_decimal)
+    for data, dia in atual.items():
+        assert de_centavos(dia["total_vendido"]) == legado[data]["total_vendido"]
+        assert relatorio_service._em_reais(dia["pagamentos_por_metodo"]) == legado[data]["pagamentos_por_metodo"]
+
+    cpu_decimal = _cpu_por_request(lambda: relatorio_service._somar_vendas_diarias(em_decimal), rodadas=5)
+    cpu_centavos = _cpu_por_request(lambda: relatorio_service._somar_vendas_diarias(em_centavos), rodadas=5)
+    print(
+        f"\n[bench] rollup {len(em_centavos)} linhas: Decimal {cpu_decimal * 1e3:.1f} ms | "
+        f"centavos {cpu_centavos * 1e3:.1f} ms"
+    )
+    assert cpu_centavos < cpu_decimal
+
+
+def test_bench_suite_json_e_regressao(tmp_path):
+    import json
+
+    import benchmark
+
+    tamanhos = {"mini": benchmark.Tamanho(pedidos=300, dias=5, codigos=20)}
+    resultado = benchmark.executar(tamanhos, rodadas=3, diretorio=tmp_path)
+    operacoes = resultado["tamanhos"]["mini"]["operacoes"]
+    assert list(operacoes) == list(benchmark.OPERACOES)
+    for metricas in operacoes.values():
+        assert metricas["amostras"] == 3
+        assert 0 < metricas["p50_ms"] <= metricas["p95_ms"] <= metricas["max_ms"]
+        assert metricas["consultas"] >= 1
+    # Segunda execucao reaproveita o banco gerado e parte dele de novo (codigos BENCH livres).
+    assert benchmark.executar(tamanhos, rodadas=3, diretorio=tmp_path)["tamanhos"]["mini"]["banco"] == (
+        resultado["tamanhos"]["mini"]["banco"]
+    )
+
+    base = json.loads(json.dumps(resultado))
+    assert not any(linha["regressao"] for linha in benchmark.comparar(base, base))
+
+    pior = deepcopy(base)
+    pior["tamanhos"]["mini"]["operacoes"]["list_comandas"]["p95_ms"] *= 3
+    pior["tamanhos"]["mini"]["operacoes"]["list_comandas"]["p95_ms"] += 1
+    pior["tamanhos"]["mini"]["operacoes"]["get_comanda"]["consultas"] += 1
+    regressoes = {
+        (linha["operacao"], linha["metrica"]) for linha in benchmark.comparar(base, pior) if linha["regressao"]
+    }
+    assert regressoes == {("list_comandas", "p95_ms"), ("get_comanda", "consultas")}
+    # Abaixo da tolerancia absoluta, variacao percentual grande e ruido.
+    assert not any(
+        linha["regressao"] and linha["metrica"] != "consultas"
+        for linha in benchmark.comparar(base, pior, tolerancia_ms=1_000)
+    )
+
+    (tmp_path / "base.json").write_text(json.dumps(base), encoding="utf-8")
+    (tmp_path / "pior.json").write_text(json.dumps(pior), encoding="utf-8")
+    assert benchmark.main(["compare", str(tmp_path / "base.json"), str(tmp_path / "base.json")]) == 0
+    assert benchmark.main(["compare", str(tmp_path / "base.json"), str(tmp_path / "pior.json")]) == 1
@@ -0,0 +1,214 @@
+from collections.abc import Callable
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import create_engine, event, insert, select
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.db.base import Base
+from app.db.bootstrap import ensure_schema
+from app.db.consultas_lentas import explicar, normalizar_sql, tabelas_varridas
+from app.models.cliente import Cliente
+from app.models.comanda_codigo import ComandaCodigo
+from app.models.enums import MetodoPagamento, StatusPagamento, StatusPedido, TipoEntrega
+from app.models.item_pedido import ItemPedido
+from app.models.pagamento import Pagamento
+from app.models.pedido import Pedido
+from app.models.produto import Produto
+from app.services import comanda_service, pagamento_service, relatorio_service
+from app.services.manutencao_service import reconstruir_ponteiros_comanda
+
+INDICES_PEDIDOS = 5_000
+INDICES_DIAS = 30
+INDICES_CODIGOS = 200
+INDICES_PRODUTOS = 60
+# Tabelas quentes: varredura completa nelas cresce com o historico da loja.
+TABELAS_QUENTES = {"pedidos", "itens_pedido"}
+
+# (cenario, tabela) -> motivo. Toda varredura aceita precisa de justificativa aqui;
+# qualquer outra em tabela quente reprova o teste.
+PERMITIDAS: dict[tuple[str, str], str] = {
+    ("list_sugestoes_mais_pedidos", "itens_pedido"): (
+        "ranking de todo o historico: precisa ler todos os itens; o resultado fica no "
+        "cache de leitura ate a proxima escrita em itens"
+    ),
+}
+
+
+@pytest.fixture(scope="module")
+def banco_indices():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+        future=True,
+    )
+
+    @event.listens_for(engine, "connect")
+    def _enable_fk(dbapi_connection, _connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+    Base.metadata.create_all(bind=engine)
+    _seed_indices(engine)
+    # Os indices de bootstrap._ensure_indexes (e o rollup) so existem depois daqui.
+    ensure_schema(engine)
+    yield engine
+    comanda_service.invalidate_read_caches()
+    engine.dispose()
+
+
+def _seed_indices(engine) -> None:
+    inicio = datetime.combine(datetime.now().date(), datetime.min.time()) - timedelta(days=INDICES_DIAS - 1)
+    passo = timedelta(days=INDICES_DIAS) / INDICES_PEDIDOS
+    status_ciclo = list(StatusPedido)
+    metodos = list(MetodoPagamento)
+    with engine.begin() as conn:
+        conn.execute(insert(Cliente), [{"nome": "Balcao"}])
+        conn.execute(
+            insert(Produto),
+            [
+                {"nome": f"Produto {idx:03d}", "preco": Decimal("9.90"), "estoque_atual": 100}
+                for idx in range(INDICES_PRODUTOS)
+            ],
+        )
+        conn.execute(
+            insert(ComandaCodigo),
+            [
+                {"codigo": f"I-{idx:03d}", "ativo": True, "em_uso": idx % 4 == 0, "status_visual": "LIBERADO"}
+                for idx in range(INDICES_CODIGOS)
+            ],
+        )
+        conn.execute(
+            insert(Pedido),
+            [
+                {
+                    "cliente_id": 1,
+                    "comanda_codigo": f"I-{idx % INDICES_CODIGOS:03d}",
+                    "mesa": str(idx % 40),
+                    "status": status_ciclo[idx % len(status_ciclo)],
+                    "tipo_entrega": TipoEntrega.RETIRADA,
+                    "total": Decimal("19.80"),
+                    "criado_em": inicio + passo * idx,
+                }
+                for idx in range(INDICES_PEDIDOS)
+            ],
+        )
+        conn.execute(
+            insert(ItemPedido),
+            [
+                {
+                    "pedido_id": idx // 2 + 1,
+                    "produto_id": idx % INDICES_PRODUTOS + 1,
+                    "quantidade": 1,
+                    "preco_unitario": Decimal("9.90"),
+                    "subtotal": Decimal("9.90"),
+                }
+                for idx in range(INDICES_PEDIDOS * 2)
+            ],
+        )
+        conn.execute(
+            insert(Pagamento),
+            [
+                {
+                    "pedido_id": idx + 1,
+                    "metodo": metodos[idx % len(metodos)],
+                    "status": StatusPagamento.APROVADO,
+                    "valor": Decimal("19.80"),
+                    "criado_em": inicio + passo * idx,
+                }
+                for idx in range(INDICES_PEDIDOS)
+                if status_ciclo[idx % len(status_ciclo)] == StatusPedido.ENTREGUE
+            ],
+        )
+        reconstruir_ponteiros_comanda(conn)
+
+
+def _filtros_comandas(**filtros):
+    padrao = {
+        "status_filter": None,
+        "tipo_entrega": None,
+        "codigo": None,
+        "mesa": None,
+        "data_inicial": None,
+        "data_final": None,
+        "total_min": None,
+        "total_max": None,
+        "order_by": "criado_em",
+        "order_dir": "desc",
+        "limit": 50,
+    }
+    return {**padrao, **filtros}
+
+
+def _cenarios() -> dict[str, Callable[[Session], object]]:
+    hoje = datetime.now().date()
+    semana = hoje - timedelta(days=6)
+    return {
+        "list_painel_comandas": lambda db: comanda_service.list_painel_comandas(db),
+        "list_comandas": lambda db: comanda_service.list_comandas(db, **_filtros_comandas()),
+        "list_comandas_status": lambda db: comanda_service.list_comandas(
+            db, **_filtros_comandas(status_filter=StatusPedido.ABERTO)
+        ),
+        "list_comandas_periodo": lambda db: comanda_service.list_comandas(
+            db, **_filtros_comandas(data_inicial=semana, data_final=hoje)
+        ),
+        "fechamento_caixa": lambda db: relatorio_service.fechamento_caixa(db, hoje),
+        "faturamento_periodo": lambda db: relatorio_service.faturamento_periodo(db, semana, hoje),
+        "list_sugestoes_mais_pedidos": lambda db: comanda_service.list_sugestoes_mais_pedidos(db),
+        # Saldo pendente: base da validacao de todo pagamento.
+        "saldo_pedido": lambda db: pagamento_service.resumo_pagamentos_pedido(
+            db, INDICES_PEDIDOS // 2, Decimal("19.80")
+        ),
+    }
+
+
+def _planos(engine, funcao: Callable[[Session], object]) -> list[tuple[str, list[str]]]:
+    capturados: list[tuple[str, list[str]]] = []
+
+    def _capturar(conn, _cursor, statement, parameters, _context, executemany):
+        if executemany or not statement.lstrip().upper().startswith(("SELECT", "WITH", "UPDATE", "DELETE")):
+            return
+        capturados.append((normalizar_sql(statement), explicar(conn, statement, parameters)))
+
+    comanda_service.invalidate_read_caches()
+    event.listen(engine, "after_cursor_execute", _capturar)
+    try:
+        with sessionmaker(bind=engine, autoflush=False, expire_on_commit=False, future=True)() as db:
+            funcao(db)
+    finally:
+        event.remove(engine, "after_cursor_execute", _capturar)
+    return capturados
+
+
+@pytest.mark.parametrize("cenario", list(_cenarios()))
+def test_consultas_quentes_usam_indice(banco_indices, cenario):
+    planos = _planos(banco_indices, _cenarios()[cenario])
+    assert planos, f"{cenario} nao executou SQL (cache?)"
+
+    violacoes = [
+        f"SCAN {tabela} em: {sql}\n    " + "\n    ".join(plano)
+        for sql, plano in planos
+        for tabela in tabelas_varridas(plano)
+        if tabela in TABELAS_QUENTES and (cenario, tabela) not in PERMITIDAS
+    ]
+    assert not violacoes, f"{cenario} varre tabela quente sem indice:\n" + "\n".join(violacoes)
+
+
+def test_permitidas_ainda_sao_necessarias(banco_indices):
+    # Entrada obsoleta na allowlist esconderia a proxima regressao do mesmo cenario.
+    for cenario, tabela in PERMITIDAS:
+        planos = _planos(banco_indices, _cenarios()[cenario])
+        assert any(tabela in tabelas_varridas(plano) for _sql, plano in planos), (cenario, tabela)
+
+
+def test_detector_acusa_varredura(banco_indices):
+    # Controle do proprio harness: filtro em coluna sem indice tem que aparecer.
+    planos = _planos(
+        banco_indices,
+        lambda db: db.execute(select(Pedido.id).where(Pedido.observacoes.ilike("%cebola%"))).all(),
+    )
+    assert any("pedidos" in tabelas_varridas(plano) for _sql, plano in planos)
@@ -1,8 +1,15 @@
 from __future__ import annotations
 
+import argparse
+import random
+from bisect import bisect_right
+from datetime import date, datetime, timedelta
 from decimal import Decimal
+from itertools import accumulate
+from time import perf_counter
 
-from sqlalchemy import func, select
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.engine import Engine
 
 from app.db.base import Base
 from app.db.bootstrap import ensure_schema
@@ -23,11 +30,11 @@ def money(value: str | Decimal | int | float) -> Decimal:
     return Decimal(value).quantize(Decimal("0.01"))
 
 
-def run_seed() -> None:
-    Base.metadata.create_all(bind=engine)
-    ensure_schema(engine)
+def run_seed(alvo: Engine = engine) -> None:
+    Base.metadata.create_all(bind=alvo)
+    ensure_schema(alvo)
 
-    with SessionLocal() as db:
+    with SessionLocal(bind=alvo) as db:
         cliente = _get_or_create_cliente_balcao(db)
         produtos = _seed_produtos(db)
         adicionais = _seed_adicionais(db)
@@ -243,7 +250,7 @@ def _seed_comandas_fake(db, cliente: Cliente, produtos: dict, adicionais: dict,
         },
         {
             "codigo": "C-003",
-            "status": StatusPedido.EM_PREPARO,
+            "status": StatusPedido.ABERTO,
             "tipo_entrega": TipoEntrega.RETIRADA,
             "mesa": "5",
             "obs": "Mesa 5",
@@ -255,7 +262,7 @@ def _seed_comandas_fake(db, cliente: Cliente, produtos: dict, adicionais: dict,
         },
         {
             "codigo": "C-004",
-            "status": StatusPedido.PRONTO,
+            "status": StatusPedido.ABERTO,
             "tipo_entrega": TipoEntrega.RETIRADA,
             "obs": "Balcao retirada",
             "itens": [
@@ -266,7 +273,7 @@ def _seed_comandas_fake(db, cliente: Cliente, produtos: dict, adicionais: dict,
         },
         {
             "codigo": "C-005",
-            "status": StatusPedido.ENTREGUE,
+            "status": StatusPedido.FINALIZADA,
             "tipo_entrega": TipoEntrega.ENTREGA,
             "obs": "Condominio Grill",
             "itens": [
@@ -277,7 +284,7 @@ def _seed_comandas_fake(db, cliente: Cliente, produtos: dict, adicionais: dict,
         },
         {
             "codigo": "C-006",
-            "status": StatusPedido.ENTREGUE,
+            "status": StatusPedido.FINALIZADA,
             "tipo_entrega": TipoEntrega.RETIRADA,
             "mesa": "9",
             "obs": "Mesa 9",
@@ -374,12 +381,319 @@ def _seed_comandas_fake(db, cliente: Cliente, produtos: dict, adicionais: dict,
         codigo = codigos.get(row["codigo"])
         if codigo:
             codigo.ativo = True
-            codigo.em_uso = row["status"] in {
-                StatusPedido.ABERTO,
-                StatusPedido.EM_PREPARO,
-                StatusPedido.PRONTO,
+            codigo.em_uso = row["status"] == StatusPedido.ABERTO
+
+
+# Carga sintetica (python seed.py --pedidos N --dias D --codigos C): historico
+# de D dias ate ontem mais as comandas abertas agora, com picos de almoco e
+# jantar, produtos populares, adicionais, mix de pagamentos e cancelamentos.
+# Tudo em INSERTs Core em lote, uma transacao por lote de pedidos.
+PICOS_POR_HORA = {
+    11: 8, 12: 20, 13: 18, 14: 8, 15: 3, 17: 2, 18: 5, 19: 11, 20: 14, 21: 11, 22: 5,
+}
+# Segunda..domingo: sexta a domingo bem mais cheios.
+PESO_DIA_SEMANA = (0.7, 0.8, 0.85, 0.95, 1.25, 1.5, 1.4)
+POPULARIDADE = {
+    "Refrigerante Lata 350ml": 22,
+    "Buffet Almoco": 18,
+    "Espeto Completo": 14,
+    "Cerveja Long Neck": 14,
+    "Mini Espeto": 12,
+    "Buffet": 10,
+    "Agua Mineral 500ml": 9,
+    "Suco Natural 500ml": 7,
+    "Pao de Alho": 7,
+    "Queijo Coalho na Brasa": 6,
+    "Costela Fatiada": 4,
+    "Bebidas": 3,
+}
+QUANTIDADES = {
+    "Refrigerante Lata 350ml": (1, 4),
+    "Cerveja Long Neck": (1, 6),
+    "Mini Espeto": (1, 4),
+    "Buffet Almoco": (1, 4),
+}
+ITENS_POR_PEDIDO = {1: 10, 2: 25, 3: 28, 4: 18, 5: 10, 6: 6, 7: 3}
+METODOS = {
+    MetodoPagamento.CARTAO_CREDITO: 40,
+    MetodoPagamento.PIX: 28,
+    MetodoPagamento.CARTAO_DEBITO: 22,
+    MetodoPagamento.DINHEIRO: 10,
+}
+TAXA_CANCELAMENTO = 0.03
+TAXA_ENTREGA = 0.05
+TAXA_MESA = 0.9
+TAXA_ADICIONAL = 0.35
+TAXA_DESCONTO = 0.04
+TAXA_PAGAMENTO_DIVIDIDO = 0.15
+TAXA_CARTAO_RECUSADO = 0.02
+
+
+class _Sorteio:
+    # random.choices com os pesos acumulados uma vez so.
+    def __init__(self, rng: random.Random, pesos: dict) -> None:
+        self.rng = rng
+        self.valores = list(pesos)
+        self.acumulados = list(accumulate(pesos.values()))
+        self.total = self.acumulados[-1]
+
+    def __call__(self):
+        return self.valores[bisect_right(self.acumulados, self.rng.random() * self.total)]
+
+
+def _centavos(valor: Decimal) -> int:
+    return int(money(valor) * 100)
+
+
+def _reais(centavos: int) -> Decimal:
+    return Decimal(centavos).scaleb(-2)
+
+
+def gerar_carga(
+    alvo: Engine,
+    pedidos: int,
+    dias: int,
+    codigos: int,
+    semente: int = 42,
+    lote: int = 20_000,
+) -> dict[str, int]:
+    rng = random.Random(semente)
+    inicio_execucao = perf_counter()
+    with alvo.connect() as conn:
+        cliente_id = conn.scalar(select(Cliente.id).where(func.lower(Cliente.nome) == "balcao"))
+        catalogo = conn.execute(
+            select(Produto.id, Produto.nome, Produto.preco).where(Produto.ativo.is_(True)).order_by(Produto.id)
+        ).all()
+        adicionais = {
+            adicional_id: _centavos(preco)
+            for adicional_id, preco in conn.execute(
+                select(Adicional.id, Adicional.preco).where(Adicional.ativo.is_(True))
+            )
+        }
+        permitidos: dict[int, list[int]] = {}
+        for produto_id, adicional_id in conn.execute(
+            select(ProdutoAdicional.produto_id, ProdutoAdicional.adicional_id)
+        ):
+            if adicional_id in adicionais:
+                permitidos.setdefault(produto_id, []).append(adicional_id)
+        proximo = {
+            tabela: (conn.scalar(select(func.max(coluna))) or 0) + 1
+            for tabela, coluna in (
+                ("pedidos", Pedido.id),
+                ("itens", ItemPedido.id),
+                ("adicionais", ItemPedidoAdicional.id),
+                ("pagamentos", Pagamento.id),
+            )
+        }
+    if cliente_id is None or not catalogo:
+        raise SystemExit("Rode o seed base antes (cliente Balcao e catalogo).")
+
+    produtos = {produto_id: (nome, _centavos(preco)) for produto_id, nome, preco in catalogo}
+    sortear_produto = _Sorteio(rng, {produto_id: POPULARIDADE.get(nome, 1) for produto_id, nome, _ in catalogo})
+    sortear_hora = _Sorteio(rng, PICOS_POR_HORA)
+    sortear_qtd_itens = _Sorteio(rng, ITENS_POR_PEDIDO)
+    sortear_metodo = _Sorteio(rng, METODOS)
+
+    nomes_codigos = _garantir_codigos(alvo, codigos)
+    abertas = min(len(nomes_codigos), max(1, codigos // 4), pedidos)
+    agenda = _agenda(rng, pedidos - abertas, dias, sortear_hora)
+    agora = datetime.now().replace(microsecond=0)
+    agenda += sorted(agora - timedelta(seconds=rng.randint(60, 90 * 60)) for _ in range(abertas))
+    codigos_abertos = rng.sample(nomes_codigos, abertas)
+
+    contagem = {"pedidos": 0, "itens": 0, "adicionais": 0, "pagamentos": 0}
+    for inicio_lote in range(0, len(agenda), lote):
+        linhas: dict[str, list[dict]] = {"pedidos": [], "itens": [], "adicionais": [], "pagamentos": []}
+        for posicao in range(inicio_lote, min(inicio_lote + lote, len(agenda))):
+            indice_aberta = posicao - (len(agenda) - abertas)
+            if indice_aberta >= 0:
+                status = StatusPedido.ABERTO
+                codigo = codigos_abertos[indice_aberta]
+            else:
+                status = StatusPedido.CANCELADO if rng.random() < TAXA_CANCELAMENTO else StatusPedido.FINALIZADA
+                codigo = rng.choice(nomes_codigos)
+            _gerar_pedido(
+                rng, linhas, proximo, cliente_id, codigo, status, agenda[posicao],
+                produtos, permitidos, adicionais,
+                sortear_produto, sortear_qtd_itens, sortear_metodo,
+            )
+        with alvo.begin() as conn:
+            for tabela, modelo in (
+                ("pedidos", Pedido),
+                ("itens", ItemPedido),
+                ("adicionais", ItemPedidoAdicional),
+                ("pagamentos", Pagamento),
+            ):
+                if linhas[tabela]:
+                    conn.execute(insert(modelo), linhas[tabela])
+                    contagem[tabela] += len(linhas[tabela])
+        print(f"  {contagem['pedidos']}/{len(agenda)} pedidos ({perf_counter() - inicio_execucao:.0f}s)")
+
+    with alvo.begin() as conn:
+        conn.execute(
+            update(ComandaCodigo)
+            .where(ComandaCodigo.codigo.in_(nomes_codigos))
+            .values(em_uso=False, status_visual="LIBERADO")
+        )
+        conn.execute(
+            update(ComandaCodigo)
+            .where(ComandaCodigo.codigo.in_(codigos_abertos))
+            .values(em_uso=True, status_visual=StatusPedido.ABERTO.value)
+        )
+    contagem["segundos"] = round(perf_counter() - inicio_execucao)
+    return contagem
+
+
+def _garantir_codigos(alvo: Engine, quantidade: int) -> list[str]:
+    nomes = [f"G-{indice:04d}" for indice in range(1, quantidade + 1)]
+    with alvo.begin() as conn:
+        existentes = set(conn.scalars(select(ComandaCodigo.codigo).where(ComandaCodigo.codigo.in_(nomes))))
+        novos = [{"codigo": nome, "ativo": True, "em_uso": False} for nome in nomes if nome not in existentes]
+        if novos:
+            conn.execute(insert(ComandaCodigo), novos)
+    return nomes
+
+
+def _agenda(rng: random.Random, quantidade: int, dias: int, sortear_hora: _Sorteio) -> list[datetime]:
+    # Volume por dia: dia da semana e crescimento leve ao longo do periodo.
+    ontem = date.today() - timedelta(days=1)
+    datas = [ontem - timedelta(days=dias - 1 - indice) for indice in range(dias)]
+    pesos = [PESO_DIA_SEMANA[dia.weekday()] * (0.8 + 0.2 * indice / max(dias - 1, 1)) for indice, dia in enumerate(datas)]
+    total_pesos = sum(pesos)
+    por_dia = [int(quantidade * peso / total_pesos) for peso in pesos]
+    for indice in rng.sample(range(dias), quantidade - sum(por_dia)):
+        por_dia[indice] += 1
+
+    agenda: list[datetime] = []
+    for dia, total in zip(datas, por_dia):
+        base = datetime.combine(dia, datetime.min.time())
+        agenda.extend(
+            sorted(base + timedelta(hours=sortear_hora(), seconds=rng.randrange(3600)) for _ in range(total))
+        )
+    return agenda
+
+
+def _gerar_pedido(
+    rng: random.Random,
+    linhas: dict[str, list[dict]],
+    proximo: dict[str, int],
+    cliente_id: int,
+    codigo: str,
+    status: StatusPedido,
+    criado_em: datetime,
+    produtos: dict[int, tuple[str, int]],
+    permitidos: dict[int, list[int]],
+    adicionais: dict[int, int],
+    sortear_produto: _Sorteio,
+    sortear_qtd_itens: _Sorteio,
+    sortear_metodo: _Sorteio,
+) -> None:
+    pedido_id = proximo["pedidos"]
+    proximo["pedidos"] += 1
+    entrega = rng.random() < TAXA_ENTREGA
+    mesa = None if entrega or rng.random() >= TAXA_MESA else str(rng.randint(1, 40))
+    total = 0
+    for produto_id in {sortear_produto() for _ in range(sortear_qtd_itens())}:
+        nome, preco = produtos[produto_id]
+        minimo, maximo = QUANTIDADES.get(nome, (1, 2))
+        quantidade = rng.randint(minimo, maximo)
+        item_id = proximo["itens"]
+        proximo["itens"] += 1
+        bruto = preco * quantidade
+        if produto_id in permitidos and rng.random() < TAXA_ADICIONAL:
+            adicional_id = rng.choice(permitidos[produto_id])
+            linhas["adicionais"].append(
+                {
+                    "id": proximo["adicionais"],
+                    "item_pedido_id": item_id,
+                    "adicional_id": adicional_id,
+                    "quantidade": 1,
+                    "preco_unitario": _reais(adicionais[adicional_id]),
+                    "subtotal": _reais(adicionais[adicional_id]),
+                }
+            )
+            proximo["adicionais"] += 1
+            bruto += adicionais[adicional_id]
+        desconto = min(bruto, rng.choice((100, 200, 500))) if rng.random() < TAXA_DESCONTO else 0
+        total += bruto - desconto
+        linhas["itens"].append(
+            {
+                "id": item_id,
+                "pedido_id": pedido_id,
+                "produto_id": produto_id,
+                "quantidade": quantidade,
+                "preco_unitario": _reais(preco),
+                "desconto": _reais(desconto),
+                "subtotal": _reais(bruto - desconto),
             }
+        )
+    linhas["pedidos"].append(
+        {
+            "id": pedido_id,
+            "cliente_id": cliente_id,
+            "comanda_codigo": codigo,
+            "mesa": mesa,
+            "status": status,
+            "tipo_entrega": TipoEntrega.ENTREGA if entrega else TipoEntrega.RETIRADA,
+            "observacoes": None,
+            "total": _reais(total),
+            "criado_em": criado_em,
+        }
+    )
+    if status == StatusPedido.FINALIZADA:
+        _gerar_pagamentos(rng, linhas, proximo, pedido_id, total, criado_em, sortear_metodo)
+
+
+def _gerar_pagamentos(
+    rng: random.Random,
+    linhas: dict[str, list[dict]],
+    proximo: dict[str, int],
+    pedido_id: int,
+    total: int,
+    criado_em: datetime,
+    sortear_metodo: _Sorteio,
+) -> None:
+    # Mesa grande divide a conta com mais frequencia.
+    partes = [total]
+    if total > 2000 and rng.random() < TAXA_PAGAMENTO_DIVIDIDO:
+        pessoas = rng.randint(2, 4)
+        parte = total // pessoas
+        partes = [parte] * (pessoas - 1) + [total - parte * (pessoas - 1)]
+    pago_em = criado_em + timedelta(minutes=rng.randint(30, 120))
+    for valor in partes:
+        metodo = sortear_metodo()
+        cartao = metodo in {MetodoPagamento.CARTAO_DEBITO, MetodoPagamento.CARTAO_CREDITO}
+        tentativas = [StatusPagamento.RECUSADO] if cartao and rng.random() < TAXA_CARTAO_RECUSADO else []
+        for status in [*tentativas, StatusPagamento.APROVADO]:
+            pagamento_id = proximo["pagamentos"]
+            proximo["pagamentos"] += 1
+            linhas["pagamentos"].append(
+                {
+                    "id": pagamento_id,
+                    "pedido_id": pedido_id,
+                    "metodo": metodo,
+                    "status": status,
+                    "valor": _reais(valor),
+                    "referencia_externa": f"NSU-{pagamento_id}" if cartao else None,
+                    "maquininha_id": "MAQ-01" if cartao else None,
+                    "criado_em": pago_em,
+                }
+            )
+
+
+def _argumentos() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Seed base e carga sintetica para testes de volume.")
+    parser.add_argument("--pedidos", type=int, default=0, help="pedidos sinteticos (ex.: 1_000_000)")
+    parser.add_argument("--dias", type=int, default=365, help="dias de historico ate ontem")
+    parser.add_argument("--codigos", type=int, default=300, help="codigos de comanda G-0001..")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--lote", type=int, default=20_000, help="pedidos por transacao")
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
+    args = _argumentos()
     run_seed()
+    if args.pedidos > 0:
+        resultado = gerar_carga(engine, args.pedidos, args.dias, args.codigos, args.semente, args.lote)
+        print(f"Carga sintetica concluida: {resultado}")